@@ -1,14 +1,40 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser
+from .models import CustomUser, ExecucaoTarefa, PerfilExecucao, Tarefa
 
 class CustomUserAdmin(UserAdmin):
     fieldsets = UserAdmin.fieldsets + (
-        ('Campos Personalizados', {'fields': ('telefone', 'cargo', 'situacao')}),
+        ('Campos Personalizados', {'fields': ('telefone', 'cargo', 'situacao', 'localizacao_base', 'capacidade_diaria')}),
     )
     add_fieldsets = UserAdmin.add_fieldsets + (
         ('Campos Personalizados', {'fields': ('telefone', 'cargo', 'situacao')}),
     )
 
 # Diz ao Django para usar a configuração customizada para o modelo CustomUser
-admin.site.register(CustomUser, CustomUserAdmin)
\ No newline at end of file
+admin.site.register(CustomUser, CustomUserAdmin)
+
+
+# Tarefas agendadas (api/agendador.py): editar o intervalo, pausar ou antecipar pelo admin
+class TarefaAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'comando', 'intervalo', 'proxima_execucao', 'ativa', 'tentativa', 'bloqueada_por')
+    list_filter = ('ativa', 'comando')
+
+
+class ExecucaoTarefaAdmin(admin.ModelAdmin):
+    list_display = ('tarefa', 'status', 'tentativa', 'worker', 'iniciada_em', 'finalizada_em', 'progresso_atual', 'progresso_total')
+    list_filter = ('status', 'tarefa')
+    list_select_related = ('tarefa',)
+
+
+admin.site.register(Tarefa, TarefaAdmin)
+admin.site.register(ExecucaoTarefa, ExecucaoTarefaAdmin)
+
+
+# Perfis de execução (api/perfilamento.py): o arquivo baixa-se por /api/perfis/<id>/download/
+class PerfilExecucaoAdmin(admin.ModelAdmin):
+    list_display = ('alvo', 'origem', 'metodo', 'status', 'duracao', 'consultas', 'tempo_consultas', 'formato', 'criado_em')
+    list_filter = ('origem', 'formato')
+    search_fields = ('alvo', 'caminho')
+
+
+admin.site.register(PerfilExecucao, PerfilExecucaoAdmin)
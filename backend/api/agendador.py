@@ -0,0 +1,202 @@
+import datetime
+import io
+import os
+import socket
+import time
+import traceback
+
+from django.conf import settings
+from django.core.management import call_command, load_command_class
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ExecucaoTarefa, Tarefa
+
+##
+## --- agendador.py ---
+## Fila de tarefas no banco e worker de longa duração para os comandos de manutenção
+## (calcula_mtbf, calcula_mttr, os_preventiva, ...), que antes rodavam cada um no seu
+## processo lançado pelo cron.
+##
+## Um processo `worker_tarefas` fica em execução com o Django (GDAL/GEOS, conexões) já
+## carregado e roda o próprio código dos comandos (call_command). Cada tarefa tem um
+## intervalo; o worker reserva a tarefa vencida com FOR UPDATE SKIP LOCKED e grava um
+## "lease" (bloqueada_ate): enquanto ele não expirar, nenhum outro worker roda a mesma
+## tarefa — duas execuções nunca se sobrepõem. Falhas são repetidas com espera crescente
+## até max_tentativas. Cada execução fica registada em ExecucaoTarefa, com progresso e saída.
+##
+## O tempo vem sempre de um relógio (`Relogio`); nos testes usa-se o `RelogioFalso`, que
+## avança sem esperar de verdade.
+##
+
+
+"""
+============================== BLOCO 1 — Relógios ==============================
+`agora()` e `dormir(segundos)` são tudo o que o agendador usa do tempo.
+=================================================================================
+"""
+class Relogio:
+    def agora(self):
+        return timezone.now()
+
+    def dormir(self, segundos):
+        time.sleep(segundos)
+
+
+class RelogioFalso:
+    """ Relógio parado que só anda quando alguém dorme ou chama `avancar`. """
+
+    def __init__(self, inicio=None):
+        self.atual = inicio or timezone.now()
+
+    def agora(self):
+        return self.atual
+
+    def dormir(self, segundos):
+        self.avancar(segundos)
+
+    def avancar(self, segundos):
+        self.atual += datetime.timedelta(seconds=segundos)
+
+
+def nome_worker():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def relatar_progresso(comando, atual, total):
+    """ Chamado pelos comandos a cada item; só faz algo quando o comando roda pelo worker. """
+    ao_progredir = getattr(comando, 'ao_progredir', None)
+    if ao_progredir is not None:
+        ao_progredir(atual, total)
+
+
+"""
+============================ BLOCO 2 — Reserva e agenda ============================
+Uma tarefa está disponível quando está ativa, venceu (proxima_execucao <= agora) e não
+tem lease válido. Se o lease anterior expirou com a execução ainda 'executando', o worker
+que a rodava caiu: a execução é marcada como 'abandonada' e conta como uma tentativa.
+
+A próxima execução regular mantém a grade do intervalo (ex.: todo dia às 02:00), mesmo
+que a tarefa tenha atrasado; execuções perdidas não são acumuladas. As retentativas não
+mexem na grade: a tarefa fica vencida e bloqueada (bloqueada_ate) até à hora da retentativa.
+=====================================================================================
+"""
+def _lease(relogio):
+    return relogio.agora() + datetime.timedelta(seconds=settings.JOB_LEASE_SECONDS)
+
+
+def reservar(worker, relogio):
+    """ Reserva a tarefa vencida mais antiga. Devolve (tarefa, execucao) ou None. """
+    agora = relogio.agora()
+    with transaction.atomic():
+        tarefa = (
+            Tarefa.objects.select_for_update(skip_locked=True)
+            .filter(ativa=True, proxima_execucao__lte=agora)
+            .filter(Q(bloqueada_ate__isnull=True) | Q(bloqueada_ate__lt=agora))
+            .order_by('proxima_execucao')
+            .first()
+        )
+        if tarefa is None:
+            return None
+        tarefa.execucoes.filter(status='executando').update(status='abandonada', finalizada_em=agora)
+        tarefa.tentativa += 1
+        tarefa.bloqueada_ate = _lease(relogio)
+        tarefa.bloqueada_por = worker
+        tarefa.save(update_fields=['tentativa', 'bloqueada_ate', 'bloqueada_por'])
+        execucao = ExecucaoTarefa.objects.create(
+            tarefa=tarefa, tentativa=tarefa.tentativa, worker=worker, iniciada_em=agora,
+        )
+    return tarefa, execucao
+
+
+def proxima_regular(tarefa, agora):
+    """ Primeiro instante da grade (proxima_execucao + k * intervalo) depois de `agora`. """
+    base = tarefa.proxima_execucao
+    if base > agora:
+        return base
+    passos = (agora - base) // tarefa.intervalo + 1
+    return base + passos * tarefa.intervalo
+
+
+def _finalizar(tarefa, execucao, relogio, sucesso, saida, erro=''):
+    agora = relogio.agora()
+    ExecucaoTarefa.objects.filter(pk=execucao.pk).update(
+        status='sucesso' if sucesso else 'falha',
+        finalizada_em=agora,
+        saida=saida[-settings.JOB_OUTPUT_MAX_CHARS:],
+        erro=erro[-settings.JOB_OUTPUT_MAX_CHARS:],
+    )
+
+    # Só mexe na tarefa se o lease ainda for deste worker (se expirou, outro já pode tê-la reservado)
+    minha = Tarefa.objects.filter(pk=tarefa.pk, bloqueada_por=execucao.worker)
+    if sucesso or tarefa.tentativa >= tarefa.max_tentativas:
+        proxima = proxima_regular(tarefa, agora)
+        minha.update(proxima_execucao=proxima, tentativa=0, bloqueada_ate=None, bloqueada_por='')
+    else:
+        # Nova tentativa: a tarefa continua vencida e fica bloqueada até à hora da retentativa
+        proxima = agora + tarefa.espera_retentativa * 2 ** (tarefa.tentativa - 1)
+        minha.update(bloqueada_ate=proxima, bloqueada_por='')
+    return proxima
+
+
+def executar_agora(nome, relogio=None):
+    """ Antecipa a tarefa para já (o worker pega-a na próxima volta). """
+    agora = (relogio or Relogio()).agora()
+    return Tarefa.objects.filter(nome=nome).update(proxima_execucao=agora)
+
+
+"""
+============================== BLOCO 3 — Execução ==============================
+O comando roda no próprio processo (call_command) com a saída capturada. O progresso
+relatado pelo comando é gravado no máximo a cada JOB_PROGRESS_INTERVAL segundos, e cada
+gravação renova o lease — uma tarefa longa não perde a reserva enquanto avança.
+=================================================================================
+"""
+def executar(tarefa, execucao, relogio):
+    """ Roda a tarefa reservada. Devolve (sucesso, proxima_execucao). """
+    saida = io.StringIO()
+    comando = load_command_class('api', tarefa.comando)
+    ultima_gravacao = [None]
+
+    def ao_progredir(atual, total):
+        agora = relogio.agora()
+        if (
+            ultima_gravacao[0] is not None and atual != total
+            and (agora - ultima_gravacao[0]).total_seconds() < settings.JOB_PROGRESS_INTERVAL
+        ):
+            return
+        ultima_gravacao[0] = agora
+        ExecucaoTarefa.objects.filter(pk=execucao.pk).update(progresso_atual=atual, progresso_total=total)
+        Tarefa.objects.filter(pk=tarefa.pk, bloqueada_por=execucao.worker).update(bloqueada_ate=_lease(relogio))
+
+    comando.ao_progredir = ao_progredir
+    try:
+        call_command(comando, stdout=saida, stderr=saida, **tarefa.argumentos)
+    except Exception:
+        return False, _finalizar(tarefa, execucao, relogio, False, saida.getvalue(), traceback.format_exc())
+    return True, _finalizar(tarefa, execucao, relogio, True, saida.getvalue())
+
+
+def rodar(worker, relogio, uma_vez=False, intervalo=5.0, relatar=None):
+    """
+    Laço do worker: reserva, executa, repete. Com `uma_vez`, termina quando não houver
+    tarefa vencida. `relatar(tarefa, execucao, sucesso, proxima)` é chamado após cada execução.
+    Devolve o número de execuções.
+    """
+    execucoes = 0
+    while True:
+        # Entre tarefas: descarta conexões quebradas ou além do CONN_MAX_AGE (mantém as boas)
+        close_old_connections()
+        reservada = reservar(worker, relogio)
+        if reservada is None:
+            if uma_vez:
+                return execucoes
+            relogio.dormir(intervalo)
+            continue
+
+        tarefa, execucao = reservada
+        sucesso, proxima = executar(tarefa, execucao, relogio)
+        execucoes += 1
+        if relatar is not None:
+            relatar(tarefa, execucao, sucesso, proxima)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Conecta os signals (ex.: manutenção da matriz de deslocamento)
+        from . import signals  # noqa: F401
@@ -0,0 +1,308 @@
+import datetime
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import OrdemServico
+from .otimizador_rotas import GANHO_MINIMO, RAIO_TERRA_M
+
+##
+## --- atribuicao.py ---
+## Atribuição em lote das O.S. pendentes de um dia aos técnicos ativos (comando
+## `atribui_tecnicos` e POST /api/ordens-servico/atribuir/).
+##
+## Cada Ativo com O.S. do dia é uma parada (as O.S. do mesmo Ativo vão para o mesmo técnico).
+## O custo de uma parada para um técnico é a distância em linha reta da base do técnico
+## (CustomUser.localizacao_base) até o Ativo; cada técnico recebe no máximo a sua capacidade
+## diária em O.S., descontadas as que já tem no dia.
+##
+## 1. Candidatos: para cada parada, os ASSIGNMENT_CANDIDATES técnicos mais próximos, numa
+##    única query com JOIN LATERAL e ORDER BY <-> (busca KNN pelo índice GiST da base).
+## 2. Guloso por arrependimento: as paradas em que perder o melhor técnico custa mais
+##    (2º candidato - 1º) escolhem primeiro; cada uma fica com o candidato mais próximo
+##    com capacidade.
+## 3. Sobras: paradas cujos candidatos lotaram vão para o técnico mais próximo com
+##    capacidade entre todos (NumPy); se nenhum comporta a parada inteira, ela é dividida.
+## 4. Reparo: passadas de busca local — mover uma parada para um candidato mais próximo com
+##    folga, ou trocar duas paradas entre técnicos — enquanto a distância total cair.
+##
+## Técnicos sem localizacao_base ficam de fora (não há de onde medir o custo). Com
+## ASSIGNMENT_MAX_DISTANCE_M, nenhum técnico recebe uma parada mais longe do que isso da sua
+## base: as O.S. sem técnico dentro do raio (ou sem técnico nenhum) vão para `sem_tecnico`.
+##
+
+
+"""
+=============================== BLOCO 1 — Dados do dia ===============================
+Uma query traz as paradas com os seus candidatos; outras duas, os técnicos (com a
+capacidade) e a carga que já têm no dia (O.S. atribuídas antes, manual ou noutra execução).
+========================================================================================
+"""
+SQL_CANDIDATOS = """
+    WITH paradas AS (
+        SELECT o.ativo_id, array_agg(o.id ORDER BY o.data_prevista, o.id) AS ordens
+        FROM api_ordemservico o
+        WHERE o.status = 'pendente' AND o.tecnico_id IS NULL AND o.ativo_id IS NOT NULL
+          AND o.data_prevista >= %(inicio)s AND o.data_prevista < %(fim)s
+        GROUP BY o.ativo_id
+    )
+    SELECT p.ativo_id, p.ordens, ST_Y(a.localizacao), ST_X(a.localizacao),
+           t.id, ST_DistanceSphere(a.localizacao, t.localizacao_base)
+    FROM paradas p
+    JOIN api_ativo a ON a.id = p.ativo_id
+    LEFT JOIN LATERAL (
+        SELECT u.id, u.localizacao_base
+        FROM api_customuser u
+        WHERE u.cargo = 'tecnico' AND u.situacao = 'ativo' AND u.is_active
+          AND u.localizacao_base IS NOT NULL
+        ORDER BY u.localizacao_base <-> a.localizacao
+        LIMIT %(candidatos)s
+    ) t ON true
+    ORDER BY p.ativo_id
+"""
+
+
+def limites_do_dia(dia):
+    inicio = timezone.make_aware(datetime.datetime.combine(dia, datetime.time()))
+    return inicio, inicio + datetime.timedelta(days=1)
+
+
+def carregar_paradas(dia, candidatos=None, distancia_maxima=None):
+    """ Lista de paradas {'ativo_id', 'ordens', 'lat', 'lng', 'custos': {tecnico_id: metros}}. """
+    candidatos = candidatos or settings.ASSIGNMENT_CANDIDATES
+    distancia_maxima = settings.ASSIGNMENT_MAX_DISTANCE_M if distancia_maxima is None else distancia_maxima
+    inicio, fim = limites_do_dia(dia)
+    paradas = {}
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_CANDIDATOS, {'inicio': inicio, 'fim': fim, 'candidatos': candidatos})
+        for ativo_id, ordens, lat, lng, tecnico_id, distancia in cursor.fetchall():
+            parada = paradas.get(ativo_id)
+            if parada is None:
+                parada = paradas[ativo_id] = {'ativo_id': ativo_id, 'ordens': list(ordens), 'lat': lat, 'lng': lng, 'custos': {}}
+            # Sem técnico nenhum com base, o LEFT JOIN traz a parada com tecnico_id NULL
+            if tecnico_id is not None and (not distancia_maxima or distancia <= distancia_maxima):
+                parada['custos'][tecnico_id] = distancia
+    return list(paradas.values())
+
+
+def carregar_tecnicos(dia):
+    """ {tecnico_id: {'lat', 'lng', 'folga'}}: folga = capacidade - O.S. que já tem no dia. """
+    inicio, fim = limites_do_dia(dia)
+    tecnicos = get_user_model().objects.filter(
+        cargo='tecnico', situacao='ativo', is_active=True, localizacao_base__isnull=False,
+    ).values_list('id', 'capacidade_diaria', 'localizacao_base')
+    carga = dict(
+        OrdemServico.objects.filter(status='pendente', data_prevista__gte=inicio, data_prevista__lt=fim, tecnico__isnull=False)
+        .values_list('tecnico_id').annotate(total=Count('id')).values_list('tecnico_id', 'total')
+    )
+    return {
+        tecnico_id: {
+            'lat': base.y,
+            'lng': base.x,
+            'folga': max((capacidade or settings.ASSIGNMENT_DEFAULT_CAPACITY) - carga.get(tecnico_id, 0), 0),
+        }
+        for tecnico_id, capacidade, base in tecnicos
+    }
+
+
+"""
+============================ BLOCO 2 — Atribuição (em memória) ============================
+`atribuir(paradas, tecnicos)` não toca no banco. Devolve {tecnico_id: [ordem_ids]}, as O.S.
+sem técnico (capacidade esgotada ou nenhum técnico dentro de `distancia_maxima`) e a
+distância total. `parada['custos']` ganha as distâncias calculadas nas sobras (só as
+dentro do raio), para o reparo poder usá-las.
+===========================================================================================
+"""
+def _distancias(lat, lng, lats, lngs):
+    """ Haversine de um ponto para vários, em metros. """
+    lat, lng, lats, lngs = np.radians(lat), np.radians(lng), np.radians(lats), np.radians(lngs)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    return 2 * RAIO_TERRA_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _arrependimento(parada):
+    custos = sorted(parada['custos'].values())
+    if not custos:
+        return float('inf')  # sem candidatos: vai para as sobras de qualquer forma
+    return (custos[1] - custos[0]) if len(custos) > 1 else float('inf')
+
+
+def atribuir(paradas, tecnicos, passadas_reparo=None, distancia_maxima=None):
+    passadas_reparo = settings.ASSIGNMENT_REPAIR_PASSES if passadas_reparo is None else passadas_reparo
+    distancia_maxima = settings.ASSIGNMENT_MAX_DISTANCE_M if distancia_maxima is None else distancia_maxima
+    folga = {tecnico_id: dados['folga'] for tecnico_id, dados in tecnicos.items()}
+    # Índice da parada → técnico; paradas divididas (BLOCO 3) ficam fora do reparo
+    escolha = {}
+    por_tecnico = {tecnico_id: set() for tecnico_id in tecnicos}
+    divididas = {}
+    sem_tecnico = []
+
+    # Guloso por arrependimento (paradas maiores primeiro no empate)
+    ordem = sorted(range(len(paradas)), key=lambda i: (-_arrependimento(paradas[i]), -len(paradas[i]['ordens'])))
+    sobras = []
+    for indice in ordem:
+        parada = paradas[indice]
+        demanda = len(parada['ordens'])
+        for tecnico_id, _ in sorted(parada['custos'].items(), key=lambda item: item[1]):
+            if folga.get(tecnico_id, 0) >= demanda:
+                escolha[indice] = tecnico_id
+                por_tecnico[tecnico_id].add(indice)
+                folga[tecnico_id] -= demanda
+                break
+        else:
+            sobras.append(indice)
+
+    # Sobras: o mais próximo com folga entre todos os técnicos (dentro do raio, se houver)
+    if sobras and tecnicos:
+        ids = np.fromiter(tecnicos, dtype=np.int64, count=len(tecnicos))
+        lats = np.array([tecnicos[t]['lat'] for t in ids])
+        lngs = np.array([tecnicos[t]['lng'] for t in ids])
+        for indice in sobras:
+            parada = paradas[indice]
+            demanda = len(parada['ordens'])
+            distancias = _distancias(parada['lat'], parada['lng'], lats, lngs)
+            folgas = np.array([folga[t] for t in ids])
+            proximos = np.argsort(distancias)
+            if distancia_maxima:
+                proximos = proximos[distancias[proximos] <= distancia_maxima]
+            for posicao in proximos:
+                tecnico_id = int(ids[posicao])
+                parada['custos'].setdefault(tecnico_id, float(distancias[posicao]))
+                if folgas[posicao] >= demanda:
+                    escolha[indice] = tecnico_id
+                    por_tecnico[tecnico_id].add(indice)
+                    folga[tecnico_id] -= demanda
+                    break
+            else:
+                # Nenhum técnico comporta a parada inteira: divide entre os mais próximos com folga
+                restantes = list(parada['ordens'])
+                for posicao in proximos:
+                    tecnico_id = int(ids[posicao])
+                    if not restantes:
+                        break
+                    if folga[tecnico_id] > 0:
+                        parte, restantes = restantes[:folga[tecnico_id]], restantes[folga[tecnico_id]:]
+                        divididas.setdefault(indice, []).append((tecnico_id, parte))
+                        folga[tecnico_id] -= len(parte)
+                sem_tecnico.extend(restantes)
+    elif sobras:
+        for indice in sobras:
+            sem_tecnico.extend(paradas[indice]['ordens'])
+
+    _reparar(paradas, escolha, por_tecnico, folga, passadas_reparo)
+
+    atribuidas = {}
+    distancia_total = 0.0
+    for indice, tecnico_id in escolha.items():
+        atribuidas.setdefault(tecnico_id, []).extend(paradas[indice]['ordens'])
+        distancia_total += paradas[indice]['custos'][tecnico_id]
+    for indice, partes in divididas.items():
+        for tecnico_id, parte in partes:
+            atribuidas.setdefault(tecnico_id, []).extend(parte)
+            distancia_total += paradas[indice]['custos'][tecnico_id]
+    return {'atribuidas': atribuidas, 'sem_tecnico': sem_tecnico, 'distancia_total': distancia_total}
+
+
+"""
+=================================== BLOCO 3 — Reparo ===================================
+Mover: a parada vai para um candidato mais próximo que tenha folga para ela.
+Trocar: a parada p (técnico A) e uma parada q do candidato B de p trocam de técnico se a
+soma das duas distâncias cai e as folgas de A e B comportam a troca. Só pares em que
+ambos os custos já são conhecidos (candidatos ou sobras) são considerados.
+==========================================================================================
+"""
+def _reparar(paradas, escolha, por_tecnico, folga, passadas):
+    for _ in range(passadas):
+        melhorou = False
+        for indice in list(escolha):
+            parada = paradas[indice]
+            atual = escolha[indice]
+            custo_atual = parada['custos'][atual]
+            demanda = len(parada['ordens'])
+            for tecnico_id, custo in sorted(parada['custos'].items(), key=lambda item: item[1]):
+                if custo >= custo_atual - GANHO_MINIMO:
+                    break
+                if folga.get(tecnico_id, 0) >= demanda:
+                    _mover(indice, atual, tecnico_id, demanda, escolha, por_tecnico, folga)
+                    melhorou = True
+                    break
+                troca = _melhor_troca(paradas, indice, atual, tecnico_id, custo, escolha, por_tecnico, folga)
+                if troca is not None:
+                    outra = troca
+                    demanda_outra = len(paradas[outra]['ordens'])
+                    _mover(indice, atual, tecnico_id, demanda, escolha, por_tecnico, folga)
+                    _mover(outra, tecnico_id, atual, demanda_outra, escolha, por_tecnico, folga)
+                    melhorou = True
+                    break
+        if not melhorou:
+            break
+
+
+def _mover(indice, origem, destino, demanda, escolha, por_tecnico, folga):
+    por_tecnico[origem].discard(indice)
+    por_tecnico[destino].add(indice)
+    escolha[indice] = destino
+    folga[origem] += demanda
+    folga[destino] -= demanda
+
+
+def _melhor_troca(paradas, indice, tecnico_a, tecnico_b, custo_p_b, escolha, por_tecnico, folga):
+    parada = paradas[indice]
+    demanda_p = len(parada['ordens'])
+    custo_p_a = parada['custos'][tecnico_a]
+    melhor, melhor_ganho = None, GANHO_MINIMO
+    for outra in por_tecnico[tecnico_b]:
+        custos_q = paradas[outra]['custos']
+        if tecnico_a not in custos_q:
+            continue
+        demanda_q = len(paradas[outra]['ordens'])
+        if folga[tecnico_a] + demanda_p < demanda_q or folga[tecnico_b] + demanda_q < demanda_p:
+            continue
+        ganho = (custo_p_a + custos_q[tecnico_b]) - (custo_p_b + custos_q[tecnico_a])
+        if ganho > melhor_ganho:
+            melhor, melhor_ganho = outra, ganho
+    return melhor
+
+
+"""
+================================ BLOCO 4 — Gravação ================================
+Um UPDATE por técnico, só das O.S. ainda pendentes e sem técnico — para não sobrescrever
+uma atribuição manual feita durante o cálculo —, travadas antes (SELECT ... FOR UPDATE)
+para se saber exatamente quais foram gravadas. O update() não dispara os signals: os
+eventos 'ordem.atribuida' dessas O.S. são publicados aqui, depois do commit (ver tempo_real.py).
+=====================================================================================
+"""
+def gravar(atribuidas):
+    from .tempo_real import publicar_ordem
+
+    gravadas = []
+    with transaction.atomic():
+        agora = timezone.now()
+        for tecnico_id, ordem_ids in atribuidas.items():
+            livres = list(
+                OrdemServico.objects.filter(pk__in=ordem_ids, status='pendente', tecnico__isnull=True)
+                .select_for_update().values_list('pk', flat=True)
+            )
+            OrdemServico.objects.filter(pk__in=livres).update(tecnico_id=tecnico_id, atualizado_em=agora)
+            gravadas.extend(livres)
+        for ordem in OrdemServico.objects.filter(pk__in=gravadas).select_related('ativo'):
+            publicar_ordem('ordem.atribuida', ordem)
+    return len(gravadas)
+
+
+def atribuir_dia(dia, candidatos=None, distancia_maxima=None, salvar=True):
+    """
+    Atribui as O.S. pendentes e sem técnico do dia. Devolve o resultado de `atribuir`
+    com 'paradas', 'tecnicos' e 'gravadas' (0 com salvar=False).
+    """
+    paradas = carregar_paradas(dia, candidatos, distancia_maxima)
+    tecnicos = carregar_tecnicos(dia)
+    resultado = atribuir(paradas, tecnicos, distancia_maxima=distancia_maxima)
+    resultado['paradas'] = len(paradas)
+    resultado['tecnicos'] = len(tecnicos)
+    resultado['gravadas'] = gravar(resultado['atribuidas']) if salvar else 0
+    return resultado
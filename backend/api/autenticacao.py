@@ -0,0 +1,146 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+##
+## --- autenticacao.py ---
+## Autenticação por token com cache da resolução token → usuário.
+##
+## O `TokenAuthentication` do DRF faz, em TODO pedido autenticado, um SELECT em
+## authtoken_token com JOIN no usuário. Aqui o resultado fica guardado em dois níveis:
+##
+## 1. Cache local do processo (dicionário com TTL curto, AUTH_TOKEN_LOCAL_TTL) → sem
+##    nenhuma ida à rede no caminho quente.
+## 2. Cache partilhado do Django (Redis quando REDIS_URL está definido, ver settings)
+##    com TTL maior (AUTH_TOKEN_SHARED_TTL) → um processo novo não precisa ir ao banco.
+##
+## A invalidação (ver signals.py) acontece quando o token é apagado ou o usuário passa a
+## `situacao='desativado'`: remove a entrada do cache partilhado e do cache local do
+## processo que fez a alteração. Os demais processos deixam de aceitar o token em no
+## máximo AUTH_TOKEN_LOCAL_TTL segundos, quando a entrada local expira.
+##
+
+PREFIXO_CACHE = 'auth:token:'
+PREFIXO_CACHE_USUARIO = 'auth:usuario:'
+
+
+def _chave_cache(key):
+    # Não guarda o token em claro nas chaves do Redis
+    return PREFIXO_CACHE + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class CacheLocal:
+    """ Dicionário token → (usuário, expira_em), seguro entre threads. """
+
+    def __init__(self, relogio=time.monotonic):
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._entradas = {}
+
+    def obter(self, key):
+        with self._lock:
+            entrada = self._entradas.get(key)
+            if entrada is None:
+                return None
+            usuario, expira_em = entrada
+            if self._relogio() >= expira_em:
+                del self._entradas[key]
+                return None
+            return usuario
+
+    def guardar(self, key, usuario, ttl):
+        with self._lock:
+            # Limpeza preguiçosa: evita que tokens nunca mais usados fiquem na memória
+            if len(self._entradas) >= settings.AUTH_TOKEN_LOCAL_MAX_ENTRIES:
+                agora = self._relogio()
+                self._entradas = {k: e for k, e in self._entradas.items() if e[1] > agora}
+                if len(self._entradas) >= settings.AUTH_TOKEN_LOCAL_MAX_ENTRIES:
+                    self._entradas.clear()
+            self._entradas[key] = (usuario, self._relogio() + ttl)
+
+    def remover(self, key):
+        with self._lock:
+            self._entradas.pop(key, None)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_local = CacheLocal()
+
+
+def guardar(key, usuario):
+    """ Guarda a resolução token → usuário nos dois níveis (usado também no login). """
+    cache_local.guardar(key, usuario, settings.AUTH_TOKEN_LOCAL_TTL)
+    cache.set(_chave_cache(key), usuario, settings.AUTH_TOKEN_SHARED_TTL)
+
+
+def invalidar(*keys, usuario_id=None):
+    """ Remove os tokens dos dois níveis de cache (e o token do usuário guardado para o login). """
+    for key in keys:
+        cache_local.remover(key)
+    chaves = [_chave_cache(key) for key in keys]
+    if usuario_id is not None:
+        chaves.append(f'{PREFIXO_CACHE_USUARIO}{usuario_id}')
+    cache.delete_many(chaves)
+
+
+def token_do_usuario(usuario):
+    """
+    Devolve a key do token do usuário para o LoginView, evitando o get_or_create em
+    authtoken_token a cada login. Já deixa a resolução token → usuário no cache, de
+    modo que o primeiro pedido depois do login também não vai ao banco.
+    """
+    chave_usuario = f'{PREFIXO_CACHE_USUARIO}{usuario.pk}'
+    key = cache.get(chave_usuario)
+    if key is None:
+        from rest_framework.authtoken.models import Token
+        key = Token.objects.get_or_create(user=usuario)[0].key
+        cache.set(chave_usuario, key, settings.AUTH_TOKEN_SHARED_TTL)
+    guardar(key, usuario)
+    return key
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Igual ao TokenAuthentication (mesmo cabeçalho `Authorization: Token <key>`), mas
+    resolve o token pelo cache antes de ir ao banco. Usuários inativos ou com
+    `situacao='desativado'` são recusados.
+
+    Token inválido, expirado ou de usuário desativado NÃO gera 401 aqui: o pedido segue
+    como anônimo. Assim as views AllowAny que o app chama continuam respondendo como antes
+    (quando só Session e Basic eram aceitas e o cabeçalho Token era ignorado), e as que
+    exigem login devolvem 401 pela permissão.
+    """
+
+    def authenticate(self, request):
+        try:
+            return super().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            return None
+
+    def authenticate_credentials(self, key):
+        usuario = cache_local.obter(key)
+        if usuario is None:
+            usuario = cache.get(_chave_cache(key))
+            if usuario is not None:
+                cache_local.guardar(key, usuario, settings.AUTH_TOKEN_LOCAL_TTL)
+        if usuario is None:
+            usuario, _ = super().authenticate_credentials(key)
+            self._validar(usuario)
+            guardar(key, usuario)
+        else:
+            self._validar(usuario)
+
+        # O objeto Token não é lido do banco: `request.auth` recebe um Token não salvo com a mesma key
+        return usuario, self.get_model()(key=key, user=usuario)
+
+    def _validar(self, usuario):
+        if not usuario.is_active or getattr(usuario, 'situacao', None) == 'desativado':
+            raise exceptions.AuthenticationFailed('Usuário inativo ou desativado.')
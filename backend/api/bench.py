@@ -0,0 +1,122 @@
+import json
+import math
+import os
+import subprocess
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+##
+## --- bench.py ---
+## Funções auxiliares partilhadas pelos comandos de benchmark (bench_*):
+## cálculo de percentis e formatação de um resumo de latências; medição com contagem de
+## queries e os resultados em JSON do `bench_suite`, para comparar commits.
+##
+
+
+def percentil(amostras_ordenadas, p):
+    """ Percentil `p` (0-100) por interpolação linear; recebe a lista JÁ ordenada. """
+    if not amostras_ordenadas:
+        return 0.0
+    posicao = (len(amostras_ordenadas) - 1) * (p / 100.0)
+    inferior = math.floor(posicao)
+    superior = math.ceil(posicao)
+    if inferior == superior:
+        return amostras_ordenadas[int(posicao)]
+    peso = posicao - inferior
+    return amostras_ordenadas[inferior] * (1 - peso) + amostras_ordenadas[superior] * peso
+
+
+def resumo_latencias(amostras, duracao_total=None):
+    """
+    Resume uma lista de latências (em segundos) num dicionário com contagem,
+    média, p50/p95/p99, máximo e — se `duracao_total` for dado — a vazão em req/s.
+    """
+    ordenadas = sorted(amostras)
+    resumo = {
+        'n': len(ordenadas),
+        'media': sum(ordenadas) / len(ordenadas) if ordenadas else 0.0,
+        'p50': percentil(ordenadas, 50),
+        'p95': percentil(ordenadas, 95),
+        'p99': percentil(ordenadas, 99),
+        'max': ordenadas[-1] if ordenadas else 0.0,
+    }
+    if duracao_total:
+        resumo['vazao'] = len(ordenadas) / duracao_total
+    return resumo
+
+
+def formatar_resumo(nome, resumo):
+    """ Linha legível para `self.stdout.write`, com latências em milissegundos. """
+    linha = (
+        f"{nome}: n={resumo['n']} media={resumo['media'] * 1000:.1f}ms "
+        f"p50={resumo['p50'] * 1000:.1f}ms p95={resumo['p95'] * 1000:.1f}ms "
+        f"p99={resumo['p99'] * 1000:.1f}ms max={resumo['max'] * 1000:.1f}ms"
+    )
+    if 'vazao' in resumo:
+        linha += f" vazao={resumo['vazao']:.1f} req/s"
+    return linha
+
+
+"""
+======================= BLOCO 2 — Medição e resultados (bench_suite) =======================
+`medir` roda um caso várias vezes e conta as queries; os resultados de uma execução ficam
+num JSON identificado pelo commit, e `comparar` põe lado a lado dois desses arquivos.
+============================================================================================
+"""
+def medir(funcao, repeticoes, preparar=None):
+    """
+    Executa `funcao(contexto)` `repeticoes` vezes; `preparar(i)` (opcional, fora da medição)
+    devolve o contexto de cada repetição. Devolve o resumo com 'queries' por execução.
+    """
+    latencias = []
+    queries = 0
+    for indice in range(repeticoes):
+        contexto = preparar(indice) if preparar else None
+        with CaptureQueriesContext(connection) as capturadas:
+            antes = time.perf_counter()
+            funcao(contexto)
+            latencias.append(time.perf_counter() - antes)
+        queries += len(capturadas.captured_queries)
+    resumo = resumo_latencias(latencias)
+    resumo['queries'] = queries / repeticoes if repeticoes else 0
+    return resumo
+
+
+def commit_atual():
+    """ (hash do HEAD ou None, True se há alterações não commitadas). """
+    try:
+        cabeca = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        alteracoes = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return cabeca, bool(alteracoes)
+
+
+def gravar_resultados(caminho, resultados):
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+
+
+def ler_resultados(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def comparar(anterior, atual):
+    """ [(escala, caso, resumo anterior, resumo atual)] dos casos presentes nos dois resultados. """
+    linhas = []
+    for escala, casos in atual['escalas'].items():
+        casos_anteriores = anterior.get('escalas', {}).get(escala, {})
+        for caso, resumo in casos.items():
+            if caso in casos_anteriores:
+                linhas.append((escala, caso, casos_anteriores[caso], resumo))
+    return linhas
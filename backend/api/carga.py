@@ -0,0 +1,284 @@
+import collections
+import datetime
+import random
+import threading
+import time
+
+import requests
+
+from .bench import resumo_latencias
+
+##
+## --- carga.py ---
+## Teste de carga de ponta a ponta contra um servidor em execução (comando `teste_carga`).
+##
+## Usuários virtuais (uma thread e uma sessão HTTP cada) imitam o app Flutter: fazem login,
+## consultam a agenda de O.S. pendentes, abrem o mapa de Ativos, o histórico de um Ativo,
+## finalizam O.S. e pedem rotas, na proporção do MIX, com uma pausa aleatória entre ações
+## (o tempo em que o técnico olha para a tela). O resultado é a vazão e a distribuição de
+## latências por endpoint — rodando o servidor com um único worker, a vazão no ponto em que
+## a latência dispara é a capacidade por worker.
+##
+## O endpoint de rotas chama a Google: para não gastar cota, suba o `fake_directions` e
+## inicie o servidor testado com GOOGLE_DIRECTIONS_URL apontando para ele. `finalizar` grava
+## no banco: use um banco de testes (ex.: populado com `seed_dados`).
+##
+
+# Peso de cada ação do app no tráfego (proporção, não precisa somar 100)
+MIX_PADRAO = {
+    'login': 1,
+    'agenda': 35,
+    'mapa': 20,
+    'historico': 15,
+    'finalizar': 4,
+    'rota': 25,
+}
+
+ENDPOINTS = {
+    'login': 'POST /api/login/',
+    'agenda': 'GET /api/ordens-servico/?status=pendente',
+    'mapa': 'GET /api/ativos/',
+    'historico': 'GET /api/ativos/{id}/historico/',
+    'finalizar': 'POST /api/ordens-servico/{id}/finalizar/',
+    'rota': 'POST /api/get-route/',
+}
+
+
+class CargaError(Exception):
+    pass
+
+
+def ler_mix(texto):
+    """ "agenda=40,mapa=20" → {'agenda': 40, 'mapa': 20}; ações omitidas ficam com peso 0. """
+    mix = {}
+    for parte in texto.split(','):
+        nome, _, peso = parte.partition('=')
+        nome = nome.strip()
+        if nome not in MIX_PADRAO:
+            raise CargaError(f'Ação desconhecida "{nome}"; use {", ".join(MIX_PADRAO)}.')
+        try:
+            mix[nome] = float(peso)
+        except ValueError:
+            raise CargaError(f'Peso inválido para "{nome}": "{peso}".')
+        if mix[nome] < 0:
+            raise CargaError(f'O peso de "{nome}" não pode ser negativo.')
+    if not any(mix.values()):
+        raise CargaError('O mix precisa de ao menos uma ação com peso maior que zero.')
+    return mix
+
+
+"""
+=========================== BLOCO 1 — Dados partilhados ===========================
+Antes da carga, o teste lê do servidor os Ativos (ids e coordenadas, para o histórico e
+as rotas) e as O.S. pendentes (para finalizar). Cada O.S. só é finalizada uma vez: os
+usuários tiram-nas de uma fila partilhada e, quando ela acaba, `finalizar` é pulado.
+====================================================================================
+"""
+class DadosServidor:
+    def __init__(self, ativos, pendentes):
+        self.ativos = ativos  # [(id, lat, lng)]
+        self._pendentes = collections.deque(pendentes)
+        self._trava = threading.Lock()
+
+    @classmethod
+    def carregar(cls, sessao, base_url, timeout):
+        try:
+            resposta = sessao.get(f'{base_url}/api/ativos/', timeout=timeout)
+            resposta.raise_for_status()
+            ativos = []
+            for ativo in _itens(resposta.json()):
+                coordenadas = _coordenadas(ativo)
+                if coordenadas is not None:
+                    ativos.append((ativo.get('id'), coordenadas[1], coordenadas[0]))
+            resposta = sessao.get(f'{base_url}/api/ordens-servico/', params={'status': 'pendente'}, timeout=timeout)
+            resposta.raise_for_status()
+            pendentes = [ordem['id'] for ordem in _itens(resposta.json())]
+        except (requests.RequestException, ValueError) as e:
+            raise CargaError(f'Não foi possível ler os dados iniciais de {base_url}: {e}')
+        return cls(ativos, pendentes)
+
+    def proxima_pendente(self):
+        with self._trava:
+            return self._pendentes.popleft() if self._pendentes else None
+
+    @property
+    def pendentes_restantes(self):
+        return len(self._pendentes)
+
+
+def _itens(dados):
+    # Listas simples, paginadas ({"results": [...]}) ou GeoJSON ({"features": [...]})
+    if isinstance(dados, dict):
+        dados = dados.get('results', dados.get('features', []))
+    return dados if isinstance(dados, list) else []
+
+
+def _coordenadas(ativo):
+    """ (lng, lat) do Ativo, na forma GeoJSON ou como campos soltos; None se não houver. """
+    if ativo.get('type') == 'Feature':
+        geometria = ativo.get('geometry') or {}
+        propriedades = ativo.get('properties') or {}
+        ativo = dict(propriedades, id=ativo.get('id', propriedades.get('id')), localizacao=geometria)
+    localizacao = ativo.get('localizacao')
+    if isinstance(localizacao, dict) and len(localizacao.get('coordinates') or []) >= 2:
+        return tuple(localizacao['coordinates'][:2])
+    if ativo.get('longitude') is not None and ativo.get('latitude') is not None:
+        return float(ativo['longitude']), float(ativo['latitude'])
+    return None
+
+
+"""
+============================ BLOCO 2 — Usuário virtual ============================
+Cada ação devolve o código HTTP (ou None se a ação foi pulada por falta de dados). Erros
+de rede contam como falha com código 0. A latência é medida no cliente, com a rede.
+====================================================================================
+"""
+class UsuarioVirtual:
+    def __init__(self, teste, numero):
+        self.teste = teste
+        self.aleatorio = random.Random(f'{teste.semente}:{numero}')
+        self.sessao = requests.Session()
+
+    def _pedir(self, metodo, caminho, **kwargs):
+        return self.sessao.request(metodo, f'{self.teste.base_url}{caminho}', timeout=self.teste.timeout, **kwargs)
+
+    def login(self):
+        if not self.teste.usuario:
+            return None
+        resposta = self._pedir('POST', '/api/login/', json={'username': self.teste.usuario, 'password': self.teste.senha})
+        if resposta.status_code == 200:
+            self.sessao.headers['Authorization'] = f'Token {resposta.json()["token"]}'
+        return resposta.status_code
+
+    def agenda(self):
+        return self._pedir('GET', '/api/ordens-servico/', params={'status': 'pendente'}).status_code
+
+    def mapa(self):
+        return self._pedir('GET', '/api/ativos/').status_code
+
+    def historico(self):
+        if not self.teste.dados.ativos:
+            return None
+        ativo_id = self.aleatorio.choice(self.teste.dados.ativos)[0]
+        return self._pedir('GET', f'/api/ativos/{ativo_id}/historico/').status_code
+
+    def finalizar(self):
+        ordem_id = self.teste.dados.proxima_pendente()
+        if ordem_id is None:
+            return None
+        fim = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        inicio = fim - datetime.timedelta(minutes=self.aleatorio.randint(20, 240))
+        return self._pedir('POST', f'/api/ordens-servico/{ordem_id}/finalizar/', json={
+            'data_inicio_execucao': inicio.isoformat(),
+            'data_fim_execucao': fim.isoformat(),
+            'observacoes': 'Finalizada pelo teste de carga.',
+        }).status_code
+
+    def rota(self):
+        ativos = self.teste.dados.ativos
+        if not ativos:
+            return None
+        # Origem num Ativo, 1 a 5 paradas em Ativos — como o dia de um técnico no mapa
+        origem = self.aleatorio.choice(ativos)
+        paradas = self.aleatorio.sample(ativos, min(len(ativos), self.aleatorio.randint(1, 5)))
+        return self._pedir('POST', '/api/get-route/', json={
+            'start_lat': origem[1], 'start_lng': origem[2],
+            'waypoints': [{'lat': lat, 'lng': lng} for _, lat, lng in paradas],
+        }).status_code
+
+    def executar(self, ate):
+        acoes = [nome for nome, peso in self.teste.mix.items() if peso > 0]
+        pesos = [self.teste.mix[nome] for nome in acoes]
+        # Como no app: a sessão começa com o login
+        if self.teste.usuario:
+            self._registrar('login', self.login)
+        while time.monotonic() < ate:
+            nome = self.aleatorio.choices(acoes, weights=pesos)[0]
+            self._registrar(nome, getattr(self, nome))
+            if self.teste.pausa:
+                time.sleep(min(self.aleatorio.expovariate(1 / self.teste.pausa), max(0.0, ate - time.monotonic())))
+        self.sessao.close()
+
+    def _registrar(self, nome, acao):
+        antes = time.perf_counter()
+        try:
+            codigo = acao()
+        except requests.RequestException:
+            codigo = 0
+        if codigo is not None:
+            self.teste.registrar(nome, time.perf_counter() - antes, codigo)
+
+
+"""
+============================== BLOCO 3 — Execução ==============================
+`executar(usuarios)` roda um estágio com esse número de usuários durante `duracao`
+segundos e devolve {endpoint: resumo} com vazão, percentis e erros (códigos ≥ 400 ou 0).
+=================================================================================
+"""
+class TesteCarga:
+    def __init__(self, base_url, mix=None, duracao=60, pausa=1.0, usuario=None, senha=None, semente=42, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.mix = dict(mix or MIX_PADRAO)
+        self.duracao = duracao
+        self.pausa = pausa
+        self.usuario = usuario
+        self.senha = senha
+        self.semente = semente
+        self.timeout = timeout
+        if not usuario:
+            # Sem credenciais não há login a medir (os endpoints aceitam pedidos anônimos)
+            self.mix['login'] = 0
+            if not any(peso > 0 for peso in self.mix.values()):
+                raise CargaError('O mix só tem "login", que precisa de --usuario; inclua outras ações.')
+        self.dados = None
+        self._amostras = collections.defaultdict(list)
+        self._codigos = collections.defaultdict(collections.Counter)
+        self._trava = threading.Lock()
+
+    def preparar(self):
+        with requests.Session() as sessao:
+            self.dados = DadosServidor.carregar(sessao, self.base_url, self.timeout)
+        return self.dados
+
+    def registrar(self, nome, latencia, codigo):
+        with self._trava:
+            self._amostras[nome].append(latencia)
+            self._codigos[nome][codigo] += 1
+
+    def executar(self, usuarios):
+        if self.dados is None:
+            self.preparar()
+        self._amostras.clear()
+        self._codigos.clear()
+
+        ate = time.monotonic() + self.duracao
+        threads = [
+            threading.Thread(target=UsuarioVirtual(self, numero).executar, args=(ate,), name=f'usuario-{numero}', daemon=True)
+            for numero in range(usuarios)
+        ]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+        return self._relatorio(duracao)
+
+    def _relatorio(self, duracao):
+        relatorio = {}
+        todas = []
+        erros_total = 0
+        for nome in MIX_PADRAO:
+            if nome not in self._amostras:
+                continue
+            resumo = resumo_latencias(self._amostras[nome], duracao)
+            codigos = self._codigos[nome]
+            resumo['erros'] = sum(total for codigo, total in codigos.items() if codigo == 0 or codigo >= 400)
+            resumo['codigos'] = {str(codigo): total for codigo, total in sorted(codigos.items())}
+            relatorio[nome] = resumo
+            todas.extend(self._amostras[nome])
+            erros_total += resumo['erros']
+        total = resumo_latencias(todas, duracao)
+        total['erros'] = erros_total
+        relatorio['total'] = total
+        return relatorio
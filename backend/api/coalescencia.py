@@ -0,0 +1,235 @@
+import asyncio
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metricas import registrar_origem_rota
+
+##
+## --- coalescencia.py ---
+## "Single-flight": quando vários pedidos idênticos chegam ao mesmo tempo, apenas o
+## primeiro (o líder) chama o serviço externo; os restantes esperam e recebem o mesmo
+## resultado. Usado pelo proxy de rotas para não repetir a mesma chamada à Google quando
+## os técnicos de uma mesma base pedem rotas quase iguais no início do turno.
+##
+
+
+"""
+======================= BLOCO 1 — Métricas de coalescência =======================
+Contadores simples (protegidos por lock) de quantas chamadas passaram pelo
+single-flight, quantas foram de fato ao serviço externo e quantas reaproveitaram
+o resultado de outra chamada — no mesmo processo ou via cache partilhado.
+==================================================================================
+"""
+class Metricas:
+    CAMPOS = ('chamadas', 'upstream', 'coalescidas_processo', 'coalescidas_cache')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._lock:
+            self._valores = dict.fromkeys(self.CAMPOS, 0)
+
+    def incrementar(self, campo):
+        with self._lock:
+            self._valores[campo] += 1
+
+    def como_dict(self):
+        with self._lock:
+            return dict(self._valores)
+
+
+metricas = Metricas()
+
+
+"""
+==================== BLOCO 2 — Single-flight dentro do processo ====================
+`SingleFlight.executar(chave, funcao)` (threads) e `SingleFlightAsync.executar(chave,
+corrotina)` (asyncio) registram a primeira chamada de cada chave como "em voo". Chamadas
+seguintes com a mesma chave não executam nada: esperam a conclusão da primeira e
+devolvem o mesmo resultado — ou relançam a mesma exceção, se ela falhou.
+
+Ambos devolvem a tupla `(resultado, compartilhado)`, onde `compartilhado` indica que
+o resultado veio de outra chamada.
+=====================================================================================
+"""
+class _Chamada:
+    def __init__(self):
+        self.concluida = threading.Event()
+        self.resultado = None
+        self.excecao = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_voo = {}
+
+    def executar(self, chave, funcao):
+        metricas.incrementar('chamadas')
+        with self._lock:
+            chamada = self._em_voo.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._em_voo[chave] = _Chamada()
+
+        if not lider:
+            metricas.incrementar('coalescidas_processo')
+            registrar_origem_rota('processo')
+            chamada.concluida.wait()
+            if chamada.excecao is not None:
+                raise chamada.excecao
+            return chamada.resultado, True
+
+        try:
+            chamada.resultado, compartilhado = funcao()
+            return chamada.resultado, compartilhado
+        except BaseException as e:
+            chamada.excecao = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_voo[chave]
+            chamada.concluida.set()
+
+
+class SingleFlightAsync:
+    def __init__(self):
+        # Futures só valem no event loop em que foram criados: um dicionário por loop
+        self._em_voo_por_loop = weakref.WeakKeyDictionary()
+
+    async def executar(self, chave, corrotina):
+        metricas.incrementar('chamadas')
+        loop = asyncio.get_running_loop()
+        em_voo = self._em_voo_por_loop.setdefault(loop, {})
+
+        tarefa = em_voo.get(chave)
+        if tarefa is not None:
+            metricas.incrementar('coalescidas_processo')
+            registrar_origem_rota('processo')
+            resultado, _ = await asyncio.shield(tarefa)
+            return resultado, True
+
+        # A chamada roda numa tarefa própria e todos (o líder também) esperam-na com shield:
+        # se o pedido do líder for cancelado (cliente desconectou), os seguidores continuam
+        tarefa = em_voo[chave] = asyncio.ensure_future(corrotina())
+
+        def concluir(tarefa):
+            del em_voo[chave]
+            # Marca a exceção como lida, para o asyncio não avisar quando ninguém esperou
+            if not tarefa.cancelled():
+                tarefa.exception()
+
+        tarefa.add_done_callback(concluir)
+        return await asyncio.shield(tarefa)
+
+
+"""
+=================== BLOCO 3 — Coalescência entre processos (cache) ===================
+Opcional (settings.ROUTE_COALESCING_SHARED_CACHE). Usa o cache do Django — que precisa
+ser partilhado entre os processos, ex.: Redis — como trava distribuída:
+
+1. Quem chega consulta primeiro o resultado; se já está no cache, usa-o.
+2. Senão tenta `cache.add(trava)`, que é atômico: só um processo consegue criá-la e vira
+   o líder. Com a trava na mão, o resultado é consultado de novo — o líder anterior pode
+   tê-lo gravado e soltado a trava entre as duas consultas.
+3. O líder chama o serviço externo, grava o resultado no cache por alguns segundos e só
+   depois apaga a trava: quem a encontrar livre já encontra o resultado no passo 1 ou 2.
+4. Os outros processos repetem 1–2 em intervalos curtos até o resultado aparecer.
+   Se a trava sumir sem resultado (o líder falhou) ou o tempo de espera acabar, o
+   processo faz a chamada por conta própria — a coalescência nunca piora a
+   disponibilidade, no máximo deixa de economizar chamadas.
+=======================================================================================
+"""
+INTERVALO_CONSULTA = 0.05  # segundos entre consultas ao cache pelos seguidores
+
+
+def _chaves_cache(chave):
+    return f'singleflight:trava:{chave}', f'singleflight:resultado:{chave}'
+
+
+def entre_processos(chave, funcao):
+    """ Executa `funcao()` no máximo uma vez entre os processos que partilham o cache. """
+    if not settings.ROUTE_COALESCING_SHARED_CACHE:
+        metricas.incrementar('upstream')
+        registrar_origem_rota('upstream')
+        return funcao(), False
+
+    chave_trava, chave_resultado = _chaves_cache(chave)
+    limite = time.monotonic() + settings.ROUTE_COALESCING_WAIT_TIMEOUT
+
+    while True:
+        resultado = cache.get(chave_resultado)
+        if resultado is None and cache.add(chave_trava, 1, timeout=settings.ROUTE_COALESCING_LOCK_TTL):
+            resultado = cache.get(chave_resultado)
+            if resultado is None:
+                trava_adquirida = True
+                break
+            cache.delete(chave_trava)
+        if resultado is not None:
+            metricas.incrementar('coalescidas_cache')
+            registrar_origem_rota('cache')
+            return resultado, True
+        if time.monotonic() >= limite:
+            trava_adquirida = False
+            break
+        time.sleep(INTERVALO_CONSULTA)
+
+    metricas.incrementar('upstream')
+    registrar_origem_rota('upstream')
+    try:
+        resultado = funcao()
+        cache.set(chave_resultado, resultado, timeout=settings.ROUTE_COALESCING_RESULT_TTL)
+        return resultado, False
+    finally:
+        # Depois do cache.set: a trava só fica livre quando o resultado já está visível
+        if trava_adquirida:
+            cache.delete(chave_trava)
+
+
+async def entre_processos_async(chave, corrotina):
+    """ Versão assíncrona de `entre_processos`. """
+    if not settings.ROUTE_COALESCING_SHARED_CACHE:
+        metricas.incrementar('upstream')
+        registrar_origem_rota('upstream')
+        return await corrotina(), False
+
+    chave_trava, chave_resultado = _chaves_cache(chave)
+    limite = time.monotonic() + settings.ROUTE_COALESCING_WAIT_TIMEOUT
+
+    while True:
+        resultado = await cache.aget(chave_resultado)
+        if resultado is None and await cache.aadd(chave_trava, 1, timeout=settings.ROUTE_COALESCING_LOCK_TTL):
+            resultado = await cache.aget(chave_resultado)
+            if resultado is None:
+                trava_adquirida = True
+                break
+            await cache.adelete(chave_trava)
+        if resultado is not None:
+            metricas.incrementar('coalescidas_cache')
+            registrar_origem_rota('cache')
+            return resultado, True
+        if time.monotonic() >= limite:
+            trava_adquirida = False
+            break
+        await asyncio.sleep(INTERVALO_CONSULTA)
+
+    metricas.incrementar('upstream')
+    registrar_origem_rota('upstream')
+    try:
+        resultado = await corrotina()
+        await cache.aset(chave_resultado, resultado, timeout=settings.ROUTE_COALESCING_RESULT_TTL)
+        return resultado, False
+    finally:
+        if trava_adquirida:
+            await cache.adelete(chave_trava)
+
+
+# Instâncias partilhadas pelas views do proxy de rotas
+rotas = SingleFlight()
+rotas_async = SingleFlightAsync()
@@ -0,0 +1,166 @@
+import math
+from collections import deque
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+
+from .autenticacao import CachedTokenAuthentication
+from .tempo_real import grupo_ativo, grupo_tecnico, grupos_da_area
+
+##
+## --- consumers.py ---
+## WebSocket /ws/atualizacoes/ (ver routing.py e core/asgi.py): entrega os eventos de
+## tempo_real.py aos clientes que assinaram um técnico, um Ativo ou uma área do mapa.
+##
+## Protocolo (JSON):
+##   → {"acao": "assinar", "tipo": "tecnico", "id": 7}          (sem "id": o usuário do token)
+##   → {"acao": "assinar", "tipo": "ativo", "id": 42}
+##   → {"acao": "assinar", "tipo": "area", "bbox": [min_lon, min_lat, max_lon, max_lat]}
+##   → {"acao": "cancelar", ...mesmos campos...}
+##   ← {"tipo": "assinado" | "cancelado", ...}   ← {"tipo": "erro", "mensagem": ...}
+##   ← {"tipo": "evento", "evento": "ordem.criada", "dados": {...}}
+##
+## O token vai no cabeçalho `Authorization: Token <key>` ou em `?token=<key>`.
+##
+
+
+"""
+========================= BLOCO ÚNICO — AtualizacoesConsumer =========================
+As assinaturas ficam na memória da conexão. O mesmo evento pode chegar por vários grupos
+(técnico, Ativo e célula da área): o consumer entrega-o uma vez só (ids recentes) e, para
+as áreas, só se o ponto do Ativo estiver dentro de alguma bbox assinada — a célula da
+grade é maior que a área pedida.
+=======================================================================================
+"""
+class AtualizacoesConsumer(AsyncJsonWebsocketConsumer):
+
+    async def connect(self):
+        self.tecnicos = set()
+        self.ativos = set()
+        self.areas = {}  # bbox (tupla) → grupos das células
+        self.grupos = {}  # grupo → número de assinaturas que o usam
+        self.recentes = deque(maxlen=256)
+        self.usuario = await self._autenticar()
+        # Para desenvolvimento: conexões sem token são aceitas (como as views com AllowAny)
+        await self.accept()
+
+    async def disconnect(self, code):
+        for grupo in list(self.grupos):
+            await self.channel_layer.group_discard(grupo, self.channel_name)
+        self.grupos.clear()
+
+    async def _autenticar(self):
+        cabecalhos = dict(self.scope.get('headers', []))
+        autorizacao = cabecalhos.get(b'authorization', b'').decode('latin-1').split()
+        key = autorizacao[1] if len(autorizacao) == 2 and autorizacao[0].lower() == 'token' else None
+        if key is None:
+            parametros = self.scope.get('query_string', b'').decode('latin-1')
+            for parametro in parametros.split('&'):
+                nome, _, valor = parametro.partition('=')
+                if nome == 'token' and valor:
+                    key = valor
+        if key is None:
+            return None
+        try:
+            usuario, _ = await database_sync_to_async(CachedTokenAuthentication().authenticate_credentials)(key)
+        except AuthenticationFailed:
+            return None
+        return usuario
+
+    async def _entrar(self, grupos):
+        for grupo in grupos:
+            if grupo not in self.grupos:
+                await self.channel_layer.group_add(grupo, self.channel_name)
+            self.grupos[grupo] = self.grupos.get(grupo, 0) + 1
+
+    async def _sair(self, grupos):
+        for grupo in grupos:
+            self.grupos[grupo] = self.grupos.get(grupo, 1) - 1
+            if self.grupos[grupo] <= 0:
+                self.grupos.pop(grupo, None)
+                await self.channel_layer.group_discard(grupo, self.channel_name)
+
+    async def _erro(self, mensagem):
+        await self.send_json({'tipo': 'erro', 'mensagem': mensagem})
+
+    async def receive_json(self, conteudo, **kwargs):
+        if not isinstance(conteudo, dict):
+            return await self._erro('Mensagem deve ser um objeto JSON.')
+        acao, tipo = conteudo.get('acao'), conteudo.get('tipo')
+        if acao not in ('assinar', 'cancelar') or tipo not in ('tecnico', 'ativo', 'area'):
+            return await self._erro('Use {"acao": "assinar"|"cancelar", "tipo": "tecnico"|"ativo"|"area", ...}.')
+
+        if tipo == 'area':
+            bbox = conteudo.get('bbox')
+            try:
+                bbox = tuple(float(valor) for valor in bbox)
+            except (TypeError, ValueError):
+                bbox = ()
+            # float() aceita "nan" e "inf", que passariam pelas comparações e quebrariam o cálculo das células
+            if len(bbox) != 4 or not all(math.isfinite(valor) for valor in bbox) or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                return await self._erro('"bbox" deve ser [min_lon, min_lat, max_lon, max_lat].')
+            chave = bbox
+        else:
+            valor = conteudo.get('id')
+            if valor is None and tipo == 'tecnico' and self.usuario is not None:
+                valor = self.usuario.pk
+            try:
+                chave = int(valor)
+            except (TypeError, ValueError):
+                return await self._erro('"id" deve ser um número inteiro.')
+
+        if acao == 'assinar':
+            await self._assinar(tipo, chave)
+        else:
+            await self._cancelar(tipo, chave)
+
+    async def _assinar(self, tipo, chave):
+        if len(self.tecnicos) + len(self.ativos) + len(self.areas) >= settings.REALTIME_MAX_SUBSCRIPTIONS:
+            return await self._erro('Limite de assinaturas por conexão atingido.')
+        if tipo == 'tecnico' and chave not in self.tecnicos:
+            self.tecnicos.add(chave)
+            await self._entrar([grupo_tecnico(chave)])
+        elif tipo == 'ativo' and chave not in self.ativos:
+            self.ativos.add(chave)
+            await self._entrar([grupo_ativo(chave)])
+        elif tipo == 'area' and chave not in self.areas:
+            grupos = grupos_da_area(*chave)
+            if grupos is None:
+                return await self._erro('Área grande demais; aproxime o mapa ou assine por técnico/Ativo.')
+            self.areas[chave] = grupos
+            await self._entrar(grupos)
+        await self.send_json({'tipo': 'assinado', 'assinatura': tipo, 'chave': chave})
+
+    async def _cancelar(self, tipo, chave):
+        if tipo == 'tecnico' and chave in self.tecnicos:
+            self.tecnicos.discard(chave)
+            await self._sair([grupo_tecnico(chave)])
+        elif tipo == 'ativo' and chave in self.ativos:
+            self.ativos.discard(chave)
+            await self._sair([grupo_ativo(chave)])
+        elif tipo == 'area' and chave in self.areas:
+            await self._sair(self.areas.pop(chave))
+        await self.send_json({'tipo': 'cancelado', 'assinatura': tipo, 'chave': chave})
+
+    def _interessa(self, mensagem):
+        if mensagem.get('tecnico_id') in self.tecnicos or mensagem.get('ativo_id') in self.ativos:
+            return True
+        # O.S. reatribuída: o técnico anterior também fica a saber que ela saiu da sua lista
+        if mensagem.get('tecnico_anterior_id') in self.tecnicos:
+            return True
+        ponto = mensagem.get('ponto')
+        if ponto is None:
+            return False
+        longitude, latitude = ponto
+        return any(
+            min_lon <= longitude <= max_lon and min_lat <= latitude <= max_lat
+            for min_lon, min_lat, max_lon, max_lat in self.areas
+        )
+
+    async def evento_publicado(self, mensagem):
+        if mensagem['id'] in self.recentes or not self._interessa(mensagem):
+            return
+        self.recentes.append(mensagem['id'])
+        await self.send_json({'tipo': 'evento', 'evento': mensagem['evento'], 'dados': mensagem['dados']})
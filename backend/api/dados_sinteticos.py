@@ -0,0 +1,206 @@
+import datetime
+import math
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.gis.geos import Point
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Ativo, Manutencao, OrdemServico
+
+##
+## --- dados_sinteticos.py ---
+## Gerador determinístico de dados para benchmarks (comandos `seed_dados` e `bench_suite`):
+## Ativos espalhados em torno de algumas cidades, O.S. dos três tipos ao longo de um
+## período, e a Manutenção de cada O.S. finalizada.
+##
+## A mesma semente e a mesma data de referência geram sempre os mesmos dados — é o que
+## permite comparar o resultado de um benchmark entre commits. Tudo entra com bulk_create
+## (sem signals): no fim, o resumo de manutenção (e, se pedido, a matriz de deslocamento)
+## é reconstruído de uma vez, como na importação em massa.
+##
+## Os registos gerados são marcados (PREFIXO_SEED no nome do Ativo, PREFIXO_USUARIO no
+## username dos técnicos) para que `remover` apague só eles.
+##
+
+PREFIXO_SEED = '[seed] '
+PREFIXO_USUARIO = 'seed_tecnico_'
+TAMANHO_LOTE = 2000
+
+# (cidade, longitude, latitude, dispersão em graus)
+CIDADES = [
+    ('São Paulo', -46.633, -23.550, 0.20),
+    ('Campinas', -47.063, -22.905, 0.10),
+    ('Belo Horizonte', -43.938, -19.920, 0.12),
+    ('Curitiba', -49.273, -25.428, 0.10),
+    ('Porto Alegre', -51.230, -30.033, 0.10),
+    ('Recife', -34.877, -8.047, 0.08),
+]
+PESOS_CIDADES = [40, 15, 15, 10, 10, 10]
+
+EQUIPAMENTOS = [
+    ('Bomba centrífuga', ['KSB', 'Schneider', 'WEG'], 30),
+    ('Compressor de ar', ['Atlas Copco', 'Schulz', 'Chiaperini'], 60),
+    ('Gerador diesel', ['Cummins', 'Stemac', 'Heimer'], 90),
+    ('Transformador', ['WEG', 'Siemens', 'ABB'], 180),
+    ('Chiller', ['Carrier', 'Trane', 'York'], 45),
+    ('Quadro elétrico', ['Schneider', 'Siemens', 'ABB'], 120),
+    ('Elevador', ['Atlas Schindler', 'Otis', 'ThyssenKrupp'], 30),
+]
+
+# Proporção das O.S. por tipo e fração das vencidas que já foram finalizadas
+PESOS_TIPOS = {'corretiva': 50, 'preventiva': 40, 'preditiva': 10}
+FRACAO_FINALIZADAS = 0.85
+
+
+def _lotes(objetos):
+    for inicio in range(0, len(objetos), TAMANHO_LOTE):
+        yield objetos[inicio:inicio + TAMANHO_LOTE]
+
+
+"""
+============================== BLOCO 1 — Geração ==============================
+Cada entidade usa o seu próprio random.Random derivado da semente: mudar o número de
+O.S. não altera os Ativos gerados, e vice-versa.
+================================================================================
+"""
+def _ponto(rng, longitude, latitude, dispersao):
+    return Point(
+        round(rng.gauss(longitude, dispersao), 6),
+        round(rng.gauss(latitude, dispersao * math.cos(math.radians(latitude))), 6),
+        srid=4326,
+    )
+
+
+def _ativos(rng, quantidade):
+    ativos = []
+    for numero in range(1, quantidade + 1):
+        cidade, longitude, latitude, dispersao = rng.choices(CIDADES, weights=PESOS_CIDADES)[0]
+        equipamento, marcas, periodicidade = rng.choice(EQUIPAMENTOS)
+        ponto = _ponto(rng, longitude, latitude, dispersao)
+        ativos.append(Ativo(
+            nome=f'{PREFIXO_SEED}{equipamento} {numero:06d}',
+            marca=rng.choice(marcas),
+            modelo=f'{rng.choice("ABCDEFGH")}{rng.randint(100, 999)}',
+            periodicidade=periodicidade,
+            endereco=f'Rua {rng.randint(1, 500)}, {rng.randint(1, 3000)} - {cidade}',
+            localizacao=ponto,
+        ))
+    return ativos
+
+
+def _tecnicos(rng, quantidade):
+    """ Técnicos com a base (localizacao_base) numa das cidades, na mesma proporção dos Ativos. """
+    senha = make_password(None)
+    tecnicos = []
+    for numero in range(1, quantidade + 1):
+        _, longitude, latitude, dispersao = rng.choices(CIDADES, weights=PESOS_CIDADES)[0]
+        tecnicos.append(get_user_model()(
+            username=f'{PREFIXO_USUARIO}{numero:04d}', password=senha, cargo='tecnico',
+            localizacao_base=_ponto(rng, longitude, latitude, dispersao),
+        ))
+    return tecnicos
+
+
+def _ordens(rng, quantidade, ativos, tecnicos, referencia, dias):
+    """ [(ordem, manutencao ou None)]; a data de criação vai no atributo e é regravada depois. """
+    tipos, pesos = zip(*PESOS_TIPOS.items())
+    geradas = []
+    for numero in range(1, quantidade + 1):
+        ativo = rng.choice(ativos)
+        tipo = rng.choices(tipos, weights=pesos)[0]
+        criacao = referencia - datetime.timedelta(seconds=rng.randint(0, dias * 86400))
+        prevista = criacao + datetime.timedelta(days=rng.randint(0, 2 if tipo == 'corretiva' else 20))
+        tecnico = rng.choice(tecnicos) if tecnicos else None
+        finalizada = prevista < referencia and rng.random() < FRACAO_FINALIZADAS
+
+        ordem = OrdemServico(
+            titulo=f'{tipo.capitalize()} - {ativo.nome[len(PREFIXO_SEED):]}',
+            tipo=tipo,
+            descricao='Gerada por seed_dados.',
+            status='finalizada' if finalizada else 'pendente',
+            ativo=ativo,
+            data_prevista=prevista,
+            tecnico=tecnico,
+        )
+        ordem.data_criacao = criacao
+
+        manutencao = None
+        if finalizada:
+            inicio = prevista + datetime.timedelta(minutes=rng.randint(0, 8 * 60))
+            # Duração log-normal: a maioria em 1-3 h, algumas bem mais longas
+            duracao = datetime.timedelta(minutes=max(10, int(rng.lognormvariate(math.log(120), 0.6))))
+            manutencao = Manutencao(
+                usuario_executor=tecnico,
+                data_inicio_execucao=inicio,
+                data_fim_execucao=inicio + duracao,
+                tempo_gasto=duracao,
+                observacoes='',
+            )
+        geradas.append((ordem, manutencao))
+    return geradas
+
+
+def gerar(ativos=100, ordens=2000, tecnicos=10, semente=42, referencia=None, dias=730, reconstruir_matriz=False):
+    """
+    Gera os dados e devolve {'ativos': n, 'ordens': n, 'manutencoes': n, 'tecnicos': n}.
+    `referencia` (padrão: hoje à meia-noite) é o fim do período de `dias` dias das O.S.
+    """
+    referencia = referencia or timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    with transaction.atomic():
+        novos_ativos = _ativos(random.Random(f'{semente}:ativos'), ativos)
+        for lote in _lotes(novos_ativos):
+            Ativo.objects.bulk_create(lote)
+
+        novos_tecnicos = _tecnicos(random.Random(f'{semente}:tecnicos'), tecnicos)
+        for lote in _lotes(novos_tecnicos):
+            get_user_model().objects.bulk_create(lote)
+
+        geradas = _ordens(random.Random(f'{semente}:ordens'), ordens, novos_ativos, novos_tecnicos, referencia, dias)
+        for lote in _lotes(geradas):
+            datas = [ordem.data_criacao for ordem, _ in lote]
+            criadas = OrdemServico.objects.bulk_create([ordem for ordem, _ in lote])
+            # auto_now_add sobrescreve a data no INSERT: o bulk_update grava a data gerada
+            for ordem, data in zip(criadas, datas):
+                ordem.data_criacao = data
+            OrdemServico.objects.bulk_update(criadas, ['data_criacao'])
+            manutencoes = []
+            for ordem, manutencao in lote:
+                if manutencao is not None:
+                    manutencao.ordem_servico = ordem
+                    manutencoes.append(manutencao)
+            Manutencao.objects.bulk_create(manutencoes)
+
+        # O bulk_create não dispara os signals: o resumo é refeito na mesma transação
+        from .resumo_manutencao import reconstruir as reconstruir_resumo
+        reconstruir_resumo()
+    if reconstruir_matriz:
+        from .matriz_deslocamento import reconstruir
+        reconstruir()
+
+    return {
+        'ativos': len(novos_ativos),
+        'ordens': len(geradas),
+        'manutencoes': sum(1 for _, manutencao in geradas if manutencao is not None),
+        'tecnicos': len(novos_tecnicos),
+    }
+
+
+"""
+============================== BLOCO 2 — Remoção ==============================
+Apaga só o que foi gerado (pelas marcas). As Manutenções saem pelo CASCADE das O.S.
+================================================================================
+"""
+def remover():
+    """ Devolve o número de objetos apagados (como QuerySet.delete). """
+    with transaction.atomic():
+        ativos = Ativo.objects.filter(nome__startswith=PREFIXO_SEED)
+        apagados = OrdemServico.objects.filter(ativo__in=ativos).delete()[0]
+        apagados += ativos.delete()[0]
+        apagados += get_user_model().objects.filter(username__startswith=PREFIXO_USUARIO).delete()[0]
+        from .resumo_manutencao import reconstruir as reconstruir_resumo
+        reconstruir_resumo()
+    return apagados
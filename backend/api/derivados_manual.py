@@ -0,0 +1,210 @@
+import datetime
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Ativo, ManualDerivado
+
+##
+## --- derivados_manual.py ---
+## Derivados do manual dos Ativos: miniatura PNG da 1ª página e texto extraído, indexado
+## para busca (tsvector + GIN). O app mostra a miniatura e pesquisa dentro dos manuais
+## sem baixar o PDF inteiro.
+##
+## Fila: cada vez que o hash do manual muda (ver manuais.py), `agendar` marca a linha de
+## ManualDerivado como pendente com o novo hash. O comando `gera_derivados_manual` (worker)
+## reserva as pendentes com FOR UPDATE SKIP LOCKED — vários workers não pegam a mesma — e
+## gera os derivados fora da transação. Manual com o mesmo hash não é reprocessado.
+##
+## Bibliotecas de PDF são opcionais: PyMuPDF (`pip install pymupdf`) gera texto e miniatura;
+## só com pypdf (`pip install pypdf`) há texto, sem miniatura. Sem nenhuma, o derivado fica
+## com status 'erro' e a mensagem correspondente.
+##
+
+
+class DerivadoError(Exception):
+    pass
+
+
+"""
+================================ BLOCO 1 — Fila ================================
+`agendar` é chamado quando o hash do manual é gravado; `agendar_faltantes` recupera os
+Ativos cujo derivado não existe ou ficou para trás (ex.: manuais anteriores a este módulo).
+`reservar` devolve também as linhas 'processando' paradas há mais de
+MANUAL_DERIVATIVE_STALE_MINUTES (worker que caiu a meio).
+=================================================================================
+"""
+def agendar(ativo_id, sha256):
+    if not sha256:
+        # Manual removido: os derivados deixam de fazer sentido
+        for derivado in ManualDerivado.objects.filter(ativo_id=ativo_id):
+            if derivado.miniatura:
+                derivado.miniatura.delete(save=False)
+            derivado.delete()
+        return
+    ManualDerivado.objects.bulk_create([ManualDerivado(ativo_id=ativo_id, sha256=sha256)], ignore_conflicts=True)
+    ManualDerivado.objects.filter(ativo_id=ativo_id).exclude(sha256=sha256).update(
+        sha256=sha256, status='pendente', tentativas=0, erro='', atualizado_em=timezone.now(),
+    )
+
+
+def agendar_faltantes():
+    """ Agenda os Ativos com manual cujo derivado não existe ou é de outro hash. Devolve quantos. """
+    faltantes = (
+        Ativo.objects.exclude(manual_sha256='')
+        .filter(Q(manual_derivado__isnull=True) | ~Q(manual_derivado__sha256=F('manual_sha256')))
+        .values_list('pk', 'manual_sha256')
+    )
+    quantidade = 0
+    for ativo_id, sha256 in faltantes:
+        agendar(ativo_id, sha256)
+        quantidade += 1
+    return quantidade
+
+
+def _fila():
+    parados = timezone.now() - datetime.timedelta(minutes=settings.MANUAL_DERIVATIVE_STALE_MINUTES)
+    return ManualDerivado.objects.filter(Q(status='pendente') | Q(status='processando', atualizado_em__lt=parados))
+
+
+def contar_pendentes():
+    return _fila().count()
+
+
+def reservar(limite):
+    """ Marca até `limite` derivados como 'processando' e devolve [(ativo_id, sha256)]. """
+    with transaction.atomic():
+        reservados = list(
+            _fila().select_for_update(skip_locked=True).order_by('atualizado_em').values_list('ativo_id', 'sha256')[:limite]
+        )
+        ManualDerivado.objects.filter(ativo_id__in=[ativo_id for ativo_id, _ in reservados]).update(
+            status='processando', tentativas=F('tentativas') + 1, atualizado_em=timezone.now(),
+        )
+    return reservados
+
+
+"""
+============================ BLOCO 2 — Geração ============================
+O PDF é lido do disco (ou copiado para um temporário, se o storage não tiver
+caminho local); só a 1ª página é renderizada. O resultado só é gravado se o
+derivado ainda estiver à espera do mesmo hash — um manual trocado durante o
+processamento já terá voltado para a fila com o hash novo.
+===========================================================================
+"""
+def _extrair(caminho):
+    """ (paginas, texto, png da 1ª página ou None) """
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        fitz = None
+
+    if fitz is not None:
+        with fitz.open(caminho) as documento:
+            texto = '\n'.join(pagina.get_text() for pagina in documento)
+            png = None
+            if documento.page_count:
+                primeira = documento[0]
+                zoom = settings.MANUAL_THUMBNAIL_WIDTH / max(primeira.rect.width, 1)
+                png = primeira.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes('png')
+            return documento.page_count, texto, png
+
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise DerivadoError('Nenhuma biblioteca de PDF instalada (instale pymupdf ou pypdf).')
+    leitor = PdfReader(caminho)
+    texto = '\n'.join((pagina.extract_text() or '') for pagina in leitor.pages)
+    return len(leitor.pages), texto, None
+
+
+def _com_caminho_local(arquivo, funcao):
+    try:
+        return funcao(arquivo.path)
+    except NotImplementedError:
+        # Storage remoto (sem .path): copia para um temporário, em blocos
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as temporario:
+            with arquivo.open('rb') as origem:
+                shutil.copyfileobj(origem, temporario)
+            temporario.flush()
+            return funcao(temporario.name)
+
+
+def processar(ativo_id, sha256):
+    """ Gera e grava os derivados. Devolve o status final ('pronto', 'pendente', 'erro' ou None se descartado). """
+    ativo = Ativo.objects.filter(pk=ativo_id).only('pk', 'manual', 'manual_sha256').first()
+    if ativo is None or ativo.manual_sha256 != sha256 or not ativo.manual:
+        return None
+
+    try:
+        paginas, texto, png = _com_caminho_local(ativo.manual, _extrair)
+    except Exception as e:
+        return _registrar_falha(ativo_id, sha256, e)
+
+    with transaction.atomic():
+        derivado = ManualDerivado.objects.select_for_update().filter(ativo_id=ativo_id, sha256=sha256).first()
+        if derivado is None:
+            return None
+        if derivado.miniatura:
+            derivado.miniatura.delete(save=False)
+        if png is not None:
+            derivado.miniatura.save(f'{ativo_id}_{sha256[:16]}.png', ContentFile(png), save=False)
+        derivado.paginas = paginas
+        derivado.texto = texto[:settings.MANUAL_TEXT_MAX_CHARS].replace('\x00', '')
+        derivado.status = 'pronto'
+        derivado.erro = ''
+        derivado.save()
+        # O tsvector é calculado no próprio banco, a partir do texto acabado de gravar
+        ManualDerivado.objects.filter(ativo_id=ativo_id).update(
+            busca=SearchVector('texto', config=settings.MANUAL_SEARCH_CONFIG),
+        )
+    return 'pronto'
+
+
+def _registrar_falha(ativo_id, sha256, erro):
+    derivado = ManualDerivado.objects.filter(ativo_id=ativo_id, sha256=sha256).first()
+    if derivado is None:
+        return None
+    status = 'erro' if derivado.tentativas >= settings.MANUAL_DERIVATIVE_MAX_ATTEMPTS else 'pendente'
+    ManualDerivado.objects.filter(ativo_id=ativo_id, sha256=sha256).update(
+        status=status, erro=str(erro)[:1000], atualizado_em=timezone.now(),
+    )
+    return status
+
+
+"""
+============================ BLOCO 3 — Busca ============================
+Consulta no formato do websearch_to_tsquery ("bomba hidráulica", -óleo, a OR b),
+ordenada por ts_rank. Com ORDER BY + LIMIT o PostgreSQL só calcula o trecho (ts_headline,
+caro) para as linhas devolvidas.
+==========================================================================
+"""
+def buscar(consulta, limite=20):
+    query = SearchQuery(consulta, config=settings.MANUAL_SEARCH_CONFIG, search_type='websearch')
+    resultados = (
+        ManualDerivado.objects.filter(status='pronto', busca=query)
+        .annotate(
+            relevancia=SearchRank(F('busca'), query),
+            trecho=SearchHeadline(
+                'texto', query, config=settings.MANUAL_SEARCH_CONFIG,
+                start_sel='<b>', stop_sel='</b>', max_words=30, min_words=10,
+            ),
+        )
+        .order_by('-relevancia')
+        .values('ativo_id', 'ativo__nome', 'paginas', 'relevancia', 'trecho')[:limite]
+    )
+    return [
+        {
+            'ativo_id': linha['ativo_id'],
+            'ativo_nome': linha['ativo__nome'],
+            'paginas': linha['paginas'],
+            'relevancia': linha['relevancia'],
+            'trecho': linha['trecho'],
+        }
+        for linha in resultados
+    ]
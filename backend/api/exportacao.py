@@ -0,0 +1,196 @@
+import csv
+import datetime
+import heapq
+import io
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import OrdemServico, OrdemServicoArquivo
+
+##
+## --- exportacao.py ---
+## Exportação do histórico de O.S. (com a manutenção e o Ativo) em CSV, NDJSON ou GeoJSON,
+## para auditoria: GET /api/exportacao/historico/ e comando `exporta_historico`.
+##
+## As linhas vêm de cursores do lado do servidor (QuerySet.iterator → DECLARE CURSOR no
+## PostgreSQL), EXPORT_CHUNK_SIZE de cada vez, e vão sendo escritas na resposta
+## (StreamingHttpResponse) — a memória não cresce com o tamanho do histórico e o primeiro
+## byte sai logo, sem esperar a consulta inteira. As O.S. vivas e as do arquivo morto são
+## lidas por dois cursores e intercaladas por data de criação (heapq.merge).
+##
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'geojson': ('application/geo+json', 'geojson'),
+}
+
+CAMPOS = {
+    # coluna exportada: caminho no ORM (o mesmo nas O.S. vivas e arquivadas)
+    'id': 'id',
+    'titulo': 'titulo',
+    'tipo': 'tipo',
+    'status': 'status',
+    'data_criacao': 'data_criacao',
+    'data_prevista': 'data_prevista',
+    'ativo_id': 'ativo_id',
+    'ativo_nome': 'ativo__nome',
+    'solicitante': 'solicitante__username',
+    'tecnico': 'tecnico__username',
+    'executor': 'manutencao__usuario_executor__username',
+    'inicio_execucao': 'manutencao__data_inicio_execucao',
+    'fim_execucao': 'manutencao__data_fim_execucao',
+    'tempo_gasto_segundos': 'manutencao__tempo_gasto',
+    'observacoes': 'manutencao__observacoes',
+}
+COLUNAS = list(CAMPOS) + ['arquivada', 'longitude', 'latitude']
+
+
+class ExportacaoError(Exception):
+    pass
+
+
+"""
+============================ BLOCO 1 — Filtros e consulta ============================
+Filtros aceites (todos opcionais): inicio / fim (data ou data-hora ISO, sobre a data de
+criação; `fim` só com a data inclui o dia inteiro), ativo, tipo e status.
+=======================================================================================
+"""
+def _ler_instante(texto, fim=False):
+    """ (instante, so_data): `so_data` diz que o texto trazia só a data, sem a hora. """
+    try:
+        instante = parse_datetime(texto)
+        so_data = instante is None
+        if so_data:
+            data = parse_date(texto)
+            if data is None:
+                raise ValueError
+            instante = datetime.datetime.combine(data + datetime.timedelta(days=1) if fim else data, datetime.time())
+    except (OverflowError, ValueError):
+        # Bem formada mas inexistente (ex.: 2024-02-30, ou 9999-12-31 + 1 dia) também chega aqui
+        raise ExportacaoError(f'Data inválida: "{texto}" (use AAAA-MM-DD ou data-hora ISO).')
+    if settings.USE_TZ and instante.tzinfo is None:
+        instante = instante.replace(tzinfo=datetime.timezone.utc)
+    return instante, so_data
+
+
+def montar_filtros(inicio=None, fim=None, ativo=None, tipo=None, status=None):
+    filtros = {}
+    if inicio:
+        filtros['data_criacao__gte'], _ = _ler_instante(inicio)
+    if fim:
+        # Só a data: o dia seguinte à meia-noite, exclusive
+        instante, so_data = _ler_instante(fim, fim=True)
+        filtros['data_criacao__lt' if so_data else 'data_criacao__lte'] = instante
+    if ativo:
+        try:
+            filtros['ativo_id'] = int(ativo)
+        except (TypeError, ValueError):
+            raise ExportacaoError('"ativo" deve ser o id numérico do Ativo.')
+    if tipo:
+        filtros['tipo__iexact'] = tipo
+    if status:
+        filtros['status__iexact'] = status
+    return filtros
+
+
+def _linhas(modelo, filtros, arquivada):
+    caminhos = list(CAMPOS.values()) + ['ativo__localizacao']
+    consulta = modelo.objects.using(settings.EXPORT_DB_ALIAS).filter(**filtros).order_by('data_criacao', 'id').values_list(*caminhos)
+    for valores in consulta.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        linha = dict(zip(CAMPOS, valores))
+        ponto = valores[-1]
+        linha['arquivada'] = arquivada
+        linha['longitude'] = ponto.x if ponto is not None else None
+        linha['latitude'] = ponto.y if ponto is not None else None
+        yield linha
+
+
+def linhas_historico(filtros):
+    """ Linhas (dict) das O.S. vivas e arquivadas, por data de criação, em fluxo. """
+    return heapq.merge(
+        _linhas(OrdemServico, filtros, False),
+        _linhas(OrdemServicoArquivo, filtros, True),
+        key=lambda linha: (linha['data_criacao'], linha['id']),
+    )
+
+
+"""
+============================== BLOCO 2 — Formatos ==============================
+Cada formatador é um gerador de pedaços de texto. As linhas são agrupadas em pedaços
+de EXPORT_CHUNK_SIZE, para não fazer uma escrita na rede por linha.
+=================================================================================
+"""
+def _valor_texto(valor):
+    if isinstance(valor, datetime.timedelta):
+        return int(valor.total_seconds())
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.isoformat()
+    return valor
+
+
+def _em_pedacos(textos):
+    pedaco = []
+    for texto in textos:
+        pedaco.append(texto)
+        if len(pedaco) >= settings.EXPORT_CHUNK_SIZE:
+            yield ''.join(pedaco)
+            pedaco = []
+    if pedaco:
+        yield ''.join(pedaco)
+
+
+def _csv(linhas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def linha_csv(valores):
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerow(valores)
+        return buffer.getvalue()
+
+    yield linha_csv(COLUNAS)
+    yield from _em_pedacos(
+        linha_csv([_valor_texto(linha[coluna]) for coluna in COLUNAS]) for linha in linhas
+    )
+
+
+def _ndjson(linhas):
+    yield from _em_pedacos(
+        json.dumps({coluna: _valor_texto(linha[coluna]) for coluna in COLUNAS}, cls=DjangoJSONEncoder) + '\n'
+        for linha in linhas
+    )
+
+
+def _feature(linha):
+    geometria = None
+    if linha['longitude'] is not None:
+        geometria = {'type': 'Point', 'coordinates': [linha['longitude'], linha['latitude']]}
+    propriedades = {coluna: _valor_texto(linha[coluna]) for coluna in COLUNAS if coluna not in ('longitude', 'latitude')}
+    return json.dumps({'type': 'Feature', 'geometry': geometria, 'properties': propriedades}, cls=DjangoJSONEncoder)
+
+
+def _geojson(linhas):
+    yield '{"type": "FeatureCollection", "features": ['
+    primeira = [True]
+
+    def com_separador(linha):
+        if primeira[0]:
+            primeira[0] = False
+            return '\n' + _feature(linha)
+        return ',\n' + _feature(linha)
+
+    yield from _em_pedacos(com_separador(linha) for linha in linhas)
+    yield '\n]}\n'
+
+
+def exportar(formato, filtros):
+    """ Gerador de pedaços de texto do histórico no formato pedido. """
+    if formato not in FORMATOS:
+        raise ExportacaoError(f'Formato desconhecido; use {", ".join(FORMATOS)}.')
+    linhas = linhas_historico(filtros)
+    return {'csv': _csv, 'ndjson': _ndjson, 'geojson': _geojson}[formato](linhas)
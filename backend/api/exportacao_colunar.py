@@ -0,0 +1,286 @@
+import datetime
+import io
+import json
+import os
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+##
+## --- exportacao_colunar.py ---
+## Snapshot colunar (Parquet) do conjunto de dados de confiabilidade para a equipe de dados
+## (comando `exporta_parquet`): O.S. (vivas + arquivadas), manutenções e Ativos.
+##
+## Em vez de consultas ad hoc de MTBF no banco de produção, os analistas leem arquivos
+## Parquet particionados por mês (layout Hive: ordens/mes=2024-05/parte.parquet), que
+## DuckDB, pandas, Spark etc. leem direto, só com as colunas pedidas.
+##
+## Sem objetos Python por linha: cada mês sai do banco por COPY (CSV) para um buffer e é
+## convertido pelo leitor CSV do pyarrow (em C) com um schema fixo; datas saem como
+## microssegundos desde a época e viram timestamp no Arrow. pyarrow é opcional: só este
+## comando precisa dele (`pip install pyarrow`).
+##
+## Incremental: `_estado.json` guarda até onde cada conjunto foi exportado (a marca). Cada
+## execução reescreve os meses a partir de (marca − EXPORT_PARQUET_REWRITE_DAYS) e, além
+## deles, todo mês com linhas alteradas desde a marca: O.S. com `atualizado_em` posterior
+## (finalizadas, reatribuídas...) e O.S. arquivadas depois (`arquivado_em`), com as suas
+## manutenções.
+##
+
+ARQUIVO_ESTADO = '_estado.json'
+
+
+class ExportacaoColunarError(Exception):
+    pass
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.csv
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportacaoColunarError('pyarrow não está instalado (pip install -r requirements-opcional.txt).')
+    return pyarrow
+
+
+"""
+============================== BLOCO 1 — Conjuntos ==============================
+Cada conjunto: consulta (com %(inicio)s e %(fim)s para o mês, se particionado), colunas
+na ordem do SELECT com o tipo Arrow, a consulta da data mais antiga (1ª exportação) e a
+dos meses (em UTC) com linhas alteradas desde %(marca)s.
+As colunas 'timestamp' saem do banco em microssegundos desde a época (_us).
+==================================================================================
+"""
+def _us(coluna):
+    return f"(EXTRACT(EPOCH FROM {coluna}) * 1000000)::bigint"
+
+
+def _mes(coluna):
+    # Início do mês em UTC, como os limites de meses_a_exportar
+    return f"date_trunc('month', {coluna} AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'"
+
+
+CONJUNTOS = {
+    'ordens': {
+        'sql': f"""
+            SELECT id, titulo, tipo, status, ativo_id, {_us('data_criacao')}, {_us('data_prevista')},
+                   solicitante_id, tecnico_id, arquivada
+            FROM (
+                SELECT id, titulo, tipo, status, ativo_id, data_criacao, data_prevista,
+                       solicitante_id, tecnico_id, false AS arquivada
+                FROM api_ordemservico
+                UNION ALL
+                SELECT id, titulo, tipo, status, ativo_id, data_criacao, data_prevista,
+                       solicitante_id, tecnico_id, true
+                FROM api_ordemservicoarquivo
+            ) ordens
+            WHERE data_criacao >= %(inicio)s AND data_criacao < %(fim)s
+        """,
+        'colunas': [
+            ('id', 'int64'), ('titulo', 'string'), ('tipo', 'string'), ('status', 'string'),
+            ('ativo_id', 'int64'), ('data_criacao', 'timestamp'), ('data_prevista', 'timestamp'),
+            ('solicitante_id', 'int64'), ('tecnico_id', 'int64'), ('arquivada', 'bool'),
+        ],
+        'data': "SELECT MIN(data_criacao) FROM (SELECT MIN(data_criacao) AS data_criacao FROM api_ordemservico "
+                "UNION ALL SELECT MIN(data_criacao) FROM api_ordemservicoarquivo) d",
+        'alterados': f"""
+            SELECT DISTINCT {_mes('data_criacao')} FROM api_ordemservico WHERE atualizado_em >= %(marca)s
+            UNION
+            SELECT DISTINCT {_mes('data_criacao')} FROM api_ordemservicoarquivo WHERE arquivado_em >= %(marca)s
+        """,
+    },
+    'manutencoes': {
+        'sql': f"""
+            SELECT ordem_servico_id, usuario_executor_id, {_us('data_inicio_execucao')},
+                   {_us('data_fim_execucao')}, EXTRACT(EPOCH FROM tempo_gasto)::bigint, arquivada
+            FROM (
+                SELECT ordem_servico_id, usuario_executor_id, data_inicio_execucao, data_fim_execucao,
+                       tempo_gasto, false AS arquivada
+                FROM api_manutencao
+                UNION ALL
+                SELECT ordem_servico_id, usuario_executor_id, data_inicio_execucao, data_fim_execucao,
+                       tempo_gasto, true
+                FROM api_manutencaoarquivo
+            ) manutencoes
+            WHERE data_fim_execucao >= %(inicio)s AND data_fim_execucao < %(fim)s
+        """,
+        'colunas': [
+            ('ordem_servico_id', 'int64'), ('usuario_executor_id', 'int64'), ('data_inicio_execucao', 'timestamp'),
+            ('data_fim_execucao', 'timestamp'), ('tempo_gasto_segundos', 'int64'), ('arquivada', 'bool'),
+        ],
+        'data': "SELECT MIN(data_fim_execucao) FROM (SELECT MIN(data_fim_execucao) AS data_fim_execucao FROM api_manutencao "
+                "UNION ALL SELECT MIN(data_fim_execucao) FROM api_manutencaoarquivo) d",
+        # A manutenção é gravada junto com a O.S. finalizada (que atualiza atualizado_em)
+        'alterados': f"""
+            SELECT DISTINCT {_mes('m.data_fim_execucao')}
+            FROM api_manutencao m JOIN api_ordemservico o ON o.id = m.ordem_servico_id
+            WHERE o.atualizado_em >= %(marca)s
+            UNION
+            SELECT DISTINCT {_mes('m.data_fim_execucao')}
+            FROM api_manutencaoarquivo m JOIN api_ordemservicoarquivo o ON o.id = m.ordem_servico_id
+            WHERE o.arquivado_em >= %(marca)s
+        """,
+    },
+}
+
+# Pequeno e sem data: reescrito inteiro a cada execução
+ATIVOS = {
+    'sql': """
+        SELECT id, nome, marca, modelo, periodicidade, endereco,
+               ST_X(localizacao) AS longitude, ST_Y(localizacao) AS latitude, mtbf, mttr
+        FROM api_ativo
+    """,
+    'colunas': [
+        ('id', 'int64'), ('nome', 'string'), ('marca', 'string'), ('modelo', 'string'), ('periodicidade', 'int32'),
+        ('endereco', 'string'), ('longitude', 'float64'), ('latitude', 'float64'), ('mtbf', 'int32'), ('mttr', 'int32'),
+    ],
+}
+
+
+"""
+=========================== BLOCO 2 — Banco → Arrow → Parquet ===========================
+COPY não aceita parâmetros: os limites do mês (datetimes gerados aqui, nunca texto do
+usuário) entram como literais timestamptz. A escrita vai para um temporário e é trocada
+com os.replace: quem lê o diretório nunca vê um arquivo pela metade.
+==========================================================================================
+"""
+def _literal(instante):
+    return f"'{instante.isoformat()}'::timestamptz"
+
+
+def _copiar_csv(conexao, sql, limites=None):
+    destino = io.BytesIO()
+    if limites is not None:
+        sql = sql % {chave: _literal(valor) for chave, valor in limites.items()}
+    copia_sql = f"COPY ({sql}) TO STDOUT WITH (FORMAT csv)"
+    with conexao.cursor() as cursor:
+        bruto = cursor.cursor  # cursor do driver por baixo do wrapper do Django
+        if hasattr(bruto, 'copy_expert'):  # psycopg2
+            bruto.copy_expert(copia_sql, destino)
+        else:  # psycopg 3
+            with bruto.copy(copia_sql) as copia:
+                for bloco in copia:
+                    destino.write(bloco)
+    destino.seek(0)
+    return destino
+
+
+def _tabela(pa, dados, colunas):
+    tipos_leitura = {
+        'int64': pa.int64(), 'int32': pa.int32(), 'float64': pa.float64(),
+        'string': pa.string(), 'bool': pa.bool_(), 'timestamp': pa.int64(),
+    }
+    if dados.getbuffer().nbytes == 0:
+        # Mês sem linhas: o leitor CSV recusa um arquivo vazio
+        tabela = pa.schema([(nome, tipos_leitura[tipo]) for nome, tipo in colunas]).empty_table()
+    else:
+        tabela = pa.csv.read_csv(
+            dados,
+            read_options=pa.csv.ReadOptions(column_names=[nome for nome, _ in colunas]),
+            convert_options=pa.csv.ConvertOptions(
+                column_types={nome: tipos_leitura[tipo] for nome, tipo in colunas},
+                true_values=['t'], false_values=['f'],
+                strings_can_be_null=True, quoted_strings_can_be_null=False,
+            ),
+        )
+    for posicao, (nome, tipo) in enumerate(colunas):
+        if tipo == 'timestamp':
+            tabela = tabela.set_column(posicao, nome, tabela.column(nome).cast(pa.timestamp('us', tz='UTC')))
+    return tabela
+
+
+def _gravar(pa, tabela, caminho):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + '.tmp'
+    pa.parquet.write_table(tabela, temporario, compression='zstd')
+    os.replace(temporario, caminho)
+
+
+def _inicio_mes(instante):
+    return instante.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _proximo_mes(instante):
+    return (instante.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def meses_a_exportar(desde, ate):
+    """ [(inicio, fim)] dos meses que cobrem [desde, ate). """
+    meses = []
+    inicio = _inicio_mes(desde)
+    while inicio < ate:
+        fim = _proximo_mes(inicio)
+        meses.append((inicio, fim))
+        inicio = fim
+    return meses
+
+
+"""
+============================= BLOCO 3 — Exportação =============================
+`exportar` devolve, para relatório, [(conjunto, mês ou None, linhas)].
+=================================================================================
+"""
+def ler_estado(destino):
+    try:
+        with open(os.path.join(destino, ARQUIVO_ESTADO), encoding='utf-8') as arquivo:
+            return {nome: datetime.datetime.fromisoformat(valor) for nome, valor in json.load(arquivo).items()}
+    except FileNotFoundError:
+        return {}
+
+
+def _gravar_estado(destino, estado):
+    caminho = os.path.join(destino, ARQUIVO_ESTADO)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump({nome: valor.isoformat() for nome, valor in estado.items()}, arquivo, indent=2)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def planejar(destino, completo=False, agora=None, banco='default'):
+    """ {conjunto: [(inicio, fim)]} dos meses a (re)escrever nesta execução. """
+    agora = agora or timezone.now()
+    estado = {} if completo else ler_estado(destino)
+    janela = datetime.timedelta(days=settings.EXPORT_PARQUET_REWRITE_DAYS)
+    plano = {}
+    for nome, conjunto in CONJUNTOS.items():
+        alterados = []
+        with connections[banco].cursor() as cursor:
+            if nome in estado:
+                desde = estado[nome] - janela
+                cursor.execute(conjunto['alterados'], {'marca': estado[nome]})
+                alterados = [(inicio, _proximo_mes(inicio)) for inicio, in cursor.fetchall() if inicio < agora]
+            else:
+                cursor.execute(conjunto['data'])
+                desde = cursor.fetchone()[0]
+        meses = meses_a_exportar(desde, agora) if desde is not None else []
+        plano[nome] = sorted(set(meses) | set(alterados))
+    return plano
+
+
+def exportar(destino, completo=False, agora=None, banco='default'):
+    pa = _pyarrow()
+    agora = agora or timezone.now()
+    conexao = connections[banco]
+    relatorio = []
+    estado = ler_estado(destino)
+
+    for nome, meses in planejar(destino, completo, agora, banco).items():
+        conjunto = CONJUNTOS[nome]
+        for inicio, fim in meses:
+            dados = _copiar_csv(conexao, conjunto['sql'], {'inicio': inicio, 'fim': min(fim, agora)})
+            tabela = _tabela(pa, dados, conjunto['colunas'])
+            caminho = os.path.join(destino, nome, f'mes={inicio:%Y-%m}', 'parte.parquet')
+            if tabela.num_rows:
+                _gravar(pa, tabela, caminho)
+            elif os.path.exists(caminho):
+                os.remove(caminho)
+            relatorio.append((nome, inicio, tabela.num_rows))
+        estado[nome] = agora
+        # Estado gravado por conjunto: uma falha no seguinte não refaz este
+        _gravar_estado(destino, estado)
+
+    tabela = _tabela(pa, _copiar_csv(conexao, ATIVOS['sql']), ATIVOS['colunas'])
+    _gravar(pa, tabela, os.path.join(destino, 'ativos', 'ativos.parquet'))
+    relatorio.append(('ativos', None, tabela.num_rows))
+    return relatorio
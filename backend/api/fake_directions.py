@@ -0,0 +1,209 @@
+import asyncio
+import json
+import math
+import random
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+##
+## --- fake_directions.py ---
+## Servidor HTTP local que imita a API Google Directions, para testar e medir o proxy
+## de rotas sem rede e sem custo. Responde com um JSON no mesmo formato da Google
+## (routes → legs → distance/duration, waypoint_order), depois de uma latência
+## configurável que simula o tempo de resposta do serviço real.
+##
+## Para testes de carga, o servidor também simula as falhas da Google, em proporções
+## configuráveis: HTTP 500, o status OVER_QUERY_LIMIT (HTTP 200, como a Google faz) e pedidos
+## que ficam pendurados até o cliente desistir (timeout). Fora do processo, suba-o com o
+## comando `fake_directions` e aponte GOOGLE_DIRECTIONS_URL do servidor testado para ele.
+##
+## Uso típico (num comando de benchmark):
+##     servidor = FakeDirectionsServer(latencia=0.2)
+##     url = servidor.iniciar_em_thread()
+##     ... apontar settings.GOOGLE_DIRECTIONS_URL para `url` ...
+##     servidor.parar()
+##
+
+RAIO_TERRA_M = 6371000.0
+VELOCIDADE_MEDIA_MS = 40 / 3.6  # 40 km/h em metros por segundo
+
+
+def _haversine_m(origem, destino):
+    lat1, lng1 = map(math.radians, origem)
+    lat2, lng2 = map(math.radians, destino)
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * RAIO_TERRA_M * math.asin(math.sqrt(a))
+
+
+def _ler_coordenada(texto):
+    lat, lng = texto.split(',')
+    return float(lat), float(lng)
+
+
+def montar_resposta_directions(params):
+    """ Monta uma resposta no formato da Directions a partir dos parâmetros do pedido. """
+    try:
+        origem = _ler_coordenada(params['origin'])
+        destino = _ler_coordenada(params['destination'])
+        paradas = []
+        if params.get('waypoints'):
+            paradas = [_ler_coordenada(wp) for wp in params['waypoints'].split('|') if wp and not wp.startswith('optimize:')]
+    except (KeyError, ValueError):
+        return {'status': 'INVALID_REQUEST', 'error_message': 'Parâmetros de rota inválidos.', 'routes': []}
+
+    pontos = [origem] + paradas + [destino]
+    legs = []
+    for inicio, fim in zip(pontos, pontos[1:]):
+        metros = _haversine_m(inicio, fim)
+        legs.append({
+            'distance': {'value': int(metros), 'text': f'{metros / 1000:.1f} km'},
+            'duration': {'value': int(metros / VELOCIDADE_MEDIA_MS), 'text': f'{metros / VELOCIDADE_MEDIA_MS / 60:.0f} min'},
+            'start_location': {'lat': inicio[0], 'lng': inicio[1]},
+            'end_location': {'lat': fim[0], 'lng': fim[1]},
+            'steps': [],
+        })
+    return {
+        'status': 'OK',
+        'geocoded_waypoints': [],
+        'routes': [{
+            'summary': 'Rota simulada',
+            'legs': legs,
+            'waypoint_order': list(range(len(paradas))),
+            'overview_polyline': {'points': ''},
+            'warnings': [],
+        }],
+    }
+
+
+class FakeDirectionsServer:
+    """
+    Servidor HTTP/1.1 mínimo (asyncio puro, com keep-alive) que responde a
+    GET /maps/api/directions/json depois de `latencia` segundos (± `variacao`, distribuição
+    normal). As taxas (0 a 1) dizem que fração dos pedidos falha de cada maneira; um pedido
+    em timeout fica `espera_timeout` segundos sem resposta e a conexão é fechada.
+    """
+    CAMINHO = '/maps/api/directions/json'
+
+    def __init__(self, host='127.0.0.1', port=0, latencia=0.2, variacao=0.0,
+                 taxa_erro=0.0, taxa_limite=0.0, taxa_timeout=0.0, espera_timeout=60.0, semente=None):
+        self.host = host
+        self.port = port
+        self.latencia = latencia
+        self.variacao = variacao
+        self.taxa_erro = taxa_erro
+        self.taxa_limite = taxa_limite
+        self.taxa_timeout = taxa_timeout
+        self.espera_timeout = espera_timeout
+        self._aleatorio = random.Random(semente)
+        self.pedidos_atendidos = 0
+        self.falhas_simuladas = {'erro': 0, 'limite': 0, 'timeout': 0}
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._pronto = threading.Event()
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}{self.CAMINHO}'
+
+    async def _responder(self, writer, codigo, corpo):
+        dados = json.dumps(corpo).encode('utf-8')
+        motivo = {200: 'OK', 404: 'Not Found', 500: 'Internal Server Error'}.get(codigo, 'OK')
+        writer.write(
+            f'HTTP/1.1 {codigo} {motivo}\r\n'
+            f'Content-Type: application/json; charset=UTF-8\r\n'
+            f'Content-Length: {len(dados)}\r\n'
+            f'Connection: keep-alive\r\n\r\n'.encode('latin-1') + dados
+        )
+        await writer.drain()
+
+    def _sortear_falha(self):
+        sorteio = self._aleatorio.random()
+        for falha, taxa in (('erro', self.taxa_erro), ('limite', self.taxa_limite), ('timeout', self.taxa_timeout)):
+            if sorteio < taxa:
+                self.falhas_simuladas[falha] += 1
+                return falha
+            sorteio -= taxa
+        return None
+
+    def _sortear_latencia(self):
+        if not self.variacao:
+            return self.latencia
+        return max(0.0, self._aleatorio.gauss(self.latencia, self.variacao))
+
+    async def _tratar_conexao(self, reader, writer):
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                metodo, alvo, _ = linha.decode('latin-1').split(' ', 2)
+                # Descarta os cabeçalhos (pedidos GET não têm corpo)
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+
+                partes = urlsplit(alvo)
+                if metodo != 'GET' or partes.path != self.CAMINHO:
+                    await self._responder(writer, 404, {'status': 'NOT_FOUND'})
+                    continue
+
+                params = {chave: valores[0] for chave, valores in parse_qs(partes.query).items()}
+                falha = self._sortear_falha()
+                if falha == 'timeout':
+                    await asyncio.sleep(self.espera_timeout)
+                    break
+                await asyncio.sleep(self._sortear_latencia())
+                self.pedidos_atendidos += 1
+                if falha == 'erro':
+                    await self._responder(writer, 500, {'status': 'UNKNOWN_ERROR', 'error_message': 'Falha simulada.', 'routes': []})
+                elif falha == 'limite':
+                    await self._responder(writer, 200, {
+                        'status': 'OVER_QUERY_LIMIT', 'error_message': 'Cota simulada excedida.', 'routes': [],
+                    })
+                else:
+                    await self._responder(writer, 200, montar_resposta_directions(params))
+        except (ConnectionError, ValueError, asyncio.CancelledError):
+            # Cliente desligou, pedido malformado ou servidor a encerrar
+            pass
+        finally:
+            writer.close()
+
+    async def iniciar(self):
+        self._server = await asyncio.start_server(self._tratar_conexao, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def servir_para_sempre(self):
+        await self.iniciar()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def iniciar_em_thread(self):
+        """ Sobe o servidor num event loop próprio, numa thread daemon; devolve a URL. """
+        def _executar():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.iniciar())
+            self._pronto.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=_executar, name='fake-directions', daemon=True)
+        self._thread.start()
+        self._pronto.wait()
+        return self.url
+
+    async def _encerrar(self):
+        # Fecha o socket de escuta e cancela as conexões keep-alive ainda abertas
+        self._server.close()
+        tarefas = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+    def parar(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._encerrar(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
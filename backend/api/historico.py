@@ -0,0 +1,153 @@
+import datetime
+from itertools import chain
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Sum
+
+from .models import Manutencao, ManutencaoArquivo, OrdemServico, OrdemServicoArquivo
+
+##
+## --- historico.py ---
+## Arquivo morto das O.S. finalizadas antigas e leitura transparente do histórico.
+##
+## As O.S. finalizadas há mais de ARCHIVE_FINALIZED_AFTER_DAYS dias (e as suas manutenções)
+## saem de api_ordemservico / api_manutencao e vão para OrdemServicoArquivo /
+## ManutencaoArquivo. As tabelas quentes ficam só com o que a agenda e o mapa usam; o
+## histórico completo continua disponível para o /historico/ e para os cálculos de
+## confiabilidade (MTBF, MTTR, preventivas), que leem as duas fontes pelas funções abaixo.
+##
+
+
+"""
+============================ BLOCO 1 — Arquivamento em lotes ============================
+Cada lote é UMA instrução SQL numa transação curta: escolhe até `tamanho` O.S. finalizadas
+anteriores ao corte (FOR UPDATE SKIP LOCKED → não espera por linhas que o app esteja a
+alterar), apaga-as das tabelas quentes e insere as linhas devolvidas (RETURNING) no arquivo.
+Os bloqueios ficam restritos às linhas do lote, e só durante a transação.
+==========================================================================================
+"""
+SQL_ARQUIVAR_LOTE = """
+    WITH lote AS (
+        SELECT id FROM api_ordemservico
+        WHERE status = 'finalizada' AND data_criacao < %(corte)s
+        ORDER BY data_criacao
+        LIMIT %(tamanho)s
+        FOR UPDATE SKIP LOCKED
+    ),
+    manutencoes AS (
+        DELETE FROM api_manutencao m USING lote WHERE m.ordem_servico_id = lote.id
+        RETURNING m.ordem_servico_id, m.usuario_executor_id, m.data_inicio_execucao,
+                  m.data_fim_execucao, m.tempo_gasto, m.observacoes
+    ),
+    ordens AS (
+        DELETE FROM api_ordemservico o USING lote WHERE o.id = lote.id
+        RETURNING o.id, o.titulo, o.tipo, o.descricao, o.status, o.ativo_id, o.data_criacao,
+                  o.data_prevista, o.solicitante_id, o.tecnico_id
+    ),
+    ordens_arquivadas AS (
+        INSERT INTO api_ordemservicoarquivo
+            (id, titulo, tipo, descricao, status, ativo_id, data_criacao, data_prevista,
+             solicitante_id, tecnico_id, arquivado_em)
+        SELECT id, titulo, tipo, descricao, status, ativo_id, data_criacao, data_prevista,
+               solicitante_id, tecnico_id, %(agora)s
+        FROM ordens
+        RETURNING 1
+    ),
+    manutencoes_arquivadas AS (
+        INSERT INTO api_manutencaoarquivo
+            (ordem_servico_id, usuario_executor_id, data_inicio_execucao, data_fim_execucao,
+             tempo_gasto, observacoes)
+        SELECT * FROM manutencoes
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM ordens_arquivadas), (SELECT COUNT(*) FROM manutencoes_arquivadas)
+"""
+
+
+def corte_arquivamento(dias, agora):
+    return agora - datetime.timedelta(days=dias)
+
+
+def contar_candidatos(corte):
+    return OrdemServico.objects.filter(status='finalizada', data_criacao__lt=corte).count()
+
+
+def arquivar_lote(corte, tamanho, agora):
+    """ Move um lote para o arquivo. Devolve (ordens_movidas, manutencoes_movidas). """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(SQL_ARQUIVAR_LOTE, {'corte': corte, 'tamanho': tamanho, 'agora': agora})
+            ordens, manutencoes = cursor.fetchone()
+    return ordens, manutencoes
+
+
+"""
+========================= BLOCO 2 — Leitura (vivas + arquivadas) =========================
+Funções usadas pelo AtivoViewSet.historico e pelos comandos de métricas. Os objetos das
+duas fontes têm os mesmos atributos (id, tipo, status, datas, `manutencao`), por isso o
+código que os consome não precisa saber de onde vieram.
+============================================================================================
+"""
+def ordens_do_ativo(ativo_id, **filtros):
+    """ O.S. (vivas e arquivadas) do ativo que satisfazem `filtros`, por data_criacao crescente. """
+    vivas = OrdemServico.objects.filter(ativo_id=ativo_id, **filtros).select_related('manutencao')
+    arquivadas = OrdemServicoArquivo.objects.filter(ativo_id=ativo_id, **filtros).select_related('manutencao')
+    return sorted(chain(vivas, arquivadas), key=lambda ordem: (ordem.data_criacao, ordem.id))
+
+
+def historico_ativo(ativo_id):
+    """ O.S. finalizadas do ativo, da mais recente para a mais antiga. """
+    relacionados = ('ativo', 'solicitante', 'manutencao__usuario_executor')
+    vivas = OrdemServico.objects.filter(ativo_id=ativo_id, status='finalizada').select_related(*relacionados)
+    arquivadas = OrdemServicoArquivo.objects.filter(ativo_id=ativo_id, status='finalizada').select_related(*relacionados)
+    return sorted(chain(vivas, arquivadas), key=lambda ordem: (ordem.data_criacao, ordem.id), reverse=True)
+
+
+def manutencao_de(ordem):
+    """ A manutenção da O.S. (viva ou arquivada), ou None se ela não tiver. """
+    try:
+        return ordem.manutencao
+    except (Manutencao.DoesNotExist, ManutencaoArquivo.DoesNotExist):
+        return None
+
+
+def existe_ordem(ativo_id, **filtros):
+    return (
+        OrdemServico.objects.filter(ativo_id=ativo_id, **filtros).exists()
+        or OrdemServicoArquivo.objects.filter(ativo_id=ativo_id, **filtros).exists()
+    )
+
+
+def somar_tempo_gasto(ativo_id, **filtros_ordem):
+    """ (soma de tempo_gasto, quantidade) das manutenções das O.S. do ativo, nas duas fontes. """
+    filtros = {f'ordem_servico__{campo}': valor for campo, valor in filtros_ordem.items()}
+    total = None
+    qtd = 0
+    for modelo in (Manutencao, ManutencaoArquivo):
+        agg = modelo.objects.filter(ordem_servico__ativo_id=ativo_id, **filtros).aggregate(
+            total_tempo=Sum('tempo_gasto'), qtd=Count('pk'),
+        )
+        if agg['total_tempo'] is not None:
+            total = agg['total_tempo'] if total is None else total + agg['total_tempo']
+        qtd += agg['qtd'] or 0
+    return total, qtd
+
+
+def ultimo_fim_manutencao(ativo_id, **filtros_ordem):
+    """ Maior data_fim_execucao entre as manutenções das O.S. do ativo, nas duas fontes. """
+    filtros = {f'ordem_servico__{campo}': valor for campo, valor in filtros_ordem.items()}
+    datas = [
+        modelo.objects.filter(ordem_servico__ativo_id=ativo_id, **filtros).aggregate(fim=Max('data_fim_execucao'))['fim']
+        for modelo in (Manutencao, ManutencaoArquivo)
+    ]
+    datas = [data for data in datas if data is not None]
+    return max(datas) if datas else None
+
+
+def ultima_data_prevista(ativo_id, **filtros):
+    datas = [
+        modelo.objects.filter(ativo_id=ativo_id, **filtros).aggregate(ultima=Max('data_prevista'))['ultima']
+        for modelo in (OrdemServico, OrdemServicoArquivo)
+    ]
+    datas = [data for data in datas if data is not None]
+    return max(datas) if datas else None
@@ -0,0 +1,263 @@
+import csv
+import io
+import json
+import re
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import connection, transaction
+
+from .models import Ativo
+
+##
+## --- importacao_ativos.py ---
+## Importação em massa de Ativos a partir de CSV ou GeoJSON (comando `importa_ativos` e
+## POST /api/ativos/importar/).
+##
+## Criar milhares de Ativos com um POST cada (AtivoSerializer.create) custa um pedido,
+## um json.loads e um INSERT por linha. Aqui o arquivo é lido em fluxo (uma linha / uma
+## feature de cada vez), as linhas válidas são juntadas em lotes de IMPORT_BATCH_SIZE e
+## cada lote entra com um único COPY (ou bulk_create, com metodo='bulk_create'). A memória
+## usada não depende do tamanho do arquivo: só um lote e até IMPORT_MAX_ERRORS erros ficam
+## guardados. Linhas inválidas são rejeitadas uma a uma, com o número da linha e o motivo;
+## as demais são importadas.
+##
+## O COPY não dispara signals: no fim, a matriz de deslocamento é reconstruída de uma vez
+## (em vez de uma atualização por Ativo).
+##
+
+TAMANHO_BLOCO = 64 * 1024
+CAMPOS_TEXTO = ('nome', 'marca', 'modelo', 'endereco')
+COLUNAS_COPY = ('nome', 'marca', 'modelo', 'periodicidade', 'endereco', 'localizacao', 'mtbf', 'mttr', 'manual_sha256')
+
+
+class ImportacaoError(Exception):
+    """ Arquivo que não dá para ler (formato, cabeçalho); erros de linha vão para o resultado. """
+    pass
+
+
+class ResultadoImportacao:
+    def __init__(self):
+        self.importados = 0
+        self.rejeitados = 0
+        self.erros = []
+
+    def rejeitar(self, linha, erros):
+        self.rejeitados += 1
+        if len(self.erros) < settings.IMPORT_MAX_ERRORS:
+            self.erros.append({'linha': linha, 'erros': erros})
+
+    def como_dict(self):
+        return {
+            'importados': self.importados,
+            'rejeitados': self.rejeitados,
+            'erros': self.erros,
+            'erros_omitidos': self.rejeitados - len(self.erros),
+        }
+
+
+"""
+========================== BLOCO 1 — Leitura em fluxo ==========================
+Os leitores devolvem (número da linha, dicionário de campos). Para o GeoJSON, o array
+"features" é percorrido com JSONDecoder.raw_decode sobre um buffer que só guarda o
+trecho ainda não lido — o arquivo nunca é carregado inteiro.
+=================================================================================
+"""
+RE_INICIO_FEATURES = re.compile(r'"features"\s*:\s*\[')
+
+
+def ler_csv(texto):
+    leitor = csv.DictReader(texto)
+    # csv.Error (byte NUL, campo maior que o limite, aspas abertas) aparece no meio da leitura
+    # e impede ler o resto do arquivo: vira ImportacaoError, não erro de linha
+    try:
+        faltando = {'nome', 'periodicidade', 'longitude', 'latitude'} - set(leitor.fieldnames or [])
+        if faltando:
+            raise ImportacaoError(f'Colunas obrigatórias ausentes no CSV: {", ".join(sorted(faltando))}.')
+        for campos in leitor:
+            yield leitor.line_num, campos
+    except csv.Error as e:
+        # leitor.line_num só é atualizado depois de uma linha lida com sucesso
+        raise ImportacaoError(f'CSV inválido na linha {leitor.reader.line_num}: {e}.')
+
+
+def _features_geojson(texto):
+    decodificador = json.JSONDecoder()
+    buffer = ''
+
+    def ler():
+        nonlocal buffer
+        bloco = texto.read(TAMANHO_BLOCO)
+        buffer += bloco
+        return bool(bloco)
+
+    while True:
+        inicio = RE_INICIO_FEATURES.search(buffer)
+        if inicio:
+            buffer = buffer[inicio.end():]
+            break
+        if not ler():
+            raise ImportacaoError('GeoJSON sem a lista "features" (esperado um FeatureCollection).')
+
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if not buffer:
+            if not ler():
+                raise ImportacaoError('GeoJSON truncado: a lista "features" não foi fechada.')
+            continue
+        if buffer[0] == ']':
+            return
+        try:
+            feature, fim = decodificador.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # Feature incompleta no buffer: lê mais; se o arquivo acabou, o JSON é inválido
+            if not ler():
+                raise ImportacaoError('GeoJSON inválido perto do fim do arquivo.')
+            continue
+        buffer = buffer[fim:]
+        yield feature
+
+
+def ler_geojson(texto):
+    for numero, feature in enumerate(_features_geojson(texto), start=1):
+        campos = dict(feature.get('properties') or {}) if isinstance(feature, dict) else {}
+        geometria = feature.get('geometry') if isinstance(feature, dict) else None
+        if isinstance(geometria, dict) and geometria.get('type') == 'Point':
+            coordenadas = geometria.get('coordinates') or []
+            if len(coordenadas) >= 2:
+                campos['longitude'], campos['latitude'] = coordenadas[0], coordenadas[1]
+        yield numero, campos
+
+
+def leitor_para(formato, texto):
+    if formato == 'csv':
+        return ler_csv(texto)
+    if formato == 'geojson':
+        return ler_geojson(texto)
+    raise ImportacaoError('Formato desconhecido; use "csv" ou "geojson".')
+
+
+def formato_do_nome(nome):
+    nome = (nome or '').lower()
+    if nome.endswith('.csv'):
+        return 'csv'
+    if nome.endswith(('.geojson', '.json')):
+        return 'geojson'
+    return None
+
+
+"""
+============================== BLOCO 2 — Validação ==============================
+As mesmas regras do modelo (campos obrigatórios, tamanhos, periodicidade inteira) mais
+coordenadas dentro dos limites WGS84. Devolve os valores prontos para o COPY ou o dict
+de erros por campo.
+==================================================================================
+"""
+def validar(campos):
+    erros = {}
+    valores = {}
+    for campo in CAMPOS_TEXTO:
+        valor = str(campos.get(campo) or '').strip()
+        if campo == 'nome' and not valor:
+            erros[campo] = 'Obrigatório.'
+        elif len(valor) > 255:
+            erros[campo] = 'Máximo de 255 caracteres.'
+        valores[campo] = valor
+
+    try:
+        valores['periodicidade'] = int(str(campos.get('periodicidade')).strip())
+        if valores['periodicidade'] <= 0:
+            erros['periodicidade'] = 'Deve ser maior que zero (dias).'
+    except (TypeError, ValueError):
+        erros['periodicidade'] = 'Número inteiro de dias obrigatório.'
+
+    for campo, limite in (('longitude', 180), ('latitude', 90)):
+        try:
+            valores[campo] = float(str(campos.get(campo)).strip())
+            if not -limite <= valores[campo] <= limite:
+                erros[campo] = f'Fora do intervalo [-{limite}, {limite}].'
+        except (TypeError, ValueError):
+            erros[campo] = 'Número obrigatório.'
+
+    return (None, erros) if erros else (valores, None)
+
+
+"""
+============================== BLOCO 3 — Gravação ==============================
+COPY ... FROM STDIN em CSV com todos os campos entre aspas (o texto vazio não vira
+NULL). A localização vai em EWKT, que o PostGIS aceita como entrada do tipo geometry.
+A importação inteira é uma transação: ou entram todas as linhas válidas, ou nenhuma.
+=================================================================================
+"""
+def _copiar(cursor, sql, dados):
+    bruto = cursor.cursor  # cursor do driver por baixo do wrapper do Django
+    if hasattr(bruto, 'copy_expert'):  # psycopg2
+        bruto.copy_expert(sql, dados)
+    else:  # psycopg 3
+        with bruto.copy(sql) as copia:
+            copia.write(dados.getvalue())
+
+
+def _gravar_copy(lote):
+    dados = io.StringIO()
+    escritor = csv.writer(dados, quoting=csv.QUOTE_ALL)
+    for valores in lote:
+        escritor.writerow([
+            valores['nome'], valores['marca'], valores['modelo'], valores['periodicidade'], valores['endereco'],
+            f"SRID=4326;POINT({valores['longitude']!r} {valores['latitude']!r})", 0, 0, '',
+        ])
+    dados.seek(0)
+    sql = f"COPY {Ativo._meta.db_table} ({', '.join(COLUNAS_COPY)}) FROM STDIN WITH (FORMAT csv)"
+    with connection.cursor() as cursor:
+        _copiar(cursor, sql, dados)
+
+
+def _gravar_bulk_create(lote):
+    Ativo.objects.bulk_create([
+        Ativo(
+            nome=valores['nome'], marca=valores['marca'], modelo=valores['modelo'],
+            periodicidade=valores['periodicidade'], endereco=valores['endereco'],
+            localizacao=Point(valores['longitude'], valores['latitude'], srid=4326),
+        )
+        for valores in lote
+    ], batch_size=len(lote))
+
+
+def importar(linhas, metodo='copy', dry_run=False, reconstruir_matriz=True):
+    """ `linhas` é um leitor de `leitor_para`. Devolve o ResultadoImportacao. """
+    gravar = _gravar_copy if metodo == 'copy' else _gravar_bulk_create
+    resultado = ResultadoImportacao()
+    lote = []
+
+    with transaction.atomic():
+        for numero, campos in linhas:
+            valores, erros = validar(campos)
+            if erros:
+                resultado.rejeitar(numero, erros)
+                continue
+            lote.append(valores)
+            if len(lote) >= settings.IMPORT_BATCH_SIZE:
+                if not dry_run:
+                    gravar(lote)
+                resultado.importados += len(lote)
+                lote = []
+        if lote:
+            if not dry_run:
+                gravar(lote)
+            resultado.importados += len(lote)
+
+    if resultado.importados and reconstruir_matriz and not dry_run:
+        from .matriz_deslocamento import reconstruir
+        reconstruir()
+    return resultado
+
+
+def importar_arquivo(arquivo_binario, formato, **opcoes):
+    """ Atalho para arquivos abertos em modo binário (upload ou arquivo em disco). """
+    texto = io.TextIOWrapper(arquivo_binario, encoding='utf-8-sig', newline='')
+    try:
+        return importar(leitor_para(formato, texto), **opcoes)
+    except UnicodeDecodeError:
+        raise ImportacaoError('O arquivo deve estar em UTF-8.')
+    finally:
+        texto.detach()
@@ -0,0 +1,159 @@
+from django.db import connection
+from django.utils import timezone
+
+##
+## --- indicadores.py ---
+## Indicadores do painel de gestão (/api/indicadores/), servidos por materialized views.
+##
+## Os gestores montavam estes números puxando as listas completas de /api/ordens-servico/
+## e /api/ativos/. Agora o banco pré-calcula tudo em quatro materialized views, atualizadas
+## pelo comando `atualiza_indicadores` (agendado, ex.: a cada 5 minutos) com
+## REFRESH MATERIALIZED VIEW CONCURRENTLY — as leituras não ficam bloqueadas durante a
+## atualização. Cada view guarda o instante do cálculo (`atualizado_em`), devolvido na
+## resposta para o cliente saber a idade dos dados.
+##
+## O SQL abaixo é usado por `recriar_views()` (chamada, por exemplo, depois de
+## `particiona_historico --converter`, que troca a tabela de O.S.). A migração 0013 tem a
+## sua própria cópia: ao mudar uma view aqui, crie uma migração nova que a recrie.
+##
+
+
+"""
+=============================== BLOCO 1 — Definição das views ===============================
+REFRESH ... CONCURRENTLY exige um índice único em cada view: por isso a view da frota (uma
+linha só) tem a coluna constante `id`. As O.S. do arquivo morto entram nas contagens
+históricas (finalizadas, corretivas, taxa de conclusão).
+==============================================================================================
+"""
+ORDENS_VIVAS_E_ARQUIVADAS = """
+    SELECT id, ativo_id, tecnico_id, tipo, status, data_criacao, data_prevista FROM api_ordemservico
+    UNION ALL
+    SELECT id, ativo_id, tecnico_id, tipo, status, data_criacao, data_prevista FROM api_ordemservicoarquivo
+"""
+
+VIEWS = {
+    'mv_indicadores_backlog': (
+        f"""
+        SELECT status, tipo,
+               COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE status = 'pendente' AND data_prevista < now()) AS vencidas,
+               now() AS atualizado_em
+        FROM ({ORDENS_VIVAS_E_ARQUIVADAS}) ordens
+        GROUP BY status, tipo
+        """,
+        ['status', 'tipo'],
+    ),
+    'mv_indicadores_ativos': (
+        f"""
+        SELECT a.id AS ativo_id, a.nome, a.mtbf, a.mttr,
+               COUNT(o.id) FILTER (WHERE o.status = 'pendente') AS pendentes,
+               COUNT(o.id) FILTER (WHERE o.status = 'pendente' AND o.data_prevista < now()) AS vencidas,
+               COUNT(o.id) FILTER (WHERE o.tipo = 'corretiva' AND o.data_criacao >= now() - interval '365 days') AS corretivas_12m,
+               now() AS atualizado_em
+        FROM api_ativo a
+        LEFT JOIN ({ORDENS_VIVAS_E_ARQUIVADAS}) o ON o.ativo_id = a.id
+        GROUP BY a.id, a.nome, a.mtbf, a.mttr
+        """,
+        ['ativo_id'],
+    ),
+    'mv_indicadores_frota': (
+        """
+        SELECT 1 AS id,
+               COUNT(*) AS ativos,
+               AVG(mtbf) FILTER (WHERE mtbf > 0) AS mtbf_media,
+               percentile_cont(0.1) WITHIN GROUP (ORDER BY mtbf) FILTER (WHERE mtbf > 0) AS mtbf_p10,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY mtbf) FILTER (WHERE mtbf > 0) AS mtbf_p50,
+               percentile_cont(0.9) WITHIN GROUP (ORDER BY mtbf) FILTER (WHERE mtbf > 0) AS mtbf_p90,
+               AVG(mttr) FILTER (WHERE mttr > 0) AS mttr_media,
+               percentile_cont(0.1) WITHIN GROUP (ORDER BY mttr) FILTER (WHERE mttr > 0) AS mttr_p10,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY mttr) FILTER (WHERE mttr > 0) AS mttr_p50,
+               percentile_cont(0.9) WITHIN GROUP (ORDER BY mttr) FILTER (WHERE mttr > 0) AS mttr_p90,
+               now() AS atualizado_em
+        FROM api_ativo
+        """,
+        ['id'],
+    ),
+    'mv_indicadores_tecnicos': (
+        f"""
+        SELECT u.id AS tecnico_id, u.username,
+               COUNT(*) AS atribuidas,
+               COUNT(*) FILTER (WHERE o.status = 'finalizada') AS finalizadas,
+               COUNT(*) FILTER (WHERE o.status = 'pendente' AND o.data_prevista < now()) AS vencidas,
+               COUNT(*) FILTER (WHERE o.status = 'finalizada')::float / COUNT(*) AS taxa_conclusao,
+               now() AS atualizado_em
+        FROM ({ORDENS_VIVAS_E_ARQUIVADAS}) o
+        JOIN api_customuser u ON u.id = o.tecnico_id
+        GROUP BY u.id, u.username
+        """,
+        ['tecnico_id'],
+    ),
+}
+
+
+def sql_criar_views():
+    comandos = []
+    for nome, (consulta, chave) in VIEWS.items():
+        comandos.append(f"CREATE MATERIALIZED VIEW {nome} AS {consulta} WITH DATA")
+        comandos.append(f"CREATE UNIQUE INDEX {nome}_chave ON {nome} ({', '.join(chave)})")
+    return comandos
+
+
+def sql_remover_views():
+    return [f"DROP MATERIALIZED VIEW IF EXISTS {nome}" for nome in VIEWS]
+
+
+def recriar_views():
+    with connection.cursor() as cursor:
+        for sql in sql_remover_views() + sql_criar_views():
+            cursor.execute(sql)
+
+
+def atualizar(concorrente=True):
+    """ Atualiza todas as views. Devolve [(nome, segundos)]. """
+    tempos = []
+    with connection.cursor() as cursor:
+        for nome in VIEWS:
+            inicio = timezone.now()
+            cursor.execute(f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concorrente else ''}{nome}")
+            tempos.append((nome, (timezone.now() - inicio).total_seconds()))
+    return tempos
+
+
+"""
+================================ BLOCO 2 — Leitura ================================
+`indicadores(piores=N)` monta a resposta do endpoint com quatro SELECTs simples sobre as
+views (já agregadas e pequenas). `atualizado_em` é o cálculo mais antigo entre elas.
+====================================================================================
+"""
+def _linhas(cursor, sql, params=None):
+    cursor.execute(sql, params)
+    colunas = [coluna[0] for coluna in cursor.description]
+    return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+
+
+def indicadores(piores=10):
+    with connection.cursor() as cursor:
+        backlog = _linhas(cursor, "SELECT * FROM mv_indicadores_backlog ORDER BY status, tipo")
+        frota = _linhas(cursor, "SELECT * FROM mv_indicadores_frota")
+        piores_ativos = _linhas(
+            cursor,
+            "SELECT * FROM mv_indicadores_ativos ORDER BY vencidas DESC, corretivas_12m DESC, "
+            "NULLIF(mtbf, 0) ASC NULLS LAST LIMIT %s",
+            [piores],
+        )
+        tecnicos = _linhas(cursor, "SELECT * FROM mv_indicadores_tecnicos ORDER BY taxa_conclusao, vencidas DESC")
+
+    instantes = [linha.pop('atualizado_em') for grupo in (backlog, frota, piores_ativos, tecnicos) for linha in grupo]
+    atualizado_em = min(instantes) if instantes else None
+    frota = frota[0] if frota else {}
+    frota.pop('id', None)
+
+    return {
+        'atualizado_em': atualizado_em,
+        'defasagem_segundos': round((timezone.now() - atualizado_em).total_seconds()) if atualizado_em else None,
+        'backlog': backlog,
+        'vencidas': sum(linha['vencidas'] for linha in backlog),
+        'frota': frota,
+        'piores_ativos': piores_ativos,
+        'tecnicos': tecnicos,
+    }
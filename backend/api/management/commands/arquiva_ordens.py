@@ -0,0 +1,78 @@
+# api/management/commands/arquiva_ordens.py
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from api.historico import arquivar_lote, contar_candidatos, corte_arquivamento
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Move as O.S. finalizadas criadas há mais de --dias dias (e as suas manutenções) para o arquivo morto "
+        "(OrdemServicoArquivo / ManutencaoArquivo), em lotes de --lote O.S., cada um numa transação curta.\n"
+        "O histórico dos ativos e os comandos de métricas continuam a ler as O.S. arquivadas.\n"
+        "Por padrão grava no banco; use --dry-run para apenas contar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Conta as O.S. que seriam arquivadas, sem mover nada.'
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=settings.ARCHIVE_FINALIZED_AFTER_DAYS,
+            help='Idade mínima (dias desde a criação) das O.S. a arquivar (padrão: settings.ARCHIVE_FINALIZED_AFTER_DAYS).'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=settings.ARCHIVE_BATCH_SIZE,
+            help='O.S. movidas por transação (padrão: settings.ARCHIVE_BATCH_SIZE).'
+        )
+        parser.add_argument(
+            '--max-lotes',
+            type=int,
+            help='Para depois deste número de lotes (opcional; útil para limitar a janela de execução).'
+        )
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            default=0.0,
+            help='Segundos de espera entre lotes, para aliviar o banco e as réplicas (padrão: 0).'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        agora = timezone.now()
+        corte = corte_arquivamento(options['dias'], agora)
+
+        self.stdout.write(self.style.NOTICE(f'Iniciando arquivamento das O.S. finalizadas criadas antes de {corte} - {agora}'))
+        if dry_run:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhuma alteração será persistida.'))
+            self.stdout.write(f'O.S. a arquivar: {contar_candidatos(corte)}.')
+            return
+
+        lotes = 0
+        total_ordens = 0
+        total_manutencoes = 0
+        while options.get('max_lotes') is None or lotes < options['max_lotes']:
+            ordens, manutencoes = arquivar_lote(corte, options['lote'], agora)
+            if ordens == 0:
+                break
+            lotes += 1
+            total_ordens += ordens
+            total_manutencoes += manutencoes
+            self.stdout.write(f'Lote {lotes}: {ordens} O.S. e {manutencoes} manutenções arquivadas.')
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        duration = timezone.now() - agora
+        self.stdout.write(self.style.SUCCESS(
+            f'-------------- Concluído. -------------- \nLotes: {lotes}. \nO.S. arquivadas: {total_ordens}.'
+            f'\nManutenções arquivadas: {total_manutencoes}. \nDuração: {duration}.'
+        ))
@@ -0,0 +1,103 @@
+# api/management/commands/atribui_tecnicos.py
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from api.atribuicao import atribuir, carregar_paradas, carregar_tecnicos, gravar
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Atribui as O.S. pendentes e sem técnico de um dia aos técnicos ativos mais próximos.\n"
+        "O custo é a distância em linha reta da localizacao_base do técnico até o Ativo; cada técnico recebe "
+        "até capacidade_diaria O.S. no dia (padrão: settings.ASSIGNMENT_DEFAULT_CAPACITY), contando as que já "
+        "tem. Só os --candidatos técnicos mais próximos de cada Ativo são avaliados (índice espacial); a "
+        "escolha é gulosa por arrependimento, seguida de passadas de reparo (mover/trocar paradas).\n"
+        "Rode antes do planeja_rotas. Por padrão grava no banco; utilize --dry-run para simular."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Calcula a atribuição mas NÃO grava nada no banco.'
+        )
+        parser.add_argument(
+            '--data',
+            type=str,
+            help='Dia a atribuir no formato AAAA-MM-DD (padrão: hoje).'
+        )
+        parser.add_argument(
+            '--candidatos',
+            type=int,
+            default=settings.ASSIGNMENT_CANDIDATES,
+            help='Técnicos mais próximos considerados por Ativo (padrão: settings.ASSIGNMENT_CANDIDATES).'
+        )
+        parser.add_argument(
+            '--raio-max',
+            type=float,
+            default=settings.ASSIGNMENT_MAX_DISTANCE_M,
+            help='Distância máxima da base do técnico até o Ativo, em metros; 0 = sem limite '
+                 '(padrão: settings.ASSIGNMENT_MAX_DISTANCE_M).'
+        )
+        parser.add_argument(
+            '--detalhar',
+            action='store_true',
+            help='Lista as O.S. atribuídas a cada técnico.'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        try:
+            dia = datetime.date.fromisoformat(options['data']) if options.get('data') else timezone.localdate()
+        except ValueError:
+            raise CommandError('Data inválida; use o formato AAAA-MM-DD.')
+        if options['candidatos'] <= 0 or options['raio_max'] < 0:
+            raise CommandError('--candidatos deve ser maior que zero e --raio-max não pode ser negativo.')
+
+        started = timezone.now()
+        self.stdout.write(self.style.NOTICE(f'Iniciando atribuição das O.S. de {dia} - {started}'))
+        if dry_run:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhuma alteração será persistida.'))
+
+        inicio = time.perf_counter()
+        paradas = carregar_paradas(dia, options['candidatos'], options['raio_max'])
+        tecnicos = carregar_tecnicos(dia)
+        duracao_carga = time.perf_counter() - inicio
+        total_ordens = sum(len(parada['ordens']) for parada in paradas)
+        self.stdout.write(
+            f'{total_ordens} O.S. sem técnico em {len(paradas)} Ativo(s); {len(tecnicos)} técnico(s) com base, '
+            f'folga total {sum(t["folga"] for t in tecnicos.values())}; carga em {duracao_carga:.2f}s.'
+        )
+
+        inicio = time.perf_counter()
+        resultado = atribuir(paradas, tecnicos, distancia_maxima=options['raio_max'])
+        duracao_atribuicao = time.perf_counter() - inicio
+
+        for tecnico_id, ordem_ids in sorted(resultado['atribuidas'].items()):
+            if options['detalhar']:
+                self.stdout.write(f'{"[DRY-RUN] " if dry_run else ""}Técnico {tecnico_id}: {len(ordem_ids)} O.S. {ordem_ids}')
+        if resultado['sem_tecnico']:
+            self.stdout.write(self.style.WARNING(
+                f'{len(resultado["sem_tecnico"])} O.S. sem técnico (capacidade esgotada ou nenhum técnico no raio): '
+                f'{resultado["sem_tecnico"][:20]}'
+                + (' ...' if len(resultado['sem_tecnico']) > 20 else '')
+            ))
+
+        atribuidas = sum(len(ordem_ids) for ordem_ids in resultado['atribuidas'].values())
+        gravadas = atribuidas if dry_run else gravar(resultado['atribuidas'])
+        if gravadas < atribuidas:
+            self.stdout.write(self.style.WARNING(
+                f'{atribuidas - gravadas} O.S. mudaram durante o cálculo (concluídas ou atribuídas à mão) e foram mantidas.'
+            ))
+
+        duration = timezone.now() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'-------------- Concluído. -------------- \nO.S. {"simuladas" if dry_run else "atribuídas"}: {gravadas} '
+            f'para {len(resultado["atribuidas"])} técnico(s). \nDistância total: ~{resultado["distancia_total"] / 1000:.1f} km. '
+            f'\nAtribuição em {duracao_atribuicao:.2f}s. \nDuração: {duration}.'
+        ))
@@ -0,0 +1,39 @@
+# api/management/commands/atualiza_indicadores.py
+from django.utils import timezone
+
+from api.indicadores import atualizar, recriar_views
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Atualiza as materialized views do painel de indicadores (/api/indicadores/) com "
+        "REFRESH MATERIALIZED VIEW CONCURRENTLY, sem bloquear as leituras. Agende (ex.: cron a cada 5 minutos).\n"
+        "Use --recriar para apagar e recriar as views (ex.: depois de `particiona_historico --converter`)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recriar',
+            action='store_true',
+            help='Apaga e recria as views a partir do SQL de api/indicadores.py.'
+        )
+        parser.add_argument(
+            '--sem-concorrencia',
+            action='store_true',
+            help='REFRESH sem CONCURRENTLY (mais rápido, mas bloqueia as leituras durante a atualização).'
+        )
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        self.stdout.write(self.style.NOTICE(f'Iniciando atualização dos indicadores - {started}'))
+
+        if options['recriar']:
+            recriar_views()
+            self.stdout.write(self.style.SUCCESS('Views recriadas.'))
+        else:
+            for nome, segundos in atualizar(concorrente=not options['sem_concorrencia']):
+                self.stdout.write(f'{nome}: {segundos:.2f}s')
+
+        duration = timezone.now() - started
+        self.stdout.write(self.style.SUCCESS(f'-------------- Concluído em {duration}. --------------'))
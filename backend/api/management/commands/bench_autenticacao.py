@@ -0,0 +1,57 @@
+# api/management/commands/bench_autenticacao.py
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.autenticacao import CachedTokenAuthentication, invalidar
+from api.bench import resumo_latencias, formatar_resumo
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o TokenAuthentication do DRF com o CachedTokenAuthentication (api/autenticacao.py).\n"
+        "Cria um usuário (nome aleatório, sem colidir com usuários reais) e um token temporários dentro de uma transação que é desfeita no fim, "
+        "autentica --pedidos vezes com cada classe e mostra latências e queries por pedido."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=5000, help='Autenticações por classe (padrão: 5000).')
+
+    def handle(self, *args, **options):
+        pedidos = options['pedidos']
+
+        with transaction.atomic():
+            usuario = get_user_model().objects.create_user(
+                username=f'bench_autenticacao_{uuid.uuid4().hex[:12]}', password=None,
+            )
+            token = Token.objects.create(user=usuario)
+            request = RequestFactory().get('/api/ativos/', HTTP_AUTHORIZATION=f'Token {token.key}')
+
+            for nome, classe in (('TokenAuthentication      ', TokenAuthentication),
+                                 ('CachedTokenAuthentication', CachedTokenAuthentication)):
+                invalidar(token.key)
+                resumo, queries = self._medir(classe(), request, pedidos)
+                self.stdout.write(f'{formatar_resumo(nome, resumo)} queries/pedido={queries / pedidos:.3f}')
+
+            invalidar(token.key)
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Concluído. Usuário e token temporários descartados.'))
+
+    def _medir(self, autenticador, request, pedidos):
+        latencias = []
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            for _ in range(pedidos):
+                antes = time.perf_counter()
+                autenticador.authenticate(request)
+                latencias.append(time.perf_counter() - antes)
+            duracao = time.perf_counter() - inicio
+        return resumo_latencias(latencias, duracao), len(capturadas.captured_queries)
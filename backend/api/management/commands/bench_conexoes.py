@@ -0,0 +1,166 @@
+# api/management/commands/bench_conexoes.py
+import platform
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.utils import ConnectionHandler
+from django.utils import timezone
+
+from api.bench import commit_atual, formatar_resumo, gravar_resultados, resumo_latencias
+
+MODOS = ('por_pedido', 'persistente', 'pool')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara as formas de conexão ao banco do core/settings_producao.py sob uma rajada de pedidos:\n"
+        "  por_pedido  → uma conexão nova por pedido (core/settings.py, CONN_MAX_AGE=0);\n"
+        "  persistente → conexão por thread reaproveitada (CONN_MAX_AGE + CONN_HEALTH_CHECKS);\n"
+        "  pool        → pool do psycopg 3 com --pool-max conexões (exige psycopg[pool]).\n"
+        "--threads threads simulam os workers; cada uma faz --pedidos ciclos de pedido (abrir/pegar a "
+        "conexão, rodar --sql, devolver como no request_finished). Mostra latências por pedido, erros "
+        "(ex.: too many connections, timeout do pool) e o pico de conexões abertas no Postgres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modos', type=str, default=','.join(MODOS), help=f'Modos a medir (padrão: {",".join(MODOS)}).')
+        parser.add_argument('--threads', type=int, default=20, help='Pedidos simultâneos (padrão: 20).')
+        parser.add_argument('--pedidos', type=int, default=200, help='Pedidos por thread (padrão: 200).')
+        parser.add_argument('--pool-max', type=int, default=10, help='max_size do pool no modo pool (padrão: 10).')
+        parser.add_argument('--pool-timeout', type=float, default=10, help='Espera máxima por uma conexão do pool, em segundos (padrão: 10).')
+        parser.add_argument(
+            '--sql',
+            type=str,
+            default='SELECT id, nome FROM api_ativo ORDER BY id LIMIT 20',
+            help='Query de cada pedido (padrão: 20 Ativos, como uma página pequena da API).'
+        )
+        parser.add_argument('--saida', type=str, help='Grava os resultados em JSON neste arquivo (opcional).')
+
+    def handle(self, *args, **options):
+        modos = [modo.strip() for modo in options['modos'].split(',') if modo.strip()]
+        desconhecidos = set(modos) - set(MODOS)
+        if desconhecidos:
+            raise CommandError(f'Modo(s) desconhecido(s): {", ".join(sorted(desconhecidos))}; use {", ".join(MODOS)}.')
+        if options['threads'] <= 0 or options['pedidos'] <= 0:
+            raise CommandError('--threads e --pedidos devem ser maiores que zero.')
+        if 'pool' in modos and not self._pool_disponivel():
+            self.stdout.write(self.style.WARNING('psycopg 3 com psycopg_pool não instalado: modo pool ignorado.'))
+            modos.remove('pool')
+
+        self.stdout.write(self.style.NOTICE(
+            f'{options["threads"]} thread(s) × {options["pedidos"]} pedido(s) por modo; SQL: {options["sql"]}'
+        ))
+        commit, _ = commit_atual()
+        resultados = {
+            'commit': commit,
+            'data': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'threads': options['threads'],
+            'pedidos': options['pedidos'],
+            'sql': options['sql'],
+            'modos': {},
+        }
+        for modo in modos:
+            resumo = self._medir(modo, options)
+            resultados['modos'][modo] = resumo
+            linha = (
+                f'{formatar_resumo(f"{modo:<11}", resumo)} erros={resumo["erros"]} '
+                f'conexoes_pico={resumo["conexoes_pico"]} conexoes_abertas={resumo["conexoes_abertas"]}'
+            )
+            self.stdout.write(self.style.WARNING(linha) if resumo['erros'] else linha)
+
+        if options.get('saida'):
+            gravar_resultados(options['saida'], resultados)
+            self.stdout.write(f'Resultados gravados em {options["saida"]}.')
+        self.stdout.write(self.style.SUCCESS('Concluído.'))
+
+    def _pool_disponivel(self):
+        try:
+            import psycopg_pool  # noqa: F401
+            from django.db.backends.postgresql.psycopg_any import is_psycopg3
+        except ImportError:
+            return False
+        return is_psycopg3
+
+    def _config(self, modo, options):
+        base = settings.DATABASES['default']
+        opcoes = {chave: valor for chave, valor in base.get('OPTIONS', {}).items() if chave != 'pool'}
+        # Identifica as conexões do modo no pg_stat_activity
+        opcoes['application_name'] = f'bench_conexoes_{modo}'
+        banco = dict(base, OPTIONS=opcoes, CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+        if modo == 'persistente':
+            banco.update(CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True)
+        elif modo == 'pool':
+            opcoes['pool'] = {'min_size': 1, 'max_size': options['pool_max'], 'timeout': options['pool_timeout']}
+        return banco
+
+    def _medir(self, modo, options):
+        # Alias próprio por modo: o Django guarda os pools por alias ('default' é exigido, mas não é usado)
+        alias = f'bench_conexoes_{modo}'
+        handler = ConnectionHandler({'default': settings.DATABASES['default'], alias: self._config(modo, options)})
+        latencias = []
+        erros = []
+        trava = threading.Lock()
+        picos = []
+        parar = threading.Event()
+
+        def pedido_simulado(conexao):
+            # O que acontece num pedido: close_old_connections no request_started e no request_finished
+            conexao.close_if_unusable_or_obsolete()
+            try:
+                with conexao.cursor() as cursor:
+                    cursor.execute(options['sql'])
+                    cursor.fetchall()
+            finally:
+                conexao.close_if_unusable_or_obsolete()
+
+        def worker():
+            conexao = handler[alias]
+            for _ in range(options['pedidos']):
+                antes = time.perf_counter()
+                try:
+                    pedido_simulado(conexao)
+                except DatabaseError as e:
+                    with trava:
+                        erros.append(str(e).splitlines()[0] if str(e) else type(e).__name__)
+                    continue
+                with trava:
+                    latencias.append(time.perf_counter() - antes)
+            conexao.close()
+
+        def observar():
+            # Conta as conexões do modo no servidor enquanto os workers rodam
+            while not parar.wait(0.05):
+                picos.append(self._conexoes_abertas(alias))
+            connection.close()
+
+        observador = threading.Thread(target=observar, daemon=True)
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(options['threads'])]
+        observador.start()
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+        parar.set()
+        observador.join()
+
+        resumo = resumo_latencias(latencias, duracao)
+        resumo['erros'] = len(erros)
+        resumo['conexoes_pico'] = max(picos, default=0)
+        # Depois do teste: o pool continua com as suas conexões até close_pool
+        resumo['conexoes_abertas'] = self._conexoes_abertas(alias)
+        if erros:
+            resumo['exemplo_erro'] = erros[0]
+        if modo == 'pool':
+            handler[alias].close_pool()
+        return resumo
+
+    def _conexoes_abertas(self, application_name):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE application_name = %s', [application_name])
+            return cursor.fetchone()[0]
@@ -0,0 +1,97 @@
+# api/management/commands/bench_rota_async.py
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import Client, AsyncClient, override_settings
+
+from api import upstream
+from api.bench import resumo_latencias, formatar_resumo
+from api.fake_directions import FakeDirectionsServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o proxy de rotas síncrono (/api/get-route/) com o assíncrono (/api/get-route-async/) "
+        "contra um servidor local que imita a Google Directions com latência configurável.\n"
+        "O modo síncrono simula um processo WSGI com --threads threads; o assíncrono usa um único "
+        "event loop, como um processo ASGI. Nenhuma chamada sai para a rede."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=500, help='Total de pedidos de rota por modo (padrão: 500).')
+        parser.add_argument('--concorrencia', type=int, default=200, help='Pedidos simultâneos em voo (padrão: 200).')
+        parser.add_argument('--threads', type=int, default=8, help='Threads do worker WSGI simulado (padrão: 8).')
+        parser.add_argument('--latencia', type=float, default=0.2, help='Latência simulada da Google em segundos (padrão: 0.2).')
+        parser.add_argument('--apenas', choices=['sync', 'async'], help='Executa só um dos modos (opcional).')
+
+    def handle(self, *args, **options):
+        pedidos = options['pedidos']
+        concorrencia = options['concorrencia']
+        threads = options['threads']
+        apenas = options.get('apenas')
+
+        servidor = FakeDirectionsServer(latencia=options['latencia'])
+        url = servidor.iniciar_em_thread()
+        self.stdout.write(self.style.NOTICE(f'Servidor Directions simulado em {url} (latência {options["latencia"]}s)'))
+
+        corpo = {
+            'start_lat': -23.5505, 'start_lng': -46.6333,
+            'waypoints': [{'lat': -23.56, 'lng': -46.64}, {'lat': -23.57, 'lng': -46.65}],
+        }
+
+        try:
+            # Pool maior que o número de pedidos em voo, para não medir a espera por conexão
+            with override_settings(
+                GOOGLE_DIRECTIONS_URL=url,
+                UPSTREAM_POOL_MAXSIZE=max(threads, concorrencia),
+                UPSTREAM_ASYNC_MAX_CONNECTIONS=concorrencia,
+            ):
+                upstream.circuit_breaker.registrar_sucesso()
+
+                if apenas in (None, 'sync'):
+                    upstream._session = None
+                    resumo = self._medir_sync(corpo, pedidos, threads)
+                    self.stdout.write(formatar_resumo(f'sync  (WSGI, {threads} threads)', resumo))
+
+                if apenas in (None, 'async'):
+                    resumo = asyncio.run(self._medir_async(corpo, pedidos, concorrencia))
+                    self.stdout.write(formatar_resumo(f'async (ASGI, {concorrencia} em voo)', resumo))
+        finally:
+            upstream._session = None
+            servidor.parar()
+
+        self.stdout.write(self.style.SUCCESS(f'Concluído. Pedidos atendidos pelo servidor simulado: {servidor.pedidos_atendidos}.'))
+
+    def _medir_sync(self, corpo, pedidos, threads):
+        # A latência conta desde a chegada do pedido, incluindo a espera por uma thread livre
+        def _um_pedido(chegada):
+            resposta = Client().post('/api/get-route/', corpo, content_type='application/json')
+            if resposta.status_code != 200:
+                raise RuntimeError(f'Resposta inesperada do proxy síncrono: {resposta.status_code}')
+            return time.perf_counter() - chegada
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            futuros = [executor.submit(_um_pedido, time.perf_counter()) for _ in range(pedidos)]
+            latencias = [f.result() for f in futuros]
+        return resumo_latencias(latencias, time.perf_counter() - inicio)
+
+    async def _medir_async(self, corpo, pedidos, concorrencia):
+        cliente = AsyncClient()
+        semaforo = asyncio.Semaphore(concorrencia)
+
+        async def _um_pedido():
+            chegada = time.perf_counter()
+            async with semaforo:
+                resposta = await cliente.post('/api/get-route-async/', corpo, content_type='application/json')
+            if resposta.status_code != 200:
+                raise RuntimeError(f'Resposta inesperada do proxy assíncrono: {resposta.status_code}')
+            return time.perf_counter() - chegada
+
+        inicio = time.perf_counter()
+        latencias = await asyncio.gather(*[_um_pedido() for _ in range(pedidos)])
+        resumo = resumo_latencias(latencias, time.perf_counter() - inicio)
+        await upstream.get_cliente_async().aclose()
+        return resumo
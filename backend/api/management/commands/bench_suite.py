@@ -0,0 +1,232 @@
+# api/management/commands/bench_suite.py
+import datetime
+import io
+import os
+import platform
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.test import Client
+from django.utils import timezone
+
+from api.bench import commit_atual, comparar, gravar_resultados, ler_resultados, medir
+from api.dados_sinteticos import PREFIXO_SEED, gerar
+from api.models import Ativo, OrdemServico
+from api.serializers import AtivoSerializer, OrdemServicoSerializer
+from api.views import AtivoViewSet, OrdemServicoViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Suíte de benchmarks dos comandos (calcula_mtbf, calcula_mttr, os_preventiva, os_preditiva, atribui_tecnicos), dos endpoints "
+        "(listagens, histórico do Ativo, finalizar O.S.) e dos serializers, em várias escalas de dados.\n"
+        "Cada escala gera dados sintéticos (api/dados_sinteticos.py) numa transação desfeita no fim; cada "
+        "repetição que grava roda num savepoint também desfeito. Mostra latências e queries por execução "
+        "e grava o resultado em JSON (identificado pelo commit) para comparar com --comparar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escalas',
+            type=str,
+            default='100x2000,1000x20000,5000x100000',
+            help='Escalas ATIVOSxORDENS separadas por vírgula (padrão: 100x2000,1000x20000,5000x100000).'
+        )
+        parser.add_argument('--repeticoes', type=int, default=5, help='Repetições de cada caso (padrão: 5).')
+        parser.add_argument('--semente', type=int, default=42, help='Semente dos dados gerados (padrão: 42).')
+        parser.add_argument(
+            '--referencia',
+            type=str,
+            default='2025-01-01',
+            help='Data (AAAA-MM-DD) de referência dos dados gerados (padrão: 2025-01-01, fixa entre commits).'
+        )
+        parser.add_argument(
+            '--casos',
+            type=str,
+            help='Roda só os casos cujo nome contém um destes textos (separados por vírgula).'
+        )
+        parser.add_argument(
+            '--saida',
+            type=str,
+            help='Arquivo JSON dos resultados (padrão: BENCH_RESULTS_DIR/<commit>.json).'
+        )
+        parser.add_argument(
+            '--comparar',
+            type=str,
+            help='JSON de uma execução anterior para comparar com esta.'
+        )
+
+    def handle(self, *args, **options):
+        escalas = self._escalas(options['escalas'])
+        repeticoes = options['repeticoes']
+        if repeticoes <= 0:
+            raise CommandError('--repeticoes deve ser maior que zero.')
+        try:
+            data = datetime.date.fromisoformat(options['referencia'])
+        except ValueError:
+            raise CommandError('--referencia deve estar no formato AAAA-MM-DD.')
+        referencia = timezone.make_aware(datetime.datetime.combine(data, datetime.time()))
+        filtros = [texto.strip() for texto in (options.get('casos') or '').split(',') if texto.strip()]
+
+        anterior = None
+        if options.get('comparar'):
+            try:
+                anterior = ler_resultados(options['comparar'])
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Não foi possível ler {options["comparar"]}: {e}')
+
+        if Ativo.objects.filter(nome__startswith=PREFIXO_SEED).exists():
+            raise CommandError('O banco tem dados de seed_dados; apague-os antes com `seed_dados --so-limpar`.')
+        if Ativo.objects.exists():
+            self.stdout.write(self.style.WARNING(
+                'O banco já tem Ativos: os dados gerados somam-se a eles e os números não são comparáveis '
+                'com os de um banco vazio.'
+            ))
+
+        commit, alteracoes = commit_atual()
+        resultados = {
+            'commit': commit,
+            'alteracoes_locais': alteracoes,
+            'data': timezone.now().isoformat(),
+            'semente': options['semente'],
+            'referencia': options['referencia'],
+            'repeticoes': repeticoes,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'escalas': {},
+        }
+
+        for ativos, ordens in escalas:
+            escala = f'{ativos}x{ordens}'
+            self.stdout.write(self.style.NOTICE(f'Escala {escala}: gerando dados...'))
+            with transaction.atomic():
+                gerar(ativos=ativos, ordens=ordens, tecnicos=max(1, ativos // 50),
+                      semente=options['semente'], referencia=referencia)
+                resultados['escalas'][escala] = {}
+                for nome, funcao, preparar in self._casos(repeticoes):
+                    if filtros and not any(texto in nome for texto in filtros):
+                        continue
+                    resumo = medir(funcao, repeticoes, preparar)
+                    resultados['escalas'][escala][nome] = resumo
+                    self.stdout.write(
+                        f'  {nome:<28} p50={resumo["p50"] * 1000:9.1f}ms p95={resumo["p95"] * 1000:9.1f}ms '
+                        f'max={resumo["max"] * 1000:9.1f}ms queries={resumo["queries"]:.1f}'
+                    )
+                transaction.set_rollback(True)
+
+        saida = options.get('saida') or os.path.join(
+            settings.BENCH_RESULTS_DIR, f'{(commit or "sem_git")[:12]}{"-alterado" if alteracoes else ""}.json'
+        )
+        gravar_resultados(saida, resultados)
+        self.stdout.write(self.style.SUCCESS(f'Resultados gravados em {saida}. Dados gerados descartados.'))
+
+        if anterior is not None:
+            self._mostrar_comparacao(anterior, resultados)
+
+    def _escalas(self, texto):
+        escalas = []
+        for parte in texto.split(','):
+            try:
+                ativos, ordens = (int(valor) for valor in parte.lower().split('x'))
+            except ValueError:
+                raise CommandError(f'Escala inválida "{parte}"; use ATIVOSxORDENS, ex.: 1000x20000.')
+            if ativos <= 0 or ordens <= 0:
+                raise CommandError(f'Escala inválida "{parte}": os números devem ser maiores que zero.')
+            escalas.append((ativos, ordens))
+        return escalas
+
+    # Casos: (nome, funcao(contexto), preparar(indice) ou None). Os que gravam no banco rodam
+    # num savepoint desfeito, para que todas as repetições partam dos mesmos dados.
+    def _casos(self, repeticoes):
+        cliente = Client()
+        gerados = Ativo.objects.filter(nome__startswith=PREFIXO_SEED)
+        # Histórico do Ativo com mais O.S. finalizadas: o pior caso da escala
+        ativo_historico = gerados.annotate(
+            finalizadas=Count('ordens_servico', filter=Q(ordens_servico__status='finalizada')),
+        ).order_by('-finalizadas', 'pk').values_list('pk', flat=True).first()
+        # Uma O.S. pendente diferente por repetição (o savepoint desfaz a finalização)
+        pendentes = list(
+            OrdemServico.objects.filter(ativo__in=gerados, status='pendente')
+            .order_by('pk').values_list('pk', flat=True)[:repeticoes]
+        )
+
+        # Dia com mais O.S. pendentes: o caso atribui_tecnicos tira-lhes o técnico e atribui de novo
+        dia_atribuicao = (
+            OrdemServico.objects.filter(ativo__in=gerados, status='pendente')
+            .annotate(dia=TruncDate('data_prevista')).values('dia')
+            .annotate(total=Count('id')).order_by('-total', 'dia').values_list('dia', flat=True).first()
+        )
+
+        def desfeito(funcao):
+            def executar(contexto):
+                with transaction.atomic():
+                    funcao(contexto)
+                    transaction.set_rollback(True)
+            return executar
+
+        def comando(nome):
+            return desfeito(lambda contexto: call_command(nome, stdout=io.StringIO(), stderr=io.StringIO()))
+
+        def get(url):
+            def executar(contexto):
+                resposta = cliente.get(url)
+                if resposta.status_code != 200:
+                    raise CommandError(f'GET {url} devolveu {resposta.status_code}.')
+            return executar
+
+        def finalizar(ordem_id):
+            resposta = cliente.post(
+                f'/api/ordens-servico/{ordem_id}/finalizar/',
+                {'data_inicio_execucao': '2024-12-30T08:00:00Z', 'data_fim_execucao': '2024-12-30T10:30:00Z'},
+                content_type='application/json',
+            )
+            if resposta.status_code != 200:
+                raise CommandError(f'Finalizar a O.S. {ordem_id} devolveu {resposta.status_code}.')
+
+        def atribuir(contexto):
+            OrdemServico.objects.filter(ativo__in=gerados, status='pendente', data_prevista__date=dia_atribuicao).update(tecnico=None)
+            call_command('atribui_tecnicos', data=dia_atribuicao.isoformat(), stdout=io.StringIO(), stderr=io.StringIO())
+
+        casos = [
+            ('comando.calcula_mtbf', comando('calcula_mtbf'), None),
+            ('comando.calcula_mttr', comando('calcula_mttr'), None),
+            ('comando.os_preventiva', comando('os_preventiva'), None),
+            ('comando.os_preditiva', comando('os_preditiva'), None),
+            ('endpoint.ativos_lista', get('/api/ativos/'), None),
+            ('endpoint.ordens_lista', get('/api/ordens-servico/'), None),
+        ]
+        if dia_atribuicao is not None:
+            casos.append(('comando.atribui_tecnicos', desfeito(atribuir), None))
+        if ativo_historico is not None:
+            casos.append(('endpoint.ativo_historico', get(f'/api/ativos/{ativo_historico}/historico/'), None))
+        if len(pendentes) == repeticoes:
+            casos.append(('endpoint.ordem_finalizar', desfeito(finalizar), lambda indice: pendentes[indice]))
+        else:
+            self.stdout.write(self.style.WARNING('  Poucas O.S. pendentes nesta escala: endpoint.ordem_finalizar pulado.'))
+        casos += [
+            ('serializer.ativos', lambda contexto: AtivoSerializer(AtivoViewSet.queryset.all(), many=True).data, None),
+            ('serializer.ordens', lambda contexto: OrdemServicoSerializer(OrdemServicoViewSet.queryset.all(), many=True).data, None),
+        ]
+        return casos
+
+    def _mostrar_comparacao(self, anterior, atual):
+        self.stdout.write(self.style.NOTICE(
+            f'Comparação com {(anterior.get("commit") or "?")[:12]} (p50 e queries por execução):'
+        ))
+        for escala, caso, antes, depois in comparar(anterior, atual):
+            variacao = (depois['p50'] / antes['p50'] - 1) * 100 if antes['p50'] else 0.0
+            linha = (
+                f'  {escala:<14} {caso:<28} {antes["p50"] * 1000:9.1f}ms → {depois["p50"] * 1000:9.1f}ms '
+                f'({variacao:+6.1f}%)  queries {antes["queries"]:.1f} → {depois["queries"]:.1f}'
+            )
+            if variacao > 10 or depois['queries'] > antes['queries']:
+                self.stdout.write(self.style.WARNING(linha))
+            elif variacao < -10 or depois['queries'] < antes['queries']:
+                self.stdout.write(self.style.SUCCESS(linha))
+            else:
+                self.stdout.write(linha)
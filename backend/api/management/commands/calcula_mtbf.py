@@ -1,14 +1,16 @@
 # api/management/commands/calcula_mtbf.py
-from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
 import datetime
 import math
 
-from api.models import Ativo, OrdemServico, Manutencao
+from api.models import Ativo
+from api.historico import ordens_do_ativo, manutencao_de
+from api.agendador import relatar_progresso
+from api.metricas import ComandoMedido
 
 
-class Command(BaseCommand):
+class Command(ComandoMedido):
     help = (
         "Calcula e atualiza o MTBF (em minutos) de cada Ativo usando EXCLUSIVAMENTE "
         "o intervalo Manutencao.data_fim_execucao -> OrdemServico.data_criacao (próxima OS corretiva).\n"
@@ -53,12 +55,14 @@ class Command(BaseCommand):
         total_sem_alteracao = 0
         erros = 0
 
+        total_ativos = ativos_qs.count()
         for ativo in ativos_qs:
             total_processados += 1
+            relatar_progresso(self, total_processados, total_ativos)
             try:
-                # pegar ordens do tipo corretiva ordenadas por criação
-                ordens_corretivas = ativo.ordens_servico.filter(tipo__iexact=tipo_filter).order_by('data_criacao')
-                n_failures = ordens_corretivas.count()
+                # pegar ordens do tipo corretiva (vivas e arquivadas) ordenadas por criação
+                ordens_list = ordens_do_ativo(ativo.id, tipo__iexact=tipo_filter)
+                n_failures = len(ordens_list)
 
                 if n_failures == 0:
                     novo_mtbf = 0
@@ -67,11 +71,11 @@ class Command(BaseCommand):
                 else:
                     # montamos map de manutenções por ordem_id (se existir)
                     manut_map = {}
-                    manut_qs = Manutencao.objects.filter(ordem_servico__in=ordens_corretivas)
-                    for m in manut_qs:
-                        manut_map[m.ordem_servico_id] = m
+                    for ordem in ordens_list:
+                        m = manutencao_de(ordem)
+                        if m is not None:
+                            manut_map[ordem.id] = m
 
-                    ordens_list = list(ordens_corretivas)
                     operation_intervals = []
 
                     # percorre pares (ordem_i, ordem_j) e calcula:
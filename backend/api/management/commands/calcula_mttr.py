@@ -1,16 +1,17 @@
 # api/management/commands/calcula_mttr.py
-from django.core.management.base import BaseCommand
 from django.db import transaction
-from django.db.models import Sum, Count
 from django.utils import timezone
 import datetime
 import math
 
 # imports com nomes exatos dos seus modelos
-from api.models import Ativo, OrdemServico, Manutencao
+from api.models import Ativo
+from api.historico import existe_ordem, somar_tempo_gasto
+from api.agendador import relatar_progresso
+from api.metricas import ComandoMedido
 
 
-class Command(BaseCommand):
+class Command(ComandoMedido):
     help = 'Calcula e atualiza o MTTR (em minutos) de cada Ativo com base nas manutenções de ordens finalizadas. Por padrão grava as alterações no banco; use --dry-run para apenas simular.'
 
     def add_arguments(self, parser):
@@ -50,21 +51,18 @@ class Command(BaseCommand):
         total_sem_alteracao = 0
         erros = 0
 
+        total_ativos = ativos_qs.count()
         for ativo in ativos_qs:
             total_processados += 1
+            relatar_progresso(self, total_processados, total_ativos)
             try:
-                # Relacionamento reverso 'ordens_servico' (related_name)
-                ordens_finalizadas_qs = ativo.ordens_servico.filter(status__iexact=status_filter)
-
-                if not ordens_finalizadas_qs.exists():
+                # O.S. finalizadas do ativo, vivas e do arquivo morto
+                if not existe_ordem(ativo.id, status__iexact=status_filter):
                     novo_mttr = 0
                     self.stdout.write(f'Ativo {ativo.id} ({ativo}): nenhuma O.S. finalizada encontrada — novo_mttr={novo_mttr}')
                 else:
-                    manutencoes_qs = Manutencao.objects.filter(ordem_servico__in=ordens_finalizadas_qs)
-                    agg = manutencoes_qs.aggregate(total_tempo=Sum('tempo_gasto'), qtd=Count('pk'))
-
-                    total_tempo = agg.get('total_tempo')  # timedelta ou None
-                    qtd = agg.get('qtd') or 0
+                    # total_tempo: timedelta ou None
+                    total_tempo, qtd = somar_tempo_gasto(ativo.id, status__iexact=status_filter)
 
                     if not total_tempo or qtd == 0:
                         novo_mttr = 0
@@ -0,0 +1,49 @@
+# api/management/commands/exporta_historico.py
+import sys
+import time
+
+from django.core.management.base import CommandError
+
+from api.exportacao import FORMATOS, ExportacaoError, exportar, montar_filtros
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Exporta o histórico de O.S. (vivas e arquivadas, com manutenção e Ativo) em CSV, NDJSON ou GeoJSON, "
+        "lendo o banco em fluxo (cursor do lado do servidor) — a memória não cresce com o tamanho do histórico.\n"
+        "Sem --saida, escreve na saída padrão."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=list(FORMATOS), default='csv', help='Formato (padrão: csv).')
+        parser.add_argument('--saida', type=str, help='Arquivo de destino (padrão: saída padrão).')
+        parser.add_argument('--inicio', type=str, help='Data de criação inicial (AAAA-MM-DD ou data-hora ISO).')
+        parser.add_argument('--fim', type=str, help='Data de criação final, inclusive (AAAA-MM-DD ou data-hora ISO).')
+        parser.add_argument('--ativo-id', type=int, help='Apenas as O.S. deste Ativo (opcional).')
+        parser.add_argument('--tipo', type=str, help="Tipo de O.S., ex.: 'corretiva' (opcional).")
+        parser.add_argument('--status', type=str, help="Status da O.S., ex.: 'finalizada' (opcional).")
+
+    def handle(self, *args, **options):
+        try:
+            filtros = montar_filtros(
+                inicio=options.get('inicio'), fim=options.get('fim'), ativo=options.get('ativo_id'),
+                tipo=options.get('tipo'), status=options.get('status'),
+            )
+            pedacos = exportar(options['formato'], filtros)
+        except ExportacaoError as e:
+            raise CommandError(str(e))
+
+        inicio = time.perf_counter()
+        destino = open(options['saida'], 'w', encoding='utf-8', newline='') if options.get('saida') else sys.stdout
+        try:
+            for pedaco in pedacos:
+                destino.write(pedaco)
+        finally:
+            if destino is not sys.stdout:
+                destino.close()
+
+        if options.get('saida'):
+            self.stdout.write(self.style.SUCCESS(
+                f'Histórico exportado em {options["saida"]} em {time.perf_counter() - inicio:.2f}s.'
+            ))
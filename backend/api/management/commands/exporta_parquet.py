@@ -0,0 +1,68 @@
+# api/management/commands/exporta_parquet.py
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connections
+
+from api import exportacao_colunar
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Exporta O.S. (vivas e arquivadas), manutenções e Ativos (com longitude/latitude em colunas) para "
+        "arquivos Parquet particionados por mês, para análise fora do banco de produção.\n"
+        "Incremental: reescreve os meses desde a última exportação (menos EXPORT_PARQUET_REWRITE_DAYS) e os meses com O.S. alteradas ou arquivadas desde então.\n"
+        "Requer pyarrow, dependência opcional (backend/requirements-opcional.txt). Use --dry-run para apenas mostrar os meses que seriam escritos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostra os meses que seriam exportados, sem escrever arquivos.'
+        )
+        parser.add_argument(
+            '--destino',
+            type=str,
+            default=settings.EXPORT_PARQUET_DIR,
+            help='Diretório do snapshot (padrão: settings.EXPORT_PARQUET_DIR).'
+        )
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Ignora o estado salvo e reescreve todos os meses.'
+        )
+        parser.add_argument(
+            '--database',
+            default=settings.EXPORT_DB_ALIAS,
+            choices=list(connections),
+            help='Alias do banco a ler; aponte para uma réplica de leitura se houver (padrão: EXPORT_DB_ALIAS).'
+        )
+
+    def handle(self, *args, **options):
+        destino = options['destino']
+        self.stdout.write(self.style.NOTICE(f'Exportando snapshot Parquet para {destino}'))
+
+        if options.get('dry_run', False):
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhum arquivo será escrito.'))
+            plano = exportacao_colunar.planejar(destino, completo=options['completo'], banco=options['database'])
+            for nome, meses in plano.items():
+                rotulos = ', '.join(f'{inicio:%Y-%m}' for inicio, _ in meses) or 'nenhum'
+                self.stdout.write(f'{nome}: {rotulos}')
+            self.stdout.write('ativos: snapshot completo')
+            return
+
+        inicio = time.perf_counter()
+        try:
+            relatorio = exportacao_colunar.exportar(destino, completo=options['completo'], banco=options['database'])
+        except exportacao_colunar.ExportacaoColunarError as e:
+            raise CommandError(str(e))
+
+        for nome, mes, linhas in relatorio:
+            rotulo = f'{mes:%Y-%m}' if mes else 'completo'
+            self.stdout.write(f'{nome} ({rotulo}): {linhas} linha(s)')
+        self.stdout.write(self.style.SUCCESS(
+            f'-------------- Snapshot atualizado em {time.perf_counter() - inicio:.2f}s. --------------'
+        ))
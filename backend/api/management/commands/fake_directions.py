@@ -0,0 +1,56 @@
+# api/management/commands/fake_directions.py
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.fake_directions import FakeDirectionsServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Sobe, em primeiro plano, o servidor local que imita a Google Directions (api/fake_directions.py), "
+        "com latência e taxas de falha configuráveis.\n"
+        "Inicie o servidor testado com GOOGLE_DIRECTIONS_URL apontando para a URL mostrada: o proxy de "
+        "rotas passa a ser exercitado sem rede e sem custo (ex.: durante o `teste_carga`). Ctrl+C para parar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço de escuta (padrão: 127.0.0.1).')
+        parser.add_argument('--porta', type=int, default=8765, help='Porta de escuta (padrão: 8765).')
+        parser.add_argument('--latencia', type=float, default=0.2, help='Latência média em segundos (padrão: 0.2).')
+        parser.add_argument('--variacao', type=float, default=0.05, help='Desvio padrão da latência em segundos (padrão: 0.05).')
+        parser.add_argument('--taxa-erro', type=float, default=0.0, help='Fração dos pedidos com HTTP 500 (padrão: 0).')
+        parser.add_argument('--taxa-limite', type=float, default=0.0, help='Fração dos pedidos com OVER_QUERY_LIMIT (padrão: 0).')
+        parser.add_argument('--taxa-timeout', type=float, default=0.0, help='Fração dos pedidos sem resposta (padrão: 0).')
+        parser.add_argument(
+            '--espera-timeout',
+            type=float,
+            default=60.0,
+            help='Segundos que um pedido em timeout fica sem resposta (padrão: 60, acima de UPSTREAM_READ_TIMEOUT).'
+        )
+        parser.add_argument('--semente', type=int, help='Semente do sorteio das falhas (opcional).')
+
+    def handle(self, *args, **options):
+        taxas = (options['taxa_erro'], options['taxa_limite'], options['taxa_timeout'])
+        if any(taxa < 0 for taxa in taxas) or sum(taxas) > 1:
+            raise CommandError('As taxas devem ser >= 0 e somar no máximo 1.')
+
+        servidor = FakeDirectionsServer(
+            host=options['host'], port=options['porta'],
+            latencia=options['latencia'], variacao=options['variacao'],
+            taxa_erro=options['taxa_erro'], taxa_limite=options['taxa_limite'], taxa_timeout=options['taxa_timeout'],
+            espera_timeout=options['espera_timeout'], semente=options.get('semente'),
+        )
+        self.stdout.write(self.style.NOTICE(
+            f'Servidor Directions simulado em {servidor.url} (latência {options["latencia"]}s ± {options["variacao"]}s, '
+            f'erro {taxas[0]:.0%}, cota {taxas[1]:.0%}, timeout {taxas[2]:.0%})'
+        ))
+        self.stdout.write(f'Inicie o servidor testado com GOOGLE_DIRECTIONS_URL={servidor.url}')
+        try:
+            asyncio.run(servidor.servir_para_sempre())
+        except KeyboardInterrupt:
+            pass
+        falhas = ', '.join(f'{nome}={total}' for nome, total in servidor.falhas_simuladas.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Encerrado. Pedidos atendidos: {servidor.pedidos_atendidos}; falhas simuladas: {falhas}.'
+        ))
@@ -0,0 +1,81 @@
+# api/management/commands/gera_derivados_manual.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import derivados_manual
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker que gera os derivados dos manuais (miniatura da 1ª página e texto pesquisável) dos Ativos "
+        "cujo manual mudou de hash. Vários workers podem rodar em paralelo (a fila usa SKIP LOCKED).\n"
+        "Por padrão fica em execução; use --uma-vez para esvaziar a fila e sair (ex.: cron).\n"
+        "Requer PyMuPDF (texto e miniatura) ou pypdf (só texto). Use --dry-run para apenas contar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Conta os derivados pendentes, sem gerar nada.'
+        )
+        parser.add_argument(
+            '--uma-vez',
+            action='store_true',
+            help='Processa a fila até esvaziar e termina.'
+        )
+        parser.add_argument(
+            '--agendar-faltantes',
+            action='store_true',
+            help='Antes de começar, agenda os Ativos com manual sem derivado atualizado (ex.: manuais antigos).'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=5,
+            help='Manuais reservados por vez (padrão: 5).'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=10.0,
+            help='Segundos de espera quando a fila está vazia (padrão: 10).'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+
+        self.stdout.write(self.style.NOTICE(f'Iniciando geração dos derivados dos manuais - {timezone.now()}'))
+        if dry_run:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhuma alteração será persistida.'))
+            self.stdout.write(f'Derivados pendentes: {derivados_manual.contar_pendentes()}.')
+            return
+
+        if options['agendar_faltantes']:
+            agendados = derivados_manual.agendar_faltantes()
+            self.stdout.write(f'{agendados} manual(is) agendado(s).')
+
+        processados = 0
+        while True:
+            reservados = derivados_manual.reservar(options['lote'])
+            if not reservados:
+                if options['uma_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            for ativo_id, sha256 in reservados:
+                inicio = time.perf_counter()
+                resultado = derivados_manual.processar(ativo_id, sha256)
+                duracao = time.perf_counter() - inicio
+                if resultado == 'pronto':
+                    self.stdout.write(self.style.SUCCESS(f'Ativo {ativo_id}: derivados gerados em {duracao:.2f}s.'))
+                elif resultado is None:
+                    self.stdout.write(f'Ativo {ativo_id}: manual mudou durante o processamento, descartado.')
+                else:
+                    self.stdout.write(self.style.ERROR(f'Ativo {ativo_id}: falha ({resultado}).'))
+                processados += 1
+
+        self.stdout.write(self.style.SUCCESS(f'-------------- {processados} manual(is) processado(s). --------------'))
@@ -0,0 +1,73 @@
+# api/management/commands/importa_ativos.py
+import time
+
+from django.core.management.base import CommandError
+
+from api.importacao_ativos import ImportacaoError, formato_do_nome, importar_arquivo
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Importa Ativos em massa de um arquivo CSV (colunas nome, marca, modelo, periodicidade, endereco, "
+        "longitude, latitude) ou GeoJSON (FeatureCollection de Points com as mesmas propriedades).\n"
+        "O arquivo é lido em fluxo e gravado em lotes com COPY; linhas inválidas são listadas e puladas.\n"
+        "Use --dry-run para apenas validar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', type=str, help='Caminho do arquivo .csv, .geojson ou .json.')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Valida todas as linhas sem gravar nada.'
+        )
+        parser.add_argument(
+            '--formato',
+            choices=['csv', 'geojson'],
+            help='Formato do arquivo (padrão: pela extensão).'
+        )
+        parser.add_argument(
+            '--metodo',
+            choices=['copy', 'bulk_create'],
+            default='copy',
+            help='Como gravar os lotes (padrão: copy).'
+        )
+        parser.add_argument(
+            '--sem-matriz',
+            action='store_true',
+            help='Não reconstrói a matriz de deslocamento no fim (rode `matriz_deslocamento` depois).'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        formato = options.get('formato') or formato_do_nome(options['arquivo'])
+        if formato is None:
+            raise CommandError('Não foi possível deduzir o formato pela extensão; use --formato.')
+
+        self.stdout.write(self.style.NOTICE(f'Importando {options["arquivo"]} ({formato}, {options["metodo"]})'))
+        if dry_run:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhuma alteração será persistida.'))
+
+        inicio = time.perf_counter()
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                resultado = importar_arquivo(
+                    arquivo, formato,
+                    metodo=options['metodo'], dry_run=dry_run, reconstruir_matriz=not options['sem_matriz'],
+                )
+        except (OSError, ImportacaoError) as e:
+            raise CommandError(str(e))
+        duracao = time.perf_counter() - inicio
+
+        for erro in resultado.erros:
+            detalhes = '; '.join(f'{campo}: {mensagem}' for campo, mensagem in erro['erros'].items())
+            self.stdout.write(self.style.ERROR(f'Linha {erro["linha"]}: {detalhes}'))
+        if resultado.rejeitados > len(resultado.erros):
+            self.stdout.write(self.style.WARNING(f'... mais {resultado.rejeitados - len(resultado.erros)} linha(s) com erro.'))
+
+        verbo = 'validados' if dry_run else 'importados'
+        self.stdout.write(self.style.SUCCESS(
+            f'-------------- {resultado.importados} Ativo(s) {verbo}, {resultado.rejeitados} rejeitado(s), '
+            f'em {duracao:.2f}s. --------------'
+        ))
@@ -0,0 +1,42 @@
+# api/management/commands/limpa_uploads_manual.py
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from api.manuais import limpar_uploads_abandonados
+from api.models import UploadManual
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Apaga os uploads de manual em andamento sem atividade há mais de --horas horas, "
+        "junto com os arquivos temporários (MANUAL_UPLOAD_TEMP_DIR). Agende diariamente (cron).\n"
+        "Use --dry-run para apenas contar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Conta os uploads abandonados, sem apagar nada.'
+        )
+        parser.add_argument(
+            '--horas',
+            type=int,
+            default=settings.MANUAL_UPLOAD_ABANDON_HOURS,
+            help='Horas sem atividade para considerar o upload abandonado (padrão: settings.MANUAL_UPLOAD_ABANDON_HOURS).'
+        )
+
+    def handle(self, *args, **options):
+        horas = options['horas']
+        if options.get('dry_run', False):
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhuma alteração será persistida.'))
+            limite = timezone.now() - datetime.timedelta(hours=horas)
+            quantidade = UploadManual.objects.filter(status='em_andamento', atualizado_em__lt=limite).count()
+            self.stdout.write(f'Uploads abandonados: {quantidade}.')
+            return
+
+        apagados = limpar_uploads_abandonados(horas)
+        self.stdout.write(self.style.SUCCESS(f'{apagados} upload(s) abandonado(s) apagado(s).'))
@@ -0,0 +1,91 @@
+# api/management/commands/matriz_deslocamento.py
+from django.conf import settings
+from django.utils import timezone
+
+from api import upstream
+from api.matriz_deslocamento import atualizar_ativo, reconstruir, registrar_custos_rodoviarios
+from api.models import Ativo, CustoDeslocamento
+from api.rotas import montar_parametros_rota
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Mantém a matriz de custos de deslocamento entre Ativos próximos (CustoDeslocamento).\n"
+        "Sem opções, reconstrói a matriz inteira (corrige desvios); com --ativo-id recalcula só as linhas desse Ativo.\n"
+        "Com --rodoviario N, pede à Google o custo rodoviário dos N pares mais próximos que ainda não o têm."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ativo-id',
+            type=int,
+            help='Recalcula apenas as linhas do ativo com este id (opcional).'
+        )
+        parser.add_argument(
+            '--raio',
+            type=float,
+            help='Raio de vizinhança em metros (padrão: settings.TRAVEL_MATRIX_RADIUS_M).'
+        )
+        parser.add_argument(
+            '--rodoviario',
+            type=int,
+            default=0,
+            help='Quantidade de pares sem custo rodoviário a preencher via Google (padrão: 0, nenhum).'
+        )
+
+    def handle(self, *args, **options):
+        ativo_id = options.get('ativo_id')
+        raio = options.get('raio') or settings.TRAVEL_MATRIX_RADIUS_M
+
+        started = timezone.now()
+        self.stdout.write(self.style.NOTICE(f'Iniciando manutenção da matriz de deslocamento (raio {raio:.0f} m) - {started}'))
+
+        if ativo_id:
+            pares = atualizar_ativo(ativo_id, raio)
+            self.stdout.write(self.style.SUCCESS(f'Ativo {ativo_id}: {pares} pares recalculados.'))
+        else:
+            gravados, removidos = reconstruir(raio)
+            self.stdout.write(self.style.SUCCESS(f'Matriz reconstruída: {gravados} pares gravados, {removidos} pares removidos.'))
+
+        if options['rodoviario'] > 0:
+            self._preencher_rodoviario(options['rodoviario'])
+
+        duration = timezone.now() - started
+        self.stdout.write(self.style.SUCCESS(f'-------------- Concluído em {duration}. --------------'))
+
+    def _preencher_rodoviario(self, limite):
+        pendentes = (
+            CustoDeslocamento.objects.filter(distancia_rodoviaria__isnull=True)
+            .order_by('distancia_linha_reta')
+            .values_list('origem_id', 'destino_id')[:limite]
+        )
+        pendentes = list(pendentes)
+        ids = {pk for par in pendentes for pk in par}
+        pontos = dict(Ativo.objects.filter(pk__in=ids).values_list('pk', 'localizacao'))
+
+        obtidos = []
+        erros = 0
+        for origem_id, destino_id in pendentes:
+            origem, destino = pontos[origem_id], pontos[destino_id]
+            params = montar_parametros_rota({
+                'start_lat': origem.y, 'start_lng': origem.x,
+                'end_lat': destino.y, 'end_lng': destino.x,
+            })
+            try:
+                response = upstream.get(settings.GOOGLE_DIRECTIONS_URL, params=params)
+                response.raise_for_status()
+                dados = response.json()
+                leg = dados['routes'][0]['legs'][0]
+                obtidos.append((origem_id, destino_id, leg['distance']['value'], leg['duration']['value']))
+            except upstream.CircuitoAbertoError as e:
+                self.stdout.write(self.style.ERROR(f'Circuito aberto, interrompendo: {e}'))
+                break
+            except Exception as e:
+                erros += 1
+                self.stdout.write(self.style.ERROR(f'Par {origem_id} -> {destino_id}: erro ao obter custo rodoviário: {e}'))
+
+        gravados = registrar_custos_rodoviarios(obtidos)
+        self.stdout.write(self.style.SUCCESS(
+            f'Custos rodoviários: pedidos={len(pendentes)} gravados={gravados} erros={erros}.'
+        ))
@@ -0,0 +1,87 @@
+# api/management/commands/os_preditiva.py
+import time
+
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from api.preditiva import avaliar, criar_ordens
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Gera ordens de serviço preditivas a partir de um modelo de falhas de Weibull por Ativo.\n"
+        "Os tempos entre falhas são os do calcula_mtbf (fim da manutenção de uma OS corretiva -> criação da "
+        "próxima); o tempo desde a última corretiva entra como observação censurada. Para cada Ativo com "
+        "pelo menos --min-falhas falhas, se a probabilidade de falhar nos próximos --janela dias passar de "
+        "--limiar, cria uma OS preditiva para a data em que a probabilidade atinge o limiar.\n"
+        "Ativos com OS preditiva pendente são pulados. Por padrão grava no banco; utilize --dry-run para simular."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Simula a execução sem gravar nada no banco.'
+        )
+        parser.add_argument(
+            '--ativo-id',
+            type=int,
+            help='Executa apenas para o ativo com este id (opcional).'
+        )
+        parser.add_argument(
+            '--tipo',
+            type=str,
+            default='corretiva',
+            help="Tipo de ordem cujas datas são as falhas (padrão: 'corretiva')."
+        )
+        parser.add_argument('--janela', type=int, default=30, help='Janela de previsão em dias (padrão: 30).')
+        parser.add_argument(
+            '--limiar',
+            type=float,
+            default=0.5,
+            help='Probabilidade de falha na janela a partir da qual a OS é criada (padrão: 0.5).'
+        )
+        parser.add_argument(
+            '--min-falhas',
+            type=int,
+            default=3,
+            help='Falhas mínimas para ajustar o modelo de um Ativo (padrão: 3).'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        janela = options['janela']
+        limiar = options['limiar']
+        if janela <= 0 or not 0 < limiar < 1 or options['min_falhas'] < 2:
+            raise CommandError('--janela deve ser maior que zero, --limiar entre 0 e 1 e --min-falhas pelo menos 2.')
+
+        now = timezone.now()
+        self.stdout.write(self.style.NOTICE(f'Iniciando geração OS preditiva - {now}'))
+        if dry_run:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhuma alteração será persistida.'))
+
+        inicio = time.perf_counter()
+        resultado = avaliar(
+            now, janela_dias=janela, limiar=limiar, min_falhas=options['min_falhas'],
+            tipo=options['tipo'], ativo_id=options.get('ativo_id'),
+        )
+        duracao_ajuste = time.perf_counter() - inicio
+        candidatos = resultado['candidatos']
+        self.stdout.write(
+            f'{resultado["ativos_com_dados"]} Ativo(s) com histórico, {resultado["ajustados"]} com falhas suficientes '
+            f'para o ajuste, {resultado["avaliados"]} em operação; ajuste em {duracao_ajuste:.2f}s.'
+        )
+
+        for candidato in candidatos:
+            estilo = self.style.WARNING if dry_run else self.style.SUCCESS
+            self.stdout.write(estilo(
+                f'{"[DRY-RUN] " if dry_run else ""}Ativo {candidato["ativo_id"]}: P(falha em {janela} dias)='
+                f'{candidato["probabilidade"]:.1%} (β={candidato["beta"]:.2f}, η={candidato["eta"]:.0f} dias, '
+                f'idade={candidato["idade"]:.0f} dias) -> OS preditiva para {candidato["data_prevista"]}'
+            ))
+
+        criadas = len(candidatos) if dry_run else len(criar_ordens(candidatos, janela))
+        self.stdout.write(self.style.SUCCESS(
+            f'Finalizado. \nAtivos avaliados: {resultado["avaliados"]}. \nOS {"simuladas" if dry_run else "criadas"}: {criadas}.'
+        ))
@@ -1,14 +1,17 @@
 # api/management/commands/os_preventiva.py
-from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
 import datetime
 
-from api.models import Ativo, OrdemServico, Manutencao
+from api.models import Ativo, OrdemServico
+from api.historico import existe_ordem, ultimo_fim_manutencao, ultima_data_prevista
+from api.resumo_manutencao import TIPO_PREVENTIVA, resumo_do_ativo
+from api.agendador import relatar_progresso
+from api.metricas import ComandoMedido
 
 
-class Command(BaseCommand):
+class Command(ComandoMedido):
     help = (
         "Gera ordens de serviço preventivas com base na periodicidade dos ativos.\n\n"
         "Regras:\n"
@@ -46,7 +49,7 @@ class Command(BaseCommand):
         if dry_run:
             self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhuma alteração será persistida.'))
 
-        ativos_qs = Ativo.objects.all()
+        ativos_qs = Ativo.objects.select_related('resumo_manutencao')
         if ativo_id:
             ativos_qs = ativos_qs.filter(pk=ativo_id)
 
@@ -55,8 +58,10 @@ class Command(BaseCommand):
         puladas = 0
         erros = 0
 
+        total_ativos = ativos_qs.count()
         for ativo in ativos_qs:
             total += 1
+            relatar_progresso(self, total, total_ativos)
             try:
                 periodicidade_days = int(ativo.periodicidade or 0)
                 if periodicidade_days <= 0:
@@ -68,9 +73,10 @@ class Command(BaseCommand):
 
                 # todas as ordens do tipo preventiva deste ativo
                 ordens_preventivas_qs = ativo.ordens_servico.filter(tipo__iexact=tipo_preventiva)
+                situacao = self._situacao_preventivas(ativo, tipo_preventiva)
 
-                # Caso 1: não tem nenhuma preventiva -> criar para hoje + periodicidade
-                if not ordens_preventivas_qs.exists():
+                # Caso 1: não tem nenhuma preventiva (nem no arquivo morto) -> criar para hoje + periodicidade
+                if not situacao['tem_preventiva']:
                     suggested_date = now + datetime.timedelta(days=periodicidade_days)
                     # set date_prevista time to same time as now (or midnight if you prefer)
                     suggested_date = suggested_date.replace(microsecond=0)
@@ -95,7 +101,7 @@ class Command(BaseCommand):
                     continue
 
                 # Caso 2: se existir alguma preventiva pendente -> não gera
-                if ordens_preventivas_qs.filter(status__iexact='pendente').exists():
+                if situacao['tem_pendente']:
                     self.stdout.write(
                         f'Ativo {ativo.id} ({ativo}): existe OS preventiva com status PENDENTE -> nenhuma ação.'
                     )
@@ -103,8 +109,7 @@ class Command(BaseCommand):
                     continue
 
                 # Caso 3: existem preventivas, mas não pendentes => verificar últimas finalizadas
-                ordens_finalizadas = ordens_preventivas_qs.filter(status__iexact='finalizada')
-                if not ordens_finalizadas.exists():
+                if not situacao['tem_finalizada']:
                     # não há pendentes, nem finalizadas (talvez outras statuses) -> criar baseada em hoje
                     suggested_date = now + datetime.timedelta(days=periodicidade_days)
                     self.stdout.write(
@@ -126,23 +131,18 @@ class Command(BaseCommand):
                     continue
 
                 # Temos ordens_finalizadas -> queremos o último data_fim_execucao da manutenção ligada a essas ordens
-                # Buscamos manutenções associadas
-                manut_qs = Manutencao.objects.filter(ordem_servico__in=ordens_finalizadas).order_by('-data_fim_execucao')
+                # Buscamos manutenções associadas (vivas e do arquivo morto)
+                ultimo_fim = situacao['ultimo_fim']
 
-                if not manut_qs.exists():
+                if ultimo_fim is None:
                     # não encontramos manutenções nem com finalizadas -> fallback usar data_prevista da última OS finalizada
-                    ultima_ordem = ordens_finalizadas.order_by('-data_prevista').first()
-                    if ultima_ordem and ultima_ordem.data_prevista:
-                        base_date = ultima_ordem.data_prevista
-                    else:
-                        base_date = now
+                    base_date = situacao['ultima_prevista'] or now
                     suggested_date = base_date + datetime.timedelta(days=periodicidade_days)
                     self.stdout.write(
                         f'Ativo {ativo.id} ({ativo}): ordens finalizadas sem manutenção associada -> usando ultima.data_prevista {base_date} -> sugerindo {suggested_date}'
                     )
                 else:
-                    ultima_manut = manut_qs.first()
-                    base_date = ultima_manut.data_fim_execucao
+                    base_date = ultimo_fim
                     suggested_date = base_date + datetime.timedelta(days=periodicidade_days)
                     self.stdout.write(
                         f'Ativo {ativo.id} ({ativo}): ultima manut finalizada em {base_date} -> sugerindo {suggested_date}'
@@ -186,4 +186,27 @@ class Command(BaseCommand):
             f'Finalizado. \nAtivos processados: {total}. \nOS criadas: {criadas}. \nPuladas: {puladas}. \nErros: {erros}.'
         ))
 
-
+    def _situacao_preventivas(self, ativo, tipo_preventiva):
+        """
+        Respostas usadas nas regras acima. Para o tipo padrão vêm do ResumoManutencaoAtivo
+        (uma linha já carregada com o ativo); para outro --tipo, de consultas às O.S.
+        vivas e arquivadas.
+        """
+        if tipo_preventiva.lower() == TIPO_PREVENTIVA:
+            resumo = resumo_do_ativo(ativo)
+            return {
+                'tem_preventiva': resumo.preventivas_total > 0,
+                'tem_pendente': resumo.preventivas_pendentes > 0,
+                'tem_finalizada': resumo.ultima_prevista_preventiva is not None,
+                'ultimo_fim': resumo.ultimo_fim_preventiva,
+                'ultima_prevista': resumo.ultima_prevista_preventiva,
+            }
+
+        filtro_finalizadas = {'tipo__iexact': tipo_preventiva, 'status__iexact': 'finalizada'}
+        return {
+            'tem_preventiva': existe_ordem(ativo.id, tipo__iexact=tipo_preventiva),
+            'tem_pendente': ativo.ordens_servico.filter(tipo__iexact=tipo_preventiva, status__iexact='pendente').exists(),
+            'tem_finalizada': existe_ordem(ativo.id, **filtro_finalizadas),
+            'ultimo_fim': ultimo_fim_manutencao(ativo.id, **filtro_finalizadas),
+            'ultima_prevista': ultima_data_prevista(ativo.id, **filtro_finalizadas),
+        }
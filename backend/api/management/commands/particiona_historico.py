@@ -0,0 +1,118 @@
+# api/management/commands/particiona_historico.py
+import datetime
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from api import particionamento
+from api.indicadores import recriar_views
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Particionamento mensal (PostgreSQL) de api_ordemservico (por data_criacao, subparticionada por status) "
+        "e api_manutencao (por data_fim_execucao).\n"
+        "Sem opções, cria as partições que faltam do mês atual até --meses meses à frente: agende diariamente (cron).\n"
+        "Com --converter, converte uma vez as tabelas existentes: a tabela atual vira a partição <tabela>_legado, "
+        "sem copiar as linhas. Rode `migrate` antes (a migração 0010 remove a FOREIGN KEY de Manutencao).\n"
+        "Use --dry-run para apenas mostrar o SQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostra o SQL que seria executado, sem alterar o banco.'
+        )
+        parser.add_argument(
+            '--converter',
+            action='store_true',
+            help='Converte as tabelas ainda não particionadas (operação única; bloqueia a tabela por instantes).'
+        )
+        parser.add_argument(
+            '--tabela',
+            choices=[config.tabela for config in particionamento.TABELAS],
+            help='Com --converter, converte apenas esta tabela (opcional).'
+        )
+        parser.add_argument(
+            '--meses',
+            type=int,
+            default=settings.HISTORY_PARTITION_MONTHS_AHEAD,
+            help='Meses de partições criados à frente (padrão: settings.HISTORY_PARTITION_MONTHS_AHEAD).'
+        )
+        parser.add_argument(
+            '--corte',
+            type=str,
+            help='Com --converter, início (AAAA-MM-01) da primeira partição mensal (padrão: daqui a dois meses).'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        meses = options['meses']
+
+        started = timezone.now()
+        self.stdout.write(self.style.NOTICE(f'Iniciando particionamento do histórico - {started}'))
+        if dry_run:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhuma alteração será persistida.'))
+
+        try:
+            if options['converter']:
+                self._converter(options, meses, dry_run)
+            self._garantir(meses, dry_run)
+        except particionamento.ParticionamentoError as e:
+            raise CommandError(str(e))
+
+        duration = timezone.now() - started
+        self.stdout.write(self.style.SUCCESS(f'-------------- Concluído em {duration}. --------------'))
+
+    def _converter(self, options, meses, dry_run):
+        try:
+            corte = datetime.date.fromisoformat(options['corte']) if options.get('corte') else particionamento.corte_padrao()
+        except ValueError:
+            raise CommandError('Corte inválido; use o formato AAAA-MM-01.')
+        if corte.day != 1 or corte <= timezone.now().date():
+            raise CommandError('O corte deve ser o primeiro dia de um mês futuro.')
+
+        convertidas = 0
+        for config in particionamento.TABELAS:
+            if options.get('tabela') and config.tabela != options['tabela']:
+                continue
+            if particionamento.esta_particionada(config.tabela):
+                self.stdout.write(f'{config.tabela}: já particionada, pulando.')
+                continue
+
+            self.stdout.write(self.style.NOTICE(f'{config.tabela}: convertendo (legado até {corte}).'))
+            if dry_run:
+                # O SQL da etapa 2 é calculado sem o bloqueio: no dry-run só serve de conferência
+                comandos = (
+                    particionamento.sql_preparar(config, corte)
+                    + [particionamento.sql_bloquear(config)]
+                    + particionamento.sql_converter(config, corte, meses)
+                )
+                for sql in comandos:
+                    self.stdout.write(f'  {sql};')
+            else:
+                particionamento.converter(config, corte, meses, relatar=lambda sql: self.stdout.write(f'  {sql};'))
+                self.stdout.write(self.style.SUCCESS(f'{config.tabela}: convertida.'))
+                convertidas += 1
+
+        if convertidas:
+            # As materialized views seguem a tabela renomeada para _legado: recria-as sobre a nova
+            recriar_views()
+            self.stdout.write(self.style.SUCCESS('Views de indicadores recriadas sobre as tabelas particionadas.'))
+
+    def _garantir(self, meses, dry_run):
+        if dry_run:
+            plano = particionamento.planejar_particoes(meses)
+        else:
+            plano = particionamento.garantir_particoes(meses)
+
+        for tabela, mes, comandos in plano:
+            self.stdout.write(f'{tabela}: partição de {mes:%Y-%m}' + (' (prevista)' if dry_run else ' criada'))
+            if dry_run:
+                for sql in comandos:
+                    self.stdout.write(f'  {sql};')
+        if not plano:
+            self.stdout.write('Nenhuma partição a criar.')
@@ -0,0 +1,79 @@
+# api/management/commands/planeja_rotas.py
+import datetime
+
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.utils import timezone
+
+from api.planejamento_rotas import ler_origem, planejar_dia
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Pré-calcula a rota do dia de cada técnico a partir das O.S. pendentes com data_prevista no dia.\n"
+        "Ordena as paradas com o otimizador local, pede a rota completa à Google e grava em RotaPlanejada,\n"
+        "para o app apenas buscar a rota pronta. Pensado para rodar de madrugada (ex.: cron às 03:00).\n"
+        "Por padrão grava no banco; use --dry-run para simular."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Calcula as rotas mas NÃO grava nada no banco.'
+        )
+        parser.add_argument(
+            '--data',
+            type=str,
+            help='Dia a planejar no formato AAAA-MM-DD (padrão: hoje).'
+        )
+        parser.add_argument(
+            '--tecnico-id',
+            type=int,
+            action='append',
+            help='Planeja apenas para este técnico (pode repetir a opção).'
+        )
+        parser.add_argument(
+            '--origem',
+            type=str,
+            default=settings.ROUTE_PLANNING_DEPOT,
+            help='Ponto de partida "lat,lng" dos técnicos sem localizacao_base (padrão: settings.ROUTE_PLANNING_DEPOT; vazio = melhor parada).'
+        )
+        parser.add_argument(
+            '--sem-google',
+            action='store_true',
+            help='Só ordena as paradas, sem pedir a rota completa à Google.'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        try:
+            dia = datetime.date.fromisoformat(options['data']) if options.get('data') else timezone.localdate()
+        except ValueError:
+            raise CommandError('Data inválida; use o formato AAAA-MM-DD.')
+
+        try:
+            origem = ler_origem(options.get('origem'))
+        except ValueError:
+            raise CommandError('Origem inválida; use o formato "lat,lng".')
+
+        started = timezone.now()
+        self.stdout.write(self.style.NOTICE(f'Iniciando planejamento das rotas de {dia} - {started}'))
+        if dry_run:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhuma alteração será persistida.'))
+
+        rotas = planejar_dia(
+            dia,
+            tecnico_ids=options.get('tecnico_id'),
+            origem=origem,
+            buscar_google=not options['sem_google'],
+            salvar=not dry_run,
+            relatar=self.stdout.write,
+        )
+
+        duration = timezone.now() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'-------------- Concluído. -------------- \nRotas planejadas: {len(rotas)}.'
+            f'\nSem rota da Google: {sum(1 for r in rotas if not r.rota)}. \nDuração: {duration}.'
+        ))
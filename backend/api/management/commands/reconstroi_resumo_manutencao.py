@@ -0,0 +1,61 @@
+# api/management/commands/reconstroi_resumo_manutencao.py
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import ResumoManutencaoAtivo
+from api.resumo_manutencao import reconstruir
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Reconstrói o resumo de manutenção por Ativo (ResumoManutencaoAtivo) a partir das O.S. e manutenções "
+        "vivas e arquivadas. Os signals mantêm o resumo atualizado; este comando corrige desvios "
+        "(ex.: alterações feitas por SQL direto ou importações em lote).\n"
+        "Use --dry-run para apenas contar as linhas que estão diferentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Calcula e compara, mas NÃO grava nada no banco.'
+        )
+        parser.add_argument(
+            '--ativo-id',
+            type=int,
+            help='Reconstrói apenas o resumo do ativo com este id (opcional).'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        ativo_id = options.get('ativo_id')
+
+        started = timezone.now()
+        self.stdout.write(self.style.NOTICE(f'Iniciando reconstrução do resumo de manutenção - {started}'))
+        if dry_run:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhuma alteração será persistida.'))
+
+        campos = [f.name for f in ResumoManutencaoAtivo._meta.fields if f.name not in ('ativo', 'atualizado_em')]
+        antes = self._carregar(campos, ativo_id)
+
+        with transaction.atomic():
+            gravadas = reconstruir(ativo_id)
+            depois = self._carregar(campos, ativo_id)
+            diferentes = [pk for pk, valores in depois.items() if antes.get(pk) != valores]
+            for pk in diferentes[:50]:
+                self.stdout.write(f'Ativo {pk}: {antes.get(pk)} -> {depois[pk]}')
+            if dry_run:
+                transaction.set_rollback(True)
+
+        duration = timezone.now() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'-------------- Concluído. -------------- \nResumos calculados: {gravadas}.'
+            f'\nResumos com desvio: {len(diferentes)}. \nDuração: {duration}.'
+        ))
+
+    def _carregar(self, campos, ativo_id):
+        qs = ResumoManutencaoAtivo.objects.all()
+        if ativo_id:
+            qs = qs.filter(ativo_id=ativo_id)
+        return {linha[0]: linha[1:] for linha in qs.values_list('ativo_id', *campos).iterator(chunk_size=5000)}
@@ -0,0 +1,106 @@
+# api/management/commands/seed_dados.py
+import datetime
+import time
+
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.dados_sinteticos import gerar, remover
+from api.metricas import ComandoMedido
+
+
+class Command(ComandoMedido):
+    help = (
+        "Gera dados sintéticos determinísticos para benchmarks: --ativos Ativos em torno de algumas cidades, "
+        "--ordens O.S. (corretivas, preventivas e preditivas, pendentes e finalizadas) nos últimos --dias dias "
+        "e a Manutenção de cada O.S. finalizada.\n"
+        "A mesma --semente e a mesma --referencia geram sempre os mesmos dados. Use --limpar para apagar "
+        "antes os dados gerados anteriormente e --dry-run para gerar e desfazer (só mede o tempo)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Gera os dados numa transação que é desfeita no fim.'
+        )
+        parser.add_argument('--ativos', type=int, default=1000, help='Quantidade de Ativos (padrão: 1000).')
+        parser.add_argument('--ordens', type=int, default=20000, help='Quantidade de O.S. (padrão: 20000).')
+        parser.add_argument('--tecnicos', type=int, default=20, help='Quantidade de técnicos (padrão: 20).')
+        parser.add_argument('--semente', type=int, default=42, help='Semente do gerador (padrão: 42).')
+        parser.add_argument('--dias', type=int, default=730, help='Período coberto pelas O.S., em dias (padrão: 730).')
+        parser.add_argument(
+            '--referencia',
+            type=str,
+            help='Data (AAAA-MM-DD) em que o período termina (padrão: hoje). Fixe-a para reproduzir os mesmos dados.'
+        )
+        parser.add_argument(
+            '--limpar',
+            action='store_true',
+            help='Apaga os dados gerados anteriormente por este comando antes de gerar.'
+        )
+        parser.add_argument(
+            '--so-limpar',
+            action='store_true',
+            help='Apenas apaga os dados gerados anteriormente, sem gerar novos.'
+        )
+        parser.add_argument(
+            '--com-matriz',
+            action='store_true',
+            help='Reconstrói também a matriz de deslocamento (demorado com muitos Ativos próximos).'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        if options['so_limpar']:
+            with transaction.atomic():
+                apagados = remover()
+                if dry_run:
+                    transaction.set_rollback(True)
+            self.stdout.write(self.style.SUCCESS(f'{apagados} registo(s) gerados por seed_dados apagados.'))
+            return
+
+        if options['ativos'] <= 0 or options['ordens'] < 0:
+            raise CommandError('--ativos deve ser maior que zero e --ordens não pode ser negativo.')
+
+        referencia = None
+        if options.get('referencia'):
+            try:
+                data = datetime.date.fromisoformat(options['referencia'])
+            except ValueError:
+                raise CommandError('--referencia deve estar no formato AAAA-MM-DD.')
+            referencia = timezone.make_aware(datetime.datetime.combine(data, datetime.time()))
+
+        self.stdout.write(self.style.NOTICE(
+            f'Gerando {options["ativos"]} Ativo(s), {options["ordens"]} O.S. e {options["tecnicos"]} técnico(s) '
+            f'(semente {options["semente"]})'
+        ))
+        if dry_run:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhuma alteração será persistida.'))
+
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            if options['limpar']:
+                apagados = remover()
+                self.stdout.write(f'{apagados} registo(s) gerados anteriormente apagados.')
+            contagem = gerar(
+                ativos=options['ativos'],
+                ordens=options['ordens'],
+                tecnicos=options['tecnicos'],
+                semente=options['semente'],
+                referencia=referencia,
+                dias=options['dias'],
+                reconstruir_matriz=options['com_matriz'],
+            )
+            if dry_run:
+                transaction.set_rollback(True)
+        duracao = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(
+            f'-------------- {contagem["ativos"]} Ativo(s), {contagem["ordens"]} O.S., '
+            f'{contagem["manutencoes"]} manutenção(ões) e {contagem["tecnicos"]} técnico(s) '
+            f'{"simulados" if dry_run else "gerados"} em {duracao:.2f}s. --------------'
+        ))
+        if not dry_run:
+            self.stdout.write('Rode calcula_mtbf e calcula_mttr para preencher as métricas dos Ativos gerados.')
@@ -0,0 +1,93 @@
+# api/management/commands/teste_carga.py
+import platform
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.bench import commit_atual, formatar_resumo, gravar_resultados
+from api.carga import ENDPOINTS, MIX_PADRAO, CargaError, TesteCarga, ler_mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga de ponta a ponta contra um servidor em execução (--url): usuários virtuais repetem o "
+        "tráfego do app (login, agenda de O.S., mapa de Ativos, histórico, finalizar O.S. e rotas) na "
+        "proporção de --mix, com pausas entre ações, e o relatório mostra vazão e p50/p95/p99 por endpoint.\n"
+        "Com vários valores em --usuarios (ex.: 5,10,20,40) roda um estágio por valor: servindo com um único "
+        "worker, a vazão no estágio em que a latência dispara é a capacidade por worker.\n"
+        "Para não chamar a Google, suba `fake_directions` e inicie o servidor com GOOGLE_DIRECTIONS_URL apontando "
+        "para ele. `finalizar` grava no banco do servidor: use um banco de testes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', type=str, default='http://127.0.0.1:8000', help='Servidor testado (padrão: http://127.0.0.1:8000).')
+        parser.add_argument(
+            '--usuarios',
+            type=str,
+            default='10',
+            help='Usuários virtuais simultâneos; vários valores separados por vírgula = um estágio cada (padrão: 10).'
+        )
+        parser.add_argument('--duracao', type=float, default=60, help='Segundos de cada estágio (padrão: 60).')
+        parser.add_argument('--pausa', type=float, default=1.0, help='Pausa média entre ações de um usuário, em segundos (padrão: 1.0; 0 = sem pausa).')
+        parser.add_argument(
+            '--mix',
+            type=str,
+            help='Pesos das ações, ex.: agenda=40,mapa=20,rota=25 (padrão: ' + ','.join(f'{nome}={peso}' for nome, peso in MIX_PADRAO.items()) + ').'
+        )
+        parser.add_argument('--usuario', type=str, help='Username para o login (sem ele, os pedidos são anônimos e o login não é medido).')
+        parser.add_argument('--senha', type=str, default='', help='Senha do --usuario.')
+        parser.add_argument('--timeout', type=float, default=30, help='Timeout de cada pedido em segundos (padrão: 30).')
+        parser.add_argument('--semente', type=int, default=42, help='Semente do sorteio das ações (padrão: 42).')
+        parser.add_argument('--saida', type=str, help='Grava o relatório completo em JSON neste arquivo (opcional).')
+
+    def handle(self, *args, **options):
+        try:
+            estagios = [int(valor) for valor in options['usuarios'].split(',')]
+            mix = ler_mix(options['mix']) if options.get('mix') else None
+        except ValueError:
+            raise CommandError('--usuarios deve ser um número ou uma lista de números separados por vírgula.')
+        except CargaError as e:
+            raise CommandError(str(e))
+        if any(usuarios <= 0 for usuarios in estagios) or options['duracao'] <= 0:
+            raise CommandError('--usuarios e --duracao devem ser maiores que zero.')
+
+        try:
+            teste = TesteCarga(
+                options['url'], mix=mix, duracao=options['duracao'], pausa=options['pausa'],
+                usuario=options.get('usuario'), senha=options['senha'], semente=options['semente'], timeout=options['timeout'],
+            )
+            dados = teste.preparar()
+        except CargaError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.NOTICE(
+            f'Servidor {teste.base_url}: {len(dados.ativos)} Ativo(s) e {dados.pendentes_restantes} O.S. pendente(s) '
+            f'disponíveis para o teste.'
+        ))
+
+        commit, _ = commit_atual()
+        resultados = {
+            'url': teste.base_url,
+            'commit': commit,
+            'data': timezone.now().isoformat(),
+            'mix': teste.mix,
+            'duracao': options['duracao'],
+            'pausa': options['pausa'],
+            'python': platform.python_version(),
+            'estagios': {},
+        }
+
+        for usuarios in estagios:
+            self.stdout.write(self.style.NOTICE(f'Estágio com {usuarios} usuário(s) por {options["duracao"]:.0f}s...'))
+            relatorio = teste.executar(usuarios)
+            resultados['estagios'][str(usuarios)] = relatorio
+            for nome, resumo in relatorio.items():
+                rotulo = ENDPOINTS.get(nome, 'todos os endpoints')
+                linha = f'  {formatar_resumo(f"{nome:<10}", resumo)} erros={resumo["erros"]}  [{rotulo}]'
+                self.stdout.write(self.style.WARNING(linha) if resumo['erros'] else linha)
+            if teste.mix.get('finalizar') and dados.pendentes_restantes == 0:
+                self.stdout.write(self.style.WARNING('  As O.S. pendentes acabaram: `finalizar` foi pulado no resto do teste.'))
+
+        if options.get('saida'):
+            gravar_resultados(options['saida'], resultados)
+            self.stdout.write(f'Relatório gravado em {options["saida"]}.')
+        self.stdout.write(self.style.SUCCESS('Teste de carga concluído.'))
@@ -0,0 +1,95 @@
+# api/management/commands/worker_tarefas.py
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import agendador
+from api.models import Tarefa
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de longa duração que roda as tarefas agendadas (modelo Tarefa: calcula_mtbf, calcula_mttr, "
+        "os_preventiva, ...) no próprio processo, sem o arranque a frio de um manage.py por comando.\n"
+        "Vários workers podem rodar em paralelo: cada tarefa é reservada por um só (lease no banco).\n"
+        "Use --uma-vez para rodar as tarefas vencidas e sair, --listar para ver a agenda, "
+        "--executar NOME para antecipar uma tarefa e --dry-run para apenas mostrar o que venceu."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostra as tarefas vencidas, sem executá-las.'
+        )
+        parser.add_argument(
+            '--uma-vez',
+            action='store_true',
+            help='Roda as tarefas vencidas e termina.'
+        )
+        parser.add_argument(
+            '--listar',
+            action='store_true',
+            help='Lista as tarefas, a próxima execução e o resultado da última.'
+        )
+        parser.add_argument(
+            '--executar',
+            type=str,
+            metavar='NOME',
+            help='Antecipa a tarefa com este nome para agora (o worker em execução pega-a na próxima volta).'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5.0,
+            help='Segundos de espera quando não há tarefa vencida (padrão: 5).'
+        )
+        parser.add_argument(
+            '--worker',
+            type=str,
+            default=agendador.nome_worker(),
+            help='Identificação deste worker no lease e no histórico (padrão: host:pid).'
+        )
+
+    def handle(self, *args, **options):
+        if options['executar']:
+            if not agendador.executar_agora(options['executar']):
+                raise CommandError(f'Tarefa "{options["executar"]}" não encontrada.')
+            self.stdout.write(self.style.SUCCESS(f'Tarefa "{options["executar"]}" antecipada para agora.'))
+            return
+
+        if options['listar'] or options.get('dry_run', False):
+            self._listar(somente_vencidas=not options['listar'])
+            return
+
+        self.stdout.write(self.style.NOTICE(f'Worker {options["worker"]} iniciado - {timezone.now()}'))
+        execucoes = agendador.rodar(
+            options['worker'],
+            agendador.Relogio(),
+            uma_vez=options['uma_vez'],
+            intervalo=options['intervalo'],
+            relatar=self._relatar,
+        )
+        self.stdout.write(self.style.SUCCESS(f'-------------- {execucoes} execução(ões). --------------'))
+
+    def _relatar(self, tarefa, execucao, sucesso, proxima):
+        duracao = timezone.now() - execucao.iniciada_em
+        if sucesso:
+            self.stdout.write(self.style.SUCCESS(f'{tarefa.nome}: concluída em {duracao}; próxima em {proxima}.'))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f'{tarefa.nome}: falhou (tentativa {execucao.tentativa}/{tarefa.max_tentativas}); próxima em {proxima}.'
+            ))
+
+    def _listar(self, somente_vencidas):
+        agora = timezone.now()
+        tarefas = Tarefa.objects.order_by('proxima_execucao')
+        if somente_vencidas:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: nenhuma tarefa será executada.'))
+            tarefas = tarefas.filter(ativa=True, proxima_execucao__lte=agora)
+        for tarefa in tarefas:
+            ultima = tarefa.execucoes.first()
+            resumo = f'última: {ultima.status} em {ultima.iniciada_em}' if ultima else 'nunca executada'
+            situacao = '' if tarefa.ativa else ' [pausada]'
+            self.stdout.write(f'{tarefa.nome} ({tarefa.comando}){situacao}: próxima {tarefa.proxima_execucao}; {resumo}')
+        if not tarefas:
+            self.stdout.write('Nenhuma tarefa.')
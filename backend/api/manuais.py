@@ -0,0 +1,258 @@
+import datetime
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from . import derivados_manual
+from .models import Ativo, UploadManual
+
+##
+## --- manuais.py ---
+## Upload retomável em partes e download com suporte a Range dos manuais dos Ativos.
+##
+## Upload: o app abre um UploadManual (nome + tamanho) e envia o arquivo em partes com
+## `Content-Range: bytes início-fim/total`. Cada parte é gravada direto no arquivo
+## temporário, em blocos, sem passar pela memória inteira. Se a conexão cair, o app
+## consulta quanto já foi recebido e continua daquele ponto. Ao receber o último byte,
+## o arquivo vai para o storage (Ativo.manual) e o SHA-256 é gravado em Ativo.manual_sha256;
+## um hash novo agenda a geração da miniatura e do texto (derivados_manual.py).
+##
+## Download: ETag (SHA-256), If-None-Match → 304, Range de um intervalo → 206. Com
+## MANUAL_ACCEL_REDIRECT_PREFIX configurado, o Python só devolve os cabeçalhos e o
+## servidor web (nginx: X-Accel-Redirect) envia o arquivo e trata o Range sozinho.
+##
+
+TAMANHO_BLOCO = 64 * 1024
+
+
+class UploadManualError(Exception):
+    """ Pedido de upload inválido; `status` é o código HTTP a devolver. """
+
+    def __init__(self, mensagem, status=400, recebido=None):
+        super().__init__(mensagem)
+        self.status = status
+        self.recebido = recebido
+
+
+def calcular_sha256(arquivo):
+    """ SHA-256 de um arquivo (objeto File/FieldFile ou aberto em modo binário), lido em blocos. """
+    sha = hashlib.sha256()
+    for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+        sha.update(bloco)
+    return sha.hexdigest()
+
+
+def atualizar_hash_manual(ativo_id):
+    """ Recalcula Ativo.manual_sha256 a partir do arquivo guardado (ex.: upload pelo formulário). """
+    ativo = Ativo.objects.filter(pk=ativo_id).only('pk', 'manual', 'manual_sha256').first()
+    if ativo is None:
+        return None
+    sha256 = ''
+    if ativo.manual:
+        with ativo.manual.open('rb') as arquivo:
+            sha256 = calcular_sha256(arquivo)
+    Ativo.objects.filter(pk=ativo_id).update(manual_sha256=sha256)
+    derivados_manual.agendar(ativo_id, sha256)
+    return sha256
+
+
+"""
+=============================== BLOCO 1 — Upload em partes ===============================
+`iniciar_upload` cria o registo, com o usuário dono, e o arquivo temporário (vazio).
+`receber_parte` valida o Content-Range: a parte tem de começar exatamente em `recebido`
+(senão devolve 409 com o deslocamento certo, para o app retomar) e o total tem de bater
+com o declarado. A linha do UploadManual é bloqueada (select_for_update) durante a
+escrita, para duas partes do mesmo upload não se sobreporem.
+============================================================================================
+"""
+RE_CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+def _caminho_temporario(upload_id):
+    return os.path.join(settings.MANUAL_UPLOAD_TEMP_DIR, f'{upload_id}.parcial')
+
+
+def iniciar_upload(ativo, nome_arquivo, tamanho_total, usuario):
+    if tamanho_total <= 0 or tamanho_total > settings.MANUAL_UPLOAD_MAX_SIZE:
+        raise UploadManualError(f'Tamanho inválido (máximo {settings.MANUAL_UPLOAD_MAX_SIZE} bytes).')
+    nome_arquivo = os.path.basename(nome_arquivo or '') or 'manual.pdf'
+    upload = UploadManual.objects.create(
+        ativo=ativo, usuario=usuario, nome_arquivo=nome_arquivo, tamanho_total=tamanho_total,
+    )
+    os.makedirs(settings.MANUAL_UPLOAD_TEMP_DIR, exist_ok=True)
+    open(_caminho_temporario(upload.pk), 'wb').close()
+    return upload
+
+
+def receber_parte(upload_id, content_range, tamanho_parte, fluxo):
+    """
+    Grava a parte lida de `fluxo` (file-like, ex.: request.stream) no deslocamento indicado.
+    Devolve o UploadManual atualizado (status 'concluido' quando o arquivo ficou completo).
+    """
+    encontrado = RE_CONTENT_RANGE.match(content_range or '')
+    if not encontrado:
+        raise UploadManualError('Cabeçalho Content-Range ausente ou inválido (use "bytes início-fim/total").')
+    inicio, fim, total = (int(valor) for valor in encontrado.groups())
+    if fim < inicio or tamanho_parte != fim - inicio + 1:
+        raise UploadManualError('Content-Range não corresponde ao tamanho do corpo enviado.')
+    if tamanho_parte > settings.MANUAL_UPLOAD_MAX_CHUNK:
+        raise UploadManualError(f'Parte maior que o permitido ({settings.MANUAL_UPLOAD_MAX_CHUNK} bytes).', status=413)
+
+    with transaction.atomic():
+        upload = UploadManual.objects.select_for_update().get(pk=upload_id)
+        if upload.status != 'em_andamento':
+            raise UploadManualError('Este upload já foi concluído.', status=409, recebido=upload.recebido)
+        if total != upload.tamanho_total or fim >= total:
+            raise UploadManualError('O total do Content-Range difere do tamanho declarado.')
+        if inicio != upload.recebido:
+            raise UploadManualError('A parte não começa no próximo byte esperado.', status=409, recebido=upload.recebido)
+
+        escritos = 0
+        with open(_caminho_temporario(upload.pk), 'r+b') as destino:
+            destino.seek(inicio)
+            while escritos < tamanho_parte:
+                bloco = fluxo.read(min(TAMANHO_BLOCO, tamanho_parte - escritos))
+                if not bloco:
+                    break
+                destino.write(bloco)
+                escritos += len(bloco)
+            # Conexão caída no meio da parte: guarda só o que chegou, para o app retomar dali
+            destino.truncate(inicio + escritos)
+
+        upload.recebido = inicio + escritos
+        if upload.recebido == upload.tamanho_total:
+            _concluir(upload)
+        upload.save()
+    return upload
+
+
+def _concluir(upload):
+    """ Envia o arquivo completo para o storage do Ativo.manual (copiado em blocos) e calcula o hash. """
+    caminho = _caminho_temporario(upload.pk)
+    with open(caminho, 'rb') as arquivo:
+        sha256 = calcular_sha256(arquivo)
+        arquivo.seek(0)
+        ativo = upload.ativo
+        ativo.manual.save(upload.nome_arquivo, File(arquivo), save=False)
+    ativo.manual_sha256 = sha256
+    ativo.save(update_fields=['manual', 'manual_sha256'])
+    derivados_manual.agendar(ativo.pk, sha256)
+    os.remove(caminho)
+    upload.status = 'concluido'
+    upload.sha256 = sha256
+    upload.concluido_em = timezone.now()
+
+
+def limpar_uploads_abandonados(horas):
+    """ Apaga os uploads em andamento sem atividade há mais de `horas` horas (e os temporários). """
+    limite = timezone.now() - datetime.timedelta(hours=horas)
+    abandonados = UploadManual.objects.filter(status='em_andamento', atualizado_em__lt=limite)
+    for upload_id in abandonados.values_list('pk', flat=True):
+        try:
+            os.remove(_caminho_temporario(upload_id))
+        except FileNotFoundError:
+            pass
+    return abandonados.delete()[0]
+
+
+"""
+================================= BLOCO 2 — Download =================================
+Só um intervalo por pedido (`bytes=início-fim`, `bytes=início-` ou `bytes=-sufixo`);
+pedidos com vários intervalos recebem o arquivo inteiro (200), como a RFC 9110 permite.
+If-Range com ETag diferente também devolve o arquivo inteiro.
+=======================================================================================
+"""
+RE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def interpretar_range(cabecalho, tamanho):
+    """ (início, fim) inclusivos, None para o arquivo inteiro, ou 'invalido' (→ 416). """
+    encontrado = RE_RANGE.match((cabecalho or '').strip())
+    if not encontrado or encontrado.group(1) == encontrado.group(2) == '':
+        return None
+    if tamanho == 0:
+        # Nenhum intervalo de um arquivo vazio é satisfazível (RFC 9110 §14.1.1)
+        return 'invalido'
+    inicio, fim = encontrado.groups()
+    if inicio == '':
+        sufixo = int(fim)
+        if sufixo == 0:
+            return 'invalido'
+        return max(tamanho - sufixo, 0), tamanho - 1
+    inicio = int(inicio)
+    fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio >= tamanho or fim < inicio:
+        return 'invalido'
+    return inicio, fim
+
+
+def _ler_intervalo(arquivo, inicio, quantidade):
+    try:
+        arquivo.seek(inicio)
+        while quantidade > 0:
+            bloco = arquivo.read(min(TAMANHO_BLOCO, quantidade))
+            if not bloco:
+                break
+            quantidade -= len(bloco)
+            yield bloco
+    finally:
+        arquivo.close()
+
+
+def resposta_download(request, ativo):
+    if not ativo.manual:
+        return HttpResponse(status=404)
+    if not ativo.manual_sha256:
+        ativo.manual_sha256 = atualizar_hash_manual(ativo.pk)
+
+    etag = f'"{ativo.manual_sha256}"'
+    nome = os.path.basename(ativo.manual.name)
+    cabecalhos = {
+        'ETag': etag,
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f'inline; filename="{nome}"',
+        'Cache-Control': 'private, max-age=0, must-revalidate',
+    }
+
+    if etag in [valor.strip() for valor in request.headers.get('If-None-Match', '').split(',')]:
+        resposta = HttpResponse(status=304)
+        for chave, valor in cabecalhos.items():
+            resposta[chave] = valor
+        return resposta
+
+    if settings.MANUAL_ACCEL_REDIRECT_PREFIX:
+        # O servidor web lê o arquivo (e trata Range/If-Range); o worker Python fica livre
+        resposta = HttpResponse(content_type='application/pdf')
+        resposta['X-Accel-Redirect'] = settings.MANUAL_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + ativo.manual.name
+        for chave, valor in cabecalhos.items():
+            resposta[chave] = valor
+        return resposta
+
+    tamanho = ativo.manual.size
+    intervalo = None
+    if request.headers.get('If-Range', etag) == etag:
+        intervalo = interpretar_range(request.headers.get('Range'), tamanho)
+    if intervalo == 'invalido':
+        resposta = HttpResponse(status=416)
+        resposta['Content-Range'] = f'bytes */{tamanho}'
+        return resposta
+
+    inicio, fim = intervalo or (0, tamanho - 1)
+    arquivo = ativo.manual.open('rb')
+    resposta = StreamingHttpResponse(
+        _ler_intervalo(arquivo, inicio, fim - inicio + 1),
+        status=206 if intervalo else 200,
+        content_type='application/pdf',
+    )
+    resposta['Content-Length'] = str(fim - inicio + 1)
+    if intervalo:
+        resposta['Content-Range'] = f'bytes {inicio}-{fim}/{tamanho}'
+    for chave, valor in cabecalhos.items():
+        resposta[chave] = valor
+    return resposta
@@ -0,0 +1,180 @@
+import math
+
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+from django.db import connection, transaction
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Ativo, CustoDeslocamento
+from .otimizador_rotas import matriz_distancias
+
+##
+## --- matriz_deslocamento.py ---
+## Manutenção e consulta da matriz de custos de deslocamento entre Ativos próximos
+## (modelo CustoDeslocamento). A otimização de rotas, a atribuição de técnicos e o
+## agendamento por região precisam de custos par a par; em vez de recalcular O(n²)
+## distâncias a cada pedido, os custos ficam guardados e só as linhas afetadas por
+## uma mudança de `localizacao` são recalculadas.
+##
+
+
+"""
+================= BLOCO 1 — Vizinhança de um Ativo (com o índice espacial) =================
+`Ativo.localizacao` é um PointField em SRID 4326 (graus), com índice GiST criado pelo
+GeoDjango. `ST_DWithin` em geometria só aceita raio em graus, então a busca é feita em
+duas etapas:
+
+1. `dwithin` com um raio em graus que cobre com folga TRAVEL_MATRIX_RADIUS_M metros
+   naquela latitude → filtro rápido pela caixa, usando o índice.
+2. `Distance` (distância geodésica em metros) → corte exato no raio pedido.
+==============================================================================================
+"""
+METROS_POR_GRAU = 111320.0
+
+
+def _raio_em_graus(raio_m, latitude):
+    # Um grau de longitude encolhe com cos(lat); usa-se o menor (pior caso) para não perder vizinhos
+    return raio_m / (METROS_POR_GRAU * max(math.cos(math.radians(abs(latitude))), 0.01))
+
+
+def vizinhos(ativo, raio_m=None):
+    """ Lista de (id, distancia_m) dos Ativos a até `raio_m` metros de `ativo`. """
+    raio_m = raio_m or settings.TRAVEL_MATRIX_RADIUS_M
+    ponto = ativo.localizacao
+    qs = (
+        Ativo.objects.exclude(pk=ativo.pk)
+        .filter(localizacao__dwithin=(ponto, _raio_em_graus(raio_m, ponto.y)))
+        .annotate(distancia=Distance('localizacao', ponto))
+        .filter(distancia__lte=D(m=raio_m))
+        .values_list('pk', 'distancia')
+    )
+    return [(pk, distancia.m) for pk, distancia in qs]
+
+
+"""
+======================== BLOCO 2 — Atualização incremental ========================
+`atualizar_ativo(ativo_id)` é chamado (via signal, depois do commit) quando um Ativo é
+criado ou muda de `localizacao`. Apaga apenas as linhas em que esse Ativo é origem ou
+destino — inclusive os custos rodoviários, que deixam de valer — e recria os pares
+com os vizinhos atuais, nas duas direções. As demais linhas da matriz não são tocadas.
+====================================================================================
+"""
+def atualizar_ativo(ativo_id, raio_m=None):
+    ativo = Ativo.objects.filter(pk=ativo_id).only('pk', 'localizacao').first()
+    if ativo is None:
+        return 0
+
+    pares = vizinhos(ativo, raio_m)
+    novos = []
+    for vizinho_id, distancia in pares:
+        novos.append(CustoDeslocamento(origem_id=ativo.pk, destino_id=vizinho_id, distancia_linha_reta=distancia))
+        novos.append(CustoDeslocamento(origem_id=vizinho_id, destino_id=ativo.pk, distancia_linha_reta=distancia))
+
+    with transaction.atomic():
+        CustoDeslocamento.objects.filter(origem_id=ativo.pk).delete()
+        CustoDeslocamento.objects.filter(destino_id=ativo.pk).delete()
+        # Dois Ativos vizinhos atualizados ao mesmo tempo (ex.: na importação) inserem o mesmo
+        # par (A, B): a distância é a mesma, então o segundo simplesmente não o grava
+        CustoDeslocamento.objects.bulk_create(novos, batch_size=1000, ignore_conflicts=True)
+    return len(novos)
+
+
+"""
+========================== BLOCO 3 — Reconstrução completa ==========================
+Usada pelo comando `matriz_deslocamento` (sem --ativo-id) para corrigir desvios (ex.: Ativos
+alterados por SQL direto, sem passar pelos signals). É um único INSERT ... SELECT com
+auto-junção espacial no banco — sem trazer os Ativos para o Python.
+
+Pares que continuam vizinhos são atualizados no lugar (ON CONFLICT), preservando os
+custos rodoviários já obtidos; pares que deixaram de existir são apagados no fim.
+=======================================================================================
+"""
+SQL_RECONSTRUIR = """
+    INSERT INTO api_custodeslocamento (origem_id, destino_id, distancia_linha_reta, atualizado_em)
+    SELECT a.id, b.id, ST_DistanceSphere(a.localizacao, b.localizacao), %(agora)s
+    FROM api_ativo a
+    JOIN api_ativo b
+      ON a.id <> b.id
+     AND ST_DWithin(a.localizacao, b.localizacao, %(raio_graus)s)
+     AND ST_DistanceSphere(a.localizacao, b.localizacao) <= %(raio_m)s
+    ON CONFLICT (origem_id, destino_id) DO UPDATE
+       SET distancia_linha_reta = EXCLUDED.distancia_linha_reta,
+           atualizado_em = EXCLUDED.atualizado_em
+"""
+
+
+def reconstruir(raio_m=None):
+    """ Recalcula toda a matriz. Devolve (pares_gravados, pares_removidos). """
+    raio_m = raio_m or settings.TRAVEL_MATRIX_RADIUS_M
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT MAX(ABS(ST_Y(localizacao))) FROM api_ativo')
+        latitude_maxima = cursor.fetchone()[0]
+    if latitude_maxima is None:
+        return 0, CustoDeslocamento.objects.all().delete()[0]
+
+    agora = timezone.now()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(SQL_RECONSTRUIR, {
+                'agora': agora,
+                'raio_graus': _raio_em_graus(raio_m, latitude_maxima),
+                'raio_m': raio_m,
+            })
+            gravados = cursor.rowcount
+        removidos, _ = CustoDeslocamento.objects.filter(atualizado_em__lt=agora).delete()
+    return gravados, removidos
+
+
+"""
+============================== BLOCO 4 — Consulta de custos ==============================
+`matriz_custos(ativo_ids)` devolve uma matriz NumPy NxN (na ordem de `ativo_ids`) com o
+melhor custo conhecido em metros: distância rodoviária quando existe em cache, senão a
+distância em linha reta guardada. Pares fora do raio da matriz (não guardados) são
+preenchidos com a distância haversine calculada na hora a partir das coordenadas.
+
+`registrar_custos_rodoviarios(pares)` grava custos rodoviários obtidos pelo proxy de
+rotas; cada item é (origem_id, destino_id, metros, segundos).
+===========================================================================================
+"""
+def matriz_custos(ativo_ids, coordenadas=None):
+    """
+    `coordenadas` (lista de (lat, lng) na mesma ordem) é opcional; se não for dada,
+    é lida do banco. Devolve um np.ndarray NxN em metros.
+    """
+    ativo_ids = list(ativo_ids)
+    indice = {pk: i for i, pk in enumerate(ativo_ids)}
+
+    if coordenadas is None:
+        pontos = dict(Ativo.objects.filter(pk__in=ativo_ids).values_list('pk', 'localizacao'))
+        coordenadas = [(pontos[pk].y, pontos[pk].x) for pk in ativo_ids]
+
+    custos = matriz_distancias(coordenadas)
+    guardados = CustoDeslocamento.objects.filter(origem_id__in=ativo_ids, destino_id__in=ativo_ids).values_list(
+        'origem_id', 'destino_id', 'distancia_linha_reta', 'distancia_rodoviaria'
+    )
+    for origem_id, destino_id, linha_reta, rodoviaria in guardados.iterator(chunk_size=5000):
+        custos[indice[origem_id], indice[destino_id]] = rodoviaria if rodoviaria is not None else linha_reta
+    return custos
+
+
+def registrar_custos_rodoviarios(pares):
+    """ Atualiza os custos rodoviários dos pares que já existem na matriz. Devolve quantos foram gravados. """
+    por_par = {(origem_id, destino_id): (metros, segundos) for origem_id, destino_id, metros, segundos in pares}
+    if not por_par:
+        return 0
+
+    existentes = list(CustoDeslocamento.objects.filter(
+        origem_id__in={o for o, _ in por_par}, destino_id__in={d for _, d in por_par},
+    ))
+    atualizar = []
+    for custo in existentes:
+        valores = por_par.get((custo.origem_id, custo.destino_id))
+        if valores is not None:
+            custo.distancia_rodoviaria, custo.duracao_rodoviaria = valores
+            custo.atualizado_em = timezone.now()
+            atualizar.append(custo)
+    CustoDeslocamento.objects.bulk_update(
+        atualizar, ['distancia_rodoviaria', 'duracao_rodoviaria', 'atualizado_em'], batch_size=1000
+    )
+    return len(atualizar)
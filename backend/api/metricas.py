@@ -0,0 +1,340 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from rest_framework.renderers import JSONRenderer
+
+##
+## --- metricas.py ---
+## Instrumentação de desempenho por pedido e por execução de comando.
+##
+## Para cada pedido às rotas de api/urls.py, o MetricasMiddleware mede o tempo total, as
+## queries (quantidade e tempo, via execute_wrapper em todas as conexões), o tempo de
+## serialização (JSONRendererMedido) e, no proxy de rotas, a latência da Google e se a
+## resposta veio da Google, de outro pedido em voo ou do cache (anotado por coalescencia.py).
+## Os valores vão para histogramas expostos em /metrics no formato de texto do Prometheus e,
+## com METRICS_SERVER_TIMING, para o cabeçalho Server-Timing (aba Network do navegador).
+##
+## Os histogramas ficam na memória do processo: com vários workers, cada um expõe os seus
+## (faça o scrape por worker, ou um worker por contêiner). Os comandos de gestão que herdam
+## de ComandoMedido mostram as mesmas medidas no fim de cada execução.
+##
+## Views assíncronas (ex.: /api/get-route-async/) têm o tempo total e o da Google medidos,
+## mas não as queries: estas correm noutras threads, fora do execute_wrapper.
+##
+
+BALDES_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BALDES_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+"""
+============================ BLOCO 1 — Histogramas e contadores ============================
+Implementação mínima do modelo do Prometheus: cada combinação de valores dos rótulos tem
+as suas contagens por balde, soma e total. `exposicao()` gera o texto de todo o registo.
+=============================================================================================
+"""
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(nomes, valores, extra=None):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Histograma:
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), baldes=BALDES_DURACAO):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.baldes = tuple(sorted(baldes))
+        self._trava = threading.Lock()
+        self._series = {}  # valores dos rótulos → [contagens por balde (+Inf no fim), soma]
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(rotulos.get(nome, '') for nome in self.rotulos)
+        indice = bisect.bisect_left(self.baldes, valor)
+        with self._trava:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.baldes) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def linhas(self):
+        with self._trava:
+            series = [(chave, list(contagens), soma) for chave, (contagens, soma) in sorted(self._series.items())]
+        for chave, contagens, soma in series:
+            acumulado = 0
+            for limite, contagem in zip(self.baldes + (float('inf'),), contagens):
+                acumulado += contagem
+                le = 'le="+Inf"' if limite == float('inf') else f'le="{_numero(limite)}"'
+                yield f'{self.nome}_bucket{_rotulos(self.rotulos, chave, le)} {acumulado}'
+            yield f'{self.nome}_sum{_rotulos(self.rotulos, chave)} {_numero(soma)}'
+            yield f'{self.nome}_count{_rotulos(self.rotulos, chave)} {acumulado}'
+
+
+class Contador:
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._trava = threading.Lock()
+        self._valores = {}
+
+    def incrementar(self, quantidade=1, **rotulos):
+        chave = tuple(rotulos.get(nome, '') for nome in self.rotulos)
+        with self._trava:
+            self._valores[chave] = self._valores.get(chave, 0) + quantidade
+
+    def linhas(self):
+        with self._trava:
+            valores = sorted(self._valores.items())
+        for chave, valor in valores:
+            yield f'{self.nome}{_rotulos(self.rotulos, chave)} {_numero(valor)}'
+
+
+duracao_requisicao = Histograma(
+    'api_requisicao_duracao_segundos', 'Tempo total do pedido no Django.', ('rota', 'metodo', 'status'))
+consultas_requisicao = Histograma(
+    'api_requisicao_db_consultas', 'Queries por pedido.', ('rota',), baldes=BALDES_CONSULTAS)
+duracao_db_requisicao = Histograma(
+    'api_requisicao_db_duracao_segundos', 'Tempo em queries por pedido.', ('rota',))
+duracao_serializacao = Histograma(
+    'api_requisicao_serializacao_duracao_segundos', 'Tempo de serialização (renderer) por pedido.', ('rota',))
+duracao_upstream = Histograma(
+    'api_upstream_duracao_segundos', 'Latência das chamadas ao serviço externo (com novas tentativas).', ('resultado',))
+cache_rotas = Contador(
+    'api_rota_proxy_respostas_total', 'Respostas do proxy de rotas pela origem: upstream, processo ou cache.', ('origem',))
+
+REGISTRO = [duracao_requisicao, consultas_requisicao, duracao_db_requisicao, duracao_serializacao, duracao_upstream, cache_rotas]
+
+
+def exposicao():
+    """ Texto de todo o registo no formato de exposição do Prometheus (versão 0.0.4). """
+    linhas = []
+    for metrica in REGISTRO:
+        linhas.append(f'# HELP {metrica.nome} {metrica.ajuda}')
+        linhas.append(f'# TYPE {metrica.nome} {metrica.tipo}')
+        linhas.extend(metrica.linhas())
+    return '\n'.join(linhas) + '\n'
+
+
+"""
+=============================== BLOCO 2 — Medição em curso ===============================
+A Medicao do pedido (ou do comando) em curso fica num ContextVar: o renderer, o cliente
+upstream e a coalescência somam nela sem precisar recebê-la por parâmetro. Threads
+auxiliares (ex.: os trechos de rota em paralelo) precisam de contextvars.copy_context().
+===========================================================================================
+"""
+_medicao_atual = contextvars.ContextVar('medicao_atual', default=None)
+
+
+class Medicao:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tempos = {'db': 0.0, 'serializacao': 0.0, 'upstream': 0.0}
+        self.anotacoes = {}
+        self._trava = threading.Lock()
+
+    def somar(self, nome, segundos, consulta=False):
+        with self._trava:
+            self.tempos[nome] += segundos
+            if consulta:
+                self.consultas += 1
+
+    @property
+    def duracao(self):
+        return time.perf_counter() - self.inicio
+
+    def server_timing(self):
+        partes = [f'total;dur={self.duracao * 1000:.1f}']
+        partes.append(f'db;dur={self.tempos["db"] * 1000:.1f};desc="{self.consultas} queries"')
+        if self.tempos['serializacao']:
+            partes.append(f'serializacao;dur={self.tempos["serializacao"] * 1000:.1f}')
+        if self.tempos['upstream']:
+            partes.append(f'upstream;dur={self.tempos["upstream"] * 1000:.1f}')
+        if 'cache' in self.anotacoes:
+            partes.append(f'cache;desc="{self.anotacoes["cache"]}"')
+        return ', '.join(partes)
+
+    def resumo(self):
+        texto = f'{self.duracao:.2f}s no total, {self.consultas} queries ({self.tempos["db"]:.2f}s no banco)'
+        if self.tempos['upstream']:
+            texto += f', {self.tempos["upstream"]:.2f}s no serviço externo'
+        return texto
+
+
+def somar(nome, segundos):
+    """ Soma `segundos` em `nome` ('serializacao', 'upstream') na medição em curso, se houver. """
+    medicao = _medicao_atual.get()
+    if medicao is not None:
+        medicao.somar(nome, segundos)
+
+
+def anotar(chave, valor):
+    medicao = _medicao_atual.get()
+    if medicao is not None:
+        medicao.anotacoes[chave] = valor
+
+
+def registrar_upstream(segundos, resultado):
+    """ Chamado pelo upstream.py a cada chamada ao serviço externo. """
+    duracao_upstream.observar(segundos, resultado=resultado)
+    somar('upstream', segundos)
+
+
+def registrar_origem_rota(origem):
+    """ Chamado pela coalescencia.py: 'upstream', 'processo' ou 'cache'. """
+    cache_rotas.incrementar(origem=origem)
+    anotar('cache', origem)
+
+
+@contextlib.contextmanager
+def medir():
+    """ Abre uma Medicao e mede todas as queries feitas nesta thread até o fim do bloco. """
+    medicao = Medicao()
+    token = _medicao_atual.set(medicao)
+
+    def contar_query(execute, sql, params, many, context):
+        antes = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            medicao.somar('db', time.perf_counter() - antes, consulta=True)
+
+    try:
+        with contextlib.ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(contar_query))
+            yield medicao
+    finally:
+        _medicao_atual.reset(token)
+
+
+"""
+================================ BLOCO 3 — Middleware ================================
+Só os pedidos resolvidos para rotas de api/urls.py entram nos histogramas, com o nome
+da view como rótulo (ex.: "ativo-historico") — nunca o caminho, que tem ids e faria
+uma série por Ativo. O status vai agrupado (2xx, 4xx, 5xx).
+=======================================================================================
+"""
+def _rota(request):
+    resolvida = getattr(request, 'resolver_match', None)
+    if resolvida is None or not resolvida.route.startswith('api/'):
+        return None
+    return resolvida.view_name or resolvida.route
+
+
+def _registrar(request, response, medicao):
+    rota = _rota(request)
+    if rota is None:
+        return
+    duracao_requisicao.observar(
+        medicao.duracao, rota=rota, metodo=request.method, status=f'{response.status_code // 100}xx',
+    )
+    consultas_requisicao.observar(medicao.consultas, rota=rota)
+    duracao_db_requisicao.observar(medicao.tempos['db'], rota=rota)
+    duracao_serializacao.observar(medicao.tempos['serializacao'], rota=rota)
+    if settings.METRICS_SERVER_TIMING:
+        response['Server-Timing'] = medicao.server_timing()
+
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with medir() as medicao:
+            response = self.get_response(request)
+            _registrar(request, response, medicao)
+        return response
+
+    async def __acall__(self, request):
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        try:
+            response = await self.get_response(request)
+            _registrar(request, response, medicao)
+        finally:
+            _medicao_atual.reset(token)
+        return response
+
+
+class JSONRendererMedido(JSONRenderer):
+    """ JSONRenderer do DRF que soma o tempo de serialização na medição do pedido. """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        antes = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            somar('serializacao', time.perf_counter() - antes)
+
+
+"""
+============================ BLOCO 4 — Comandos de gestão ============================
+Comandos que herdam de ComandoMedido (em vez de BaseCommand) escrevem, no fim de cada
+execução, o tempo total, as queries e o tempo no banco e no serviço externo — também
+quando rodados pelo worker_tarefas, cuja saída fica guardada na ExecucaoTarefa.
+Com --profile [speedscope|collapsed], gravam também um perfil (ver perfilamento.py).
+=======================================================================================
+"""
+class ComandoMedido(BaseCommand):
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument(
+            '--profile',
+            nargs='?',
+            const='speedscope',
+            choices=['speedscope', 'collapsed'],
+            help='Grava um perfil da execução (pilhas amostradas e SQL) em PROFILE_DIR; formato padrão: speedscope.'
+        )
+        return parser
+
+    def execute(self, *args, **options):
+        if not options.get('profile'):
+            return self._executar_medido(*args, **options)
+
+        from .perfilamento import Perfil, salvar
+
+        perfil = Perfil()
+        try:
+            with perfil:
+                return self._executar_medido(*args, **options)
+        finally:
+            registro = salvar(perfil, 'comando', self.__module__.rsplit('.', 1)[-1], formato=options['profile'])
+            self.stderr.write(f'Perfil gravado em {registro.arquivo.path} (id {registro.pk}).', style_func=self.style.NOTICE)
+
+    def _executar_medido(self, *args, **options):
+        with medir() as medicao:
+            try:
+                return super().execute(*args, **options)
+            finally:
+                # Na saída de erro: alguns comandos escrevem dados na saída padrão (ex.: exporta_historico)
+                self.stderr.write(f'Métricas: {medicao.resumo()}.', style_func=self.style.NOTICE)
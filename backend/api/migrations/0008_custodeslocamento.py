@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_alter_ativo_mtbf_alter_ativo_mttr'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustoDeslocamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distancia_linha_reta', models.FloatField()),
+                ('distancia_rodoviaria', models.IntegerField(blank=True, null=True)),
+                ('duracao_rodoviaria', models.IntegerField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('destino', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='custos_entrada', to='api.ativo')),
+                ('origem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='custos_saida', to='api.ativo')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('origem', 'destino'), name='custo_deslocamento_par_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_custodeslocamento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordemservico',
+            name='tecnico',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='os_atribuidas', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='RotaPlanejada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('paradas', models.JSONField(default=list)),
+                ('distancia_estimada', models.FloatField(default=0)),
+                ('rota', models.JSONField(blank=True, null=True)),
+                ('criado_em', models.DateTimeField(auto_now=True)),
+                ('tecnico', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rotas_planejadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('tecnico', 'data'), name='rota_planejada_tecnico_data_unica', nulls_distinct=False)],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_ordemservico_tecnico_rotaplanejada'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='manutencao',
+            name='ordem_servico',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='api.ordemservico'),
+        ),
+    ]
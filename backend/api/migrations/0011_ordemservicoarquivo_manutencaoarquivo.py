@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_alter_manutencao_ordem_servico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrdemServicoArquivo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('titulo', models.CharField(max_length=255)),
+                ('tipo', models.CharField(choices=[('corretiva', 'Corretiva'), ('preditiva', 'Preditiva'), ('preventiva', 'Preventiva')], max_length=20)),
+                ('descricao', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('finalizada', 'Finalizada')], max_length=20)),
+                ('data_criacao', models.DateTimeField()),
+                ('data_prevista', models.DateTimeField()),
+                ('arquivado_em', models.DateTimeField(auto_now_add=True)),
+                ('ativo', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ordens_arquivadas', to='api.ativo')),
+                ('solicitante', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('tecnico', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ativo', 'data_criacao'], name='os_arquivo_ativo_data')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ManutencaoArquivo',
+            fields=[
+                ('ordem_servico', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='manutencao', serialize=False, to='api.ordemservicoarquivo')),
+                ('data_inicio_execucao', models.DateTimeField()),
+                ('data_fim_execucao', models.DateTimeField()),
+                ('tempo_gasto', models.DurationField()),
+                ('observacoes', models.TextField(blank=True, null=True)),
+                ('usuario_executor', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Preenche o resumo dos Ativos já existentes; sem isto, os signals aplicariam deltas a linhas
+# zeradas. Cópia do SQL de api.resumo_manutencao.reconstruir() (todos os Ativos) nesta
+# migração, para ela fazer sempre o mesmo mesmo que aquele módulo mude.
+PREENCHER_RESUMO = """
+    INSERT INTO api_resumomanutencaoativo (
+        ativo_id, pendentes, preventivas_pendentes, preventivas_total, proxima_data_prevista,
+        ultimo_fim_manutencao, ultimo_fim_preventiva, ultima_prevista_preventiva, atualizado_em
+    )
+    SELECT a.id,
+           COALESCE(o.pendentes, 0), COALESCE(o.preventivas_pendentes, 0), COALESCE(o.preventivas_total, 0),
+           o.proxima_data_prevista, m.ultimo_fim_manutencao, m.ultimo_fim_preventiva,
+           o.ultima_prevista_preventiva, now()
+    FROM api_ativo a
+    LEFT JOIN (
+        SELECT ativo_id,
+               COUNT(*) FILTER (WHERE status = 'pendente') AS pendentes,
+               COUNT(*) FILTER (WHERE status = 'pendente' AND tipo = 'preventiva') AS preventivas_pendentes,
+               COUNT(*) FILTER (WHERE tipo = 'preventiva') AS preventivas_total,
+               MIN(data_prevista) FILTER (WHERE status = 'pendente') AS proxima_data_prevista,
+               MAX(data_prevista) FILTER (WHERE status = 'finalizada' AND tipo = 'preventiva') AS ultima_prevista_preventiva
+        FROM (
+            SELECT ativo_id, tipo, status, data_prevista FROM api_ordemservico
+            UNION ALL
+            SELECT ativo_id, tipo, status, data_prevista FROM api_ordemservicoarquivo
+        ) ordens
+        GROUP BY ativo_id
+    ) o ON o.ativo_id = a.id
+    LEFT JOIN (
+        SELECT ordens.ativo_id,
+               MAX(manutencoes.data_fim_execucao) AS ultimo_fim_manutencao,
+               MAX(manutencoes.data_fim_execucao) FILTER (WHERE ordens.tipo = 'preventiva') AS ultimo_fim_preventiva
+        FROM (
+            SELECT ordem_servico_id, data_fim_execucao FROM api_manutencao
+            UNION ALL
+            SELECT ordem_servico_id, data_fim_execucao FROM api_manutencaoarquivo
+        ) manutencoes
+        JOIN (
+            SELECT id, ativo_id, tipo FROM api_ordemservico
+            UNION ALL
+            SELECT id, ativo_id, tipo FROM api_ordemservicoarquivo
+        ) ordens ON ordens.id = manutencoes.ordem_servico_id
+        GROUP BY ordens.ativo_id
+    ) m ON m.ativo_id = a.id
+    ON CONFLICT (ativo_id) DO NOTHING
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_ordemservicoarquivo_manutencaoarquivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoManutencaoAtivo',
+            fields=[
+                ('ativo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumo_manutencao', serialize=False, to='api.ativo')),
+                ('pendentes', models.IntegerField(default=0)),
+                ('preventivas_pendentes', models.IntegerField(default=0)),
+                ('preventivas_total', models.IntegerField(default=0)),
+                ('proxima_data_prevista', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_fim_manutencao', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_fim_preventiva', models.DateTimeField(blank=True, null=True)),
+                ('ultima_prevista_preventiva', models.DateTimeField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['proxima_data_prevista'], name='resumo_proxima_prevista'), models.Index(fields=['pendentes'], name='resumo_pendentes')],
+            },
+        ),
+        migrations.RunSQL(PREENCHER_RESUMO, reverse_sql=migrations.RunSQL.noop),
+    ]
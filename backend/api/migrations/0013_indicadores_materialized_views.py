@@ -0,0 +1,89 @@
+# Materialized views do painel de indicadores (ver api/indicadores.py)
+#
+# O SQL fica copiado aqui, e não importado de api.indicadores: a migração tem de criar sempre
+# as mesmas views. Mudanças nas views vão numa migração nova.
+
+from django.db import migrations
+
+
+ORDENS_VIVAS_E_ARQUIVADAS = """
+    SELECT id, ativo_id, tecnico_id, tipo, status, data_criacao, data_prevista FROM api_ordemservico
+    UNION ALL
+    SELECT id, ativo_id, tecnico_id, tipo, status, data_criacao, data_prevista FROM api_ordemservicoarquivo
+"""
+
+CRIAR_VIEWS = [
+    f"""
+    CREATE MATERIALIZED VIEW mv_indicadores_backlog AS
+        SELECT status, tipo,
+               COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE status = 'pendente' AND data_prevista < now()) AS vencidas,
+               now() AS atualizado_em
+        FROM ({ORDENS_VIVAS_E_ARQUIVADAS}) ordens
+        GROUP BY status, tipo
+    WITH DATA
+    """,
+    "CREATE UNIQUE INDEX mv_indicadores_backlog_chave ON mv_indicadores_backlog (status, tipo)",
+    f"""
+    CREATE MATERIALIZED VIEW mv_indicadores_ativos AS
+        SELECT a.id AS ativo_id, a.nome, a.mtbf, a.mttr,
+               COUNT(o.id) FILTER (WHERE o.status = 'pendente') AS pendentes,
+               COUNT(o.id) FILTER (WHERE o.status = 'pendente' AND o.data_prevista < now()) AS vencidas,
+               COUNT(o.id) FILTER (WHERE o.tipo = 'corretiva' AND o.data_criacao >= now() - interval '365 days') AS corretivas_12m,
+               now() AS atualizado_em
+        FROM api_ativo a
+        LEFT JOIN ({ORDENS_VIVAS_E_ARQUIVADAS}) o ON o.ativo_id = a.id
+        GROUP BY a.id, a.nome, a.mtbf, a.mttr
+    WITH DATA
+    """,
+    "CREATE UNIQUE INDEX mv_indicadores_ativos_chave ON mv_indicadores_ativos (ativo_id)",
+    """
+    CREATE MATERIALIZED VIEW mv_indicadores_frota AS
+        SELECT 1 AS id,
+               COUNT(*) AS ativos,
+               AVG(mtbf) FILTER (WHERE mtbf > 0) AS mtbf_media,
+               percentile_cont(0.1) WITHIN GROUP (ORDER BY mtbf) FILTER (WHERE mtbf > 0) AS mtbf_p10,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY mtbf) FILTER (WHERE mtbf > 0) AS mtbf_p50,
+               percentile_cont(0.9) WITHIN GROUP (ORDER BY mtbf) FILTER (WHERE mtbf > 0) AS mtbf_p90,
+               AVG(mttr) FILTER (WHERE mttr > 0) AS mttr_media,
+               percentile_cont(0.1) WITHIN GROUP (ORDER BY mttr) FILTER (WHERE mttr > 0) AS mttr_p10,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY mttr) FILTER (WHERE mttr > 0) AS mttr_p50,
+               percentile_cont(0.9) WITHIN GROUP (ORDER BY mttr) FILTER (WHERE mttr > 0) AS mttr_p90,
+               now() AS atualizado_em
+        FROM api_ativo
+    WITH DATA
+    """,
+    "CREATE UNIQUE INDEX mv_indicadores_frota_chave ON mv_indicadores_frota (id)",
+    f"""
+    CREATE MATERIALIZED VIEW mv_indicadores_tecnicos AS
+        SELECT u.id AS tecnico_id, u.username,
+               COUNT(*) AS atribuidas,
+               COUNT(*) FILTER (WHERE o.status = 'finalizada') AS finalizadas,
+               COUNT(*) FILTER (WHERE o.status = 'pendente' AND o.data_prevista < now()) AS vencidas,
+               COUNT(*) FILTER (WHERE o.status = 'finalizada')::float / COUNT(*) AS taxa_conclusao,
+               now() AS atualizado_em
+        FROM ({ORDENS_VIVAS_E_ARQUIVADAS}) o
+        JOIN api_customuser u ON u.id = o.tecnico_id
+        GROUP BY u.id, u.username
+    WITH DATA
+    """,
+    "CREATE UNIQUE INDEX mv_indicadores_tecnicos_chave ON mv_indicadores_tecnicos (tecnico_id)",
+]
+
+REMOVER_VIEWS = [
+    "DROP MATERIALIZED VIEW IF EXISTS mv_indicadores_backlog",
+    "DROP MATERIALIZED VIEW IF EXISTS mv_indicadores_ativos",
+    "DROP MATERIALIZED VIEW IF EXISTS mv_indicadores_frota",
+    "DROP MATERIALIZED VIEW IF EXISTS mv_indicadores_tecnicos",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_resumomanutencaoativo'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CRIAR_VIEWS, reverse_sql=REMOVER_VIEWS),
+    ]
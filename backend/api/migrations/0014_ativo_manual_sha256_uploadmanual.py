@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:40
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_indicadores_materialized_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ativo',
+            name='manual_sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='UploadManual',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nome_arquivo', models.CharField(max_length=255)),
+                ('tamanho_total', models.BigIntegerField()),
+                ('recebido', models.BigIntegerField(default=0)),
+                ('status', models.CharField(choices=[('em_andamento', 'Em andamento'), ('concluido', 'Concluído')], default='em_andamento', max_length=20)),
+                ('sha256', models.CharField(blank=True, default='', max_length=64)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('ativo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads_manual', to='api.ativo')),
+            ],
+        ),
+    ]
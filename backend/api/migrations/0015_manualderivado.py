@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_ativo_manual_sha256_uploadmanual'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ManualDerivado',
+            fields=[
+                ('ativo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='manual_derivado', serialize=False, to='api.ativo')),
+                ('sha256', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('pronto', 'Pronto'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('miniatura', models.FileField(blank=True, null=True, upload_to='manuais/miniaturas/')),
+                ('paginas', models.IntegerField(blank=True, null=True)),
+                ('texto', models.TextField(blank=True, default='')),
+                ('busca', django.contrib.postgres.search.SearchVectorField(blank=True, null=True)),
+                ('tentativas', models.IntegerField(default=0)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['busca'], name='manual_derivado_busca'), models.Index(fields=['status', 'atualizado_em'], name='manual_derivado_fila')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:05
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_manualderivado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarefa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, unique=True)),
+                ('comando', models.CharField(choices=[('calcula_mtbf', 'Cálculo do MTBF'), ('calcula_mttr', 'Cálculo do MTTR'), ('os_preventiva', 'Geração de O.S. preventivas'), ('atualiza_indicadores', 'Atualização dos indicadores'), ('arquiva_ordens', 'Arquivamento de O.S.'), ('particiona_historico', 'Partições do histórico'), ('planeja_rotas', 'Planejamento das rotas'), ('limpa_uploads_manual', 'Limpeza de uploads de manual')], max_length=50)),
+                ('argumentos', models.JSONField(blank=True, default=dict)),
+                ('intervalo', models.DurationField()),
+                ('proxima_execucao', models.DateTimeField()),
+                ('ativa', models.BooleanField(default=True)),
+                ('max_tentativas', models.IntegerField(default=3)),
+                ('espera_retentativa', models.DurationField(default=datetime.timedelta(seconds=300))),
+                ('tentativa', models.IntegerField(default=0)),
+                ('bloqueada_ate', models.DateTimeField(blank=True, null=True)),
+                ('bloqueada_por', models.CharField(blank=True, default='', max_length=100)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ativa', 'proxima_execucao'], name='tarefa_fila')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExecucaoTarefa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tentativa', models.IntegerField()),
+                ('worker', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('executando', 'Executando'), ('sucesso', 'Sucesso'), ('falha', 'Falha'), ('abandonada', 'Abandonada')], default='executando', max_length=20)),
+                ('iniciada_em', models.DateTimeField()),
+                ('finalizada_em', models.DateTimeField(blank=True, null=True)),
+                ('progresso_atual', models.IntegerField(default=0)),
+                ('progresso_total', models.IntegerField(blank=True, null=True)),
+                ('saida', models.TextField(blank=True, default='')),
+                ('erro', models.TextField(blank=True, default='')),
+                ('tarefa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='execucoes', to='api.tarefa')),
+            ],
+            options={
+                'ordering': ['-iniciada_em'],
+                'indexes': [models.Index(fields=['tarefa', '-iniciada_em'], name='execucao_tarefa_data')],
+            },
+        ),
+    ]
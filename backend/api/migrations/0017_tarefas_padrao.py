@@ -0,0 +1,43 @@
+# Tarefas que substituem as entradas de cron de calcula_mtbf, calcula_mttr e os_preventiva
+
+import datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+TAREFAS_PADRAO = [
+    # nome, comando, hora da 1ª execução (UTC)
+    ('MTBF diário', 'calcula_mtbf', 2),
+    ('MTTR diário', 'calcula_mttr', 2),
+    ('Preventivas diárias', 'os_preventiva', 3),
+]
+
+
+def criar_tarefas(apps, schema_editor):
+    Tarefa = apps.get_model('api', 'Tarefa')
+    amanha = timezone.now().replace(minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+    for nome, comando, hora in TAREFAS_PADRAO:
+        Tarefa.objects.get_or_create(
+            nome=nome,
+            defaults={
+                'comando': comando,
+                'intervalo': datetime.timedelta(days=1),
+                'proxima_execucao': amanha.replace(hour=hora),
+            },
+        )
+
+
+def remover_tarefas(apps, schema_editor):
+    Tarefa = apps.get_model('api', 'Tarefa')
+    Tarefa.objects.filter(nome__in=[nome for nome, _, _ in TAREFAS_PADRAO]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_tarefa_execucaotarefa'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_tarefas, remover_tarefas),
+    ]
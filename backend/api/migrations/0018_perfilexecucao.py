@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:20
+
+import api.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_tarefas_padrao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfilExecucao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origem', models.CharField(choices=[('pedido', 'Pedido (?profile=1)'), ('amostra', 'Pedido amostrado'), ('comando', 'Comando de gestão')], max_length=20)),
+                ('alvo', models.CharField(max_length=200)),
+                ('metodo', models.CharField(blank=True, default='', max_length=10)),
+                ('caminho', models.CharField(blank=True, default='', max_length=500)),
+                ('status', models.IntegerField(blank=True, null=True)),
+                ('duracao', models.FloatField()),
+                ('consultas', models.IntegerField(default=0)),
+                ('tempo_consultas', models.FloatField(default=0)),
+                ('amostras', models.IntegerField(default=0)),
+                ('formato', models.CharField(choices=[('speedscope', 'Speedscope (JSON)'), ('collapsed', 'Pilhas colapsadas (flamegraph)')], default='speedscope', max_length=20)),
+                ('arquivo', models.FileField(storage=api.models.armazenamento_perfis, upload_to='%Y/%m/')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['alvo', '-criado_em'], name='perfil_alvo_data')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_perfilexecucao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tarefa',
+            name='comando',
+            field=models.CharField(choices=[('calcula_mtbf', 'Cálculo do MTBF'), ('calcula_mttr', 'Cálculo do MTTR'), ('os_preventiva', 'Geração de O.S. preventivas'), ('os_preditiva', 'Geração de O.S. preditivas'), ('atualiza_indicadores', 'Atualização dos indicadores'), ('arquiva_ordens', 'Arquivamento de O.S.'), ('particiona_historico', 'Partições do histórico'), ('planeja_rotas', 'Planejamento das rotas'), ('limpa_uploads_manual', 'Limpeza de uploads de manual')], max_length=50),
+        ),
+    ]
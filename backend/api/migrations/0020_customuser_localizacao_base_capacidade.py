@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:40
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_alter_tarefa_comando'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='localizacao_base',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='capacidade_diaria',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='tarefa',
+            name='comando',
+            field=models.CharField(choices=[('calcula_mtbf', 'Cálculo do MTBF'), ('calcula_mttr', 'Cálculo do MTTR'), ('os_preventiva', 'Geração de O.S. preventivas'), ('os_preditiva', 'Geração de O.S. preditivas'), ('atribui_tecnicos', 'Atribuição de O.S. a técnicos'), ('atualiza_indicadores', 'Atualização dos indicadores'), ('arquiva_ordens', 'Arquivamento de O.S.'), ('particiona_historico', 'Partições do histórico'), ('planeja_rotas', 'Planejamento das rotas'), ('limpa_uploads_manual', 'Limpeza de uploads de manual')], max_length=50),
+        ),
+    ]
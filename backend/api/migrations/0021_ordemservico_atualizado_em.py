@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 21:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_customuser_localizacao_base_capacidade'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordemservico',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
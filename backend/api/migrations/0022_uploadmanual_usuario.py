@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 22:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_ordemservico_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadmanual',
+            name='usuario',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploads_manual', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -1,7 +1,13 @@
+import datetime
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.contrib.gis.db import models as gis_models
 from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 # Modelos para o banco de dados usando ORM (Object Relational Mapper) permitindo interagir com as tabelas, colunas e registros de dados com a sintaxe do Pyhton
 
@@ -20,6 +26,10 @@ class CustomUser(AbstractUser):
     telefone = models.CharField(max_length=15, blank=True, null=True)
     cargo = models.CharField(max_length=10, choices=CARGO_CHOICES, default='tecnico')
     situacao = models.CharField(max_length=10, choices=SITUACAO_CHOICES, default='ativo')
+    # Técnicos: ponto de partida do dia (índice GiST, usado na atribuição de O.S. e no planejamento das rotas)
+    localizacao_base = gis_models.PointField(blank=True, null=True)
+    # O.S. por dia; vazio = ASSIGNMENT_DEFAULT_CAPACITY (ver api/atribuicao.py)
+    capacidade_diaria = models.PositiveIntegerField(blank=True, null=True)
 
     def __str__(self):
         return self.username
@@ -32,6 +42,8 @@ class Ativo(models.Model):
     modelo = models.CharField(max_length=255)
     periodicidade = models.IntegerField()
     manual = models.FileField(upload_to='manuais/', blank=True, null=True)
+    # SHA-256 do manual: ETag do download e chave dos derivados (ver api/manuais.py)
+    manual_sha256 = models.CharField(max_length=64, blank=True, default='')
     endereco = models.CharField(max_length=255)
     # GeoDjango: Um único campo para guardar o ponto geográfico (longitude, latitude).
     localizacao = gis_models.PointField()
@@ -62,13 +74,20 @@ class OrdemServico(models.Model):
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_prevista = models.DateTimeField()
     solicitante = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='os_solicitadas')
+    # Técnico responsável pela execução (usado no planejamento das rotas do dia)
+    tecnico = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='os_atribuidas')
+    # Última alteração (status, técnico...): a exportação Parquet incremental reescreve os meses
+    # das O.S. alteradas desde a exportação anterior. Os .update() em massa gravam-no à mão.
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"O.S. #{self.id} - {self.titulo}"
 
 #Modelo para Manutenção
 class Manutencao(models.Model):
-    ordem_servico = models.OneToOneField(OrdemServico, on_delete=models.CASCADE, primary_key=True)
+    # Sem FOREIGN KEY no banco: api_ordemservico pode ser particionada (ver api/particionamento.py).
+    # O CASCADE continua a ser feito pelo Django.
+    ordem_servico = models.OneToOneField(OrdemServico, on_delete=models.CASCADE, primary_key=True, db_constraint=False)
     usuario_executor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     data_inicio_execucao = models.DateTimeField()
     data_fim_execucao = models.DateTimeField()
@@ -76,4 +95,283 @@ class Manutencao(models.Model):
     observacoes = models.TextField(blank=True, null=True)
 
     def __str__(self):
-        return f"Manutenção para OS #{self.ordem_servico.id}"
\ No newline at end of file
+        return f"Manutenção para OS #{self.ordem_servico.id}"
+
+# Modelo para a matriz de custos de deslocamento entre Ativos próximos
+# Guarda um par (origem, destino) por direção para cada Ativo a até TRAVEL_MATRIX_RADIUS_M
+# metros de distância. A distância em linha reta é sempre preenchida; os custos rodoviários
+# (distância e duração devolvidas pela Google) são opcionais e ficam em cache até o Ativo mudar de lugar.
+class CustoDeslocamento(models.Model):
+    origem = models.ForeignKey(Ativo, on_delete=models.CASCADE, related_name='custos_saida')
+    destino = models.ForeignKey(Ativo, on_delete=models.CASCADE, related_name='custos_entrada')
+    distancia_linha_reta = models.FloatField()  # metros
+    distancia_rodoviaria = models.IntegerField(blank=True, null=True)  # metros
+    duracao_rodoviaria = models.IntegerField(blank=True, null=True)  # segundos
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['origem', 'destino'], name='custo_deslocamento_par_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.origem_id} -> {self.destino_id}: {self.distancia_linha_reta:.0f} m"
+
+
+
+# Modelo para as rotas do dia pré-calculadas (comando planeja_rotas)
+# Uma rota por técnico e por dia (tecnico nulo = O.S. pendentes ainda sem técnico).
+# `paradas` guarda as paradas na ordem de visita e `rota` a resposta da Google já costurada,
+# no mesmo formato devolvido por /api/get-route/, para o app apenas desenhar.
+class RotaPlanejada(models.Model):
+    tecnico = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='rotas_planejadas')
+    data = models.DateField()
+    paradas = models.JSONField(default=list)
+    distancia_estimada = models.FloatField(default=0)  # metros
+    rota = models.JSONField(blank=True, null=True)
+    criado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tecnico', 'data'], name='rota_planejada_tecnico_data_unica', nulls_distinct=False),
+        ]
+
+    def __str__(self):
+        return f"Rota de {self.tecnico or 'sem técnico'} em {self.data}"
+
+
+
+# Modelos do arquivo morto: O.S. finalizadas antigas e as suas manutenções, movidas em lote
+# pelo comando `arquiva_ordens` para manter pequenas as tabelas quentes (ver api/historico.py).
+# Guardam o mesmo `id` da O.S. original. As FKs não têm constraint no banco, para que as
+# inserções em lote não verifiquem nem bloqueiem as tabelas referenciadas.
+class OrdemServicoArquivo(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    titulo = models.CharField(max_length=255)
+    tipo = models.CharField(max_length=20, choices=OrdemServico.TIPO_CHOICES)
+    descricao = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=OrdemServico.STATUS_CHOICES)
+    ativo = models.ForeignKey(Ativo, on_delete=models.SET_NULL, null=True, related_name='ordens_arquivadas', db_constraint=False)
+    data_criacao = models.DateTimeField()
+    data_prevista = models.DateTimeField()
+    solicitante = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+', db_constraint=False)
+    tecnico = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_constraint=False)
+    arquivado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ativo', 'data_criacao'], name='os_arquivo_ativo_data'),
+        ]
+
+    def __str__(self):
+        return f"O.S. #{self.id} - {self.titulo} (arquivada)"
+
+
+class ManutencaoArquivo(models.Model):
+    ordem_servico = models.OneToOneField(OrdemServicoArquivo, on_delete=models.CASCADE, primary_key=True, related_name='manutencao')
+    usuario_executor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+', db_constraint=False)
+    data_inicio_execucao = models.DateTimeField()
+    data_fim_execucao = models.DateTimeField()
+    tempo_gasto = models.DurationField()
+    observacoes = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Manutenção para OS #{self.ordem_servico_id} (arquivada)"
+
+
+
+# Modelo com o resumo de manutenção de cada Ativo (uma linha por Ativo), desnormalizado para
+# responder sem varrer as O.S.: há preventiva pendente? quando terminou a última manutenção?
+# quantas O.S. pendentes? qual a próxima data prevista? Inclui as O.S. do arquivo morto.
+# Mantido pelos signals na mesma transação da O.S. (ver api/resumo_manutencao.py).
+class ResumoManutencaoAtivo(models.Model):
+    ativo = models.OneToOneField(Ativo, on_delete=models.CASCADE, primary_key=True, related_name='resumo_manutencao')
+    pendentes = models.IntegerField(default=0)
+    preventivas_pendentes = models.IntegerField(default=0)
+    preventivas_total = models.IntegerField(default=0)
+    proxima_data_prevista = models.DateTimeField(blank=True, null=True)  # menor data_prevista entre as pendentes
+    ultimo_fim_manutencao = models.DateTimeField(blank=True, null=True)
+    ultimo_fim_preventiva = models.DateTimeField(blank=True, null=True)
+    ultima_prevista_preventiva = models.DateTimeField(blank=True, null=True)  # entre as preventivas finalizadas
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['proxima_data_prevista'], name='resumo_proxima_prevista'),
+            models.Index(fields=['pendentes'], name='resumo_pendentes'),
+        ]
+
+    def tem_vencidas(self, agora):
+        """ Há O.S. pendentes com data prevista já passada? """
+        return self.proxima_data_prevista is not None and self.proxima_data_prevista < agora
+
+    def __str__(self):
+        return f"Resumo de manutenção do ativo {self.ativo_id}"
+
+
+
+# Modelo para os uploads do manual em partes (retomáveis), ver api/manuais.py
+# O arquivo vai sendo gravado num temporário; `recebido` é o próximo byte esperado.
+class UploadManual(models.Model):
+    STATUS_CHOICES = [
+        ('em_andamento', 'Em andamento'),
+        ('concluido', 'Concluído'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    ativo = models.ForeignKey(Ativo, on_delete=models.CASCADE, related_name='uploads_manual')
+    # Quem abriu o upload: só ele pode enviar as partes. Vazio nos uploads anteriores à coluna,
+    # ou de usuários apagados, ficam sem dono e saem pelo limpa_uploads_manual
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='uploads_manual')
+    nome_arquivo = models.CharField(max_length=255)
+    tamanho_total = models.BigIntegerField()
+    recebido = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='em_andamento')
+    sha256 = models.CharField(max_length=64, blank=True, default='')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.recebido}/{self.tamanho_total} bytes)"
+
+
+# Modelo para os derivados do manual do Ativo: miniatura da 1ª página e texto extraído (com índice de busca).
+# Gerados em segundo plano (comando gera_derivados_manual, ver api/derivados_manual.py) e refeitos
+# só quando o hash do manual muda (`sha256` ≠ Ativo.manual_sha256).
+class ManualDerivado(models.Model):
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('pronto', 'Pronto'),
+        ('erro', 'Erro'),
+    ]
+
+    ativo = models.OneToOneField(Ativo, on_delete=models.CASCADE, primary_key=True, related_name='manual_derivado')
+    sha256 = models.CharField(max_length=64)  # hash do manual a partir do qual os derivados são (ou serão) gerados
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    miniatura = models.FileField(upload_to='manuais/miniaturas/', blank=True, null=True)
+    paginas = models.IntegerField(blank=True, null=True)
+    texto = models.TextField(blank=True, default='')
+    busca = SearchVectorField(blank=True, null=True)
+    tentativas = models.IntegerField(default=0)
+    erro = models.TextField(blank=True, default='')
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['busca'], name='manual_derivado_busca'),
+            models.Index(fields=['status', 'atualizado_em'], name='manual_derivado_fila'),
+        ]
+
+    def __str__(self):
+        return f"Derivados do manual de {self.ativo_id} ({self.status})"
+
+
+# Modelo para as tarefas agendadas (comandos de manutenção rodados pelo worker_tarefas, ver api/agendador.py)
+class Tarefa(models.Model):
+    COMANDO_CHOICES = [
+        ('calcula_mtbf', 'Cálculo do MTBF'),
+        ('calcula_mttr', 'Cálculo do MTTR'),
+        ('os_preventiva', 'Geração de O.S. preventivas'),
+        ('os_preditiva', 'Geração de O.S. preditivas'),
+        ('atribui_tecnicos', 'Atribuição de O.S. a técnicos'),
+        ('atualiza_indicadores', 'Atualização dos indicadores'),
+        ('arquiva_ordens', 'Arquivamento de O.S.'),
+        ('particiona_historico', 'Partições do histórico'),
+        ('planeja_rotas', 'Planejamento das rotas'),
+        ('limpa_uploads_manual', 'Limpeza de uploads de manual'),
+    ]
+
+    nome = models.CharField(max_length=100, unique=True)
+    comando = models.CharField(max_length=50, choices=COMANDO_CHOICES)
+    argumentos = models.JSONField(default=dict, blank=True)  # opções do comando, ex.: {"tipo": "corretiva"}
+    intervalo = models.DurationField()
+    proxima_execucao = models.DateTimeField()
+    ativa = models.BooleanField(default=True)
+    max_tentativas = models.IntegerField(default=3)
+    espera_retentativa = models.DurationField(default=datetime.timedelta(minutes=5))  # dobra a cada nova falha
+    tentativa = models.IntegerField(default=0)  # tentativas da execução em curso (0 = nenhuma)
+    # "Lease": enquanto bloqueada_ate estiver no futuro, nenhum outro worker pega a tarefa
+    bloqueada_ate = models.DateTimeField(blank=True, null=True)
+    bloqueada_por = models.CharField(max_length=100, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ativa', 'proxima_execucao'], name='tarefa_fila'),
+        ]
+
+    def __str__(self):
+        return self.nome
+
+
+# Modelo para o histórico de execuções das tarefas agendadas
+class ExecucaoTarefa(models.Model):
+    STATUS_CHOICES = [
+        ('executando', 'Executando'),
+        ('sucesso', 'Sucesso'),
+        ('falha', 'Falha'),
+        ('abandonada', 'Abandonada'),  # o worker parou sem concluir (lease expirou)
+    ]
+
+    tarefa = models.ForeignKey(Tarefa, on_delete=models.CASCADE, related_name='execucoes')
+    tentativa = models.IntegerField()
+    worker = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='executando')
+    iniciada_em = models.DateTimeField()
+    finalizada_em = models.DateTimeField(blank=True, null=True)
+    progresso_atual = models.IntegerField(default=0)
+    progresso_total = models.IntegerField(blank=True, null=True)
+    saida = models.TextField(blank=True, default='')
+    erro = models.TextField(blank=True, default='')
+
+    class Meta:
+        ordering = ['-iniciada_em']
+        indexes = [
+            models.Index(fields=['tarefa', '-iniciada_em'], name='execucao_tarefa_data'),
+        ]
+
+    def __str__(self):
+        return f"{self.tarefa} @ {self.iniciada_em} ({self.status})"
+
+
+# Os perfis têm o SQL executado (com parâmetros): ficam fora de MEDIA_ROOT, que é público em DEBUG
+def armazenamento_perfis():
+    return FileSystemStorage(location=settings.PROFILE_DIR)
+
+
+# Modelo para os perfis de execução (pedidos com ?profile=1, pedidos amostrados e comandos com --profile; ver api/perfilamento.py)
+class PerfilExecucao(models.Model):
+    ORIGEM_CHOICES = [
+        ('pedido', 'Pedido (?profile=1)'),
+        ('amostra', 'Pedido amostrado'),
+        ('comando', 'Comando de gestão'),
+    ]
+    FORMATO_CHOICES = [
+        ('speedscope', 'Speedscope (JSON)'),
+        ('collapsed', 'Pilhas colapsadas (flamegraph)'),
+    ]
+
+    origem = models.CharField(max_length=20, choices=ORIGEM_CHOICES)
+    alvo = models.CharField(max_length=200)  # nome da view (ex.: ativo-historico) ou do comando
+    metodo = models.CharField(max_length=10, blank=True, default='')
+    caminho = models.CharField(max_length=500, blank=True, default='')
+    status = models.IntegerField(blank=True, null=True)
+    duracao = models.FloatField()  # segundos
+    consultas = models.IntegerField(default=0)
+    tempo_consultas = models.FloatField(default=0)  # segundos
+    amostras = models.IntegerField(default=0)
+    formato = models.CharField(max_length=20, choices=FORMATO_CHOICES, default='speedscope')
+    arquivo = models.FileField(storage=armazenamento_perfis, upload_to='%Y/%m/')
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['alvo', '-criado_em'], name='perfil_alvo_data'),
+        ]
+
+    def __str__(self):
+        return f"Perfil de {self.alvo} @ {self.criado_em} ({self.duracao * 1000:.0f} ms)"
+
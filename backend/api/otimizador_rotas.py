@@ -0,0 +1,199 @@
+import time
+
+import numpy as np
+
+##
+## --- otimizador_rotas.py ---
+## Otimizador local de rotas com várias paradas (problema do caixeiro viajante, caminho
+## aberto a partir da posição do técnico). Substitui o `optimize:true` da Google, que
+## limita o número de waypoints e é cobrado por pedido.
+##
+## Etapas:
+## 1. Matriz de distâncias haversine calculada de uma vez com NumPy (sem laços em Python).
+## 2. Até EXATO_MAX_PARADAS paradas, a rota ótima por programação dinâmica (Held-Karp):
+##    a busca local abaixo pode parar num ótimo local mesmo com 4 ou 5 paradas.
+## 3. Acima disso, construção inicial pelo vizinho mais próximo e melhoria local com
+##    2-opt (inverte trechos) e Or-opt (move blocos de 1 a 3 paradas), alternados até
+##    não haver ganho ou até acabar o orçamento de tempo.
+##
+## O índice 0 é sempre a origem (fixa); as demais posições são as paradas.
+##
+
+RAIO_TERRA_M = 6371008.8
+GANHO_MINIMO = 1e-6  # metros; evita ciclos infinitos por erros de arredondamento
+EXATO_MAX_PARADAS = 8  # 2^8 · 8 estados no Held-Karp: alguns milissegundos
+
+
+def matriz_distancias(coordenadas):
+    """
+    Matriz NxN de distâncias haversine em metros.
+    `coordenadas` é uma sequência de pares (lat, lng) em graus.
+    """
+    rad = np.radians(np.asarray(coordenadas, dtype=float))
+    lat = rad[:, 0][:, None]
+    lng = rad[:, 1][:, None]
+    a = np.sin((lat - lat.T) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lng - lng.T) / 2) ** 2
+    return 2 * RAIO_TERRA_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def custo_rota(rota, dist):
+    """ Distância total do caminho aberto `rota` (sem voltar à origem). """
+    rota = np.asarray(rota)
+    return float(dist[rota[:-1], rota[1:]].sum())
+
+
+def vizinho_mais_proximo(dist, inicio=0):
+    n = len(dist)
+    visitado = np.zeros(n, dtype=bool)
+    visitado[inicio] = True
+    rota = [inicio]
+    atual = inicio
+    for _ in range(n - 1):
+        atual = int(np.argmin(np.where(visitado, np.inf, dist[atual])))
+        visitado[atual] = True
+        rota.append(atual)
+    return np.array(rota)
+
+
+def held_karp(dist):
+    """
+    Caminho aberto ótimo a partir da posição 0, por programação dinâmica sobre os
+    subconjuntos de paradas: custo[S, j] = menor custo saindo de 0, visitando S e
+    terminando em j. O(2^n · n²); aceita custos assimétricos.
+    """
+    n = len(dist) - 1
+    paradas = np.arange(1, n + 1)
+    custo = np.full((1 << n, n), np.inf)
+    anterior = np.full((1 << n, n), -1, dtype=np.int64)
+    for mascara in range(1, 1 << n):
+        for j in range(n):
+            if not mascara >> j & 1:
+                continue
+            resto = mascara ^ (1 << j)
+            if resto == 0:
+                custo[mascara, j] = dist[0, j + 1]
+                continue
+            # custo[resto] é infinito nas paradas fora de `resto`
+            valores = custo[resto] + dist[paradas, j + 1]
+            k = int(np.argmin(valores))
+            custo[mascara, j], anterior[mascara, j] = valores[k], k
+
+    mascara = (1 << n) - 1
+    j = int(np.argmin(custo[mascara]))
+    rota = []
+    while j >= 0:
+        rota.append(j + 1)
+        mascara, j = mascara ^ (1 << j), int(anterior[mascara, j])
+    return np.array([0] + rota[::-1])
+
+
+def dois_opt(rota, dist, prazo):
+    """
+    2-opt para caminho aberto com a primeira posição fixa. Para cada `i`, os ganhos de
+    inverter rota[i..j] são calculados para todos os `j` de uma vez; aplica o melhor.
+    """
+    rota = np.array(rota)
+    n = len(rota)
+    melhorou = True
+    while melhorou and time.monotonic() < prazo:
+        melhorou = False
+        for i in range(1, n - 1):
+            a, b = rota[i - 1], rota[i]
+            j = np.arange(i + 1, n)
+            c = rota[j]
+            tem_proximo = j + 1 < n
+            e = rota[np.minimum(j + 1, n - 1)]
+            # Troca as arestas (a,b) e (c,e) por (a,c) e (b,e); no fim do caminho não há (c,e)
+            ganho = dist[a, b] - dist[a, c] + np.where(tem_proximo, dist[c, e] - dist[b, e], 0.0)
+            k = int(np.argmax(ganho))
+            if ganho[k] > GANHO_MINIMO:
+                rota[i:j[k] + 1] = rota[i:j[k] + 1][::-1].copy()
+                melhorou = True
+            if time.monotonic() >= prazo:
+                break
+    return rota
+
+
+def or_opt(rota, dist, prazo):
+    """
+    Or-opt para caminho aberto: tenta mover cada bloco de 1, 2 ou 3 paradas consecutivas
+    para a melhor posição do restante da rota (custos de inserção vetorizados).
+    """
+    rota = list(rota)
+    melhorou = True
+    while melhorou and time.monotonic() < prazo:
+        melhorou = False
+        for tamanho in (1, 2, 3):
+            i = 1
+            while i + tamanho <= len(rota) and time.monotonic() < prazo:
+                bloco = rota[i:i + tamanho]
+                anterior = rota[i - 1]
+                seguinte = rota[i + tamanho] if i + tamanho < len(rota) else None
+                resto = rota[:i] + rota[i + tamanho:]
+
+                economia = dist[anterior, bloco[0]]
+                if seguinte is not None:
+                    economia += dist[bloco[-1], seguinte] - dist[anterior, seguinte]
+
+                # Inserir o bloco entre u=resto[p] e v=resto[p+1] (ou no fim, se p for o último)
+                u = np.array(resto)
+                v = np.array(resto[1:] + [resto[-1]])
+                no_meio = np.arange(len(resto)) < len(resto) - 1
+                custo_insercao = dist[u, bloco[0]] + np.where(no_meio, dist[bloco[-1], v] - dist[u, v], 0.0)
+                p = int(np.argmin(custo_insercao))
+
+                if economia - custo_insercao[p] > GANHO_MINIMO:
+                    rota = resto[:p + 1] + bloco + resto[p + 1:]
+                    melhorou = True
+                else:
+                    i += 1
+    return np.array(rota)
+
+
+def otimizar_rota(coordenadas, orcamento_s):
+    """
+    Ordena as paradas partindo de coordenadas[0] (a origem).
+    Devolve `(ordem, distancia_m)`, onde `ordem` são os índices das paradas em
+    coordenadas[1:] (base 0) na ordem de visita e `distancia_m` é a distância
+    em linha reta estimada do percurso.
+    """
+    if len(coordenadas) < 2:
+        return [], 0.0
+    return otimizar_rota_com_matriz(matriz_distancias(coordenadas), orcamento_s)
+
+
+def otimizar_rota_com_matriz(dist, orcamento_s):
+    """
+    Igual a `otimizar_rota`, mas recebe a matriz de custos pronta (ex.: com custos
+    rodoviários da matriz de deslocamento). A linha/coluna 0 é a origem.
+    Os ganhos do 2-opt supõem custos simétricos: simetrize a matriz antes, se preciso.
+    """
+    n = len(dist)
+    if n <= 2:
+        return list(range(n - 1)), float(dist[0, 1]) if n == 2 else 0.0
+
+    if n - 1 <= EXATO_MAX_PARADAS:
+        rota = held_karp(dist)
+        return [int(k) - 1 for k in rota[1:]], custo_rota(rota, dist)
+
+    prazo = time.monotonic() + orcamento_s
+    rota = vizinho_mais_proximo(dist)
+    custo = custo_rota(rota, dist)
+
+    while time.monotonic() < prazo:
+        rota = or_opt(dois_opt(rota, dist, prazo), dist, prazo)
+        novo_custo = custo_rota(rota, dist)
+        if custo - novo_custo <= GANHO_MINIMO:
+            break
+        custo = novo_custo
+
+    return [int(k) - 1 for k in rota[1:]], custo_rota(rota, dist)
+
+
+def melhor_inicio(dist):
+    """
+    Sem origem fixa (ex.: técnico sem base cadastrada), escolhe como ponto de partida a
+    parada cujo percurso pelo vizinho mais próximo é o mais curto.
+    """
+    custos = [custo_rota(vizinho_mais_proximo(dist, inicio), dist) for inicio in range(len(dist))]
+    return int(np.argmin(custos))
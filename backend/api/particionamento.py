@@ -0,0 +1,312 @@
+import datetime
+import re
+from collections import namedtuple
+
+from django.db import connection, transaction
+
+##
+## --- particionamento.py ---
+## Particionamento por intervalo de tempo (PostgreSQL, PARTITION BY RANGE) das tabelas de
+## histórico, que só crescem: api_ordemservico (por `data_criacao`) e api_manutencao (por
+## `data_fim_execucao`). Usado pelo comando `particiona_historico`.
+##
+## • Uma partição por mês (ex.: api_ordemservico_p2026_11). Consultas com filtro de data
+##   só leem os meses envolvidos (partition pruning) e o VACUUM / a manutenção de índices
+##   trabalham partição a partição, com custo limitado ao tamanho de um mês.
+## • Cada mês de api_ordemservico é subparticionado por `status` (pendente / finalizada),
+##   para que as listas de O.S. pendentes não leiam as finalizadas. O PostgreSQL move a
+##   linha de subpartição sozinho quando o status muda (UPDATE entre partições).
+## • Uma partição DEFAULT recebe linhas fora dos meses criados (rede de segurança); as
+##   partições futuras são criadas com antecedência por `garantir_particoes()`.
+##
+## Os modelos Django não mudam. A chave primária no banco passa a incluir as colunas de
+## particionamento (exigência do PostgreSQL), mas `id`/`ordem_servico_id` continuam únicos
+## na prática (vêm de uma sequência / da O.S.) e o Django continua a usá-los como pk.
+## Por isso nenhuma tabela pode ter FOREIGN KEY no banco apontando para uma tabela
+## particionada: Manutencao.ordem_servico usa db_constraint=False (migração 0010).
+##
+
+
+TabelaParticionada = namedtuple('TabelaParticionada', ['tabela', 'coluna', 'chave_primaria', 'subparticoes'])
+
+TABELAS = [
+    TabelaParticionada('api_ordemservico', 'data_criacao', ('id', 'data_criacao', 'status'), ('status', ('pendente', 'finalizada'))),
+    TabelaParticionada('api_manutencao', 'data_fim_execucao', ('ordem_servico_id', 'data_fim_execucao'), None),
+]
+
+
+class ParticionamentoError(Exception):
+    """ Estado do banco que impede a operação; a mensagem é mostrada pelo comando. """
+
+
+def _inicio_mes(dia, meses_depois=0):
+    mes = dia.month - 1 + meses_depois
+    return datetime.date(dia.year + mes // 12, mes % 12 + 1, 1)
+
+
+def _nome_particao(tabela, mes):
+    return f'{tabela}_p{mes.year}_{mes.month:02d}'
+
+
+def _limite(mes):
+    # Limites sempre em UTC, como o Django grava os DateTimeField (USE_TZ=True)
+    return f"'{mes.isoformat()} 00:00:00+00'"
+
+
+"""
+============================== BLOCO 1 — Introspecção ==============================
+Consultas ao catálogo do PostgreSQL usadas para decidir o que criar e para copiar os
+índices e FOREIGN KEYs da tabela original para a tabela particionada.
+=====================================================================================
+"""
+def _consultar(sql, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def esta_particionada(tabela):
+    linhas = _consultar("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [tabela])
+    return bool(linhas) and linhas[0][0] == 'p'
+
+
+def coberto_ate(tabela):
+    """ Maior limite superior entre as partições de intervalo existentes (date) ou None. """
+    limites = _consultar(
+        """
+        SELECT pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        """,
+        [tabela],
+    )
+    datas = []
+    for (expressao,) in limites:
+        encontrado = re.search(r"TO \('(\d{4}-\d{2}-\d{2})", expressao or '')
+        if encontrado:
+            datas.append(datetime.date.fromisoformat(encontrado.group(1)))
+    return max(datas) if datas else None
+
+
+def _referencias_externas(tabela):
+    return _consultar(
+        "SELECT conname, conrelid::regclass::text FROM pg_constraint WHERE confrelid = %s::regclass AND contype = 'f'",
+        [tabela],
+    )
+
+
+def _colunas_identity(tabela):
+    return [linha[0] for linha in _consultar(
+        "SELECT attname FROM pg_attribute WHERE attrelid = %s::regclass AND attidentity <> '' AND NOT attisdropped",
+        [tabela],
+    )]
+
+
+def _indices_simples(tabela):
+    """ (nome, definição) dos índices não únicos da tabela. """
+    return _consultar(
+        """
+        SELECT c.relname, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = %s::regclass AND NOT i.indisunique
+        """,
+        [tabela],
+    )
+
+
+def _foreign_keys(tabela):
+    return _consultar(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+        [tabela],
+    )
+
+
+"""
+===================== BLOCO 2 — Partições futuras (rodar todo dia) =====================
+`garantir_particoes(meses)` cria, para cada tabela já particionada, as partições do mês
+atual até `meses` meses à frente que ainda não existirem. Se a partição DEFAULT tiver
+linhas no intervalo de um mês novo (ex.: o comando ficou dias sem rodar), essas linhas
+são movidas para a partição nova na mesma transação.
+=========================================================================================
+"""
+def sql_criar_particao(config, mes):
+    particao = _nome_particao(config.tabela, mes)
+    comandos = [
+        f"CREATE TABLE {particao} PARTITION OF {config.tabela} "
+        f"FOR VALUES FROM ({_limite(mes)}) TO ({_limite(_inicio_mes(mes, 1))})"
+        + (f" PARTITION BY LIST ({config.subparticoes[0]})" if config.subparticoes else '')
+    ]
+    if config.subparticoes:
+        for valor in config.subparticoes[1]:
+            comandos.append(f"CREATE TABLE {particao}_{valor} PARTITION OF {particao} FOR VALUES IN ('{valor}')")
+        comandos.append(f"CREATE TABLE {particao}_outros PARTITION OF {particao} DEFAULT")
+    return comandos
+
+
+def _sql_com_padrao_ocupado(config, mes):
+    """ Cria a partição do mês tirando a DEFAULT do caminho e movendo as linhas dela. """
+    padrao = f'{config.tabela}_padrao'
+    filtro = f"{config.coluna} >= {_limite(mes)} AND {config.coluna} < {_limite(_inicio_mes(mes, 1))}"
+    return (
+        [f"ALTER TABLE {config.tabela} DETACH PARTITION {padrao}"]
+        + sql_criar_particao(config, mes)
+        + [
+            f"INSERT INTO {config.tabela} SELECT * FROM {padrao} WHERE {filtro}",
+            f"DELETE FROM {padrao} WHERE {filtro}",
+            f"ALTER TABLE {config.tabela} ATTACH PARTITION {padrao} DEFAULT",
+        ]
+    )
+
+
+def planejar_particoes(meses, hoje=None):
+    """ Lista de (tabela, mês, [comandos SQL]) das partições que faltam criar. """
+    hoje = hoje or datetime.date.today()
+    plano = []
+    for config in TABELAS:
+        if not esta_particionada(config.tabela):
+            continue
+        inicio = max(_inicio_mes(hoje), coberto_ate(config.tabela) or _inicio_mes(hoje))
+        fim = _inicio_mes(hoje, meses + 1)
+        mes = inicio
+        while mes < fim:
+            if _consultar("SELECT to_regclass(%s)", [_nome_particao(config.tabela, mes)])[0][0] is None:
+                ocupado = _consultar(
+                    f"SELECT EXISTS (SELECT 1 FROM {config.tabela}_padrao "
+                    f"WHERE {config.coluna} >= {_limite(mes)} AND {config.coluna} < {_limite(_inicio_mes(mes, 1))})"
+                )[0][0]
+                plano.append((config.tabela, mes, _sql_com_padrao_ocupado(config, mes) if ocupado else sql_criar_particao(config, mes)))
+            mes = _inicio_mes(mes, 1)
+    return plano
+
+
+def garantir_particoes(meses, hoje=None):
+    """ Cria as partições que faltam. Devolve o plano executado. """
+    plano = planejar_particoes(meses, hoje)
+    for _tabela, _mes, comandos in plano:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for sql in comandos:
+                    cursor.execute(sql)
+    return plano
+
+
+"""
+================== BLOCO 3 — Conversão de uma tabela existente (uma vez) ==================
+A tabela atual NÃO é copiada: ela vira a primeira partição (`<tabela>_legado`), cobrindo
+tudo até `corte`, e os meses seguintes ganham partições novas. Assim a conversão não
+reescreve milhões de linhas. Duas etapas:
+
+1. Preparação (sem bloquear escritas; pode demorar em tabelas grandes):
+   - CHECK (coluna < corte) NOT VALID + VALIDATE → o ATTACH não precisa varrer a tabela;
+   - índice único na nova chave primária criado com CONCURRENTLY → reaproveitado no ATTACH.
+2. Conversão (uma transação curta, com ACCESS EXCLUSIVE): renomeia a tabela para
+   `_legado`, cria a tabela particionada com o nome original (mesmas colunas, índices e
+   FOREIGN KEYs), troca a coluna IDENTITY por uma sequência com o mesmo próximo valor,
+   anexa a `_legado` e cria as partições futuras e a DEFAULT.
+
+`corte` é o início do mês seguinte ao próximo: as linhas novas continuam a respeitar o
+CHECK entre as duas etapas, mesmo que a conversão rode perto da virada do mês.
+============================================================================================
+"""
+def corte_padrao(hoje=None):
+    return _inicio_mes(hoje or datetime.date.today(), 2)
+
+
+def sql_preparar(config, corte):
+    tabela = config.tabela
+    existentes = {nome for nome, in _consultar(
+        "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass", [tabela]
+    )}
+    comandos = []
+    if f'{tabela}_limite_legado' not in existentes:
+        comandos.append(
+            f"ALTER TABLE {tabela} ADD CONSTRAINT {tabela}_limite_legado "
+            f"CHECK ({config.coluna} < {_limite(corte)}) NOT VALID"
+        )
+    comandos += [
+        f"ALTER TABLE {tabela} VALIDATE CONSTRAINT {tabela}_limite_legado",
+        f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {tabela}_legado_chave "
+        f"ON {tabela} ({', '.join(config.chave_primaria)})",
+    ]
+    return comandos
+
+
+def sql_bloquear(config):
+    return f"LOCK TABLE {config.tabela} IN ACCESS EXCLUSIVE MODE"
+
+
+def sql_converter(config, corte, meses):
+    """ Comandos da etapa 2. Deve ser chamada já com a tabela bloqueada (`sql_bloquear`). """
+    tabela = config.tabela
+    legado = f'{tabela}_legado'
+
+    referencias = _referencias_externas(tabela)
+    if referencias:
+        descricao = ', '.join(f'{nome} ({origem})' for nome, origem in referencias)
+        raise ParticionamentoError(
+            f'{tabela} é referenciada por FOREIGN KEYs no banco: {descricao}. '
+            'Aplique as migrações (db_constraint=False) antes de particionar.'
+        )
+
+    comandos = []
+
+    # Tabelas particionadas não aceitam IDENTITY (antes do PostgreSQL 17): usa uma sequência
+    sequencias = []
+    for coluna in _colunas_identity(tabela):
+        proximo = _consultar(f"SELECT COALESCE(MAX({coluna}), 0) + 1 FROM {tabela}")[0][0]
+        sequencia = f'{tabela}_{coluna}_seq'
+        comandos += [
+            f"ALTER TABLE {tabela} ALTER {coluna} DROP IDENTITY",
+            f"CREATE SEQUENCE {sequencia} START WITH {proximo}",
+        ]
+        sequencias.append((coluna, sequencia))
+
+    comandos += [
+        f"ALTER TABLE {tabela} RENAME TO {legado}",
+        f"ALTER INDEX {tabela}_pkey RENAME TO {legado}_pkey",
+        f"CREATE TABLE {tabela} (LIKE {legado} INCLUDING DEFAULTS INCLUDING STORAGE) "
+        f"PARTITION BY RANGE ({config.coluna})",
+        f"ALTER TABLE {tabela} ADD CONSTRAINT {tabela}_pkey PRIMARY KEY ({', '.join(config.chave_primaria)})",
+    ]
+    for coluna, sequencia in sequencias:
+        comandos += [
+            f"ALTER TABLE {tabela} ALTER {coluna} SET DEFAULT nextval('{sequencia}')",
+            f"ALTER SEQUENCE {sequencia} OWNED BY {tabela}.{coluna}",
+        ]
+
+    # Índices e FKs com a mesma definição dos da tabela original: no ATTACH o PostgreSQL
+    # reaproveita os que já existem na `_legado` em vez de reconstruí-los
+    for nome, definicao in _indices_simples(tabela):
+        comandos.append(re.sub(r'^CREATE INDEX \S+ ON \S+', f'CREATE INDEX {nome}_p ON {tabela}', definicao))
+    for nome, definicao in _foreign_keys(tabela):
+        comandos.append(f"ALTER TABLE {tabela} ADD CONSTRAINT {nome} {definicao}")
+
+    comandos.append(f"ALTER TABLE {tabela} ATTACH PARTITION {legado} FOR VALUES FROM (MINVALUE) TO ({_limite(corte)})")
+    mes = corte
+    for _ in range(meses):
+        comandos += sql_criar_particao(config, mes)
+        mes = _inicio_mes(mes, 1)
+    comandos.append(f"CREATE TABLE {tabela}_padrao PARTITION OF {tabela} DEFAULT")
+    return comandos
+
+
+def converter(config, corte, meses, relatar=None):
+    """ Executa as duas etapas da conversão de `config.tabela`. """
+    relatar = relatar or (lambda mensagem: None)
+    if esta_particionada(config.tabela):
+        raise ParticionamentoError(f'{config.tabela} já está particionada.')
+
+    # Etapa 1 fora de transação: CREATE INDEX CONCURRENTLY não pode rodar dentro de uma
+    with connection.cursor() as cursor:
+        for sql in sql_preparar(config, corte):
+            relatar(sql)
+            cursor.execute(sql)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Bloqueia antes de ler o catálogo e o MAX(id), para nada mudar até o fim
+            relatar(sql_bloquear(config))
+            cursor.execute(sql_bloquear(config))
+            for sql in sql_converter(config, corte, meses):
+                relatar(sql)
+                cursor.execute(sql)
@@ -0,0 +1,324 @@
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.urls import reverse
+from django.utils import timezone
+
+from . import metricas
+from .autenticacao import CachedTokenAuthentication
+from .models import PerfilExecucao
+
+##
+## --- perfilamento.py ---
+## Perfis de execução sob demanda e por amostragem (onde o tempo de um pedido lento foi gasto).
+##
+## Um Perfil liga, durante o bloco `with`, duas capturas na thread corrente:
+##
+## 1. Amostrador de pilhas: uma thread auxiliar lê a pilha da thread perfilada a cada
+##    PROFILE_INTERVAL_MS (sys._current_frames) e soma o tempo decorrido na pilha vista.
+##    É estatístico: funções mais curtas que o intervalo podem não aparecer.
+## 2. SQL: execute_wrapper em todas as conexões guarda cada query, a sua duração e as
+##    funções do projeto (fora das bibliotecas) que a dispararam.
+##
+## O resultado vai para um arquivo speedscope (https://www.speedscope.app: um perfil "Python"
+## e um perfil "SQL", com a query como folha) ou de pilhas colapsadas (flamegraph.pl,
+## inferno), guardado em PROFILE_DIR e registado num PerfilExecucao.
+##
+## Quem é perfilado:
+## - Pedidos a /api/ com ?profile=1 feitos por um usuário staff (sessão ou token): a
+##   resposta traz X-Perfil com a URL de download.
+## - Uma fração PROFILE_SAMPLE_RATE dos pedidos a /api/ (produção), guardados só se
+##   durarem pelo menos PROFILE_SAMPLE_MIN_MS.
+## - Comandos de gestão que herdam de ComandoMedido, com --profile.
+##
+## Views assíncronas não são perfiladas (o trabalho corre noutras threads).
+##
+
+FORMATOS = {
+    'speedscope': ('.speedscope.json', 'application/json'),
+    'collapsed': ('.folded', 'text/plain; charset=utf-8'),
+}
+
+
+"""
+============================== BLOCO 1 — Captura ==============================
+As pilhas são guardadas ao nível da função (nome, arquivo, primeira linha) e
+agregadas: pilha → tempo total. A ordem no tempo perde-se, mas a memória fica
+limitada pelo número de pilhas distintas, também em comandos de horas.
+As pilhas começam no frame que abriu o `with` (ex.: o middleware).
+================================================================================
+"""
+def _chave(frame):
+    codigo = frame.f_code
+    return (getattr(codigo, 'co_qualname', codigo.co_name), codigo.co_filename, codigo.co_firstlineno)
+
+
+# Os wrappers de query (este módulo e o de métricas) não interessam na pilha de uma query
+_IGNORADOS = {__file__, metricas.__file__}
+
+
+def _do_projeto(arquivo):
+    return arquivo.startswith(str(settings.BASE_DIR)) and 'site-packages' not in arquivo and arquivo not in _IGNORADOS
+
+
+def _resumir_sql(sql):
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    return sql if len(sql) <= 200 else sql[:197] + '...'
+
+
+class Perfil:
+    def __init__(self, intervalo_ms=None, max_consultas=None):
+        self.intervalo = (intervalo_ms or settings.PROFILE_INTERVAL_MS) / 1000
+        self.max_consultas = max_consultas if max_consultas is not None else settings.PROFILE_MAX_QUERIES
+        self.amostras = {}  # pilha (tupla de chaves, da raiz para a folha) → segundos
+        self.total_amostras = 0
+        self.consultas = []  # (pilha do projeto, sql resumido, segundos)
+        self.total_consultas = 0
+        self.tempo_consultas = 0.0
+        self.duracao = 0.0
+        self._raiz = None
+        self._thread_id = None
+        self._parar = threading.Event()
+        self._amostrador = None
+        self._trava = threading.Lock()
+        self._wrappers = []
+
+    def __enter__(self):
+        self._raiz = sys._getframe(1)
+        self._thread_id = threading.get_ident()
+        self._inicio = time.perf_counter()
+        for conexao in connections.all():
+            contexto = conexao.execute_wrapper(self._capturar_query)
+            contexto.__enter__()
+            self._wrappers.append(contexto)
+        self._amostrador = threading.Thread(target=self._amostrar, name='perfilamento', daemon=True)
+        self._amostrador.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._amostrador.join(timeout=1)
+        for contexto in reversed(self._wrappers):
+            contexto.__exit__(None, None, None)
+        self._wrappers.clear()
+        self.duracao = time.perf_counter() - self._inicio
+        self._raiz = None
+        return False
+
+    def _pilha(self, frame, so_projeto=False):
+        pilha = []
+        while frame is not None:
+            if not so_projeto or _do_projeto(frame.f_code.co_filename):
+                pilha.append(_chave(frame))
+            if frame is self._raiz:
+                break
+            frame = frame.f_back
+        pilha.reverse()
+        return tuple(pilha)
+
+    def _amostrar(self):
+        anterior = time.perf_counter()
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self._thread_id)
+            agora = time.perf_counter()
+            if frame is not None:
+                pilha = self._pilha(frame)
+                with self._trava:
+                    self.amostras[pilha] = self.amostras.get(pilha, 0.0) + (agora - anterior)
+                    self.total_amostras += 1
+            anterior = agora
+
+    def _capturar_query(self, execute, sql, params, many, context):
+        antes = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = time.perf_counter() - antes
+            self.total_consultas += 1
+            self.tempo_consultas += duracao
+            if len(self.consultas) < self.max_consultas:
+                rotulo = _resumir_sql(sql) + (' (executemany)' if many else '')
+                self.consultas.append((self._pilha(sys._getframe(), so_projeto=True), rotulo, duracao))
+
+
+"""
+=============================== BLOCO 2 — Formatos ===============================
+speedscope: frames partilhados e dois perfis "sampled" em milissegundos.
+collapsed: uma linha "f1;f2;f3 peso" por pilha, peso em microssegundos; as
+queries ficam sob um frame raiz "SQL".
+==================================================================================
+"""
+def _pilhas_sql(perfil):
+    for pilha, sql, duracao in perfil.consultas:
+        yield pilha + ((f'SQL: {sql}', '', 0),), duracao
+
+
+def speedscope(perfil, nome):
+    frames = []
+    indices = {}
+
+    def indice(chave):
+        if chave not in indices:
+            indices[chave] = len(frames)
+            funcao, arquivo, linha = chave
+            frame = {'name': funcao}
+            if arquivo:
+                frame.update(file=arquivo, line=linha)
+            frames.append(frame)
+        return indices[chave]
+
+    def amostrado(nome_perfil, pilhas):
+        amostras, pesos = [], []
+        for pilha, segundos in pilhas:
+            amostras.append([indice(chave) for chave in pilha])
+            pesos.append(round(segundos * 1000, 3))
+        return {
+            'type': 'sampled',
+            'name': nome_perfil,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': round(sum(pesos), 3),
+            'samples': amostras,
+            'weights': pesos,
+        }
+
+    perfis = [
+        amostrado(f'{nome} — Python', list(perfil.amostras.items())),
+        amostrado(f'{nome} — SQL ({perfil.total_consultas} queries)', _pilhas_sql(perfil)),
+    ]
+    return json.dumps({
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': nome,
+        'activeProfileIndex': 0,
+        'exporter': 'api.perfilamento',
+        'shared': {'frames': frames},
+        'profiles': perfis,
+    }, ensure_ascii=False).encode('utf-8')
+
+
+def collapsed(perfil):
+    def rotulo(chave):
+        funcao, arquivo, _ = chave
+        # ';' separa os frames no formato colapsado
+        texto = f'{funcao} ({os.path.basename(arquivo)})' if arquivo else funcao
+        return texto.replace(';', ',')
+
+    linhas = []
+    for raiz, pilhas in ((None, perfil.amostras.items()), ('SQL', _pilhas_sql(perfil))):
+        for pilha, segundos in pilhas:
+            peso = round(segundos * 1_000_000)
+            if peso:
+                frames = ([raiz] if raiz else []) + [rotulo(chave) for chave in pilha]
+                linhas.append(f'{";".join(frames)} {peso}')
+    return ('\n'.join(linhas) + '\n').encode('utf-8')
+
+
+def exportar(perfil, formato, nome):
+    return speedscope(perfil, nome) if formato == 'speedscope' else collapsed(perfil)
+
+
+"""
+============================= BLOCO 3 — Armazenamento =============================
+Cada perfil vira um PerfilExecucao com o arquivo em PROFILE_DIR. Só os
+PROFILE_MAX_STORED mais recentes são mantidos (arquivos antigos apagados junto).
+===================================================================================
+"""
+def salvar(perfil, origem, alvo, formato='speedscope', usuario=None, metodo='', caminho='', status=None):
+    extensao, _ = FORMATOS[formato]
+    prefixo = re.sub(r'[^\w.-]+', '_', alvo)
+    nome_arquivo = f'{prefixo}-{timezone.now():%Y%m%d-%H%M%S}{extensao}'
+    registro = PerfilExecucao(
+        origem=origem,
+        alvo=alvo[:200],
+        metodo=metodo,
+        caminho=caminho[:500],
+        status=status,
+        duracao=perfil.duracao,
+        consultas=perfil.total_consultas,
+        tempo_consultas=perfil.tempo_consultas,
+        amostras=perfil.total_amostras,
+        formato=formato,
+        usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+    )
+    registro.arquivo.save(nome_arquivo, ContentFile(exportar(perfil, formato, alvo)), save=False)
+    registro.save()
+    _podar()
+    return registro
+
+
+def _podar():
+    for antigo in PerfilExecucao.objects.order_by('-criado_em', '-id')[settings.PROFILE_MAX_STORED:]:
+        antigo.arquivo.delete(save=False)
+        antigo.delete()
+
+
+"""
+============================== BLOCO 4 — Middleware ==============================
+Fica depois do AuthenticationMiddleware (usuário da sessão). Pedidos com token
+(o app) são autenticados aqui com o CachedTokenAuthentication, que é barato.
+Para o usuário não staff, ?profile=1 é ignorado em silêncio.
+==================================================================================
+"""
+def _e_staff(request):
+    usuario = getattr(request, 'user', None)
+    if usuario is not None and usuario.is_authenticated:
+        return usuario if usuario.is_staff else None
+    # Token inválido → None (anônimo), ver CachedTokenAuthentication.authenticate
+    resultado = CachedTokenAuthentication().authenticate(request)
+    if resultado is None or not resultado[0].is_staff:
+        return None
+    return resultado[0]
+
+
+class PerfilamentoMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not request.path_info.startswith('/api/'):
+            return self.get_response(request)
+
+        usuario = None
+        if request.GET.get('profile') == '1':
+            usuario = _e_staff(request)
+            origem = 'pedido' if usuario is not None else None
+        else:
+            origem = 'amostra' if settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE else None
+        if origem is None:
+            return self.get_response(request)
+
+        with Perfil() as perfil:
+            response = self.get_response(request)
+        if origem == 'amostra' and perfil.duracao * 1000 < settings.PROFILE_SAMPLE_MIN_MS:
+            return response
+
+        resolvida = getattr(request, 'resolver_match', None)
+        alvo = (resolvida.view_name if resolvida is not None else '') or request.path_info
+        formato = request.GET.get('profile_formato') if origem == 'pedido' else None
+        registro = salvar(
+            perfil, origem, alvo, formato=formato if formato in FORMATOS else 'speedscope',
+            usuario=usuario or getattr(request, 'user', None), metodo=request.method,
+            caminho=request.get_full_path(), status=response.status_code,
+        )
+        if origem == 'pedido':
+            response['X-Perfil'] = reverse('perfil-download', args=[registro.pk])
+        return response
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
@@ -0,0 +1,179 @@
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from . import upstream
+from .matriz_deslocamento import matriz_custos, registrar_custos_rodoviarios
+from .models import OrdemServico, RotaPlanejada
+from .otimizador_rotas import matriz_distancias, melhor_inicio, otimizar_rota_com_matriz
+from .rotas import PlanoRota, montar_trechos, costurar_trechos
+
+##
+## --- planejamento_rotas.py ---
+## Pré-cálculo (em lote, fora do horário de pico) da rota do dia de cada técnico.
+## Usado pelo comando `planeja_rotas` e pelo endpoint /api/rotas-planejadas/planejar/.
+##
+
+
+"""
+============================== BLOCO 1 — Paradas do dia ==============================
+Busca numa única query as O.S. pendentes com `data_prevista` no dia pedido, já com o
+Ativo (select_related), e agrupa por técnico. Várias O.S. no mesmo Ativo viram uma só
+parada, com a lista de O.S. a executar ali.
+========================================================================================
+"""
+def paradas_por_tecnico(dia, tecnico_ids=None):
+    ordens = (
+        OrdemServico.objects.filter(status='pendente', data_prevista__date=dia, ativo__isnull=False)
+        .select_related('ativo')
+        .only('id', 'titulo', 'tipo', 'tecnico_id', 'ativo__id', 'ativo__nome', 'ativo__localizacao')
+        .order_by('data_prevista', 'id')
+    )
+    if tecnico_ids:
+        ordens = ordens.filter(tecnico_id__in=tecnico_ids)
+
+    grupos = {}
+    for ordem in ordens:
+        paradas = grupos.setdefault(ordem.tecnico_id, OrderedDict())
+        parada = paradas.get(ordem.ativo_id)
+        if parada is None:
+            parada = paradas[ordem.ativo_id] = {
+                'ativo_id': ordem.ativo_id,
+                'ativo_nome': ordem.ativo.nome,
+                'lat': ordem.ativo.localizacao.y,
+                'lng': ordem.ativo.localizacao.x,
+                'ordens': [],
+            }
+        parada['ordens'].append({'id': ordem.id, 'titulo': ordem.titulo, 'tipo': ordem.tipo})
+    return {tecnico_id: list(paradas.values()) for tecnico_id, paradas in grupos.items()}
+
+
+"""
+============================== BLOCO 2 — Ordem de visita ==============================
+Monta a matriz de custos das paradas a partir da matriz de deslocamento (custos
+rodoviários quando já conhecidos, senão linha reta) e ordena com o otimizador local.
+
+• Com `origem` (lat, lng) — ex.: a base do técnico — o percurso parte dali.
+• Sem origem, parte da parada que dá o percurso mais curto pelo vizinho mais próximo.
+
+Os custos rodoviários podem ser assimétricos; a matriz é simetrizada (média das duas
+direções) porque o 2-opt inverte trechos da rota.
+========================================================================================
+"""
+def ordenar_paradas(paradas, origem=None):
+    """ Devolve (paradas_ordenadas, distancia_estimada_m). """
+    if len(paradas) <= 1:
+        return list(paradas), 0.0
+
+    coordenadas = [(p['lat'], p['lng']) for p in paradas]
+    custos = matriz_custos([p['ativo_id'] for p in paradas], coordenadas)
+    custos = (custos + custos.T) / 2
+
+    if origem is not None:
+        dist = matriz_distancias([origem] + coordenadas)
+        dist[1:, 1:] = custos
+        ordem, distancia = otimizar_rota_com_matriz(dist, settings.ROUTE_OPTIMIZER_TIME_BUDGET)
+    else:
+        inicio = melhor_inicio(custos)
+        indices = [inicio] + [k for k in range(len(paradas)) if k != inicio]
+        ordem_relativa, distancia = otimizar_rota_com_matriz(custos[np.ix_(indices, indices)], settings.ROUTE_OPTIMIZER_TIME_BUDGET)
+        ordem = [inicio] + [indices[k + 1] for k in ordem_relativa]
+
+    return [paradas[k] for k in ordem], distancia
+
+
+"""
+=========================== BLOCO 3 — Rota completa (Google) ===========================
+Pede à Google a rota já na ordem calculada (em trechos, como o proxy de rotas) e costura
+as respostas. Os `legs` entre paradas consecutivas alimentam o cache de custos rodoviários
+da matriz de deslocamento, melhorando os custos usados nos próximos planejamentos.
+========================================================================================
+"""
+def buscar_rota_google(paradas_ordenadas, distancia, origem=None):
+    pontos = [(p['lat'], p['lng']) for p in paradas_ordenadas]
+    inicio = origem if origem is not None else pontos[0]
+    destinos = pontos if origem is not None else pontos[1:]
+    if not destinos:
+        return None
+
+    trechos = montar_trechos(inicio, destinos)
+    respostas = []
+    for params in trechos:
+        response = upstream.get(settings.GOOGLE_DIRECTIONS_URL, params=params)
+        response.raise_for_status()
+        respostas.append(response.json())
+    rota = costurar_trechos(respostas, PlanoRota(trechos, list(range(len(destinos))), distancia))
+
+    if rota.get('status') == 'OK':
+        legs = rota['routes'][0]['legs']
+        # Com origem externa, o primeiro leg sai da origem (não é um Ativo): descarta-o
+        legs_entre_paradas = legs[1:] if origem is not None else legs
+        pares = []
+        for anterior, seguinte, leg in zip(paradas_ordenadas, paradas_ordenadas[1:], legs_entre_paradas):
+            pares.append((anterior['ativo_id'], seguinte['ativo_id'], leg['distance']['value'], leg['duration']['value']))
+        registrar_custos_rodoviarios(pares)
+    return rota
+
+
+def ler_origem(texto):
+    """ Converte "lat,lng" em (lat, lng); texto vazio → None. Lança ValueError se inválido. """
+    if not texto:
+        return None
+    lat, lng = texto.split(',')
+    return float(lat), float(lng)
+
+
+def planejar_dia(dia, tecnico_ids=None, origem=None, buscar_google=True, salvar=True, relatar=None):
+    """
+    Planeja (e por padrão grava em RotaPlanejada) a rota do dia de cada técnico.
+    A rota parte da localizacao_base do técnico, quando cadastrada; senão, de `origem`.
+    `relatar` é uma função opcional que recebe mensagens de progresso.
+    Ao gravar, remove as rotas do dia dos técnicos (dentre `tecnico_ids`, se informado) que
+    ficaram sem paradas. Devolve a lista de RotaPlanejada (não gravadas se salvar=False).
+    """
+    relatar = relatar or (lambda mensagem: None)
+    grupos = paradas_por_tecnico(dia, tecnico_ids)
+    bases = {
+        tecnico_id: (base.y, base.x)
+        for tecnico_id, base in get_user_model().objects.filter(pk__in=grupos, localizacao_base__isnull=False)
+        .values_list('id', 'localizacao_base')
+    }
+    rotas = []
+    for tecnico_id, paradas in grupos.items():
+        origem_tecnico = bases.get(tecnico_id, origem)
+        paradas_ordenadas, distancia = ordenar_paradas(paradas, origem_tecnico)
+
+        rota = None
+        if buscar_google:
+            try:
+                rota = buscar_rota_google(paradas_ordenadas, distancia, origem_tecnico)
+            except Exception as e:
+                # Sem a rota da Google o app ainda recebe a ordem de visita
+                relatar(f'Técnico {tecnico_id}: erro ao obter rota da Google: {e}')
+
+        rota_planejada = RotaPlanejada(
+            tecnico_id=tecnico_id, data=dia, paradas=paradas_ordenadas, distancia_estimada=distancia, rota=rota,
+        )
+        if salvar:
+            rota_planejada, _ = RotaPlanejada.objects.update_or_create(
+                tecnico_id=tecnico_id, data=dia,
+                defaults={'paradas': paradas_ordenadas, 'distancia_estimada': distancia, 'rota': rota},
+            )
+        relatar(
+            f'Técnico {tecnico_id}: {len(paradas_ordenadas)} paradas, '
+            f'{sum(len(p["ordens"]) for p in paradas_ordenadas)} O.S., ~{distancia / 1000:.1f} km'
+            + ('' if rota else ' (sem rota da Google)')
+        )
+        rotas.append(rota_planejada)
+
+    if salvar:
+        # Técnicos que tinham rota no dia mas já não têm paradas (O.S. reatribuídas ou concluídas)
+        obsoletas = RotaPlanejada.objects.filter(data=dia).exclude(tecnico_id__in=list(grupos))
+        if tecnico_ids:
+            obsoletas = obsoletas.filter(tecnico_id__in=tecnico_ids)
+        removidas, _ = obsoletas.delete()
+        if removidas:
+            relatar(f'{removidas} rota(s) sem paradas no dia removida(s)')
+    return rotas
@@ -0,0 +1,250 @@
+import datetime
+
+import numpy as np
+from django.db import connection, transaction
+
+from .models import Ativo, OrdemServico
+from . import resumo_manutencao
+
+##
+## --- preditiva.py ---
+## Geração de O.S. preditivas por um modelo de falhas de Weibull ajustado a cada Ativo
+## (comando `os_preditiva`).
+##
+## Os tempos entre falhas são os mesmos do `calcula_mtbf`: do fim da manutenção de uma O.S.
+## corretiva até a criação da corretiva seguinte (O.S. vivas e arquivadas). O tempo desde a
+## última manutenção corretiva até agora entra como observação censurada (o Ativo ainda não
+## falhou). Com β (forma) e η (escala) de cada Ativo, a probabilidade de falhar nos próximos
+## `janela` dias, dado que está a funcionar há `idade` dias, é
+##
+##     P = 1 - exp((idade/η)^β - ((idade + janela)/η)^β)
+##
+## e, quando P passa do limiar, cria-se uma O.S. preditiva para a data em que P atinge o limiar.
+##
+## Nada é feito Ativo a Ativo em Python: os intervalos de todos os Ativos vêm numa query
+## (window functions), viram vetores NumPy e o ajuste por máxima verossimilhança roda para
+## todos os Ativos ao mesmo tempo (somas por Ativo com np.bincount).
+##
+
+TIPO_PREDITIVA = 'preditiva'
+SEGUNDOS_POR_DIA = 86400.0
+BETA_MIN = 0.05
+BETA_MAX = 20.0
+
+
+"""
+============================= BLOCO 1 — Intervalos (uma query) =============================
+Uma linha por intervalo: (ativo_id, segundos, censurado). As O.S. corretivas de cada Ativo
+são ordenadas por (data_criacao, id), como em historico.ordens_do_ativo; LAG dá o fim da
+manutenção anterior e LEAD marca a última O.S. (a origem da observação censurada). Se a
+última corretiva ainda não tem manutenção, o Ativo está em falha: sem observação censurada.
+==============================================================================================
+"""
+SQL_INTERVALOS = """
+    WITH corretivas AS (
+        SELECT o.id, o.ativo_id, o.data_criacao, m.data_fim_execucao
+        FROM api_ordemservico o
+        LEFT JOIN api_manutencao m ON m.ordem_servico_id = o.id
+        WHERE UPPER(o.tipo) = UPPER(%(tipo)s) AND o.ativo_id IS NOT NULL
+          AND (%(ativo_id)s::bigint IS NULL OR o.ativo_id = %(ativo_id)s::bigint)
+        UNION ALL
+        SELECT o.id, o.ativo_id, o.data_criacao, m.data_fim_execucao
+        FROM api_ordemservicoarquivo o
+        LEFT JOIN api_manutencaoarquivo m ON m.ordem_servico_id = o.id
+        WHERE UPPER(o.tipo) = UPPER(%(tipo)s) AND o.ativo_id IS NOT NULL
+          AND (%(ativo_id)s::bigint IS NULL OR o.ativo_id = %(ativo_id)s::bigint)
+    ),
+    sequencia AS (
+        SELECT ativo_id, data_criacao, data_fim_execucao,
+               LAG(data_fim_execucao) OVER w AS fim_anterior,
+               LEAD(id) OVER w IS NULL AS ultima
+        FROM corretivas
+        WINDOW w AS (PARTITION BY ativo_id ORDER BY data_criacao, id)
+    )
+    SELECT ativo_id, EXTRACT(EPOCH FROM data_criacao - fim_anterior)::float8, false
+    FROM sequencia
+    WHERE fim_anterior IS NOT NULL AND data_criacao > fim_anterior
+    UNION ALL
+    SELECT ativo_id, EXTRACT(EPOCH FROM %(agora)s - data_fim_execucao)::float8, true
+    FROM sequencia
+    WHERE ultima AND data_fim_execucao IS NOT NULL AND data_fim_execucao < %(agora)s
+"""
+
+
+def carregar_intervalos(agora, tipo='corretiva', ativo_id=None):
+    """ (ativo_ids, tempos em dias, censurado) como vetores NumPy alinhados. """
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_INTERVALOS, {'tipo': tipo, 'ativo_id': ativo_id, 'agora': agora})
+        linhas = cursor.fetchall()
+    if not linhas:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=bool)
+    ativo_ids, segundos, censurado = zip(*linhas)
+    return (
+        np.fromiter(ativo_ids, dtype=np.int64, count=len(linhas)),
+        np.fromiter(segundos, dtype=np.float64, count=len(linhas)) / SEGUNDOS_POR_DIA,
+        np.fromiter(censurado, dtype=bool, count=len(linhas)),
+    )
+
+
+"""
+=========================== BLOCO 2 — Ajuste de Weibull vetorizado ===========================
+Máxima verossimilhança com censura à direita. Para cada grupo (Ativo), com d falhas e todas
+as observações x_i (falhas e censuradas), η sai de β em forma fechada,
+
+    η^β = Σ x_i^β / d,
+
+e β é a raiz de g(β) = Σ x^β ln x / Σ x^β - 1/β - média(ln x das falhas), crescente em β.
+Newton com o passo limitado a [β/2, 2β] converge em poucas iterações; cada iteração são três
+np.bincount sobre todas as observações. Os tempos são divididos pela média do grupo antes
+(x^β não estoura) e η volta à escala original no fim.
+==============================================================================================
+"""
+def ajustar_weibull(grupos, tempos, falha, n_grupos, min_falhas=3, iteracoes=100, tolerancia=1e-9):
+    """
+    β e η (na unidade de `tempos`) e o número de falhas de cada grupo 0..n_grupos-1.
+    Grupos com menos de `min_falhas` falhas ficam com β = η = NaN.
+    """
+    falhas = np.bincount(grupos, weights=falha.astype(np.float64), minlength=n_grupos)
+    validos = falhas >= min_falhas
+    beta = np.full(n_grupos, np.nan)
+    eta = np.full(n_grupos, np.nan)
+    if not validos.any():
+        return beta, eta, falhas
+
+    # Só as observações dos grupos com falhas suficientes entram nas iterações
+    usadas = validos[grupos]
+    grupos, tempos, falha = grupos[usadas], tempos[usadas], falha[usadas]
+
+    contagem = np.bincount(grupos, minlength=n_grupos)
+    escala = np.ones(n_grupos)
+    escala[validos] = np.bincount(grupos, weights=tempos, minlength=n_grupos)[validos] / contagem[validos]
+    log_z = np.log(np.maximum(tempos / escala[grupos], 1e-12))
+    media_log_falhas = np.zeros(n_grupos)
+    media_log_falhas[validos] = np.bincount(grupos, weights=log_z * falha, minlength=n_grupos)[validos] / falhas[validos]
+
+    b = np.ones(n_grupos)  # começa na exponencial (β = 1)
+    for _ in range(iteracoes):
+        z_b = np.exp(b[grupos] * log_z)
+        s0 = np.bincount(grupos, weights=z_b, minlength=n_grupos)[validos]
+        s1 = np.bincount(grupos, weights=z_b * log_z, minlength=n_grupos)[validos]
+        s2 = np.bincount(grupos, weights=z_b * log_z * log_z, minlength=n_grupos)[validos]
+        atual = b[validos]
+        g = s1 / s0 - 1 / atual - media_log_falhas[validos]
+        derivada = (s2 * s0 - s1 * s1) / (s0 * s0) + 1 / (atual * atual)
+        novo = np.clip(atual - g / derivada, atual / 2, atual * 2)
+        novo = np.clip(novo, BETA_MIN, BETA_MAX)
+        variacao = np.max(np.abs(novo - atual))
+        b[validos] = novo
+        if variacao < tolerancia:
+            break
+
+    s0 = np.bincount(grupos, weights=np.exp(b[grupos] * log_z), minlength=n_grupos)[validos]
+    beta[validos] = b[validos]
+    eta[validos] = escala[validos] * (s0 / falhas[validos]) ** (1 / b[validos])
+    return beta, eta, falhas
+
+
+"""
+=========================== BLOCO 3 — Probabilidade e data prevista ===========================
+Ambas condicionadas à idade atual (dias desde a última corretiva) e em forma fechada: a data
+prevista é o instante em que a probabilidade condicional de falha chega ao limiar.
+===============================================================================================
+"""
+def probabilidade_falha(idade, janela, beta, eta):
+    """ P(falha em (idade, idade + janela] | sem falha até idade), vetorizado. """
+    return -np.expm1((idade / eta) ** beta - ((idade + janela) / eta) ** beta)
+
+
+def prazo_ate_limiar(idade, limiar, beta, eta):
+    """ Dias a partir de agora até a probabilidade condicional de falha atingir `limiar`. """
+    alvo = (idade / eta) ** beta - np.log1p(-limiar)
+    return np.maximum(eta * alvo ** (1 / beta) - idade, 0.0)
+
+
+"""
+============================== BLOCO 4 — Avaliação e geração ==============================
+`avaliar` devolve os Ativos acima do limiar; `criar_ordens` grava as O.S. com bulk_create
+e, como os signals não correm no bulk_create, reconstrói o resumo de manutenção dos Ativos
+afetados e publica os eventos em tempo real.
+===========================================================================================
+"""
+def avaliar(agora, janela_dias=30, limiar=0.5, min_falhas=3, tipo='corretiva', ativo_id=None):
+    """
+    {'ativos_com_dados', 'ajustados', 'candidatos': [dict por Ativo acima do limiar]}.
+    Ativos que já têm O.S. preditiva pendente não são candidatos.
+    """
+    ativo_ids, tempos, censurado = carregar_intervalos(agora, tipo=tipo, ativo_id=ativo_id)
+    ids_unicos, grupos = np.unique(ativo_ids, return_inverse=True)
+    n_grupos = len(ids_unicos)
+    beta, eta, falhas = ajustar_weibull(grupos, tempos, ~censurado, n_grupos, min_falhas=min_falhas)
+
+    # Idade atual = a observação censurada do grupo (no máximo uma por Ativo)
+    idade = np.full(n_grupos, np.nan)
+    idade[grupos[censurado]] = tempos[censurado]
+
+    ajustados = ~np.isnan(beta)
+    avaliaveis = ajustados & ~np.isnan(idade)
+    probabilidade = np.full(n_grupos, np.nan)
+    probabilidade[avaliaveis] = probabilidade_falha(idade[avaliaveis], janela_dias, beta[avaliaveis], eta[avaliaveis])
+    acima = avaliaveis & (probabilidade >= limiar)
+    prazo = np.full(n_grupos, np.nan)
+    prazo[acima] = prazo_ate_limiar(idade[acima], limiar, beta[acima], eta[acima])
+
+    com_preditiva = set(
+        OrdemServico.objects.filter(tipo=TIPO_PREDITIVA, status='pendente', ativo_id__isnull=False)
+        .values_list('ativo_id', flat=True).distinct()
+    )
+    candidatos = []
+    for indice in np.flatnonzero(acima):
+        if int(ids_unicos[indice]) in com_preditiva:
+            continue
+        candidatos.append({
+            'ativo_id': int(ids_unicos[indice]),
+            'probabilidade': float(probabilidade[indice]),
+            'beta': float(beta[indice]),
+            'eta': float(eta[indice]),
+            'idade': float(idade[indice]),
+            'falhas': int(falhas[indice]),
+            'data_prevista': (agora + datetime.timedelta(days=float(prazo[indice]))).replace(microsecond=0),
+        })
+    return {
+        'ativos_com_dados': n_grupos,
+        'ajustados': int(ajustados.sum()),
+        'avaliados': int(avaliaveis.sum()),
+        'candidatos': candidatos,
+    }
+
+
+def criar_ordens(candidatos, janela_dias, lote=1000):
+    """ Cria uma O.S. preditiva pendente por candidato. Devolve as O.S. criadas. """
+    from .tempo_real import publicar_ordem
+
+    ativos = Ativo.objects.only('id', 'nome', 'localizacao').in_bulk([c['ativo_id'] for c in candidatos])
+    ordens = [
+        OrdemServico(
+            titulo='Preditiva automática',
+            tipo=TIPO_PREDITIVA,
+            descricao=(
+                f"Probabilidade de falha de {c['probabilidade']:.0%} nos próximos {janela_dias} dias "
+                f"(Weibull β={c['beta']:.2f}, η={c['eta']:.0f} dias; {c['falhas']} falhas; "
+                f"{c['idade']:.0f} dias desde a última corretiva). "
+                f"Gerada automaticamente pelo comando os_preditiva."
+            ),
+            status='pendente',
+            ativo=ativos.get(c['ativo_id']),
+            data_prevista=c['data_prevista'],
+        )
+        for c in candidatos
+        if c['ativo_id'] in ativos
+    ]
+    with transaction.atomic():
+        criadas = OrdemServico.objects.bulk_create(ordens, batch_size=lote)
+        afetados = {ordem.ativo_id for ordem in criadas}
+        if len(afetados) > 100:
+            resumo_manutencao.reconstruir()  # um único INSERT ... SELECT para todos os Ativos
+        else:
+            for ativo_id in afetados:
+                resumo_manutencao.reconstruir(ativo_id)
+        for ordem in criadas:
+            publicar_ordem('ordem.criada', ordem)
+    return criadas
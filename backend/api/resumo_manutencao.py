@@ -0,0 +1,180 @@
+from django.db import connection
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from .models import OrdemServico, ResumoManutencaoAtivo
+
+##
+## --- resumo_manutencao.py ---
+## Manutenção do resumo por Ativo (ResumoManutencaoAtivo): contagens de O.S. pendentes,
+## próxima data prevista, última manutenção etc. Mantido pelos signals (signals.py) na
+## mesma transação em que a O.S. / a Manutenção é gravada, e reconstruído do zero pelo
+## comando `reconstroi_resumo_manutencao` para corrigir desvios (ex.: SQL direto).
+##
+## O resumo considera as O.S. vivas e as do arquivo morto (ver historico.py). Mover O.S.
+## para o arquivo não muda nenhum valor, por isso o `arquiva_ordens` não mexe no resumo.
+##
+
+TIPO_PREVENTIVA = 'preventiva'
+
+
+"""
+====================== BLOCO 1 — Reconstrução (um Ativo ou todos) ======================
+Um único INSERT ... SELECT com agregações sobre as O.S. e manutenções vivas + arquivadas
+(UNION ALL), gravado com ON CONFLICT (upsert). Com `ativo_id`, só a linha desse Ativo.
+========================================================================================
+"""
+SQL_RECONSTRUIR = """
+    INSERT INTO api_resumomanutencaoativo (
+        ativo_id, pendentes, preventivas_pendentes, preventivas_total, proxima_data_prevista,
+        ultimo_fim_manutencao, ultimo_fim_preventiva, ultima_prevista_preventiva, atualizado_em
+    )
+    SELECT a.id,
+           COALESCE(o.pendentes, 0), COALESCE(o.preventivas_pendentes, 0), COALESCE(o.preventivas_total, 0),
+           o.proxima_data_prevista, m.ultimo_fim_manutencao, m.ultimo_fim_preventiva,
+           o.ultima_prevista_preventiva, %(agora)s
+    FROM api_ativo a
+    LEFT JOIN (
+        SELECT ativo_id,
+               COUNT(*) FILTER (WHERE status = 'pendente') AS pendentes,
+               COUNT(*) FILTER (WHERE status = 'pendente' AND tipo = 'preventiva') AS preventivas_pendentes,
+               COUNT(*) FILTER (WHERE tipo = 'preventiva') AS preventivas_total,
+               MIN(data_prevista) FILTER (WHERE status = 'pendente') AS proxima_data_prevista,
+               MAX(data_prevista) FILTER (WHERE status = 'finalizada' AND tipo = 'preventiva') AS ultima_prevista_preventiva
+        FROM (
+            SELECT ativo_id, tipo, status, data_prevista FROM api_ordemservico
+            UNION ALL
+            SELECT ativo_id, tipo, status, data_prevista FROM api_ordemservicoarquivo
+        ) ordens
+        WHERE %(ativo_id)s::bigint IS NULL OR ativo_id = %(ativo_id)s
+        GROUP BY ativo_id
+    ) o ON o.ativo_id = a.id
+    LEFT JOIN (
+        SELECT ordens.ativo_id,
+               MAX(manutencoes.data_fim_execucao) AS ultimo_fim_manutencao,
+               MAX(manutencoes.data_fim_execucao) FILTER (WHERE ordens.tipo = 'preventiva') AS ultimo_fim_preventiva
+        FROM (
+            SELECT ordem_servico_id, data_fim_execucao FROM api_manutencao
+            UNION ALL
+            SELECT ordem_servico_id, data_fim_execucao FROM api_manutencaoarquivo
+        ) manutencoes
+        JOIN (
+            SELECT id, ativo_id, tipo FROM api_ordemservico
+            UNION ALL
+            SELECT id, ativo_id, tipo FROM api_ordemservicoarquivo
+        ) ordens ON ordens.id = manutencoes.ordem_servico_id
+        WHERE %(ativo_id)s::bigint IS NULL OR ordens.ativo_id = %(ativo_id)s
+        GROUP BY ordens.ativo_id
+    ) m ON m.ativo_id = a.id
+    WHERE %(ativo_id)s::bigint IS NULL OR a.id = %(ativo_id)s
+    ON CONFLICT (ativo_id) DO UPDATE SET
+        pendentes = EXCLUDED.pendentes,
+        preventivas_pendentes = EXCLUDED.preventivas_pendentes,
+        preventivas_total = EXCLUDED.preventivas_total,
+        proxima_data_prevista = EXCLUDED.proxima_data_prevista,
+        ultimo_fim_manutencao = EXCLUDED.ultimo_fim_manutencao,
+        ultimo_fim_preventiva = EXCLUDED.ultimo_fim_preventiva,
+        ultima_prevista_preventiva = EXCLUDED.ultima_prevista_preventiva,
+        atualizado_em = EXCLUDED.atualizado_em
+"""
+
+
+def reconstruir(ativo_id=None):
+    """ Recalcula o resumo de um Ativo (ou de todos). Devolve o número de linhas gravadas. """
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_RECONSTRUIR, {'ativo_id': ativo_id, 'agora': timezone.now()})
+        return cursor.rowcount
+
+
+def resumo_do_ativo(ativo):
+    """ O resumo do Ativo; se ainda não existir (ex.: Ativo anterior ao resumo), calcula-o agora. """
+    try:
+        return ativo.resumo_manutencao
+    except ResumoManutencaoAtivo.DoesNotExist:
+        reconstruir(ativo.pk)
+        return ResumoManutencaoAtivo.objects.get(ativo_id=ativo.pk)
+
+
+"""
+===================== BLOCO 2 — Atualização incremental (signals) =====================
+Os casos frequentes — O.S. criada, O.S. finalizada, Manutenção registada — atualizam a
+linha do Ativo com expressões F() / GREATEST / LEAST, sem reler as O.S. do Ativo. Só
+quando a O.S. finalizada era a próxima prevista é preciso buscar a nova data (MIN sobre as
+pendentes do Ativo). Qualquer outra mudança (troca de Ativo, tipo ou data; exclusão)
+reconstrói a linha dos Ativos afetados.
+========================================================================================
+"""
+def _garantir_linha(ativo_id):
+    """
+    True se a linha não existia e foi reconstruída agora. Os signals rodam depois do save:
+    a reconstrução já inclui a alteração em curso, e o delta não deve ser aplicado de novo.
+    (Uma linha zerada no lugar daria pendentes negativos ou 0 com O.S. pendentes.)
+    """
+    if ResumoManutencaoAtivo.objects.filter(ativo_id=ativo_id).exists():
+        return False
+    reconstruir(ativo_id)
+    return True
+
+
+def ordem_criada(ordem):
+    if ordem.ativo_id is None or _garantir_linha(ordem.ativo_id):
+        return
+    preventiva = ordem.tipo == TIPO_PREVENTIVA
+    pendente = ordem.status == 'pendente'
+    campos = {'preventivas_total': F('preventivas_total') + int(preventiva)}
+    if pendente:
+        campos['pendentes'] = F('pendentes') + 1
+        campos['preventivas_pendentes'] = F('preventivas_pendentes') + int(preventiva)
+        campos['proxima_data_prevista'] = Least(F('proxima_data_prevista'), Value(ordem.data_prevista))
+    elif preventiva:
+        campos['ultima_prevista_preventiva'] = Greatest(F('ultima_prevista_preventiva'), Value(ordem.data_prevista))
+    ResumoManutencaoAtivo.objects.filter(ativo_id=ordem.ativo_id).update(atualizado_em=timezone.now(), **campos)
+
+
+def ordem_finalizada(ordem):
+    if ordem.ativo_id is None or _garantir_linha(ordem.ativo_id):
+        return
+    preventiva = ordem.tipo == TIPO_PREVENTIVA
+    campos = {
+        'pendentes': F('pendentes') - 1,
+        'preventivas_pendentes': F('preventivas_pendentes') - int(preventiva),
+    }
+    if preventiva:
+        campos['ultima_prevista_preventiva'] = Greatest(F('ultima_prevista_preventiva'), Value(ordem.data_prevista))
+    linhas = ResumoManutencaoAtivo.objects.filter(ativo_id=ordem.ativo_id)
+    linhas.update(atualizado_em=timezone.now(), **campos)
+
+    # Só recalcula a próxima data se a O.S. finalizada podia ser a próxima
+    if linhas.filter(proxima_data_prevista__gte=ordem.data_prevista).exists():
+        proxima = (
+            OrdemServico.objects.filter(ativo_id=ordem.ativo_id, status='pendente')
+            .order_by('data_prevista').values_list('data_prevista', flat=True).first()
+        )
+        linhas.update(proxima_data_prevista=proxima)
+
+
+def manutencao_registrada(manutencao):
+    ordem = manutencao.ordem_servico
+    if ordem.ativo_id is None or _garantir_linha(ordem.ativo_id):
+        return
+    fim = Value(manutencao.data_fim_execucao)
+    campos = {'ultimo_fim_manutencao': Greatest(F('ultimo_fim_manutencao'), fim)}
+    if ordem.tipo == TIPO_PREVENTIVA:
+        campos['ultimo_fim_preventiva'] = Greatest(F('ultimo_fim_preventiva'), fim)
+    ResumoManutencaoAtivo.objects.filter(ativo_id=ordem.ativo_id).update(atualizado_em=timezone.now(), **campos)
+
+
+def ordem_alterada(ordem, original):
+    """
+    `original` é (ativo_id, tipo, status, data_prevista) com que a O.S. foi carregada.
+    Decide entre a atualização incremental e a reconstrução dos Ativos afetados.
+    """
+    atual = (ordem.ativo_id, ordem.tipo, ordem.status, ordem.data_prevista)
+    if atual == original:
+        return
+    if atual[:2] == original[:2] and atual[3] == original[3] and original[2] == 'pendente' and atual[2] == 'finalizada':
+        ordem_finalizada(ordem)
+        return
+    for ativo_id in {original[0], ordem.ativo_id} - {None}:
+        reconstruir(ativo_id)
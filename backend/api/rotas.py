@@ -0,0 +1,257 @@
+import hashlib
+import json
+from collections import namedtuple
+
+from django.conf import settings
+
+from .otimizador_rotas import otimizar_rota
+
+##
+## --- rotas.py ---
+## Regras de montagem dos pedidos de rota enviados à Google Directions.
+## Partilhado pelas versões síncrona (WSGI) e assíncrona (ASGI) do proxy de rotas,
+## para que as duas validem e formatem os parâmetros exatamente da mesma forma.
+##
+## As coordenadas são normalizadas (arredondadas a ROUTE_COORDINATE_PRECISION casas
+## decimais) para que pedidos quase idênticos gerem a mesma chave em `chave_rota()`
+## e possam ser coalescidos numa única chamada à Google (ver coalescencia.py).
+##
+## Para muitas paradas (acima de ROUTE_LOCAL_OPTIMIZATION_THRESHOLD) a ordem de visita
+## é calculada localmente (otimizador_rotas.py) e a rota é pedida à Google em trechos
+## de até ROUTE_MAX_WAYPOINTS_PER_REQUEST waypoints, que depois são costurados numa
+## única resposta no mesmo formato da Directions.
+##
+
+
+class RotaInvalidaError(ValueError):
+    """ Dados de rota incompletos; a mensagem é devolvida ao cliente com HTTP 400. """
+
+
+def _ler_coordenada(lat, lng):
+    try:
+        return float(lat), float(lng)
+    except (TypeError, ValueError):
+        raise RotaInvalidaError(f'Coordenada inválida: {lat},{lng}.')
+
+
+def _formatar_coordenada(lat, lng):
+    casas = settings.ROUTE_COORDINATE_PRECISION
+    lat, lng = _ler_coordenada(lat, lng)
+    return f'{lat:.{casas}f},{lng:.{casas}f}'
+
+
+def montar_parametros_rota(dados):
+    """
+    Converte o corpo do pedido do app (start_lat/start_lng + end_lat/end_lng ou waypoints)
+    nos parâmetros da Google Directions. Lança `RotaInvalidaError` se faltar informação.
+    """
+    if not isinstance(dados, dict):
+        raise RotaInvalidaError('O corpo do pedido deve ser um objeto JSON.')
+    start_lat = dados.get('start_lat')
+    start_lng = dados.get('start_lng')
+    end_lat = dados.get('end_lat') # Para rota A->B
+    end_lng = dados.get('end_lng') # Para rota A->B
+    waypoints_data = dados.get('waypoints') # Lista de waypoints
+
+    if not start_lat or not start_lng:
+        raise RotaInvalidaError('Coordenadas de origem são obrigatórias.')
+
+    params = {
+        'origin': _formatar_coordenada(start_lat, start_lng),
+        'key': settings.GOOGLE_MAPS_API_KEY,
+        'mode': 'driving',
+    }
+
+    # Decide se é uma rota A->B ou uma rota otimizada
+    if waypoints_data and isinstance(waypoints_data, list) and len(waypoints_data) > 0:
+        # Rota Otimizada com Waypoints
+        # Separa o último waypoint para ser o destino final explícito
+        final_destination_data = waypoints_data[-1]
+        intermediate_waypoints_data = waypoints_data[:-1] # Todos exceto o último
+
+        try:
+            # Define o destino final
+            params['destination'] = _formatar_coordenada(final_destination_data['lat'], final_destination_data['lng'])
+
+            # Formata os waypoints intermédios se houver algum
+            if intermediate_waypoints_data:
+                waypoints_str = "optimize:true|" + "|".join([_formatar_coordenada(wp['lat'], wp['lng']) for wp in intermediate_waypoints_data])
+                params['waypoints'] = waypoints_str
+        except (KeyError, TypeError):
+            raise RotaInvalidaError('Cada waypoint deve ter "lat" e "lng".')
+        # Se só houver 1 waypoint, ele torna-se o destino e não há waypoints intermédios
+
+    elif end_lat and end_lng:
+        # Rota Simples A -> B
+        params['destination'] = _formatar_coordenada(end_lat, end_lng)
+    else:
+        raise RotaInvalidaError('Coordenadas de destino ou waypoints são obrigatórios.')
+
+    return params
+
+
+def chave_rota(params):
+    """ Chave estável de um pedido de rota (sem a API key), usada para coalescer pedidos iguais. """
+    sem_chave = {k: v for k, v in params.items() if k != 'key'}
+    return hashlib.sha256(json.dumps(sem_chave, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+"""
+==================== BLOCO 2 — Otimização local e rotas em trechos ====================
+`precisa_otimizacao_local(dados)` decide se o pedido vai para o otimizador local: quando
+há mais waypoints do que o limite configurado ou quando o app pede `"otimizacao": "local"`.
+
+`planejar_trechos(dados)` ordena TODAS as paradas (inclusive a última, que deixa de ser
+um destino fixo) e divide o percurso em trechos consecutivos: o fim de cada trecho é a
+origem do seguinte. Cada trecho vira um pedido independente à Google, sem `optimize`,
+e os pedidos podem ser feitos em paralelo.
+
+`costurar_trechos(respostas, plano)` junta as respostas na ordem: concatena os `legs`,
+une as polylines (decodificando e recodificando) e devolve `waypoint_order` com a ordem
+de visita de todos os waypoints enviados pelo app.
+========================================================================================
+"""
+PlanoRota = namedtuple('PlanoRota', ['trechos', 'ordem', 'distancia_estimada_m'])
+
+
+def precisa_otimizacao_local(dados):
+    if not isinstance(dados, dict):
+        return False  # montar_parametros_rota recusa o corpo
+    waypoints_data = dados.get('waypoints')
+    if not waypoints_data or not isinstance(waypoints_data, list):
+        return False
+    return dados.get('otimizacao') == 'local' or len(waypoints_data) > settings.ROUTE_LOCAL_OPTIMIZATION_THRESHOLD
+
+
+def planejar_trechos(dados):
+    """ Ordena as paradas localmente e monta os parâmetros de cada trecho a pedir à Google. """
+    if not dados.get('start_lat') or not dados.get('start_lng'):
+        raise RotaInvalidaError('Coordenadas de origem são obrigatórias.')
+    origem = _ler_coordenada(dados['start_lat'], dados['start_lng'])
+    try:
+        paradas = [_ler_coordenada(wp['lat'], wp['lng']) for wp in dados['waypoints']]
+    except (KeyError, TypeError):
+        raise RotaInvalidaError('Cada waypoint deve ter "lat" e "lng".')
+
+    ordem, distancia = otimizar_rota([origem] + paradas, settings.ROUTE_OPTIMIZER_TIME_BUDGET)
+    return PlanoRota(montar_trechos(origem, [paradas[k] for k in ordem]), ordem, distancia)
+
+
+def montar_trechos(origem, paradas_ordenadas):
+    """ Divide um percurso já ordenado em pedidos à Google de tamanho aceito pela API. """
+    # Cada trecho leva até N waypoints intermédios + 1 parada como destino
+    paradas_por_trecho = settings.ROUTE_MAX_WAYPOINTS_PER_REQUEST + 1
+    trechos = []
+    inicio = origem
+    for k in range(0, len(paradas_ordenadas), paradas_por_trecho):
+        bloco = paradas_ordenadas[k:k + paradas_por_trecho]
+        params = {
+            'origin': _formatar_coordenada(*inicio),
+            'destination': _formatar_coordenada(*bloco[-1]),
+            'key': settings.GOOGLE_MAPS_API_KEY,
+            'mode': 'driving',
+        }
+        if len(bloco) > 1:
+            params['waypoints'] = "|".join([_formatar_coordenada(*p) for p in bloco[:-1]])
+        trechos.append(params)
+        inicio = bloco[-1]
+    return trechos
+
+
+def chave_plano(plano):
+    return chave_rota({'trechos': [chave_rota(params) for params in plano.trechos]})
+
+
+def costurar_trechos(respostas, plano):
+    """ Junta as respostas dos trechos (na ordem) numa única resposta da Directions. """
+    for resposta in respostas:
+        # Se algum trecho falhou (ex.: ZERO_RESULTS), devolve o erro tal como a Google o enviou
+        if resposta.get('status') != 'OK' or not resposta.get('routes'):
+            return resposta
+
+    legs = []
+    pontos = []
+    geocoded = []
+    for resposta in respostas:
+        rota = resposta['routes'][0]
+        legs.extend(rota['legs'])
+        geocoded.extend(resposta.get('geocoded_waypoints', []))
+        trecho = decodificar_polyline(rota['overview_polyline']['points'])
+        # O primeiro ponto de um trecho é o último do anterior: não duplicar
+        if pontos and trecho and trecho[0] == pontos[-1]:
+            trecho = trecho[1:]
+        pontos.extend(trecho)
+
+    return {
+        'status': 'OK',
+        'geocoded_waypoints': geocoded,
+        'routes': [{
+            'summary': respostas[0]['routes'][0].get('summary', ''),
+            'legs': legs,
+            'overview_polyline': {'points': codificar_polyline(pontos)},
+            'waypoint_order': plano.ordem,
+            'warnings': [w for r in respostas for w in r['routes'][0].get('warnings', [])],
+        }],
+        'otimizacao': {
+            'origem': 'local',
+            'trechos': len(respostas),
+            'distancia_estimada_m': round(plano.distancia_estimada_m),
+        },
+    }
+
+
+"""
+========================= BLOCO 3 — Encoded Polyline (Google) =========================
+Implementação do formato "Encoded Polyline Algorithm" da Google (5 casas decimais),
+usada para unir as polylines dos trechos numa só.
+========================================================================================
+"""
+def decodificar_polyline(texto):
+    pontos = []
+    indice = lat = lng = 0
+    while indice < len(texto):
+        deltas = []
+        for _ in range(2):
+            resultado = deslocamento = 0
+            while True:
+                byte = ord(texto[indice]) - 63
+                indice += 1
+                resultado |= (byte & 0x1f) << deslocamento
+                deslocamento += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(resultado >> 1) if resultado & 1 else resultado >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        pontos.append((lat, lng))
+    # Mantém os valores inteiros (graus * 1e5) para não acumular erros ao recodificar
+    return pontos
+
+
+def _codificar_valor(valor):
+    valor = ~(valor << 1) if valor < 0 else valor << 1
+    partes = []
+    while valor >= 0x20:
+        partes.append(chr((0x20 | (valor & 0x1f)) + 63))
+        valor >>= 5
+    partes.append(chr(valor + 63))
+    return ''.join(partes)
+
+
+def codificar_polyline(pontos):
+    """ Recebe pontos como inteiros (graus * 1e5), no formato devolvido por `decodificar_polyline`. """
+    partes = []
+    lat_anterior = lng_anterior = 0
+    for lat, lng in pontos:
+        partes.append(_codificar_valor(lat - lat_anterior))
+        partes.append(_codificar_valor(lng - lng_anterior))
+        lat_anterior, lng_anterior = lat, lng
+    return ''.join(partes)
+
+
+def extrair_mensagem_erro(corpo_json, padrao):
+    """ Tenta extrair a mensagem de erro devolvida pela Google; usa `padrao` se não houver. """
+    try:
+        return corpo_json.get('error_message', padrao)
+    except AttributeError: # Corpo vazio ou que não é um objeto JSON
+        return padrao
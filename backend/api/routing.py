@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .consumers import AtualizacoesConsumer
+
+# Rotas WebSocket (montadas em core/asgi.py); as rotas HTTP continuam em urls.py
+websocket_urlpatterns = [
+    path('ws/atualizacoes/', AtualizacoesConsumer.as_asgi()),
+]
@@ -1,8 +1,9 @@
 import json
+from django.urls import reverse
 from django.contrib.gis.geos import Point
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from rest_framework import serializers
-from .models import Ativo, OrdemServico, Manutencao
+from .models import Ativo, ManualDerivado, OrdemServico, Manutencao, OrdemServicoArquivo, PerfilExecucao, ResumoManutencaoAtivo, RotaPlanejada
 
 
 ##
@@ -56,11 +57,35 @@ permitindo a integração com mapas e coordenadas no frontend.
 
 ========================================================================================
 """
+class ResumoManutencaoAtivoSerializer(serializers.ModelSerializer):
+    """ Resumo de manutenção do Ativo (O.S. pendentes, próxima data prevista, última manutenção). """
+    class Meta:
+        model = ResumoManutencaoAtivo
+        exclude = ('ativo',)
+        read_only_fields = ('pendentes', 'preventivas_pendentes', 'preventivas_total', 'proxima_data_prevista',
+                            'ultimo_fim_manutencao', 'ultimo_fim_preventiva', 'ultima_prevista_preventiva', 'atualizado_em')
+
+
+class ManualDerivadoSerializer(serializers.ModelSerializer):
+    """ Estado dos derivados do manual (miniatura, nº de páginas); o texto fica fora da listagem. """
+    class Meta:
+        model = ManualDerivado
+        fields = ('status', 'sha256', 'miniatura', 'paginas', 'atualizado_em')
+        read_only_fields = fields
+
+
 class AtivoSerializer(GeoFeatureModelSerializer):
+    # Somente leitura; calculado a partir das O.S. (ver api/resumo_manutencao.py)
+    resumo_manutencao = ResumoManutencaoAtivoSerializer(read_only=True)
+    # Somente leitura; gerado em segundo plano a partir do manual (ver api/derivados_manual.py)
+    manual_derivado = ManualDerivadoSerializer(read_only=True)
+
     class Meta:
         model = Ativo
         geo_field = "localizacao"
-        fields = ('id', 'nome', 'marca', 'modelo', 'periodicidade', 'manual', 'endereco', 'localizacao', 'mtbf', 'mttr')
+        fields = ('id', 'nome', 'marca', 'modelo', 'periodicidade', 'manual', 'manual_sha256', 'endereco', 'localizacao', 'mtbf', 'mttr', 'resumo_manutencao', 'manual_derivado')
+        # Calculado a partir do arquivo (ver api/manuais.py)
+        read_only_fields = ('manual_sha256',)
 
     def create(self, validated_data):
         localizacao_data = json.loads(validated_data.pop('localizacao'))
@@ -115,7 +140,7 @@ receber dados JSON para criar novas ordens de serviço.
 • `fields` define quais atributos serão incluídos no JSON retornado.
   Inclui:
   - Dados principais: `titulo`, `tipo`, `descricao`, `status`
-  - Relacionamentos: `ativo`, `ativo_nome`, `solicitante`
+  - Relacionamentos: `ativo`, `ativo_nome`, `solicitante`, `tecnico`
   - Datas de criação e previsão.
 • `read_only_fields` protege certos campos de edição pela API
   (por exemplo, `status`, `data_criacao` e `solicitante` só podem ser definidos internamente).
@@ -145,11 +170,21 @@ class OrdemServicoSerializer(serializers.ModelSerializer):
         model = OrdemServico
         fields = (
             'id', 'titulo', 'tipo', 'descricao', 'status', 
-            'ativo', 'ativo_nome', 'data_criacao', 'data_prevista', 'solicitante', 'manutencao'
+            'ativo', 'ativo_nome', 'data_criacao', 'data_prevista', 'solicitante', 'tecnico', 'manutencao'
         )
         read_only_fields = ('status', 'data_criacao', 'solicitante', 'ativo_nome', 'manutencao')
 
 
+class OrdemServicoArquivoSerializer(OrdemServicoSerializer):
+    """
+    Mesma representação do OrdemServicoSerializer para as O.S. do arquivo morto
+    (somente leitura), para o histórico não distinguir O.S. vivas de arquivadas.
+    """
+    class Meta(OrdemServicoSerializer.Meta):
+        model = OrdemServicoArquivo
+        read_only_fields = OrdemServicoSerializer.Meta.fields
+
+
 class FinalizarOSSerializer(serializers.Serializer):
     """
     Serializer para validar os dados enviados ao finalizar uma O.S.
@@ -162,4 +197,34 @@ class FinalizarOSSerializer(serializers.Serializer):
         """ Garante que a data de fim seja posterior à de início. """
         if data['data_inicio_execucao'] >= data['data_fim_execucao']:
             raise serializers.ValidationError("A data de fim deve ser posterior à data de início.")
-        return data
\ No newline at end of file
+        return data
+
+
+class RotaPlanejadaSerializer(serializers.ModelSerializer):
+    """
+    Rota do dia pré-calculada para um técnico: paradas na ordem de visita e,
+    em `rota`, a resposta da Google no mesmo formato de /api/get-route/.
+    """
+    tecnico_nome = serializers.StringRelatedField(source='tecnico', read_only=True)
+
+    class Meta:
+        model = RotaPlanejada
+        fields = ('id', 'tecnico', 'tecnico_nome', 'data', 'paradas', 'distancia_estimada', 'rota', 'criado_em')
+        read_only_fields = fields
+
+
+class PerfilExecucaoSerializer(serializers.ModelSerializer):
+    # O arquivo não é público: em vez da URL do storage, o link do endpoint de download (só staff)
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PerfilExecucao
+        fields = [
+            'id', 'origem', 'alvo', 'metodo', 'caminho', 'status', 'duracao', 'consultas',
+            'tempo_consultas', 'amostras', 'formato', 'usuario', 'criado_em', 'download',
+        ]
+
+    def get_download(self, obj):
+        url = reverse('perfil-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,151 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .models import Ativo, CustomUser, Manutencao, OrdemServico
+
+##
+## --- signals.py ---
+## Reações automáticas a alterações nos modelos. Registrado em ApiConfig.ready().
+##
+
+
+def _nome_manual(ativo):
+    # Antes do primeiro acesso o campo guarda o nome (str); depois, um FieldFile
+    manual = ativo.__dict__.get('manual')
+    return getattr(manual, 'name', manual) or ''
+
+
+# Guarda a localização (o manual e as métricas) com que o Ativo foi carregado, para detetar mudanças no save()
+@receiver(post_init, sender=Ativo)
+def guardar_localizacao_original(sender, instance, **kwargs):
+    # __dict__ evita disparar uma query quando o campo foi adiado com .only()/.defer()
+    instance._localizacao_original = instance.__dict__.get('localizacao')
+    instance._manual_original = _nome_manual(instance)
+    instance._metricas_original = (instance.__dict__.get('mtbf'), instance.__dict__.get('mttr'))
+
+
+# Mantém a matriz de deslocamento: só as linhas do Ativo criado/movido são recalculadas
+@receiver(post_save, sender=Ativo)
+def atualizar_matriz_deslocamento(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'localizacao' not in update_fields:
+        return
+    if not created and instance._localizacao_original == instance.localizacao:
+        return
+
+    from .matriz_deslocamento import atualizar_ativo
+    ativo_id = instance.pk
+    # Depois do commit: a busca de vizinhos precisa ver a nova localização gravada
+    transaction.on_commit(lambda: atualizar_ativo(ativo_id))
+    instance._localizacao_original = instance.localizacao
+
+
+# Manual trocado pelo formulário (multipart): recalcula o SHA-256 usado como ETag no download.
+# O upload em partes (api/manuais.py) já grava o hash junto, com update_fields.
+@receiver(post_save, sender=Ativo)
+def atualizar_hash_do_manual(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and ('manual' not in update_fields or 'manual_sha256' in update_fields):
+        return
+    manual = _nome_manual(instance)
+    if (created and not manual) or (not created and manual == instance._manual_original):
+        return
+
+    from .manuais import atualizar_hash_manual
+    ativo_id = instance.pk
+    transaction.on_commit(lambda: atualizar_hash_manual(ativo_id))
+    instance._manual_original = manual
+
+
+# Token apagado (logout, revogação pelo admin): deixa de valer no cache de autenticação
+@receiver(post_delete, sender=Token)
+def invalidar_token_apagado(sender, instance, **kwargs):
+    from .autenticacao import invalidar
+    key, usuario_id = instance.key, instance.user_id
+    transaction.on_commit(lambda: invalidar(key, usuario_id=usuario_id))
+
+
+# Usuário desativado: os tokens dele saem do cache e o próximo pedido vai ao banco (e é recusado)
+@receiver(post_save, sender=CustomUser)
+def invalidar_tokens_usuario_desativado(sender, instance, created, **kwargs):
+    if created or (instance.situacao != 'desativado' and instance.is_active):
+        return
+
+    from .autenticacao import invalidar
+    usuario_id = instance.pk
+    keys = list(Token.objects.filter(user_id=usuario_id).values_list('key', flat=True))
+    transaction.on_commit(lambda: invalidar(*keys, usuario_id=usuario_id))
+
+
+# Resumo de manutenção por Ativo (ResumoManutencaoAtivo): atualizado na mesma transação da O.S.
+# — quem grava a O.S./Manutenção abre o transaction.atomic (ver OrdemServicoViewSet)
+@receiver(post_init, sender=OrdemServico)
+def guardar_ordem_original(sender, instance, **kwargs):
+    campos = instance.__dict__
+    instance._resumo_original = (
+        campos.get('ativo_id'), campos.get('tipo'), campos.get('status'), campos.get('data_prevista'),
+    )
+
+
+@receiver(post_save, sender=OrdemServico)
+def atualizar_resumo_ordem(sender, instance, created, **kwargs):
+    from . import resumo_manutencao
+    if created:
+        resumo_manutencao.ordem_criada(instance)
+    else:
+        resumo_manutencao.ordem_alterada(instance, instance._resumo_original)
+    instance._resumo_original = (instance.ativo_id, instance.tipo, instance.status, instance.data_prevista)
+
+
+@receiver(post_save, sender=Manutencao)
+def atualizar_resumo_manutencao(sender, instance, created, **kwargs):
+    from . import resumo_manutencao
+    if created:
+        resumo_manutencao.manutencao_registrada(instance)
+    elif instance.ordem_servico.ativo_id is not None:
+        resumo_manutencao.reconstruir(instance.ordem_servico.ativo_id)
+
+
+@receiver(post_delete, sender=OrdemServico)
+@receiver(post_delete, sender=Manutencao)
+def reconstruir_resumo_apos_exclusao(sender, instance, **kwargs):
+    from . import resumo_manutencao
+    ordem = instance if sender is OrdemServico else OrdemServico.objects.filter(pk=instance.ordem_servico_id).first()
+    if ordem is not None and ordem.ativo_id is not None:
+        resumo_manutencao.reconstruir(ordem.ativo_id)
+
+
+# Eventos em tempo real (WebSocket, ver api/tempo_real.py): publicados depois do commit
+@receiver(post_init, sender=OrdemServico)
+def guardar_ordem_publicada(sender, instance, **kwargs):
+    instance._publicacao_original = (instance.__dict__.get('status'), instance.__dict__.get('tecnico_id'))
+
+
+@receiver(post_save, sender=OrdemServico)
+def publicar_alteracao_ordem(sender, instance, created, **kwargs):
+    status_original, tecnico_original = instance._publicacao_original
+    if created:
+        evento = 'ordem.criada'
+    elif status_original == 'pendente' and instance.status == 'finalizada':
+        evento = 'ordem.finalizada'
+    elif tecnico_original != instance.tecnico_id:
+        evento = 'ordem.atribuida'
+    else:
+        return
+
+    from .tempo_real import publicar_ordem
+    publicar_ordem(evento, instance, tecnico_anterior_id=tecnico_original if evento == 'ordem.atribuida' else None)
+    instance._publicacao_original = (instance.status, instance.tecnico_id)
+
+
+@receiver(post_save, sender=Ativo)
+def publicar_metricas_ativo(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not {'mtbf', 'mttr'} & set(update_fields)):
+        return
+    metricas = (instance.mtbf, instance.mttr)
+    if metricas == instance._metricas_original:
+        return
+
+    from .tempo_real import publicar_metricas
+    publicar_metricas(instance)
+    instance._metricas_original = metricas
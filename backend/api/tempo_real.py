@@ -0,0 +1,133 @@
+import logging
+import math
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+##
+## --- tempo_real.py ---
+## Eventos de alteração enviados aos clientes por WebSocket (ver consumers.py).
+##
+## Em vez de o app voltar a pedir /api/ordens-servico/?status=pendente e /api/ativos/ para
+## descobrir se algo mudou, o backend publica eventos pequenos ("ordem.criada",
+## "ordem.finalizada", "ativo.metricas") no channel layer, e o consumer os entrega a quem
+## assinou o técnico, o Ativo ou uma área do mapa.
+##
+## Grupos do channel layer:
+## - tecnico.<id>  → O.S. atribuídas ao técnico (e as que lhe foram retiradas numa reatribuição)
+## - ativo.<id>    → O.S. e métricas do Ativo
+## - celula.<x>.<y> → tudo o que acontece na célula da grade de REALTIME_GRID_DEGREES graus
+##   onde o Ativo está. Uma assinatura por área (bbox) entra em todas as células que a cobrem;
+##   o consumer filtra pela área exata.
+##
+## Os eventos são publicados depois do commit (transaction.on_commit): o cliente que reage a
+## um evento e relê o recurso já encontra a alteração gravada.
+##
+
+logger = logging.getLogger(__name__)
+
+TIPO_HANDLER = 'evento.publicado'  # chama AtualizacoesConsumer.evento_publicado
+
+
+def grupo_tecnico(tecnico_id):
+    return f'tecnico.{tecnico_id}'
+
+
+def grupo_ativo(ativo_id):
+    return f'ativo.{ativo_id}'
+
+
+def _indice_celula(coordenada):
+    return math.floor(coordenada / settings.REALTIME_GRID_DEGREES)
+
+
+def grupo_celula(longitude, latitude):
+    return f'celula.{_indice_celula(longitude)}.{_indice_celula(latitude)}'
+
+
+def grupos_da_area(min_lon, min_lat, max_lon, max_lat):
+    """ Grupos das células que cobrem a área; None se a área for grande demais. """
+    colunas = range(_indice_celula(min_lon), _indice_celula(max_lon) + 1)
+    linhas = range(_indice_celula(min_lat), _indice_celula(max_lat) + 1)
+    if len(colunas) * len(linhas) > settings.REALTIME_MAX_CELLS:
+        return None
+    passo = settings.REALTIME_GRID_DEGREES
+    return [grupo_celula((x + 0.5) * passo, (y + 0.5) * passo) for x in colunas for y in linhas]
+
+
+"""
+============================ BLOCO 1 — Publicação ============================
+`publicar` monta a mensagem e agenda o envio para depois do commit. Uma falha do
+channel layer (ex.: Redis fora do ar) não pode desfazer a gravação da O.S.: o erro
+vai para o log e o app, no pior caso, só vê a mudança na próxima sincronização.
+==============================================================================
+"""
+def _enviar(grupos, mensagem):
+    camada = get_channel_layer()
+    if camada is None:
+        return
+    for grupo in grupos:
+        try:
+            async_to_sync(camada.group_send)(grupo, mensagem)
+        except Exception:
+            logger.exception('Falha ao publicar %s no grupo %s', mensagem['evento'], grupo)
+
+
+def publicar(evento, dados, ativo_id=None, tecnico_id=None, localizacao=None, tecnico_anterior_id=None):
+    grupos = []
+    if tecnico_id is not None:
+        grupos.append(grupo_tecnico(tecnico_id))
+    if tecnico_anterior_id is not None and tecnico_anterior_id != tecnico_id:
+        grupos.append(grupo_tecnico(tecnico_anterior_id))
+    if ativo_id is not None:
+        grupos.append(grupo_ativo(ativo_id))
+    if localizacao is not None:
+        grupos.append(grupo_celula(localizacao.x, localizacao.y))
+    if not grupos:
+        return
+
+    mensagem = {
+        'type': TIPO_HANDLER,
+        'id': uuid.uuid4().hex,  # o consumer descarta o mesmo evento recebido por vários grupos
+        'evento': evento,
+        'dados': dados,
+        'ativo_id': ativo_id,
+        'tecnico_id': tecnico_id,
+        'tecnico_anterior_id': tecnico_anterior_id,
+        'ponto': [localizacao.x, localizacao.y] if localizacao is not None else None,
+    }
+    transaction.on_commit(lambda: _enviar(grupos, mensagem))
+
+
+def publicar_ordem(evento, ordem, tecnico_anterior_id=None):
+    """ `tecnico_anterior_id`: numa reatribuição, o técnico que deixou de ter a O.S. """
+    ativo = ordem.ativo
+    publicar(
+        evento,
+        {
+            'id': ordem.pk,
+            'titulo': ordem.titulo,
+            'tipo': ordem.tipo,
+            'status': ordem.status,
+            'ativo': ordem.ativo_id,
+            'tecnico': ordem.tecnico_id,
+            'tecnico_anterior': tecnico_anterior_id,
+            'data_prevista': ordem.data_prevista.isoformat() if ordem.data_prevista else None,
+        },
+        ativo_id=ordem.ativo_id,
+        tecnico_id=ordem.tecnico_id,
+        localizacao=ativo.localizacao if ativo is not None else None,
+        tecnico_anterior_id=tecnico_anterior_id,
+    )
+
+
+def publicar_metricas(ativo):
+    publicar(
+        'ativo.metricas',
+        {'id': ativo.pk, 'mtbf': ativo.mtbf, 'mttr': ativo.mttr},
+        ativo_id=ativo.pk,
+        localizacao=ativo.__dict__.get('localizacao'),
+    )
@@ -1,3 +1,400 @@
-from django.test import TestCase
+import datetime
+import itertools
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.gis.geos import Point
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .agendador import RelogioFalso, executar, reservar, _finalizar
+from .atribuicao import atribuir, _distancias
+from .consumers import AtualizacoesConsumer
+from .models import ExecucaoTarefa, Tarefa
+from .otimizador_rotas import EXATO_MAX_PARADAS, custo_rota, matriz_distancias, otimizar_rota, vizinho_mais_proximo
+from .preditiva import ajustar_weibull, prazo_ate_limiar, probabilidade_falha
+from .tempo_real import publicar_ordem
+from . import upstream
+from .upstream import CircuitBreaker
+
+
+"""
+=========================== BLOCO 1 — Agendador (api/agendador.py) ===========================
+O relógio é o RelogioFalso: o tempo só anda com `avancar`, sem esperas de verdade. O
+call_command é substituído para decidir se a execução da tarefa dá certo ou falha.
+===============================================================================================
+"""
+INICIO = datetime.datetime(2024, 1, 1, 2, 0, tzinfo=datetime.timezone.utc)
+
+
+@override_settings(JOB_LEASE_SECONDS=600)
+class AgendadorTests(TestCase):
+    def setUp(self):
+        # Sem as tarefas padrão da migração 0017
+        Tarefa.objects.all().delete()
+        self.relogio = RelogioFalso(INICIO)
+        self.tarefa = Tarefa.objects.create(
+            nome='MTBF', comando='calcula_mtbf', intervalo=datetime.timedelta(days=1), proxima_execucao=INICIO,
+            max_tentativas=3, espera_retentativa=datetime.timedelta(minutes=5),
+        )
+
+    def _rodar(self, worker='worker-a', falhar=False):
+        reservada = reservar(worker, self.relogio)
+        self.assertIsNotNone(reservada)
+        efeito = RuntimeError('falhou') if falhar else None
+        with mock.patch('api.agendador.call_command', side_effect=efeito):
+            return executar(*reservada, self.relogio)
+
+    def test_retentativas_com_espera_exponencial(self):
+        for espera in (5, 10):  # minutos: espera_retentativa * 2^(tentativa - 1)
+            sucesso, proxima = self._rodar(falhar=True)
+            self.assertFalse(sucesso)
+            self.assertEqual(proxima, self.relogio.agora() + datetime.timedelta(minutes=espera))
+            # Antes da hora da retentativa a tarefa continua bloqueada
+            self.relogio.avancar(espera * 60 - 1)
+            self.assertIsNone(reservar('worker-a', self.relogio))
+            self.relogio.avancar(2)  # o lease vale até bloqueada_ate, inclusive
+
+        # Terceira falha = max_tentativas: desiste e volta à grade
+        sucesso, proxima = self._rodar(falhar=True)
+        self.assertFalse(sucesso)
+        self.assertEqual(proxima, INICIO + datetime.timedelta(days=1))
+        self.tarefa.refresh_from_db()
+        self.assertEqual(self.tarefa.tentativa, 0)
+        self.assertEqual(list(self.tarefa.execucoes.values_list('status', flat=True)), ['falha'] * 3)
+
+    def test_lease_expirado_marca_execucao_abandonada(self):
+        tarefa, execucao = reservar('worker-a', self.relogio)
+
+        self.relogio.avancar(599)
+        self.assertIsNone(reservar('worker-b', self.relogio))
+        self.relogio.avancar(2)
+        tarefa_b, execucao_b = reservar('worker-b', self.relogio)
+
+        execucao.refresh_from_db()
+        self.assertEqual(execucao.status, 'abandonada')
+        self.assertEqual(execucao.finalizada_em, self.relogio.agora())
+        self.assertEqual(tarefa_b.tentativa, 2)
+
+        # O worker antigo termina depois: regista a execução, mas não mexe na tarefa do outro
+        _finalizar(tarefa, execucao, self.relogio, True, 'saída')
+        self.tarefa.refresh_from_db()
+        self.assertEqual(self.tarefa.bloqueada_por, 'worker-b')
+        self.assertEqual(self.tarefa.proxima_execucao, INICIO)
+        self.assertEqual(ExecucaoTarefa.objects.get(pk=execucao_b.pk).status, 'executando')
+
+    def test_proxima_execucao_mantem_a_grade(self):
+        sucesso, proxima = self._rodar()
+        self.assertTrue(sucesso)
+        self.assertEqual(proxima, INICIO + datetime.timedelta(days=1))
+
+        # Atrasada 3 dias e 5 horas: as execuções perdidas não se acumulam e a hora (02:00) mantém-se
+        self.relogio.avancar((3 * 24 + 5) * 3600)
+        sucesso, proxima = self._rodar()
+        self.assertTrue(sucesso)
+        self.assertEqual(proxima, INICIO + datetime.timedelta(days=4))
+        self.assertIsNone(reservar('worker-a', self.relogio))
+
+
+"""
+===================== BLOCO 2 — WebSocket de atualizações (api/consumers.py) =====================
+O consumer com o InMemoryChannelLayer. Os eventos saem por publicar_ordem, como nos signals;
+o envio fica para depois do commit, por isso roda dentro de captureOnCommitCallbacks.
+===================================================================================================
+"""
+def _ordem(tecnico_id=7, ativo_id=42, longitude=-46.63, latitude=-23.55):
+    return SimpleNamespace(
+        pk=1, titulo='Corretiva - Bomba', tipo='corretiva', status='pendente', data_prevista=None,
+        ativo_id=ativo_id, tecnico_id=tecnico_id, ativo=SimpleNamespace(localizacao=Point(longitude, latitude, srid=4326)),
+    )
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    REALTIME_GRID_DEGREES=0.1,
+)
+class AtualizacoesConsumerTests(TestCase):
+    async def _conectar(self):
+        comunicador = WebsocketCommunicator(AtualizacoesConsumer.as_asgi(), '/ws/atualizacoes/')
+        conectado, _ = await comunicador.connect()
+        self.assertTrue(conectado)
+        return comunicador
+
+    async def _publicar(self, evento, ordem, **kwargs):
+        def publicar():
+            with self.captureOnCommitCallbacks(execute=True):
+                publicar_ordem(evento, ordem, **kwargs)
+        await sync_to_async(publicar)()
+
+    async def _enviar(self, comunicador, mensagem):
+        await comunicador.send_json_to(mensagem)
+        return await comunicador.receive_json_from()
+
+    async def test_assinar_tecnico_recebe_evento_da_ordem(self):
+        comunicador = await self._conectar()
+        resposta = await self._enviar(comunicador, {'acao': 'assinar', 'tipo': 'tecnico', 'id': 7})
+        self.assertEqual(resposta, {'tipo': 'assinado', 'assinatura': 'tecnico', 'chave': 7})
+
+        await self._publicar('ordem.criada', _ordem())
+        evento = await comunicador.receive_json_from()
+        self.assertEqual((evento['tipo'], evento['evento'], evento['dados']['id']), ('evento', 'ordem.criada', 1))
+        # Também publicado nos grupos do Ativo e da célula: entregue uma vez só
+        self.assertTrue(await comunicador.receive_nothing())
+        await comunicador.disconnect()
+
+    async def test_cancelar_deixa_de_receber(self):
+        comunicador = await self._conectar()
+        await self._enviar(comunicador, {'acao': 'assinar', 'tipo': 'ativo', 'id': 42})
+        resposta = await self._enviar(comunicador, {'acao': 'cancelar', 'tipo': 'ativo', 'id': 42})
+        self.assertEqual(resposta['tipo'], 'cancelado')
+
+        await self._publicar('ordem.criada', _ordem())
+        self.assertTrue(await comunicador.receive_nothing())
+        await comunicador.disconnect()
+
+    async def test_area_filtra_pela_bbox_exata(self):
+        comunicador = await self._conectar()
+        await self._enviar(comunicador, {'acao': 'assinar', 'tipo': 'area', 'bbox': [-46.64, -23.56, -46.62, -23.54]})
+
+        await self._publicar('ordem.criada', _ordem(tecnico_id=None))
+        self.assertEqual((await comunicador.receive_json_from())['evento'], 'ordem.criada')
+        # Mesma célula da grade, fora da bbox
+        await self._publicar('ordem.criada', _ordem(tecnico_id=None, longitude=-46.61))
+        self.assertTrue(await comunicador.receive_nothing())
+        await comunicador.disconnect()
+
+    async def test_bbox_nao_finita_e_recusada(self):
+        comunicador = await self._conectar()
+        for bbox in (['nan', 0, 1, 1], [0, 0, 'inf', 1], ['-inf', '-inf', 0, 0]):
+            resposta = await self._enviar(comunicador, {'acao': 'assinar', 'tipo': 'area', 'bbox': bbox})
+            self.assertEqual(resposta['tipo'], 'erro')
+        # A conexão continua aberta
+        resposta = await self._enviar(comunicador, {'acao': 'assinar', 'tipo': 'tecnico', 'id': 7})
+        self.assertEqual(resposta['tipo'], 'assinado')
+        await comunicador.disconnect()
+
+    async def test_reatribuicao_avisa_o_tecnico_anterior(self):
+        comunicador = await self._conectar()
+        await self._enviar(comunicador, {'acao': 'assinar', 'tipo': 'tecnico', 'id': 7})
+
+        await self._publicar('ordem.atribuida', _ordem(tecnico_id=8), tecnico_anterior_id=7)
+        evento = await comunicador.receive_json_from()
+        self.assertEqual(evento['evento'], 'ordem.atribuida')
+        self.assertEqual((evento['dados']['tecnico'], evento['dados']['tecnico_anterior']), (8, 7))
+        await comunicador.disconnect()
+
+
+"""
+======================= BLOCO 3 — Modelo de Weibull (api/preditiva.py) =======================
+Só NumPy, sem banco. As amostras vêm de Generator.weibull com semente fixa e censura à
+direita uniforme, como as observações do Ativo que ainda não falhou desde a última corretiva.
+===============================================================================================
+"""
+class PreditivaTests(SimpleTestCase):
+    def test_ajuste_recupera_beta_e_eta_com_censura(self):
+        rng = np.random.default_rng(2024)
+        parametros = [(0.8, 50.0), (1.5, 200.0), (3.0, 400.0)]
+        grupos, tempos, falha = [], [], []
+        for grupo, (beta, eta) in enumerate(parametros):
+            vida = eta * rng.weibull(beta, 5000)
+            censura = rng.uniform(0, 2 * eta, 5000)
+            grupos.append(np.full(5000, grupo))
+            tempos.append(np.minimum(vida, censura))
+            falha.append(vida <= censura)
+
+        beta, eta, falhas = ajustar_weibull(np.concatenate(grupos), np.concatenate(tempos), np.concatenate(falha), 3)
+        np.testing.assert_allclose(beta, [b for b, _ in parametros], rtol=0.05)
+        np.testing.assert_allclose(eta, [e for _, e in parametros], rtol=0.05)
+        np.testing.assert_array_equal(falhas, [f.sum() for f in falha])
+
+    def test_prazo_ate_limiar_e_o_inverso_da_probabilidade(self):
+        idade = np.array([0.0, 10.0, 100.0, 500.0])
+        beta = np.array([0.8, 1.5, 3.0, 2.0])
+        eta = np.array([50.0, 200.0, 400.0, 100.0])
+        for limiar in (0.1, 0.3, 0.9):
+            prazo = prazo_ate_limiar(idade, limiar, beta, eta)
+            np.testing.assert_allclose(probabilidade_falha(idade, prazo, beta, eta), limiar)
+
+    def test_grupos_com_poucas_falhas_ficam_nan(self):
+        # Grupo 0: 2 falhas + 1 censura; grupo 1: 5 falhas; grupo 2: sem observações
+        grupos = np.array([0, 0, 0, 1, 1, 1, 1, 1])
+        tempos = np.array([10.0, 20.0, 30.0, 5.0, 8.0, 13.0, 21.0, 34.0])
+        falha = np.array([True, True, False, True, True, True, True, True])
+
+        beta, eta, falhas = ajustar_weibull(grupos, tempos, falha, 3, min_falhas=3)
+        np.testing.assert_array_equal(falhas, [2, 5, 0])
+        self.assertTrue(np.isnan([beta[0], eta[0], beta[2], eta[2]]).all())
+        self.assertTrue(np.isfinite([beta[1], eta[1]]).all())
+
+
+"""
+===================== BLOCO 4 — Atribuição de técnicos (api/atribuicao.py) =====================
+`atribuir` em memória. As paradas são montadas como em carregar_paradas: custos só dos
+candidatos mais próximos e dentro do raio; as sobras medem a distância a todos os técnicos.
+=================================================================================================
+"""
+def _instancia(semente, n_tecnicos=15, n_paradas=25, candidatos=3, raio=8000.0):
+    rng = np.random.default_rng(semente)
+    tecnicos = {
+        tecnico_id: {'lat': -23.55 + rng.uniform(-0.1, 0.1), 'lng': -46.63 + rng.uniform(-0.1, 0.1), 'folga': int(rng.integers(0, 9))}
+        for tecnico_id in range(1, n_tecnicos + 1)
+    }
+    ids = np.array(list(tecnicos))
+    lats = np.array([tecnicos[t]['lat'] for t in ids])
+    lngs = np.array([tecnicos[t]['lng'] for t in ids])
+    paradas, proxima_ordem = [], 1
+    for ativo_id in range(1, n_paradas + 1):
+        lat, lng = -23.55 + rng.uniform(-0.12, 0.12), -46.63 + rng.uniform(-0.12, 0.12)
+        distancias = _distancias(lat, lng, lats, lngs)
+        custos = {int(ids[i]): float(distancias[i]) for i in np.argsort(distancias)[:candidatos] if distancias[i] <= raio}
+        demanda = int(rng.integers(1, 5))
+        ordens = list(range(proxima_ordem, proxima_ordem + demanda))
+        proxima_ordem += demanda
+        paradas.append({'ativo_id': ativo_id, 'ordens': ordens, 'lat': lat, 'lng': lng, 'custos': custos})
+    return paradas, tecnicos
+
+
+class AtribuicaoTests(SimpleTestCase):
+    RAIO = 8000.0
+
+    def test_invariantes(self):
+        for semente in range(20):
+            paradas, tecnicos = _instancia(semente, raio=self.RAIO)
+            locais = {ordem: (p['lat'], p['lng']) for p in paradas for ordem in p['ordens']}
+            resultado = atribuir(paradas, tecnicos, passadas_reparo=3, distancia_maxima=self.RAIO)
+
+            # Cada O.S. exatamente uma vez, atribuída ou sem técnico
+            todas = [ordem for ordens in resultado['atribuidas'].values() for ordem in ordens] + resultado['sem_tecnico']
+            self.assertCountEqual(todas, locais)
+            for tecnico_id, ordens in resultado['atribuidas'].items():
+                tecnico = tecnicos[tecnico_id]
+                self.assertLessEqual(len(ordens), tecnico['folga'])
+                for ordem in ordens:
+                    distancia = _distancias(tecnico['lat'], tecnico['lng'], *locais[ordem])
+                    self.assertLessEqual(distancia, self.RAIO)
+
+    def test_troca_no_reparo_reduz_a_distancia(self):
+        # Folga total = demanda total: nenhuma parada pode só mudar de técnico, apenas trocar.
+        # O guloso deixa a parada 2 com o técnico 3 e a 1 com o técnico 2 (1800 m); trocar
+        # as duas dá 1700 m.
+        tecnicos = {tecnico_id: {'lat': 0.0, 'lng': 0.0, 'folga': 1} for tecnico_id in (1, 2, 3)}
+        custos = [{1: 500.0, 2: 900.0, 3: 100.0}, {1: 700.0, 2: 900.0, 3: 300.0}, {1: 900.0, 2: 900.0, 3: 400.0}]
+
+        def paradas():
+            return [
+                {'ativo_id': indice, 'ordens': [indice + 1], 'lat': 0.0, 'lng': 0.0, 'custos': dict(c)}
+                for indice, c in enumerate(custos)
+            ]
+
+        guloso = atribuir(paradas(), tecnicos, passadas_reparo=0, distancia_maxima=0)
+        reparado = atribuir(paradas(), tecnicos, passadas_reparo=3, distancia_maxima=0)
+        self.assertEqual(guloso['distancia_total'], 1800.0)
+        self.assertEqual(reparado['distancia_total'], 1700.0)
+        self.assertEqual(reparado['atribuidas'], {1: [1], 2: [3], 3: [2]})
+
+
+"""
+===================== BLOCO 5 — Otimizador de rotas (api/otimizador_rotas.py) =====================
+Pontos aleatórios (semente fixa) em torno de São Paulo. Até EXATO_MAX_PARADAS paradas a rota
+tem de ser a ótima (comparada por força bruta); acima, a da busca local 2-opt/Or-opt.
+====================================================================================================
+"""
+def _pontos(rng, paradas):
+    return np.column_stack([-23.55 + rng.uniform(-0.1, 0.1, paradas + 1), -46.63 + rng.uniform(-0.1, 0.1, paradas + 1)])
+
+
+class OtimizadorRotasTests(SimpleTestCase):
+    def test_ordem_e_uma_permutacao_das_paradas(self):
+        rng = np.random.default_rng(29)
+        for paradas in (0, 1, 2, 5, EXATO_MAX_PARADAS, EXATO_MAX_PARADAS + 1, 40):
+            coordenadas = _pontos(rng, paradas)
+            ordem, distancia = otimizar_rota(coordenadas, orcamento_s=2.0)
+            self.assertEqual(sorted(ordem), list(range(paradas)))
+            dist = matriz_distancias(coordenadas)
+            self.assertAlmostEqual(distancia, custo_rota([0] + [k + 1 for k in ordem], dist) if paradas else 0.0)
+            if paradas > 1:
+                self.assertLessEqual(distancia, custo_rota(vizinho_mais_proximo(dist), dist) + 1e-6)
+
+    def test_otima_por_forca_bruta_ate_7_paradas(self):
+        rng = np.random.default_rng(29)
+        for paradas in range(1, 8):
+            for _ in range(10):
+                coordenadas = _pontos(rng, paradas)
+                dist = matriz_distancias(coordenadas)
+                otima = min(custo_rota((0,) + permutacao, dist) for permutacao in itertools.permutations(range(1, paradas + 1)))
+                _, distancia = otimizar_rota(coordenadas, orcamento_s=2.0)
+                self.assertAlmostEqual(distancia, otima, places=6)
+
+
+"""
+======================= BLOCO 6 — Circuit breaker (api/upstream.py) =======================
+O relógio do CircuitBreaker é substituído por um contador em segundos, avançado à mão.
+=============================================================================================
+"""
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.agora = 0.0
+        self.circuito = CircuitBreaker(limite_falhas=3, tempo_reabertura=30, relogio=lambda: self.agora)
+
+    def _abrir(self):
+        for _ in range(3):
+            self.assertTrue(self.circuito.permitir())
+            self.circuito.registrar_falha()
+
+    def test_abre_apos_o_limite_de_falhas_seguidas(self):
+        self.circuito.registrar_falha()
+        self.circuito.registrar_falha()
+        self.circuito.registrar_sucesso()  # zera a contagem
+        self.circuito.registrar_falha()
+        self.circuito.registrar_falha()
+        self.assertEqual(self.circuito.estado, CircuitBreaker.FECHADO)
+
+        self.circuito.registrar_falha()
+        self.assertEqual(self.circuito.estado, CircuitBreaker.ABERTO)
+        self.agora = 29.9
+        self.assertFalse(self.circuito.permitir())
+
+    def test_meio_aberto_libera_uma_chamada_de_teste(self):
+        self._abrir()
+        self.agora = 30.0
+        self.assertEqual(self.circuito.estado, CircuitBreaker.MEIO_ABERTO)
+        self.assertTrue(self.circuito.permitir())
+        self.assertFalse(self.circuito.permitir())
+
+        self.circuito.registrar_sucesso()
+        self.assertEqual(self.circuito.estado, CircuitBreaker.FECHADO)
+        self.assertTrue(self.circuito.permitir())
+        self.assertTrue(self.circuito.permitir())
+
+    def test_falha_no_teste_reabre_por_mais_um_periodo(self):
+        self._abrir()
+        self.agora = 45.0
+        self.assertTrue(self.circuito.permitir())
+        self.circuito.registrar_falha()
+        self.assertEqual(self.circuito.estado, CircuitBreaker.ABERTO)
+        self.agora = 74.9
+        self.assertFalse(self.circuito.permitir())
+        self.agora = 75.0
+        self.assertTrue(self.circuito.permitir())
+
+    def test_teste_cancelado_libera_a_vaga(self):
+        self._abrir()
+        self.agora = 30.0
+        self.assertTrue(self.circuito.permitir())
+        self.circuito.cancelar_teste()
+        self.assertEqual(self.circuito.estado, CircuitBreaker.MEIO_ABERTO)
+        self.assertTrue(self.circuito.permitir())
+
+    def test_interrupcao_nao_conta_como_falha_do_servico(self):
+        self._abrir()
+        self.agora = 30.0
+        sessao = mock.Mock(**{'get.side_effect': KeyboardInterrupt})
+        with mock.patch.object(upstream, 'circuit_breaker', self.circuito), \
+                mock.patch.object(upstream, 'get_session', return_value=sessao):
+            with self.assertRaises(KeyboardInterrupt):
+                upstream.get('https://exemplo.invalid/')
+        # A vaga de teste voltou e o período de reabertura não recomeçou
+        self.assertEqual(self.circuito.estado, CircuitBreaker.MEIO_ABERTO)
+        self.assertTrue(self.circuito.permitir())
@@ -0,0 +1,281 @@
+import asyncio
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metricas import registrar_upstream
+
+##
+## --- upstream.py ---
+## Cliente HTTP compartilhado para as chamadas a APIs externas (ex.: Google Directions).
+## Mantém um pool de conexões keep-alive por processo, aplica timeouts de conexão/leitura,
+## faz um número limitado de novas tentativas com backoff e protege o servidor com um
+## circuit breaker que falha rápido quando o serviço externo está fora do ar.
+## Existe uma versão síncrona (`get`, com requests) e outra assíncrona (`get_async`,
+## com httpx) para as views servidas pelo ASGI; as duas partilham o mesmo circuito.
+##
+
+
+"""
+============================== BLOCO 1 — CircuitBreaker ==============================
+Implementa o padrão "circuit breaker" com três estados:
+
+• fechado     → as chamadas passam normalmente; falhas consecutivas são contadas.
+• aberto      → após `limite_falhas` falhas seguidas, as chamadas são recusadas
+                imediatamente (sem tocar na rede) durante `tempo_reabertura` segundos.
+• meio-aberto → passado esse tempo, UMA chamada de teste é liberada. Se der certo,
+                o circuito fecha; se falhar, volta a abrir por mais um período.
+
+O estado é protegido por um `threading.Lock`, pois o mesmo objeto é partilhado por
+todas as threads do worker. Toda chamada liberada por `permitir()` termina em
+`registrar_sucesso`, `registrar_falha` ou `cancelar_teste` (a chamada terminou sem
+resposta nem erro de rede, ex.: cancelada porque o cliente desconectou, ou interrompida),
+senão a chamada de teste ficaria "em andamento" para sempre.
+========================================================================================
+"""
+class CircuitoAbertoError(requests.exceptions.RequestException):
+    """ Lançada quando o circuito está aberto e a chamada nem chega a ser feita. """
+
+
+class CircuitBreaker:
+    FECHADO = 'fechado'
+    ABERTO = 'aberto'
+    MEIO_ABERTO = 'meio-aberto'
+
+    def __init__(self, limite_falhas, tempo_reabertura, relogio=time.monotonic):
+        self.limite_falhas = limite_falhas
+        self.tempo_reabertura = tempo_reabertura
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._falhas = 0
+        self._aberto_em = None
+        self._teste_em_andamento = False
+
+    @property
+    def estado(self):
+        with self._lock:
+            return self._estado_atual()
+
+    def _estado_atual(self):
+        if self._aberto_em is None:
+            return self.FECHADO
+        if self._relogio() - self._aberto_em >= self.tempo_reabertura:
+            return self.MEIO_ABERTO
+        return self.ABERTO
+
+    def permitir(self):
+        """ Diz se uma nova chamada pode ser feita agora. """
+        with self._lock:
+            estado = self._estado_atual()
+            if estado == self.FECHADO:
+                return True
+            if estado == self.MEIO_ABERTO and not self._teste_em_andamento:
+                # Libera apenas uma chamada de teste enquanto o circuito está meio-aberto
+                self._teste_em_andamento = True
+                return True
+            return False
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self._falhas = 0
+            self._aberto_em = None
+            self._teste_em_andamento = False
+
+    def cancelar_teste(self):
+        """ A chamada terminou sem dizer nada sobre o serviço: libera a vaga de teste. """
+        with self._lock:
+            self._teste_em_andamento = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self._falhas += 1
+            self._teste_em_andamento = False
+            if self._aberto_em is not None or self._falhas >= self.limite_falhas:
+                # (Re)abre o circuito: conta o tempo de reabertura a partir de agora
+                self._aberto_em = self._relogio()
+
+
+"""
+============================ BLOCO 2 — Sessão compartilhada ============================
+`get_session()` devolve uma única `requests.Session` por processo, criada sob demanda.
+O `HTTPAdapter` mantém até `UPSTREAM_POOL_MAXSIZE` conexões abertas por host, evitando
+um novo handshake TLS a cada requisição, e o `Retry` do urllib3 repete automaticamente
+erros de conexão e respostas 502/503/504 com backoff exponencial.
+
+`get()` é o ponto de entrada usado pelas views: consulta o circuit breaker, aplica os
+timeouts de conexão/leitura e atualiza o estado do circuito conforme o resultado.
+========================================================================================
+"""
+# Respostas do serviço externo que justificam uma nova tentativa
+STATUS_REPETIVEIS = (502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+circuit_breaker = CircuitBreaker(
+    limite_falhas=settings.UPSTREAM_CIRCUIT_FAILURE_THRESHOLD,
+    tempo_reabertura=settings.UPSTREAM_CIRCUIT_RESET_TIMEOUT,
+)
+
+
+def _criar_session():
+    retry = Retry(
+        total=settings.UPSTREAM_MAX_RETRIES,
+        connect=settings.UPSTREAM_MAX_RETRIES,
+        read=settings.UPSTREAM_MAX_RETRIES,
+        status=settings.UPSTREAM_MAX_RETRIES,
+        backoff_factor=settings.UPSTREAM_BACKOFF_FACTOR,
+        status_forcelist=STATUS_REPETIVEIS,
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.UPSTREAM_POOL_CONNECTIONS,
+        pool_maxsize=settings.UPSTREAM_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _criar_session()
+    return _session
+
+
+def get(url, params=None):
+    """
+    Faz um GET no serviço externo usando a sessão compartilhada.
+    Lança `CircuitoAbertoError` sem tocar na rede se o circuito estiver aberto.
+    """
+    if not circuit_breaker.permitir():
+        raise CircuitoAbertoError('Serviço externo indisponível (circuito aberto).')
+
+    inicio = time.perf_counter()
+    try:
+        response = get_session().get(
+            url,
+            params=params,
+            timeout=(settings.UPSTREAM_CONNECT_TIMEOUT, settings.UPSTREAM_READ_TIMEOUT),
+        )
+    except requests.exceptions.RequestException:
+        registrar_upstream(time.perf_counter() - inicio, 'erro_rede')
+        circuit_breaker.registrar_falha()
+        raise
+    except BaseException:
+        # KeyboardInterrupt, SystemExit, erro nosso...: não diz nada sobre o serviço externo
+        circuit_breaker.cancelar_teste()
+        raise
+    registrar_upstream(time.perf_counter() - inicio, f'{response.status_code // 100}xx')
+
+    # Erros 5xx (mesmo após as novas tentativas) contam como falha do serviço externo;
+    # erros 4xx são problemas da nossa requisição e não devem abrir o circuito.
+    if response.status_code >= 500:
+        circuit_breaker.registrar_falha()
+    else:
+        circuit_breaker.registrar_sucesso()
+    return response
+
+
+"""
+=========================== BLOCO 3 — Cliente assíncrono (httpx) ===========================
+Versão assíncrona de `get()` para as views `async def` servidas por `core/asgi.py`.
+Enquanto espera a resposta da Google a corrotina devolve o controle ao event loop, então
+um único processo atende centenas de pedidos de rota simultâneos.
+
+Um `httpx.AsyncClient` só pode ser usado no event loop em que foi criado. Sob ASGI existe
+um único loop por processo, mas sob WSGI o Django executa cada view assíncrona num loop
+próprio; por isso os clientes ficam num `WeakKeyDictionary` indexado pelo loop corrente.
+Cada cliente é fechado quando o seu loop termina: um gerador assíncrono "guardião" fica
+parado no yield e o `shutdown_asyncgens()` do fim do loop (asyncio.run, async_to_sync)
+fecha-o, correndo o `aclose()` do cliente ainda com o loop vivo. Sem isso, cada pedido
+sob WSGI deixaria um cliente com as suas conexões abertas para trás.
+
+O httpx só repete falhas de conexão, então as novas tentativas com backoff para
+respostas 502/503/504 são feitas aqui, com os mesmos parâmetros do `Retry` síncrono.
+=============================================================================================
+"""
+_clientes_async = weakref.WeakKeyDictionary()
+
+
+def _criar_cliente_async():
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.UPSTREAM_READ_TIMEOUT, connect=settings.UPSTREAM_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.UPSTREAM_ASYNC_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.UPSTREAM_POOL_MAXSIZE,
+        ),
+    )
+
+
+async def _fechar_com_o_loop(cliente):
+    try:
+        yield
+    finally:
+        await cliente.aclose()
+
+
+def get_cliente_async():
+    loop = asyncio.get_running_loop()
+    entrada = _clientes_async.get(loop)
+    if entrada is None:
+        cliente = _criar_cliente_async()
+        guardiao = _fechar_com_o_loop(cliente)
+        # Referência forte ao guardião: se fosse coletado, o loop fecharia o cliente antes da hora
+        entrada = _clientes_async[loop] = (cliente, guardiao)
+        asyncio.ensure_future(guardiao.__anext__())
+    return entrada[0]
+
+
+async def get_async(url, params=None):
+    """
+    Equivalente assíncrono de `get()`. Lança `CircuitoAbertoError` sem tocar na rede
+    se o circuito estiver aberto e `httpx.HTTPError` se todas as tentativas falharem.
+    """
+    if not circuit_breaker.permitir():
+        raise CircuitoAbertoError('Serviço externo indisponível (circuito aberto).')
+
+    cliente = get_cliente_async()
+    tentativa = 0
+    inicio = time.perf_counter()
+    try:
+        while True:
+            try:
+                response = await cliente.get(url, params=params)
+            except httpx.TransportError:
+                if tentativa >= settings.UPSTREAM_MAX_RETRIES:
+                    raise
+            else:
+                if response.status_code not in STATUS_REPETIVEIS or tentativa >= settings.UPSTREAM_MAX_RETRIES:
+                    break
+
+            # Mesmo backoff exponencial do urllib3: fator * 2^(tentativa)
+            await asyncio.sleep(settings.UPSTREAM_BACKOFF_FACTOR * (2 ** tentativa))
+            tentativa += 1
+    except httpx.TransportError:
+        registrar_upstream(time.perf_counter() - inicio, 'erro_rede')
+        circuit_breaker.registrar_falha()
+        raise
+    except BaseException:
+        # Cancelada (o cliente desconectou), KeyboardInterrupt...: só libera a vaga de teste
+        circuit_breaker.cancelar_teste()
+        raise
+
+    registrar_upstream(time.perf_counter() - inicio, f'{response.status_code // 100}xx')
+    if response.status_code >= 500:
+        circuit_breaker.registrar_falha()
+    else:
+        circuit_breaker.registrar_sucesso()
+    return response
@@ -1,6 +1,7 @@
 from django.urls import path, include
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.routers import DefaultRouter
-from .views import LoginView, AtivoViewSet, OrdemServicoViewSet, RouteProxyView
+from .views import LoginView, AtivoViewSet, OrdemServicoViewSet, RotaPlanejadaViewSet, IndicadoresView, UploadManualView, ExportacaoHistoricoView, RouteProxyView, RouteProxyAsyncView, RouteCoalescingStatsView, PerfilExecucaoViewSet
 
 """
 ================================ BLOCO ÚNICO — urls.py =================================
@@ -49,10 +50,18 @@ O arquivo `urls.py` é o ponto de entrada para todas as rotas da API REST:
 router = DefaultRouter()
 router.register(r'ativos', AtivoViewSet, basename='ativo')
 router.register(r'ordens-servico', OrdemServicoViewSet, basename='ordemservico')
+router.register(r'rotas-planejadas', RotaPlanejadaViewSet, basename='rotaplanejada')
+router.register(r'perfis', PerfilExecucaoViewSet, basename='perfil')
 
 # As URLs da API são agora determinadas automaticamente pelo router.
 urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
+    path('indicadores/', IndicadoresView.as_view(), name='indicadores'),
+    path('manual-uploads/<uuid:pk>/', UploadManualView.as_view(), name='manual-upload'),
+    path('exportacao/historico/', ExportacaoHistoricoView.as_view(), name='exportacao-historico'),
     path('get-route/', RouteProxyView.as_view(), name='get-route'),
+    path('get-route/estatisticas/', RouteCoalescingStatsView.as_view(), name='get-route-estatisticas'),
+    # Versão assíncrona do proxy de rotas (servir com o ASGI: uvicorn core.asgi:application)
+    path('get-route-async/', csrf_exempt(RouteProxyAsyncView.as_view()), name='get-route-async'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -20,83 +20,184 @@ from .serializers import AtivoSerializer, OrdemServicoSerializer, FinalizarOSSer
 ## (como um redirecionamento, JSON, etc.) para o usuário. 
 ##
 
+import asyncio
+import contextvars
+import datetime
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
 from rest_framework import viewsets, permissions, status
 from rest_framework.filters import SearchFilter
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.authtoken.models import Token
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
 from django.contrib.auth import authenticate, get_user_model
-from .models import Ativo, OrdemServico, Manutencao
-from .serializers import AtivoSerializer, OrdemServicoSerializer, FinalizarOSSerializer
+from .models import Ativo, ManualDerivado, OrdemServico, Manutencao, OrdemServicoArquivo, PerfilExecucao, RotaPlanejada, UploadManual
+from .serializers import (
+    AtivoSerializer, OrdemServicoSerializer, OrdemServicoArquivoSerializer, FinalizarOSSerializer, RotaPlanejadaSerializer,
+    PerfilExecucaoSerializer,
+)
+from .historico import historico_ativo
+from .indicadores import indicadores
+from .derivados_manual import buscar as buscar_manuais
+from .exportacao import FORMATOS as FORMATOS_EXPORTACAO, ExportacaoError, exportar, montar_filtros
+from .importacao_ativos import ImportacaoError, formato_do_nome, importar_arquivo
+from .manuais import UploadManualError, iniciar_upload, receber_parte, resposta_download
+from .atribuicao import atribuir_dia
+from .planejamento_rotas import ler_origem, planejar_dia
+from .rotas import (
+    montar_parametros_rota, chave_rota, extrair_mensagem_erro, RotaInvalidaError,
+    precisa_otimizacao_local, planejar_trechos, chave_plano, costurar_trechos,
+)
+from . import autenticacao, coalescencia, upstream
+from .metricas import exposicao as exposicao_metricas
+from .perfilamento import FORMATOS as FORMATOS_PERFIL
+
+logger = logging.getLogger(__name__)
 
 class RouteProxyView(APIView):
     permission_classes = [permissions.AllowAny]
 
-    def post(self, request, *args, **kwargs):
-        start_lat = request.data.get('start_lat')
-        start_lng = request.data.get('start_lng')
-        end_lat = request.data.get('end_lat') # Para rota A->B
-        end_lng = request.data.get('end_lng') # Para rota A->B
-        waypoints_data = request.data.get('waypoints') # Lista de waypoints
-
-        if not start_lat or not start_lng:
-             return Response({'error': 'Coordenadas de origem são obrigatórias.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        google_api_url = 'https://maps.googleapis.com/maps/api/directions/json'
-        params = {
-            'origin': f'{start_lat},{start_lng}',
-            'key': settings.GOOGLE_MAPS_API_KEY,
-            'mode': 'driving',
-        }
-
-        # Decide se é uma rota A->B ou uma rota otimizada
-        if waypoints_data and isinstance(waypoints_data, list) and len(waypoints_data) > 0:
-            # Rota Otimizada com Waypoints
-            # Separa o último waypoint para ser o destino final explícito
-            final_destination_data = waypoints_data[-1]
-            intermediate_waypoints_data = waypoints_data[:-1] # Todos exceto o último
-
-            # Define o destino final
-            params['destination'] = f"{final_destination_data['lat']},{final_destination_data['lng']}"
-
-            # Formata os waypoints intermédios se houver algum
-            if intermediate_waypoints_data:
-                 waypoints_str = "optimize:true|" + "|".join([f"{wp['lat']},{wp['lng']}" for wp in intermediate_waypoints_data])
-                 params['waypoints'] = waypoints_str
-            # Se só houver 1 waypoint, ele torna-se o destino e não há waypoints intermédios
-            
-        elif end_lat and end_lng:
-            # Rota Simples A -> B
-            params['destination'] = f'{end_lat},{end_lng}'
-        else:
-            return Response({'error': 'Coordenadas de destino ou waypoints são obrigatórios.'}, status=status.HTTP_400_BAD_REQUEST)
+    def _buscar_rota(self, params):
+        response = upstream.get(settings.GOOGLE_DIRECTIONS_URL, params=params)
+        response.raise_for_status()
+        return response.json()
 
+    def _buscar_rota_em_trechos(self, plano):
+        # Os trechos são independentes entre si: pede-os em paralelo e costura na ordem.
+        # Cada trecho leva uma cópia do contexto, para a latência da Google entrar na medição do pedido
+        with ThreadPoolExecutor(max_workers=min(len(plano.trechos), settings.ROUTE_PARALLEL_LEGS)) as executor:
+            futuros = [executor.submit(contextvars.copy_context().run, self._buscar_rota, params) for params in plano.trechos]
+            respostas = [futuro.result() for futuro in futuros]
+        return costurar_trechos(respostas, plano)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            if precisa_otimizacao_local(request.data):
+                # Muitas paradas: ordena localmente e pede a rota à Google em trechos
+                plano = planejar_trechos(request.data)
+                chave = chave_plano(plano)
+                buscar = lambda: self._buscar_rota_em_trechos(plano)
+                descricao = f'{len(plano.ordem)} paradas otimizadas localmente em {len(plano.trechos)} trecho(s)'
+            else:
+                params = montar_parametros_rota(request.data)
+                chave = chave_rota(params)
+                buscar = lambda: self._buscar_rota(params)
+                descricao = f"origem {params['origin']} destino {params['destination']}"
+        except RotaInvalidaError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Pedidos idênticos em voo (neste processo ou, opcionalmente, noutros processos
+        # via cache partilhado) esperam uma única chamada à Google e partilham a resposta
         try:
-            print(f"A pedir rota para Google com params: {params}")
-            response = requests.get(google_api_url, params=params)
-            response.raise_for_status()
-            print("Resposta da Google recebida.")
-            return Response(response.json())
+            logger.debug('A pedir rota para Google: %s', descricao)
+            dados, compartilhado = coalescencia.rotas.executar(
+                chave, lambda: coalescencia.entre_processos(chave, buscar)
+            )
+            return Response(dados, headers={'X-Route-Coalesced': '1' if compartilhado else '0'})
+        except upstream.CircuitoAbertoError as e:
+            # O circuito está aberto: falha rápido sem ocupar o worker à espera da Google
+            logger.warning('Proxy de rotas com circuito aberto: %s', e)
+            return Response({'error': f'Erro ao contactar API Externa: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except requests.exceptions.RequestException as e:
             # Tenta extrair a mensagem de erro da resposta da Google, se disponível
             error_detail = str(e)
+            error_response = getattr(e, 'response', None)
             try:
-                error_json = response.json()
-                error_detail = error_json.get('error_message', str(e))
+                error_detail = extrair_mensagem_erro(error_response.json(), str(e))
             except: # Ignora erros ao tentar ler o JSON
                 pass
-            print(f"Erro ao contactar Google ({response.status_code}): {error_detail}")
+            status_code = error_response.status_code if error_response is not None else None
+            logger.warning('Erro ao contactar Google (%s): %s', status_code, error_detail)
             return Response({'error': f'Erro ao contactar API Externa: {error_detail}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
-            print(f"Erro inesperado no proxy: {e}")
+            logger.exception('Erro inesperado no proxy de rotas')
             return Response({'error': f'Erro interno no servidor: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 
+class RouteProxyAsyncView(View):
+    """
+    Versão assíncrona do RouteProxyView, para ser servida pelo ASGI (core/asgi.py).
+    Enquanto espera a Google, a corrotina liberta o event loop em vez de prender uma
+    thread do worker. Recebe o mesmo corpo JSON e devolve as mesmas respostas.
+    URL: /api/get-route-async/
+    """
+    async def _buscar_rota(self, params):
+        response = await upstream.get_async(settings.GOOGLE_DIRECTIONS_URL, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def _buscar_rota_em_trechos(self, plano):
+        respostas = await asyncio.gather(*[self._buscar_rota(params) for params in plano.trechos])
+        return costurar_trechos(respostas, plano)
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            corpo = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'error': 'Corpo do pedido não é um JSON válido.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if precisa_otimizacao_local(corpo):
+                # O otimizador usa CPU: corre numa thread para não bloquear o event loop
+                plano = await sync_to_async(planejar_trechos, thread_sensitive=False)(corpo)
+                chave = chave_plano(plano)
+                buscar = lambda: self._buscar_rota_em_trechos(plano)
+            else:
+                params = montar_parametros_rota(corpo)
+                chave = chave_rota(params)
+                buscar = lambda: self._buscar_rota(params)
+        except RotaInvalidaError as e:
+            return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            dados, compartilhado = await coalescencia.rotas_async.executar(
+                chave, lambda: coalescencia.entre_processos_async(chave, buscar)
+            )
+            response = JsonResponse(dados)
+            response['X-Route-Coalesced'] = '1' if compartilhado else '0'
+            return response
+        except upstream.CircuitoAbertoError as e:
+            return JsonResponse({'error': f'Erro ao contactar API Externa: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except httpx.HTTPStatusError as e:
+            try:
+                error_detail = extrair_mensagem_erro(e.response.json(), str(e))
+            except ValueError: # Resposta de erro sem JSON
+                error_detail = str(e)
+            logger.warning('Erro ao contactar Google (%s): %s', e.response.status_code, error_detail)
+            return JsonResponse({'error': f'Erro ao contactar API Externa: {error_detail}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except httpx.HTTPError as e:
+            logger.warning('Erro ao contactar Google: %s', e)
+            return JsonResponse({'error': f'Erro ao contactar API Externa: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except Exception as e:
+            logger.exception('Erro inesperado no proxy de rotas assíncrono')
+            return JsonResponse({'error': f'Erro interno no servidor: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RouteCoalescingStatsView(APIView):
+    """
+    Contadores do single-flight do proxy de rotas: quantas chamadas chegaram, quantas
+    foram de fato à Google e quantas foram coalescidas (no processo ou via cache).
+    URL: /api/get-route/estatisticas/
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(coalescencia.metricas.como_dict())
+
+
 """
 ================================= BLOCO 1 — LoginView =================================
 A classe `LoginView` é uma *APIView* do Django REST Framework que implementa o processo
@@ -122,7 +223,9 @@ de autenticação que será usado para acessar as demais rotas protegidas da API
 
 5. Se a autenticação for bem-sucedida:
    - O código obtém (ou cria, se ainda não existir) um `Token` para o usuário
-     usando `Token.objects.get_or_create(user=user)`.
+     usando `autenticacao.token_do_usuario(user)`, que consulta o cache antes de fazer
+     `Token.objects.get_or_create(user=user)` e já deixa o token pronto para o
+     `CachedTokenAuthentication` (ver api/autenticacao.py).
    - Esse token é uma chave única usada em futuras requisições (autenticação por token).
 
 6. Retorna uma resposta JSON com o token no corpo:
@@ -152,11 +255,11 @@ class LoginView(APIView):
         user = authenticate(username=username, password=password)
 
         if user is not None:
-            # Se a autenticação for bem-sucedida, pega o token do usuário ou cria um novo
-            token, created = Token.objects.get_or_create(user=user)
+            # Se a autenticação for bem-sucedida, pega o token do usuário (do cache) ou cria um novo
+            key = autenticacao.token_do_usuario(user)
             
             # Retorna uma resposta de sucesso (HTTP 200 OK) com o token
-            return Response({'token': token.key})
+            return Response({'token': key})
         else:
             # Se a autenticação falhar, lança uma exceção que o DjangoRestFramework transforma
             # em uma resposta de erro (HTTP 401 Unauthorized)
@@ -179,7 +282,9 @@ Um ModelViewSet do Django REST Framework fornece automaticamente as operações
 
 --- FUNCIONAMENTO INTERNO ---
 
-1. queryset = Ativo.objects.all() → define o conjunto de objetos retornados pela view.
+1. queryset = Ativo.objects.select_related('resumo_manutencao', 'manual_derivado') → define o
+    conjunto de objetos retornados pela view, já com o resumo de manutenção e o estado dos
+    derivados do manual de cada ativo (sem uma query por ativo).
 
 2. serializer_class = AtivoSerializer → especifica como os dados serão convertidos
     para JSON e vice-versa.
@@ -187,13 +292,17 @@ Um ModelViewSet do Django REST Framework fornece automaticamente as operações
 3. filter_backends = [SearchFilter] e search_fields = ['nome']
     → habilitam buscas textuais usando o parâmetro ?search=.
     Exemplo: /api/ativos/?search=Sensor retornará todos os ativos cujo nome contenha “Sensor”.
+    A busca dentro do texto dos manuais fica em /api/ativos/manuais/busca/?q=.
 
 Em resumo: esta view controla todos os endpoints de manipulação de Ativos,
 com suporte a listagem, busca e edição completa via API.
 ====================================================================================
 """
 class AtivoViewSet(viewsets.ModelViewSet):
-    queryset = Ativo.objects.all()
+    # O texto extraído do manual (e o seu tsvector) pode ter centenas de KB: fica fora da listagem
+    queryset = Ativo.objects.select_related('resumo_manutencao', 'manual_derivado').defer(
+        'manual_derivado__texto', 'manual_derivado__busca',
+    )
     serializer_class = AtivoSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [SearchFilter]
@@ -207,11 +316,77 @@ class AtivoViewSet(viewsets.ModelViewSet):
         URL: /api/ativos/{id}/historico/
         """
         ativo = self.get_object() # Pega o ativo específico (ex: ativo de id=1)
-        # Filtra as O.S. relacionadas a este ativo que tenham o status 'finalizada'
-        historico_os = ativo.ordens_servico.filter(status='finalizada').order_by('-data_criacao')
-        # Serializa os dados para serem enviados como resposta
-        serializer = OrdemServicoSerializer(historico_os, many=True)
-        return Response(serializer.data)
+        # O.S. finalizadas deste ativo, vivas e do arquivo morto, da mais recente para a mais antiga
+        historico_os = historico_ativo(ativo.pk)
+        # Serializa os dados para serem enviados como resposta (o formato é o mesmo nas duas fontes)
+        dados = [
+            (OrdemServicoArquivoSerializer if isinstance(ordem, OrdemServicoArquivo) else OrdemServicoSerializer)(ordem).data
+            for ordem in historico_os
+        ]
+        return Response(dados)
+
+    # Download do manual com ETag (304) e Range (206), para retomar downloads interrompidos
+    @action(detail=True, methods=['get'], url_path='manual/download')
+    def manual_download(self, request, pk=None):
+        return resposta_download(request, self.get_object())
+
+    # Miniatura da 1ª página do manual (PNG), com o hash do manual como ETag
+    @action(detail=True, methods=['get'], url_path='manual/miniatura')
+    def manual_miniatura(self, request, pk=None):
+        ativo = self.get_object()
+        derivado = ManualDerivado.objects.filter(ativo=ativo, status='pronto').only('sha256', 'miniatura').first()
+        if derivado is None or not derivado.miniatura:
+            return Response({'error': 'Miniatura ainda não disponível.'}, status=status.HTTP_404_NOT_FOUND)
+        etag = f'"{derivado.sha256}"'
+        if etag in [valor.strip() for valor in request.headers.get('If-None-Match', '').split(',')]:
+            resposta = HttpResponse(status=304)
+        else:
+            resposta = FileResponse(derivado.miniatura.open('rb'), content_type='image/png')
+        resposta['ETag'] = etag
+        resposta['Cache-Control'] = 'private, max-age=86400'
+        return resposta
+
+    # Busca no texto dos manuais: /api/ativos/manuais/busca/?q=bomba hidráulica
+    @action(detail=False, methods=['get'], url_path='manuais/busca')
+    def manuais_busca(self, request):
+        consulta = request.query_params.get('q', '').strip()
+        if not consulta:
+            return Response({'error': 'Informe o parâmetro "q".'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limite = min(max(int(request.query_params.get('limite', 20)), 1), 100)
+        except ValueError:
+            return Response({'error': 'O parâmetro "limite" deve ser um número inteiro.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(buscar_manuais(consulta, limite=limite))
+
+    # Importação em massa (CSV ou GeoJSON, campo multipart "arquivo"): /api/ativos/importar/
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def importar(self, request):
+        arquivo = request.FILES.get('arquivo')
+        if arquivo is None:
+            return Response({'error': 'Envie o arquivo no campo "arquivo".'}, status=status.HTTP_400_BAD_REQUEST)
+        formato = request.query_params.get('formato') or formato_do_nome(arquivo.name)
+        dry_run = request.query_params.get('dry_run') in ('1', 'true')
+        try:
+            # O Django guarda uploads grandes num arquivo temporário: a leitura continua em fluxo
+            resultado = importar_arquivo(arquivo.file, formato, dry_run=dry_run)
+        except ImportacaoError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        codigo = status.HTTP_200_OK if resultado.importados or not resultado.rejeitados else status.HTTP_400_BAD_REQUEST
+        return Response(resultado.como_dict(), status=codigo)
+
+    # Abre um upload em partes do manual; as partes vão para /api/manual-uploads/{id}/
+    @action(detail=True, methods=['post'], url_path='manual/uploads', permission_classes=[permissions.IsAuthenticated])
+    def manual_uploads(self, request, pk=None):
+        ativo = self.get_object()
+        try:
+            tamanho = int(request.data.get('tamanho'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Informe "tamanho" (bytes) do arquivo.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload = iniciar_upload(ativo, request.data.get('nome_arquivo'), tamanho, request.user)
+        except UploadManualError as e:
+            return Response({'error': str(e)}, status=e.status)
+        return Response({'id': upload.pk, 'recebido': upload.recebido, 'tamanho_total': upload.tamanho_total}, status=status.HTTP_201_CREATED)
 
 
 """
@@ -267,29 +442,51 @@ class OrdemServicoViewSet(viewsets.ModelViewSet):
             # Calcula o tempo gasto
             tempo_gasto = data['data_fim_execucao'] - data['data_inicio_execucao']
 
-            # Cria o registo de Manutenção
-            Manutencao.objects.create(
-                ordem_servico=ordem_servico,
-                # No futuro, usaremos o utilizador autenticado: request.user
-                usuario_executor=None, 
-                data_inicio_execucao=data['data_inicio_execucao'],
-                data_fim_execucao=data['data_fim_execucao'],
-                tempo_gasto=tempo_gasto,
-                observacoes=data.get('observacoes', '')
-            )
-
-            # Atualiza o status da O.S. para "finalizada"
-            ordem_servico.status = 'finalizada'
-            ordem_servico.save()
+            # Manutenção, status e o resumo do Ativo (signals) entram juntos ou não entram
+            with transaction.atomic():
+                # Cria o registo de Manutenção
+                Manutencao.objects.create(
+                    ordem_servico=ordem_servico,
+                    # O utilizador autenticado, senão o técnico atribuído à O.S. (ver api/atribuicao.py)
+                    usuario_executor=request.user if request.user.is_authenticated else ordem_servico.tecnico,
+                    data_inicio_execucao=data['data_inicio_execucao'],
+                    data_fim_execucao=data['data_fim_execucao'],
+                    tempo_gasto=tempo_gasto,
+                    observacoes=data.get('observacoes', '')
+                )
+
+                # Atualiza o status da O.S. para "finalizada"
+                ordem_servico.status = 'finalizada'
+                ordem_servico.save()
 
             return Response({'status': 'Ordem de serviço finalizada com sucesso'}, status=status.HTTP_200_OK)
         else:
             # Se a validação falhar (ex: data de fim antes do início), retorna um erro
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    # Atribuição em lote das O.S. do dia aos técnicos mais próximos: /api/ordens-servico/atribuir/
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def atribuir(self, request):
+        try:
+            dia = datetime.date.fromisoformat(request.data['data']) if request.data.get('data') else timezone.localdate()
+        except (TypeError, ValueError):
+            return Response({'error': 'Data inválida; use o formato AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        resultado = atribuir_dia(dia, salvar=request.data.get('dry_run') not in (True, '1', 'true'))
+        return Response(resultado)
+
+    # Criar, alterar e apagar uma O.S. também mexe no resumo do Ativo (signals): uma transação só
     def perform_create(self, serializer):
         # Como o acesso é público, o solicitante será nulo por enquanto.
-        serializer.save(solicitante=None)
+        with transaction.atomic():
+            serializer.save(solicitante=None)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
 
 
 """
@@ -328,3 +525,209 @@ class OrdemServicoFilter(filters.FilterSet):
         model = OrdemServico
         fields = ['data_prevista', 'status', 'tipo']
 
+
+"""
+========================== BLOCO 5 — RotaPlanejadaViewSet ===========================
+Endpoints de leitura das rotas do dia pré-calculadas pelo comando `planeja_rotas`.
+
+- GET /rotas-planejadas/?tecnico=<id>&data=AAAA-MM-DD → lista filtrada.
+- GET /rotas-planejadas/hoje/?tecnico=<id> → a rota de hoje do técnico (sem `tecnico`,
+  usa o utilizador autenticado). O app só precisa desenhar `rota`, sem chamar a Google.
+- POST /rotas-planejadas/planejar/ {"data": "AAAA-MM-DD", "tecnico": <id>} → recalcula
+  sob demanda (ex.: uma O.S. urgente entrou depois do planejamento noturno). Só admin.
+====================================================================================
+"""
+ERRO_TECNICO = 'O parâmetro "tecnico" deve ser o id numérico do técnico.'
+
+
+class RotaPlanejadaViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = RotaPlanejadaSerializer
+    permission_classes = [permissions.AllowAny] # Para desenvolvimento
+
+    def get_queryset(self):
+        queryset = RotaPlanejada.objects.select_related('tecnico').order_by('-data', 'tecnico_id')
+        tecnico = self.request.query_params.get('tecnico')
+        data = self.request.query_params.get('data')
+        if tecnico:
+            try:
+                queryset = queryset.filter(tecnico_id=int(tecnico))
+            except ValueError:
+                raise ValidationError({'error': ERRO_TECNICO})
+        if data:
+            try:
+                queryset = queryset.filter(data=datetime.date.fromisoformat(data))
+            except ValueError:
+                raise ValidationError({'error': 'Data inválida; use o formato AAAA-MM-DD.'})
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def hoje(self, request):
+        tecnico = request.query_params.get('tecnico') or (request.user.pk if request.user.is_authenticated else None)
+        if tecnico is None:
+            return Response({'error': 'Informe o técnico (?tecnico=<id>).'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            tecnico = int(tecnico)
+        except ValueError:
+            return Response({'error': ERRO_TECNICO}, status=status.HTTP_400_BAD_REQUEST)
+        rota = RotaPlanejada.objects.filter(tecnico_id=tecnico, data=timezone.localdate()).first()
+        if rota is None:
+            return Response({'error': 'Nenhuma rota planejada para hoje.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.get_serializer(rota).data)
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def planejar(self, request):
+        try:
+            dia = datetime.date.fromisoformat(request.data['data']) if request.data.get('data') else timezone.localdate()
+        except (TypeError, ValueError):
+            return Response({'error': 'Data inválida; use o formato AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        tecnico = request.data.get('tecnico')
+        try:
+            tecnico = int(tecnico) if tecnico else None
+        except (TypeError, ValueError):
+            return Response({'error': ERRO_TECNICO}, status=status.HTTP_400_BAD_REQUEST)
+        rotas = planejar_dia(
+            dia, tecnico_ids=[tecnico] if tecnico else None, origem=ler_origem(settings.ROUTE_PLANNING_DEPOT),
+        )
+        return Response(self.get_serializer(rotas, many=True).data)
+
+
+"""
+============================ BLOCO 6 — IndicadoresView ============================
+GET /api/indicadores/?piores=10 → painel de gestão: backlog por status e tipo, O.S.
+vencidas, distribuição de MTBF/MTTR da frota, os N piores ativos e a taxa de conclusão
+por técnico. Lido das materialized views (api/indicadores.py); `atualizado_em` e
+`defasagem_segundos` dizem há quanto tempo os números foram calculados.
+====================================================================================
+"""
+class IndicadoresView(APIView):
+    permission_classes = [permissions.AllowAny] # Para desenvolvimento
+
+    def get(self, request):
+        try:
+            piores = min(max(int(request.query_params.get('piores', 10)), 1), 100)
+        except ValueError:
+            return Response({'error': 'O parâmetro "piores" deve ser um número inteiro.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(indicadores(piores=piores))
+
+
+"""
+========================= BLOCO 7 — UploadManualView =========================
+Recebe as partes do upload do manual (ver api/manuais.py):
+- GET  /api/manual-uploads/{id}/ → quanto já foi recebido (também no cabeçalho Upload-Offset),
+  para o app retomar depois de uma queda de conexão.
+- PUT  /api/manual-uploads/{id}/ com `Content-Range: bytes início-fim/total` e a parte no corpo
+  (application/octet-stream). O corpo é lido do stream, em blocos, sem passar pelos parsers.
+  Parte fora de ordem → 409 com o `recebido` certo.
+Exige login, e cada upload só é visível para o usuário que o abriu (404 para os demais):
+sem isso qualquer cliente podia trocar o manual de qualquer Ativo.
+===============================================================================
+"""
+class UploadManualView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _resposta(self, upload, codigo=status.HTTP_200_OK):
+        resposta = Response({
+            'id': upload.pk,
+            'status': upload.status,
+            'recebido': upload.recebido,
+            'tamanho_total': upload.tamanho_total,
+            'sha256': upload.sha256,
+        }, status=codigo)
+        resposta['Upload-Offset'] = str(upload.recebido)
+        return resposta
+
+    def get(self, request, pk):
+        upload = UploadManual.objects.filter(pk=pk, usuario=request.user).first()
+        if upload is None:
+            return Response({'error': 'Upload não encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        return self._resposta(upload)
+
+    def put(self, request, pk):
+        if not UploadManual.objects.filter(pk=pk, usuario=request.user).exists():
+            return Response({'error': 'Upload não encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            tamanho_parte = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            tamanho_parte = 0
+        try:
+            upload = receber_parte(pk, request.headers.get('Content-Range'), tamanho_parte, request.stream)
+        except UploadManualError as e:
+            if e.recebido is None:
+                return Response({'error': str(e)}, status=e.status)
+            resposta = Response({'error': str(e), 'recebido': e.recebido}, status=e.status)
+            resposta['Upload-Offset'] = str(e.recebido)
+            return resposta
+        return self._resposta(upload)
+
+
+"""
+======================= BLOCO 8 — ExportacaoHistoricoView =======================
+Histórico completo de O.S. (vivas e arquivadas) com manutenção e Ativo, em fluxo:
+GET /api/exportacao/historico/?formato=csv|ndjson|geojson&inicio=2024-01-01&fim=2024-12-31
+     &ativo=42&tipo=corretiva&status=finalizada
+Substitui o uso da listagem sem paginação para despejos de auditoria (ver api/exportacao.py).
+O parâmetro é `formato` porque `format` é reservado pelo DRF.
+==================================================================================
+"""
+class ExportacaoHistoricoView(APIView):
+    permission_classes = [permissions.AllowAny] # Para desenvolvimento
+
+    def get(self, request):
+        formato = request.query_params.get('formato', 'csv')
+        parametros = {campo: request.query_params.get(campo) for campo in ('inicio', 'fim', 'ativo', 'tipo', 'status')}
+        try:
+            pedacos = exportar(formato, montar_filtros(**parametros))
+        except ExportacaoError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        tipo_conteudo, extensao = FORMATOS_EXPORTACAO[formato]
+        resposta = StreamingHttpResponse(pedacos, content_type=tipo_conteudo)
+        resposta['Content-Disposition'] = f'attachment; filename="historico_{timezone.now():%Y%m%d_%H%M}.{extensao}"'
+        return resposta
+
+
+"""
+============================== BLOCO 9 — MetricasView ==============================
+GET /metrics → histogramas de api/metricas.py no formato de texto do Prometheus.
+Se METRICS_TOKEN estiver definido, exige `Authorization: Bearer <token>`.
+Fora de /api/ (convenção do Prometheus) e fora do DRF: não entra nas próprias métricas.
+====================================================================================
+"""
+class MetricasView(View):
+
+    def get(self, request):
+        if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+            return HttpResponse('Não autorizado.', status=401, content_type='text/plain; charset=utf-8')
+        return HttpResponse(exposicao_metricas(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+"""
+=========================== BLOCO 10 — PerfilExecucaoViewSet ===========================
+Perfis gravados por api/perfilamento.py (?profile=1, amostragem e comandos com --profile).
+Só staff: os arquivos têm o SQL executado, com os parâmetros.
+
+- GET /perfis/?alvo=ativo-historico&origem=amostra → lista, mais recentes primeiro.
+- GET /perfis/<id>/download/ → o arquivo (.speedscope.json: abrir em speedscope.app;
+  .folded: flamegraph.pl ou inferno-flamegraph).
+=========================================================================================
+"""
+class PerfilExecucaoViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = PerfilExecucaoSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_queryset(self):
+        queryset = PerfilExecucao.objects.all()
+        for campo in ('alvo', 'origem'):
+            valor = self.request.query_params.get(campo)
+            if valor:
+                queryset = queryset.filter(**{campo: valor})
+        return queryset
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        perfil = self.get_object()
+        _, content_type = FORMATOS_PERFIL[perfil.formato]
+        return FileResponse(
+            perfil.arquivo.open('rb'), as_attachment=True,
+            filename=os.path.basename(perfil.arquivo.name), content_type=content_type,
+        )
@@ -67,12 +67,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista: mede o pedido inteiro, incluindo os outros middlewares
+    'api.metricas.MetricasMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Depois da autenticação: ?profile=1 só vale para staff
+    'api.perfilamento.PerfilamentoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -96,6 +100,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+# HTTP + WebSocket (Channels), servido por um servidor ASGI: uvicorn core.asgi:application
+ASGI_APPLICATION = 'core.asgi.application'
 
 
 # Database
@@ -163,4 +169,150 @@ CORS_ALLOW_ALL_ORIGINS = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-GOOGLE_MAPS_API_KEY = config('GOOGLE_MAPS_API_KEY', default='')
\ No newline at end of file
+GOOGLE_MAPS_API_KEY = config('GOOGLE_MAPS_API_KEY', default='')
+GOOGLE_DIRECTIONS_URL = config('GOOGLE_DIRECTIONS_URL', default='https://maps.googleapis.com/maps/api/directions/json')
+
+# Cliente HTTP compartilhado para APIs externas (ver api/upstream.py)
+UPSTREAM_CONNECT_TIMEOUT = config('UPSTREAM_CONNECT_TIMEOUT', default=3.05, cast=float)  # segundos
+UPSTREAM_READ_TIMEOUT = config('UPSTREAM_READ_TIMEOUT', default=10.0, cast=float)  # segundos
+UPSTREAM_MAX_RETRIES = config('UPSTREAM_MAX_RETRIES', default=2, cast=int)
+UPSTREAM_BACKOFF_FACTOR = config('UPSTREAM_BACKOFF_FACTOR', default=0.3, cast=float)
+UPSTREAM_POOL_CONNECTIONS = config('UPSTREAM_POOL_CONNECTIONS', default=4, cast=int)
+UPSTREAM_POOL_MAXSIZE = config('UPSTREAM_POOL_MAXSIZE', default=20, cast=int)
+UPSTREAM_CIRCUIT_FAILURE_THRESHOLD = config('UPSTREAM_CIRCUIT_FAILURE_THRESHOLD', default=5, cast=int)
+UPSTREAM_CIRCUIT_RESET_TIMEOUT = config('UPSTREAM_CIRCUIT_RESET_TIMEOUT', default=30.0, cast=float)  # segundos
+UPSTREAM_ASYNC_MAX_CONNECTIONS = config('UPSTREAM_ASYNC_MAX_CONNECTIONS', default=200, cast=int)
+
+# Normalização e coalescência (single-flight) dos pedidos de rota (ver api/coalescencia.py)
+ROUTE_COORDINATE_PRECISION = config('ROUTE_COORDINATE_PRECISION', default=4, cast=int)  # casas decimais (~11 m)
+ROUTE_COALESCING_SHARED_CACHE = config('ROUTE_COALESCING_SHARED_CACHE', default=False, cast=bool)
+ROUTE_COALESCING_LOCK_TTL = config('ROUTE_COALESCING_LOCK_TTL', default=15, cast=int)  # segundos
+ROUTE_COALESCING_RESULT_TTL = config('ROUTE_COALESCING_RESULT_TTL', default=10, cast=int)  # segundos
+ROUTE_COALESCING_WAIT_TIMEOUT = config('ROUTE_COALESCING_WAIT_TIMEOUT', default=UPSTREAM_CONNECT_TIMEOUT + UPSTREAM_READ_TIMEOUT, cast=float)
+
+# Cache do Django. Com REDIS_URL definido o cache é partilhado entre os processos
+# (necessário para ROUTE_COALESCING_SHARED_CACHE); sem ele, cada processo tem o seu.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Channel layer dos WebSockets (ver api/tempo_real.py). Com REDIS_URL os eventos chegam aos
+# clientes ligados a qualquer processo; sem ele, só aos do próprio processo (dev e testes).
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+REALTIME_GRID_DEGREES = config('REALTIME_GRID_DEGREES', default=0.1, cast=float)  # lado da célula (≈ 11 km)
+REALTIME_MAX_CELLS = config('REALTIME_MAX_CELLS', default=400, cast=int)  # células por assinatura de área
+REALTIME_MAX_SUBSCRIPTIONS = config('REALTIME_MAX_SUBSCRIPTIONS', default=50, cast=int)  # por conexão
+
+# Otimizador local de rotas com muitas paradas (ver api/otimizador_rotas.py)
+ROUTE_LOCAL_OPTIMIZATION_THRESHOLD = config('ROUTE_LOCAL_OPTIMIZATION_THRESHOLD', default=23, cast=int)  # waypoints
+ROUTE_MAX_WAYPOINTS_PER_REQUEST = config('ROUTE_MAX_WAYPOINTS_PER_REQUEST', default=25, cast=int)  # limite da Google
+ROUTE_OPTIMIZER_TIME_BUDGET = config('ROUTE_OPTIMIZER_TIME_BUDGET', default=0.5, cast=float)  # segundos
+ROUTE_PARALLEL_LEGS = config('ROUTE_PARALLEL_LEGS', default=4, cast=int)  # trechos pedidos em paralelo
+
+# Matriz de custos de deslocamento entre Ativos próximos (ver api/matriz_deslocamento.py)
+TRAVEL_MATRIX_RADIUS_M = config('TRAVEL_MATRIX_RADIUS_M', default=20000.0, cast=float)  # metros
+
+# Planejamento noturno das rotas do dia (comando planeja_rotas); "lat,lng" da base, ou vazio
+ROUTE_PLANNING_DEPOT = config('ROUTE_PLANNING_DEPOT', default='')
+
+# Atribuição em lote das O.S. do dia aos técnicos (comando atribui_tecnicos, ver api/atribuicao.py)
+ASSIGNMENT_DEFAULT_CAPACITY = config('ASSIGNMENT_DEFAULT_CAPACITY', default=8, cast=int)  # O.S. por dia, técnicos sem capacidade_diaria
+ASSIGNMENT_CANDIDATES = config('ASSIGNMENT_CANDIDATES', default=10, cast=int)  # técnicos mais próximos considerados por Ativo
+ASSIGNMENT_MAX_DISTANCE_M = config('ASSIGNMENT_MAX_DISTANCE_M', default=0.0, cast=float)  # metros; 0 = sem limite
+ASSIGNMENT_REPAIR_PASSES = config('ASSIGNMENT_REPAIR_PASSES', default=3, cast=int)  # passadas de busca local
+
+# Autenticação por token com cache (ver api/autenticacao.py). Session e Basic continuam
+# aceitas, como no padrão do DRF, para o admin e a API navegável. Um token inválido deixa
+# o pedido anônimo (não 401), para não quebrar as views AllowAny.
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.autenticacao.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    # JSONRenderer que soma o tempo de serialização nas métricas do pedido (ver api/metricas.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.metricas.JSONRendererMedido',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+AUTH_TOKEN_LOCAL_TTL = config('AUTH_TOKEN_LOCAL_TTL', default=30, cast=int)  # segundos, por processo
+AUTH_TOKEN_SHARED_TTL = config('AUTH_TOKEN_SHARED_TTL', default=300, cast=int)  # segundos, cache partilhado
+AUTH_TOKEN_LOCAL_MAX_ENTRIES = config('AUTH_TOKEN_LOCAL_MAX_ENTRIES', default=10000, cast=int)
+
+# Particionamento mensal do histórico de O.S. e manutenções (ver api/particionamento.py)
+HISTORY_PARTITION_MONTHS_AHEAD = config('HISTORY_PARTITION_MONTHS_AHEAD', default=3, cast=int)  # meses
+
+# Arquivo morto das O.S. finalizadas antigas (comando arquiva_ordens, ver api/historico.py)
+ARCHIVE_FINALIZED_AFTER_DAYS = config('ARCHIVE_FINALIZED_AFTER_DAYS', default=365, cast=int)  # dias
+ARCHIVE_BATCH_SIZE = config('ARCHIVE_BATCH_SIZE', default=1000, cast=int)  # O.S. por transação
+
+# Upload em partes e download com Range dos manuais (ver api/manuais.py)
+MANUAL_UPLOAD_TEMP_DIR = config('MANUAL_UPLOAD_TEMP_DIR', default=str(MEDIA_ROOT / 'uploads_parciais'))
+MANUAL_UPLOAD_MAX_SIZE = config('MANUAL_UPLOAD_MAX_SIZE', default=200 * 1024 * 1024, cast=int)  # bytes
+MANUAL_UPLOAD_MAX_CHUNK = config('MANUAL_UPLOAD_MAX_CHUNK', default=8 * 1024 * 1024, cast=int)  # bytes por parte
+MANUAL_UPLOAD_ABANDON_HOURS = config('MANUAL_UPLOAD_ABANDON_HOURS', default=48, cast=int)  # horas sem atividade
+# Prefixo de uma location `internal` do nginx que aponta para MEDIA_ROOT; vazio = o Django envia o arquivo
+MANUAL_ACCEL_REDIRECT_PREFIX = config('MANUAL_ACCEL_REDIRECT_PREFIX', default='')
+
+# Derivados dos manuais: miniatura e texto pesquisável (comando gera_derivados_manual, ver api/derivados_manual.py)
+MANUAL_THUMBNAIL_WIDTH = config('MANUAL_THUMBNAIL_WIDTH', default=320, cast=int)  # pixels
+MANUAL_TEXT_MAX_CHARS = config('MANUAL_TEXT_MAX_CHARS', default=300000, cast=int)  # o tsvector tem limite de 1 MB
+MANUAL_SEARCH_CONFIG = config('MANUAL_SEARCH_CONFIG', default='portuguese')  # configuração do full-text search
+MANUAL_DERIVATIVE_MAX_ATTEMPTS = config('MANUAL_DERIVATIVE_MAX_ATTEMPTS', default=3, cast=int)
+MANUAL_DERIVATIVE_STALE_MINUTES = config('MANUAL_DERIVATIVE_STALE_MINUTES', default=30, cast=int)  # worker caído
+
+# Agendador de tarefas no banco (comando worker_tarefas, ver api/agendador.py)
+JOB_LEASE_SECONDS = config('JOB_LEASE_SECONDS', default=600, cast=int)  # renovado a cada progresso
+JOB_PROGRESS_INTERVAL = config('JOB_PROGRESS_INTERVAL', default=5, cast=int)  # segundos entre gravações
+JOB_OUTPUT_MAX_CHARS = config('JOB_OUTPUT_MAX_CHARS', default=20000, cast=int)  # saída guardada por execução
+
+# Importação em massa de Ativos (comando importa_ativos e /api/ativos/importar/, ver api/importacao_ativos.py)
+IMPORT_BATCH_SIZE = config('IMPORT_BATCH_SIZE', default=5000, cast=int)  # linhas por COPY
+IMPORT_MAX_ERRORS = config('IMPORT_MAX_ERRORS', default=1000, cast=int)  # erros de linha detalhados na resposta
+
+# Exportação do histórico em fluxo (ver api/exportacao.py)
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)  # linhas por fetch do cursor e por escrita
+EXPORT_DB_ALIAS = 'default'  # em produção, o alias "streaming" (ver core/settings_producao.py)
+
+# Snapshot Parquet para a equipe de dados (comando exporta_parquet, ver api/exportacao_colunar.py)
+EXPORT_PARQUET_DIR = config('EXPORT_PARQUET_DIR', default=str(BASE_DIR / 'exports' / 'parquet'))
+EXPORT_PARQUET_REWRITE_DAYS = config('EXPORT_PARQUET_REWRITE_DAYS', default=31, cast=int)  # dias reescritos antes da marca
+
+# Suíte de benchmarks (comandos seed_dados e bench_suite, ver api/dados_sinteticos.py e api/bench.py)
+BENCH_RESULTS_DIR = config('BENCH_RESULTS_DIR', default=str(BASE_DIR / 'bench_resultados'))  # um JSON por commit
+
+# Métricas por pedido e /metrics no formato do Prometheus (ver api/metricas.py)
+METRICS_SERVER_TIMING = config('METRICS_SERVER_TIMING', default=DEBUG, cast=bool)  # cabeçalho Server-Timing nas respostas
+METRICS_TOKEN = config('METRICS_TOKEN', default='')  # se definido, /metrics exige "Authorization: Bearer <token>"
+
+# Perfis de execução: ?profile=1 (staff), amostragem e --profile nos comandos (ver api/perfilamento.py)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'perfis'))  # fora de MEDIA_ROOT: os arquivos têm o SQL executado
+PROFILE_SAMPLE_RATE = config('PROFILE_SAMPLE_RATE', default=0.0, cast=float)  # fração dos pedidos a /api/ perfilados (ex.: 0.001)
+PROFILE_SAMPLE_MIN_MS = config('PROFILE_SAMPLE_MIN_MS', default=500, cast=float)  # só guarda pedidos amostrados mais lentos que isto
+PROFILE_INTERVAL_MS = config('PROFILE_INTERVAL_MS', default=5, cast=float)  # intervalo do amostrador de pilhas
+PROFILE_MAX_QUERIES = config('PROFILE_MAX_QUERIES', default=5000, cast=int)  # queries com pilha guardadas por perfil
+PROFILE_MAX_STORED = config('PROFILE_MAX_STORED', default=200, cast=int)  # perfis mantidos (os mais antigos são apagados)
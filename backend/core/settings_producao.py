@@ -0,0 +1,93 @@
+"""
+Perfil de produção: DJANGO_SETTINGS_MODULE=core.settings_producao.
+
+Herda tudo de core/settings.py e muda a forma de falar com o PostGIS:
+
+- Pool de conexões do psycopg 3 (DB_POOL=True, padrão): cada processo mantém entre
+  DB_POOL_MIN_SIZE e DB_POOL_MAX_SIZE conexões abertas e reaproveita-as entre pedidos,
+  sem o custo de abrir uma conexão (TCP, autenticação, negociação do client_encoding) por
+  pedido. Numa rajada, os pedidos ESPERAM (até DB_POOL_TIMEOUT segundos) por uma conexão
+  livre em vez de abrir novas: o total no Postgres fica limitado a
+  workers × DB_POOL_MAX_SIZE, que deve caber em max_connections.
+  Com DB_POOL_CHECK, o pool testa a conexão antes de entregá-la (uma ida ao banco).
+- Sem pool (DB_POOL=False, ex.: atrás de um PgBouncer): conexões persistentes por thread
+  (CONN_MAX_AGE) com CONN_HEALTH_CHECKS, que descarta uma conexão morta antes de usá-la.
+  Sob ASGI prefira o pool: as conexões persistentes ficam presas às threads do sync_to_async.
+- statement_timeout e idle_in_transaction_session_timeout na sessão: uma query presa ou
+  uma transação esquecida não seguram a conexão (nem os locks) para sempre.
+- Alias "streaming" para as exportações em fluxo (EXPORT_DB_ALIAS): mesmo banco (ou uma
+  réplica, DB_STREAMING_HOST), timeout maior e cursores do lado do servidor, para que
+  `.iterator()` leia em blocos sem trazer o resultado inteiro para a memória.
+
+Compare com a configuração anterior usando o comando `bench_conexoes`.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, config
+
+DEBUG = config('DEBUG', default=False, cast=bool)
+ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost', cast=lambda valor: [host.strip() for host in valor.split(',')])
+
+
+# --- Banco de dados ---
+DB_POOL = config('DB_POOL', default=True, cast=bool)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)  # conexões sempre abertas por processo
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=10, cast=int)  # teto por processo (≈ threads do worker)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=float)  # espera por uma conexão livre, em segundos
+DB_POOL_CHECK = config('DB_POOL_CHECK', default=True, cast=bool)  # testa a conexão ao tirá-la do pool
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=600, cast=int)  # só sem pool
+DB_STATEMENT_TIMEOUT_MS = config('DB_STATEMENT_TIMEOUT_MS', default=30000, cast=int)
+DB_IDLE_IN_TRANSACTION_TIMEOUT_MS = config('DB_IDLE_IN_TRANSACTION_TIMEOUT_MS', default=60000, cast=int)
+DB_STREAMING_STATEMENT_TIMEOUT_MS = config('DB_STREAMING_STATEMENT_TIMEOUT_MS', default=30 * 60 * 1000, cast=int)
+# PgBouncer em modo transaction não suporta cursores do lado do servidor nem opções de sessão
+DB_PGBOUNCER = config('DB_PGBOUNCER', default=False, cast=bool)
+DB_STREAMING_HOST = config('DB_STREAMING_HOST', default='')  # ex.: réplica de leitura, ou o Postgres direto sem PgBouncer
+DB_STREAMING_PGBOUNCER = config('DB_STREAMING_PGBOUNCER', default=DB_PGBOUNCER and not DB_STREAMING_HOST, cast=bool)
+
+
+def _banco(statement_timeout_ms, pool_max_size, host=None, pgbouncer=DB_PGBOUNCER):
+    banco = dict(DATABASES['default'], OPTIONS=dict(DATABASES['default'].get('OPTIONS', {})))
+    if host:
+        banco['HOST'] = host
+    if not pgbouncer:
+        banco['OPTIONS']['options'] = (
+            f'-c statement_timeout={statement_timeout_ms} '
+            f'-c idle_in_transaction_session_timeout={DB_IDLE_IN_TRANSACTION_TIMEOUT_MS}'
+        )
+    banco['DISABLE_SERVER_SIDE_CURSORS'] = pgbouncer
+    if DB_POOL:
+        # O pool do Django exige CONN_MAX_AGE=0: é o pool que guarda as conexões
+        banco['CONN_MAX_AGE'] = 0
+        banco['OPTIONS']['pool'] = {
+            'min_size': min(DB_POOL_MIN_SIZE, pool_max_size),
+            'max_size': pool_max_size,
+            'timeout': DB_POOL_TIMEOUT,
+            'max_idle': 300,  # fecha conexões paradas acima do mínimo depois de 5 min
+            'max_lifetime': 3600,  # recicla conexões antigas (memória do backend, failover)
+        }
+        if DB_POOL_CHECK:
+            from psycopg_pool import ConnectionPool
+
+            banco['OPTIONS']['pool']['check'] = ConnectionPool.check_connection
+    else:
+        banco['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+        banco['CONN_HEALTH_CHECKS'] = True
+    return banco
+
+
+DATABASES = {
+    # Pedidos da API e comandos: timeout curto
+    'default': _banco(DB_STATEMENT_TIMEOUT_MS, DB_POOL_MAX_SIZE),
+    # Exportações em fluxo: poucas conexões, timeout longo, cursores do lado do servidor
+    'streaming': dict(
+        _banco(
+            DB_STREAMING_STATEMENT_TIMEOUT_MS,
+            config('DB_STREAMING_POOL_MAX_SIZE', default=2, cast=int),
+            host=DB_STREAMING_HOST,
+            pgbouncer=DB_STREAMING_PGBOUNCER,
+        ),
+        TEST={'MIRROR': 'default'},
+    ),
+}
+
+EXPORT_DB_ALIAS = 'streaming'
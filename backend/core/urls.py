@@ -19,9 +19,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from api.views import MetricasView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    # Métricas no formato do Prometheus (ver api/metricas.py)
+    path('metrics', MetricasView.as_view(), name='metrics'),
 ]
 
 if settings.DEBUG: